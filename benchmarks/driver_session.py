@@ -0,0 +1,61 @@
+import time
+
+from compy.representations.extractors import ClangDriver
+from compy.representations.extractors.extractors import LLVMIRExtractor
+
+
+NUM_CALLS = 200
+
+kernels = [
+    """
+int foo() {
+  return 1;
+}
+""",
+    """
+int max(int a, int b) {
+  if (a > b) {
+    return a;
+  } else {
+    return b;
+  }
+}
+""",
+    """
+void saxpy(int n, float a, float *x, float *y) {
+  for (int i = 0; i < n; i++)
+    y[i] = a * x[i] + y[i];
+}
+""",
+]
+
+
+def measure(session_enabled):
+    clang_driver = ClangDriver(
+        ClangDriver.ProgrammingLanguage.C,
+        ClangDriver.OptimizationLevel.O3,
+        [],
+        ["-Wall"],
+    )
+    clang_driver.setSessionEnabled(session_enabled)
+    extractor = LLVMIRExtractor(clang_driver)
+
+    # Warm up, so that one-time initialization is not part of the measurement
+    extractor.GraphFromString(kernels[0])
+
+    start = time.perf_counter()
+    for i in range(NUM_CALLS):
+        extractor.GraphFromString(kernels[i % len(kernels)])
+    end = time.perf_counter()
+
+    return (end - start) / NUM_CALLS
+
+
+if __name__ == "__main__":
+    without_session = measure(False)
+    with_session = measure(True)
+
+    print("Per-call latency over %d calls" % NUM_CALLS)
+    print("  without session: %.3f ms" % (without_session * 1000))
+    print("  with session:    %.3f ms" % (with_session * 1000))
+    print("  speedup:         %.2fx" % (without_session / with_session))
@@ -0,0 +1,82 @@
+import collections
+import gc
+import time
+import tracemalloc
+
+from compy.representations import common
+from compy.representations.llvm_graphs import LLVMGraphBuilder
+from compy.representations.llvm_graphs import LLVMCDFGPlusVisitor
+
+
+NUM_CALLS = 20
+NUM_GRAPHS = 100
+NUM_STATEMENTS = 500
+
+kernel = "void kernel(float *x, float *y) {\n%s}\n" % "".join(
+    "  y[%d] = x[%d] * %d.0f + y[%d];\n" % (i % 64, (i * 7) % 64, i, (i * 3) % 64) for i in range(NUM_STATEMENTS)
+)
+
+
+class NetworkxGraph(object):
+    """The lists of a graph kept as a networkx graph, as common.Graph did before it kept arrays."""
+
+    def __init__(self, graph, node_types, edge_types):
+        self.G = graph
+        self.node_types_dict = {n: i for i, n in enumerate(node_types)}
+        self.edge_types = edge_types
+
+    def get_node_list(self):
+        node_strs = list(collections.OrderedDict(self.G.nodes(data="attr", default="N/A")).values())
+        return [self.node_types_dict[node_str] for node_str in node_strs]
+
+    def get_edge_list(self):
+        nodes_keys = {n: i for i, n in enumerate(collections.OrderedDict(self.G.nodes(data="attr")).keys())}
+        return [
+            (nodes_keys[node1], self.edge_types.index(data["attr"]), nodes_keys[node2])
+            for node1, node2, data in self.G.edges(data=True)
+        ]
+
+
+def build(graph_class, info, node_types):
+    visitor = LLVMCDFGPlusVisitor()
+    info.accept(visitor)
+    return graph_class(visitor.G, node_types, visitor.edge_types)
+
+
+def measure(graph_class, info, node_types):
+    # Warm up, so that one-time initialization is not part of the measurement
+    graph = build(graph_class, info, node_types)
+    graph.get_node_list()
+    graph.get_edge_list()
+
+    start = time.perf_counter()
+    for i in range(NUM_CALLS):
+        graph.get_node_list()
+        graph.get_edge_list()
+    end = time.perf_counter()
+
+    # Memory kept by the graphs, e.g. of a dataset held in memory
+    gc.collect()
+    tracemalloc.start()
+    graphs = [build(graph_class, info, node_types) for _ in range(NUM_GRAPHS)]
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del graphs
+
+    return (end - start) / NUM_CALLS, memory / NUM_GRAPHS
+
+
+if __name__ == "__main__":
+    builder = LLVMGraphBuilder()
+    info = builder.string_to_info(kernel)
+    graph = builder.info_to_representation(info, LLVMCDFGPlusVisitor)
+    node_types = builder.vocabulary
+
+    networkx_time, networkx_memory = measure(NetworkxGraph, info, node_types)
+    arrays_time, arrays_memory = measure(common.Graph.from_networkx, info, node_types)
+
+    print("Graphs of %d nodes, node and edge list latency over %d calls" % (graph.size(), NUM_CALLS))
+    print("  networkx: %.2f ms, %.1f kB per graph" % (networkx_time * 1000, networkx_memory / 1024))
+    print("  arrays:   %.2f ms, %.1f kB per graph" % (arrays_time * 1000, arrays_memory / 1024))
+    print("  speedup:  %.2fx, memory reduction: %.2fx" % (networkx_time / arrays_time, networkx_memory / arrays_memory))
@@ -0,0 +1,39 @@
+import time
+
+from compy.representations.llvm_graphs import LLVMGraphBuilder
+
+
+NUM_CALLS = 10000
+NUM_STATEMENTS = 500
+
+# A single function with a large basic block.
+kernel = "void kernel(float *x, float *y) {\n%s}\n" % "".join(
+    "  y[%d] = x[%d] + y[%d];\n" % (i, i, i) for i in range(NUM_STATEMENTS)
+)
+
+
+def measure(fn):
+    # Warm up, so that one-time initialization is not part of the measurement
+    fn()
+
+    start = time.perf_counter()
+    for i in range(NUM_CALLS):
+        fn()
+    end = time.perf_counter()
+
+    return (end - start) / NUM_CALLS
+
+
+if __name__ == "__main__":
+    info = LLVMGraphBuilder().string_to_info(kernel)
+    bb = info.functionInfos[0].basicBlocks[0]
+
+    # Accessing the field only wraps the vector, while list() converts all of its elements like the accessor did
+    # before the fields were bound as sequences.
+    access = measure(lambda: bb.instructions[-1])
+    copy = measure(lambda: list(bb.instructions)[-1])
+
+    print("Per-access latency of a field with %d instructions over %d accesses" % (len(bb.instructions), NUM_CALLS))
+    print("  sequence: %.2f us" % (access * 1e6))
+    print("  list:     %.2f us" % (copy * 1e6))
+    print("  speedup:  %.2fx" % (copy / access))
@@ -12,9 +12,24 @@ from compy.representations.extractors.extractors import llvm
 from compy.representations.ast_graphs import ASTCodeBuilder
 from compy.representations.ast_graphs import ASTCodeVisitor
 
+from compy.utils.discovery_cache import discovery_cache, tool_stamp
+
 OUTPUT_FOLDER='extractor_output'
 COMPILER='clang'
 
+# Flags whose value names a file of the invocation.
+FILE_VALUE_FLAGS = ['-o', '-MF', '-MT', '-MQ']
+
+# Flags that take their value as the next argument, e.g. a directory.
+SEPARATE_VALUE_FLAGS = ['-I', '-iquote', '-isystem', '-idirafter', '-iprefix', '-iwithprefix', '-isysroot',
+                        '--sysroot', '-resource-dir', '-B', '--gcc-toolchain', '-include', '-imacros', '-x',
+                        '-target', '--target', '-arch', '-D', '-U', '-L', '-F', '-Xclang', '-Xpreprocessor',
+                        '-Xassembler', '-Xlinker']
+
+# Extensions of the input files that clang picks the language from.
+SOURCE_EXTENSIONS = ['.c', '.i', '.cc', '.cp', '.cpp', '.cxx', '.c++', '.C', '.ii', '.m', '.mm', '.cl', '.cu',
+                     '.s', '.S', '.ll', '.bc']
+
 # Run original clang to produce required build files for rest of
 # the build process.
 def run_clang(clang_args):
@@ -55,6 +70,42 @@ def get_extra_includes(hash_output):
         index += 1
     return [(include, ClangDriver.IncludeDirType.User) for include in includes]
 
+# The parts of an invocation that the system include dirs depend on: the
+# compiler, the flags with their values and the languages of the input source
+# files, but not the names of the sources and outputs, so that the compiles of
+# a build share them.
+def include_discovery_key(compiler, clang_args):
+    key_args = []
+    ind = 0
+    while ind < len(clang_args):
+        arg = clang_args[ind]
+        if arg in FILE_VALUE_FLAGS:
+            ind += 1
+        elif arg.startswith('-o'):
+            pass
+        elif arg in SEPARATE_VALUE_FLAGS:
+            key_args += clang_args[ind:ind + 2]
+            ind += 1
+        elif is_source_file(arg):
+            key_args.append(os.path.splitext(arg)[1])
+        else:
+            key_args.append(arg)
+        ind += 1
+    return tool_stamp(shutil.which(compiler) or compiler) + key_args
+
+# The system include dirs of clang_args, from clang -###. They are cached on
+# disk, so that only the first compile of a configuration runs clang for them.
+def discover_extra_includes(clang_args):
+    def discover():
+        outputs = subprocess.Popen([COMPILER, '-###'] + clang_args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return [include for include, _ in get_extra_includes(outputs)]
+
+    includes = discovery_cache().get('clang_internal_includes', include_discovery_key(COMPILER, clang_args), discover)
+    return [(include, ClangDriver.IncludeDirType.User) for include in includes]
+
+def is_source_file(arg):
+    return not arg.startswith('-') and os.path.splitext(arg)[1] in SOURCE_EXTENSIONS
+
 def is_file(f):
     # TODO -- this check needs to say whether the file is a C file that we
     # should extract on.
@@ -128,9 +179,8 @@ def main():
 
     # Get the include directories that we need --- for some reason
     # the compy driver doesn't ge tthe normal include directories.
-    outputs = subprocess.Popen([COMPILER, '-###'] + clang_args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    extra_includes = get_extra_includes(outputs)
-    
+    extra_includes = discover_extra_includes(clang_args)
+
     if run_extractor:
         clang_driver = ClangDriver(
                 ClangDriver.ProgrammingLanguage.C,
@@ -0,0 +1,29 @@
+import sys
+
+from compy.compiler import include_discovery_key
+
+
+# Any existing executable, the key only depends on its file
+COMPILER = sys.executable
+
+
+def test_include_discovery_key_ignores_source_and_output_names():
+    key = include_discovery_key(COMPILER, ['-O2', '-c', 'a.c', '-o', 'a.o'])
+
+    assert key == include_discovery_key(COMPILER, ['-O2', '-c', 'dir/b.c', '-o', 'b.o'])
+    assert key != include_discovery_key(COMPILER, ['-O2', '-c', 'a.cpp', '-o', 'a.o'])
+
+
+def test_include_discovery_key_keeps_flag_values(tmp_path):
+    sysroot1 = tmp_path / 'sr1'
+    sysroot2 = tmp_path / 'sr2'
+    sysroot1.mkdir()
+    sysroot2.mkdir()
+
+    key = include_discovery_key(COMPILER, ['--sysroot', str(sysroot1), '-c', 'a.c'])
+
+    assert key != include_discovery_key(COMPILER, ['--sysroot', str(sysroot2), '-c', 'a.c'])
+    assert key != include_discovery_key(COMPILER, ['-isystem', str(sysroot1), '-c', 'a.c'])
+    assert include_discovery_key(COMPILER, ['-include', 'x.c', 'a.c']) != include_discovery_key(
+        COMPILER, ['-include', 'y.c', 'a.c']
+    )
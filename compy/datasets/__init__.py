@@ -4,3 +4,4 @@ from .devmap import OpenCLDevmapDataset
 from .livermorec import LivermorecDataset
 from .opencv import OpencvDataset
 from .polybench import PolybenchDataset
+from .sample_store import SampleStore, SampleStoreWriter
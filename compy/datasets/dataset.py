@@ -4,7 +4,9 @@ import shutil
 import subprocess
 import sys
 import py
+import tarfile
 import traceback
+import zipfile
 from enum import Enum
 
 from appdirs import user_data_dir
@@ -12,6 +14,7 @@ from git import Repo
 from tqdm import tqdm
 import urllib.request
 
+from compy.representations import Graph
 from compy.representations.extractors import ClangDriver
 
 
@@ -28,7 +31,17 @@ class Dataset(object):
 
         self.content_dir = os.path.join(self.dataset_dir, "content")
 
-    def preprocess(self, builder, visitor):
+    def preprocess(self, builder, visitor, *args, **kwargs):
+        return {
+            "samples": list(self.iter_samples(builder, visitor, *args, **kwargs)),
+        }
+
+    def iter_samples(self, builder, visitor, *args, **kwargs):
+        """Yield the samples of preprocess() one at a time, as they are built.
+
+        Only the infos of the sources being converted are kept in memory, and graphs do not refer to their infos, so
+        that the samples can be written to disk or fed to a model as they come, without holding the whole dataset.
+        """
         raise NotImplementedError
 
     def download_http_and_extract(self, url):
@@ -43,6 +56,20 @@ class Dataset(object):
 
         return archive_file, self.content_dir
 
+    def download_http_and_read(self, url, member_filter=None):
+        """Like download_http_and_extract(), but reads the files of the archive into memory instead of extracting them.
+
+        Returns the archive file and the files as a dict from the path they would have in the content dir to their
+        content, to be passed to ClangDriver.setVirtualFiles().
+        """
+        filename = url.split('/')[-1]
+        archive_file = os.path.join(self.dataset_dir, filename)
+
+        if not os.path.isfile(archive_file):
+            urllib.request.urlretrieve(url, archive_file)
+
+        return archive_file, read_archive(archive_file, self.content_dir, member_filter)
+
     def download_http(self, url):
         os.makedirs(self.content_dir, exist_ok=True)
         local_file = os.path.join(self.content_dir, 'file.c')
@@ -55,6 +82,31 @@ class Dataset(object):
         return self.content_dir
 
 
+def read_archive(archive_file, root, member_filter=None):
+    """Read the files of a zip or tar archive into a dict from their path below root to their content.
+
+    If member_filter is given, only the files whose name in the archive it accepts are read.
+    """
+    files = {}
+
+    def add(name, read):
+        if member_filter is None or member_filter(name):
+            files[os.path.normpath(os.path.join(root, name))] = read()
+
+    if zipfile.is_zipfile(archive_file):
+        with zipfile.ZipFile(archive_file) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    add(info.filename, lambda: archive.read(info))
+    else:
+        with tarfile.open(archive_file) as archive:
+            for member in archive:
+                if member.isfile():
+                    add(member.name, lambda: archive.extractfile(member).read())
+
+    return files
+
+
 class BuildSystem(Enum):
     CONFIGURE = 1
     MAKE = 2
@@ -150,12 +202,41 @@ class GenericDataset(Dataset):
                     json.dump(self.invocations, f)
         return self.invocations
 
-    def preprocess(self, builder, visitor, invocations=None):
+    def iter_samples(self, builder, visitor, invocations=None, num_workers=None, batch_size=64):
         if not invocations:
-            self.invocations = self.get_invocations()
+            invocations = self.get_invocations()
+
+        def samples_of(filename_abs, extractionInfo):
+            for functionInfo in extractionInfo.functionInfos:
+                meta = {'filename': filename_abs, 'dataset_name': self.name}
+                sample = builder.info_to_representation(functionInfo, visitor, meta)
+                yield {
+                    "x": {"code_rep": detach_sample(sample)},
+                }
+
+        # Batches of (invocation, absolute file name, clang driver)
+        batch = []
 
-        samples = []
-        for invocation in tqdm(self.invocations, desc="Source Code -> IR+ -> Code rep in %s" % self.content_dir):
+        def process_batch():
+            extractionInfos, errors, limits_exceeded = builder.batch_file_to_info(
+                [item[1] for item in batch],
+                clang_drivers=[item[2] for item in batch],
+                num_workers=num_workers,
+            )
+            samples = []
+            for (invocation, filename_abs, _), extractionInfo, error, limit_exceeded in zip(
+                batch, extractionInfos, errors, limits_exceeded
+            ):
+                if limit_exceeded:
+                    print("Resource limit exceeded", invocation, error)
+                elif error:
+                    print("Error", invocation, error)
+                else:
+                    samples += samples_of(filename_abs, extractionInfo)
+            batch.clear()
+            return samples
+
+        for invocation in tqdm(invocations, desc="Source Code -> IR+ -> Code rep in %s" % self.content_dir):
             # print(invocation)
 
             invocation['includes'] += [os.path.dirname(invocation['filename'])]
@@ -182,27 +263,29 @@ class GenericDataset(Dataset):
             )
 
             try:
-                builder.clang_driver = clang_driver
-
                 filename_abs = os.path.join(self.content_dir, invocation['filename'])
-                with open(filename_abs, "rb") as file:
-                    source_code = file.read()
-                extractionInfo = builder.string_to_info(source_code)
 
-                for functionInfo in extractionInfo.functionInfos:
-                    meta = {'filename': filename_abs, 'dataset_name': self.name}
-                    sample = builder.info_to_representation(functionInfo, visitor, meta)
-                    samples.append(sample)
+                if num_workers is not None:
+                    batch.append((invocation, filename_abs, clang_driver))
+                    samples = process_batch() if len(batch) >= batch_size else []
+                else:
+                    extractionInfo = builder.file_to_info(filename_abs, clang_driver=clang_driver)
+                    samples = list(samples_of(filename_abs, extractionInfo))
+                    del extractionInfo
 
             except (RuntimeError, FileNotFoundError) as e:
                 print("Error", invocation)
                 traceback.print_exc()
-                pass
+                continue
 
-        return {
-            "samples": [
-                {
-                    "x": {"code_rep": sample},
-                }
-                for sample in samples],
-        }
\ No newline at end of file
+            yield from samples
+
+        if batch:
+            yield from process_batch()
+
+
+def detach_sample(sample):
+    """Let a graph sample drop the infos it was built from, see Graph.detach()."""
+    if isinstance(sample, Graph):
+        sample.detach()
+    return sample
\ No newline at end of file
@@ -1,6 +1,8 @@
 import os
 import pytest
 import shutil
+import tarfile
+import zipfile
 
 from compy.datasets import dataset
 
@@ -30,6 +32,24 @@ def test_app_dir_exists(dataset_fixture):
     assert os.path.isdir(dataset_fixture.dataset_dir)
 
 
+def test_preprocess_collects_iter_samples():
+    class StreamedDataset(dataset.Dataset):
+        def iter_samples(self, builder, visitor, num_samples=2):
+            for i in range(num_samples):
+                yield {"x": {"code_rep": builder(visitor, i)}}
+
+    ds = StreamedDataset()
+    try:
+        samples = ds.iter_samples(lambda visitor, i: (visitor, i), "visitor")
+        assert next(samples) == {"x": {"code_rep": ("visitor", 0)}}
+
+        assert ds.preprocess(lambda visitor, i: i, None, num_samples=3) == {
+            "samples": [{"x": {"code_rep": i}} for i in range(3)]
+        }
+    finally:
+        shutil.rmtree(ds.dataset_dir)
+
+
 def test_download_http_and_extract(dataset_fixture):
     zip_file, content_dir = dataset_fixture.download_http_and_extract(
         "http://wwwpub.zih.tu-dresden.de/~s9602232/test.zip"
@@ -39,6 +59,24 @@ def test_download_http_and_extract(dataset_fixture):
     assert os.path.isdir(content_dir)
 
 
+@pytest.mark.parametrize("archive_format", ["zip", "gztar"])
+def test_read_archive(tmp_path, archive_format):
+    sources = tmp_path / "sources"
+    (sources / "include").mkdir(parents=True)
+    (sources / "include" / "limit.h").write_text("#define LIMIT 10\n")
+    (sources / "program.c").write_text("int foo() { return 1; }\n")
+    archive_file = shutil.make_archive(str(tmp_path / "archive"), archive_format, str(sources))
+
+    files = dataset.read_archive(archive_file, "/content")
+    assert files == {
+        "/content/include/limit.h": b"#define LIMIT 10\n",
+        "/content/program.c": b"int foo() { return 1; }\n",
+    }
+
+    files = dataset.read_archive(archive_file, "/content", lambda name: name.endswith(".c"))
+    assert list(files) == ["/content/program.c"]
+
+
 def test_clone_git(dataset_fixture):
     content_dir = dataset_fixture.clone_git(
         "https://github.com/alexanderb14/build-webrtc-builds.git"
@@ -4,6 +4,7 @@ from tqdm import tqdm
 
 from compy.datasets import dataset
 from compy.representations.extractors import ClangDriver
+from compy.representations.extractors import ResourceLimitExceeded
 
 
 class OpenCLDevmapDataset(dataset.Dataset):
@@ -20,7 +21,19 @@ class OpenCLDevmapDataset(dataset.Dataset):
         self.programming_language = ClangDriver.ProgrammingLanguage.OpenCL
         self.compiler_flags = ["-xcl", "-target", "x86_64-pc-linux-gnu"]
 
-    def preprocess(self, builder, visitor, benchmark_suites=None):
+    def preprocess(self, builder, visitor, benchmark_suites=None, num_workers=None, batch_size=64):
+        samples = list(self.iter_samples(builder, visitor, benchmark_suites, num_workers, batch_size))
+
+        print("Size of dataset:", len(samples))
+        print("Number of unique tokens:", builder.num_tokens())
+        builder.print_tokens()
+
+        return {
+            "samples": samples,
+            "num_types": builder.num_tokens(),
+        }
+
+    def iter_samples(self, builder, visitor, benchmark_suites=None, num_workers=None, batch_size=64):
         suite_specifics = {
             "amd-app-sdk-3.0": {"subdir": "samples/opencl/cl/1.x"},
             "npb-3.3": {"subdir": ""},
@@ -158,59 +171,75 @@ class OpenCLDevmapDataset(dataset.Dataset):
                 )
                 to_process[file_data].append(function_data)
 
-        # Process the map of files
-        processed = {}
-        for file_data in tqdm(to_process, desc="Source Code -> IR+"):
-            (
-                bench_file,
-                source_code,
-                additional_include_dir,
-                suite_name,
-                benchmark_name,
-            ) = file_data
-
-            extractionInfo = builder.string_to_info(
-                opencl_header + source_code, additional_include_dir
-            )
-
-            for functionInfo in extractionInfo.functionInfos:
-                processed[
-                    (suite_name, benchmark_name, functionInfo.name)
-                ] = functionInfo
-
-        # Map to dataset and extract representations
-        samples = {}
-        for file_data, function_datas in tqdm(
-            to_process.items(), desc="IR+ -> ML Representation"
-        ):
-            (
-                bench_file,
-                source_code,
-                additional_include_dir,
-                suite_name,
-                benchmark_name,
-            ) = file_data
-
-            for function_data in function_datas:
-                function_name, transfer, wgsize, label = function_data
-
-                item_info = (suite_name, benchmark_name, function_name)
-                samples[
-                    item_info + (transfer, wgsize, label)
-                ] = builder.info_to_representation(processed[item_info], visitor)
-
-        print("Size of dataset:", len(samples))
-        print("Number of unique tokens:", builder.num_tokens())
-        builder.print_tokens()
-
-        return {
-            "samples": [
-                {
-                    "info": info,
-                    "x": {"code_rep": sample, "aux_in": [info[3], info[4]]},
-                    "y": 0 if info[5] == "CPU" else 1,
-                }
-                for info, sample in samples.items()
-            ],
-            "num_types": builder.num_tokens(),
-        }
+        # Extract and convert the files in batches of whole benchmarks, as the functions of a benchmark are looked up
+        # in all of its files. With num_workers, the files of a batch are spread over num_workers native threads.
+        benchmarks = {}
+        for file_data in to_process:
+            benchmarks.setdefault(file_data[3:], []).append(file_data)
+        batches = [[]]
+        for files in benchmarks.values():
+            if len(batches[-1]) >= batch_size:
+                batches.append([])
+            batches[-1] += files
+
+        seen = set()
+        for batch in tqdm(batches, desc="Source Code -> IR+ -> ML Representation"):
+            if num_workers is None:
+                extractionInfos = [
+                    builder.string_to_info(opencl_header + source_code, additional_include_dir)
+                    for _, source_code, additional_include_dir, _, _ in batch
+                ]
+            else:
+                extractionInfos, errors, limits_exceeded = builder.batch_string_to_info(
+                    [opencl_header + file_data[1] for file_data in batch],
+                    additional_include_dirs=[file_data[2] for file_data in batch],
+                    num_workers=num_workers,
+                )
+                for file_data, error, limit_exceeded in zip(batch, errors, limits_exceeded):
+                    if error:
+                        error_class = ResourceLimitExceeded if limit_exceeded else RuntimeError
+                        raise error_class("%s: %s" % (file_data[0], error))
+
+            processed = {}
+            for file_data, extractionInfo in zip(batch, extractionInfos):
+                (
+                    bench_file,
+                    source_code,
+                    additional_include_dir,
+                    suite_name,
+                    benchmark_name,
+                ) = file_data
+
+                for functionInfo in extractionInfo.functionInfos:
+                    processed[
+                        (suite_name, benchmark_name, functionInfo.name)
+                    ] = functionInfo
+            del extractionInfos
+
+            # Map to dataset and extract representations
+            for file_data in batch:
+                (
+                    bench_file,
+                    source_code,
+                    additional_include_dir,
+                    suite_name,
+                    benchmark_name,
+                ) = file_data
+
+                for function_data in to_process[file_data]:
+                    function_name, transfer, wgsize, label = function_data
+
+                    item_info = (suite_name, benchmark_name, function_name)
+                    info = item_info + (transfer, wgsize, label)
+                    # The files of a benchmark share its functions
+                    if info in seen:
+                        continue
+                    seen.add(info)
+
+                    sample = builder.info_to_representation(processed[item_info], visitor)
+                    yield {
+                        "info": info,
+                        "x": {"code_rep": dataset.detach_sample(sample), "aux_in": [info[3], info[4]]},
+                        "y": 0 if info[5] == "CPU" else 1,
+                    }
+            del processed
@@ -42,11 +42,9 @@ class LivermorecDataset(dataset.Dataset):
             return None
         filenames = get_all_src_files(self.content_dir)
         filename = filenames[0]
-        with open(filename, "rb") as f:
-            source_code = f.read()
 
 #        try:
-        extractionInfo = builder.string_to_info(source_code)
+        extractionInfo = builder.file_to_info(filename)
         for functionInfo in extractionInfo.functionInfos:
             meta = {'dataset_name': 'livermorec', 'filename': filename}
             sample = builder.info_to_representation(functionInfo, visitor, meta)
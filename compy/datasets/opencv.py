@@ -121,12 +121,8 @@ class OpencvDataset(dataset.Dataset):
             )
 
             try:
-                builder.clang_driver = clang_driver
-
                 filename_abs = os.path.join(self.content_dir, invocation['filename'])
-                with open(filename_abs, "rb") as file:
-                    source_code = file.read()
-                extractionInfo = builder.string_to_info(source_code)
+                extractionInfo = builder.file_to_info(filename_abs, clang_driver=clang_driver)
 
                 for functionInfo in extractionInfo.functionInfos:
                     meta = {'filename': filename_abs}
@@ -28,13 +28,12 @@ class PolybenchDataset(dataset.Dataset):
     def get_size(self):
         return 1
 
-    def preprocess(self, builder, visitor, start_at=False, num_samples=None, randomly_select_samples=False):
+    def iter_samples(self, builder, visitor, start_at=False, num_samples=None, randomly_select_samples=False):
         filenames = []
         for subdir in ['datamining', 'stencils', 'linear-algebra', 'medley']:
             filenames += glob.glob(os.path.join(self.content_dir, subdir) + '/**/*.c', recursive=True)
         filenames = [f for f in filenames if 'Nussinov.orig.c' not in f]
 
-        samples = []
         for filename in tqdm(filenames, desc="Source Code -> IR+ -> Code rep in %s" % self.content_dir):
             includes = [(os.path.join(self.content_dir, 'utilities'), ClangDriver.IncludeDirType.User),
                         (os.path.dirname(filename), ClangDriver.IncludeDirType.User)]
@@ -47,10 +46,11 @@ class PolybenchDataset(dataset.Dataset):
                 flags,
             )
 
-            builder.clang_driver = clang_driver
-            with open(filename, "rb") as file:
-                source_code = file.read()
-            extractionInfo = builder.string_to_info(source_code)
+            extractionInfo = builder.file_to_info(filename, clang_driver=clang_driver)
             for functionInfo in extractionInfo.functionInfos:
                 meta = {'filename': filename}
                 sample = builder.info_to_representation(functionInfo, visitor, meta)
+                yield {
+                    "x": {"code_rep": dataset.detach_sample(sample)},
+                }
+            del extractionInfo
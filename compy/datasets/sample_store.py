@@ -0,0 +1,331 @@
+import bisect
+import json
+import os
+
+import numpy as np
+
+from compy.representations import Graph
+from compy.representations import Sequence
+from compy.representations import Vocabulary
+
+
+SHARD_SIZE = 10000
+
+# The arrays of a shard, with their dtype and the width of their rows
+_GRAPH_ARRAYS = {
+    "nodes": (np.int32, None),
+    "node_offsets": (np.int64, None),
+    "edges": (np.int32, 3),
+    "edge_offsets": (np.int64, None),
+    "seq_order": (np.int64, None),
+}
+_SEQUENCE_ARRAYS = {
+    "tokens": (np.int32, None),
+    "token_offsets": (np.int64, None),
+}
+# The arrays with a row per node, edge or token, and their offsets array, which holds where the rows of every sample
+# start, followed by the number of rows
+_OFFSETS = {"nodes": "node_offsets", "edges": "edge_offsets", "tokens": "token_offsets"}
+
+
+def _shard_dir(path, shard):
+    return os.path.join(path, "shard-%05d" % shard)
+
+
+def _array_file(path, shard, name):
+    return os.path.join(_shard_dir(path, shard), name + ".bin")
+
+
+def _same_types(types, other):
+    # Vocabularies grow while samples are added, lists of types are built for every graph
+    if isinstance(types, Vocabulary) or isinstance(other, Vocabulary):
+        return types is other
+    return types is other or list(types) == list(other)
+
+
+def _save_types(types, path):
+    if not isinstance(types, Vocabulary):
+        vocabulary = Vocabulary(types)
+        if len(vocabulary) != len(types):
+            raise ValueError("Types must be unique to be stored")
+        types = vocabulary
+    types.save(path)
+
+
+class SampleStoreWriter(object):
+    """Writes samples to a sample store on disk, see SampleStore.
+
+    The samples are dicts like the ones of Dataset.iter_samples(), whose code_rep is a Graph or a Sequence. Their
+    info is not stored. All samples must be of the same kind and refer to the same node and edge types or token types,
+    e.g. the vocabulary of one builder, which is saved when the writer is closed, so that it includes every type, and
+    equal lists of edge types.
+
+    Samples are written as they are added, and only the labels and offsets of the current shard are kept in memory.
+    Every shard_size samples a new shard is started.
+
+    Use it as a context manager, or call close() after the last sample:
+
+        with SampleStoreWriter(path) as writer:
+            for sample in dataset.iter_samples(builder, visitor):
+                writer.add(sample)
+    """
+
+    def __init__(self, path, shard_size=SHARD_SIZE):
+        self.path = path
+        self.shard_size = shard_size
+        os.makedirs(path, exist_ok=True)
+
+        self.__kind = None
+        self.__arrays = None
+        self.__types = None
+        self.__columns = None
+        self.__shards = []
+        self.__files = None
+        self.__offsets = None
+        self.__column_values = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return sum(self.__shards)
+
+    def add(self, sample):
+        code_rep = sample["x"]["code_rep"]
+        columns = {"y": sample.get("y"), "aux_in": sample["x"].get("aux_in")}
+
+        if self.__kind is None:
+            self.__start(code_rep, columns)
+        self.__check(code_rep, columns)
+
+        if self.__files is None or self.__shards[-1] >= self.shard_size:
+            self.__open_shard()
+
+        if self.__kind == "graph":
+            arrays = {
+                "nodes": code_rep.get_node_array(),
+                "edges": code_rep.get_edge_array(),
+                "seq_order": code_rep.get_seq_order_array(),
+            }
+        else:
+            arrays = {"tokens": code_rep.get_token_array()}
+
+        for name, array in arrays.items():
+            dtype, _ = self.__arrays[name]
+            np.ascontiguousarray(array, dtype=dtype).tofile(self.__files[name])
+            if name in _OFFSETS:
+                offsets = self.__offsets[_OFFSETS[name]]
+                offsets.append(offsets[-1] + len(array))
+
+        for name, value in columns.items():
+            if value is not None:
+                self.__column_values[name].append(value)
+        self.__shards[-1] += 1
+
+    def close(self):
+        """Write the last shard, the types and the metadata of the store."""
+        if self.__files is not None:
+            self.__close_shard()
+
+        meta = {"kind": self.__kind, "shards": self.__shards, "columns": self.__columns or {}}
+        for name, types in (self.__types or {}).items():
+            _save_types(types, os.path.join(self.path, name + ".json"))
+
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    def __start(self, code_rep, columns):
+        if isinstance(code_rep, Graph):
+            self.__kind = "graph"
+            self.__arrays = _GRAPH_ARRAYS
+            self.__types = {"node_types": code_rep.node_types, "edge_types": code_rep.edge_types}
+        elif isinstance(code_rep, Sequence):
+            self.__kind = "sequence"
+            self.__arrays = _SEQUENCE_ARRAYS
+            self.__types = {"token_types": code_rep.token_types}
+        else:
+            raise ValueError("Cannot store %s samples" % type(code_rep).__name__)
+
+        self.__columns = {}
+        for name, value in columns.items():
+            if value is not None:
+                value = np.asarray(value)
+                self.__columns[name] = {"dtype": value.dtype.str, "shape": list(value.shape)}
+
+    def __check(self, code_rep, columns):
+        if self.__kind == "graph":
+            if not isinstance(code_rep, Graph):
+                raise ValueError("Cannot add a %s to a store of graphs" % type(code_rep).__name__)
+            types = {"node_types": code_rep.node_types, "edge_types": code_rep.edge_types}
+        else:
+            if not isinstance(code_rep, Sequence):
+                raise ValueError("Cannot add a %s to a store of sequences" % type(code_rep).__name__)
+            types = {"token_types": code_rep.token_types}
+
+        if not all(_same_types(types[name], self.__types[name]) for name in types):
+            raise ValueError("All samples of a store must refer to the same types")
+        if {name for name, value in columns.items() if value is not None} != set(self.__columns):
+            raise ValueError("All samples of a store must have the same columns, %s" % sorted(self.__columns))
+
+    def __open_shard(self):
+        if self.__files is not None:
+            self.__close_shard()
+
+        shard = len(self.__shards)
+        os.makedirs(_shard_dir(self.path, shard), exist_ok=True)
+        self.__files = {
+            name: open(_array_file(self.path, shard, name), "wb")
+            for name in self.__arrays
+            if name not in _OFFSETS.values()
+        }
+        self.__offsets = {name: [0] for name in self.__arrays if name in _OFFSETS.values()}
+        self.__column_values = {name: [] for name in self.__columns}
+        self.__shards.append(0)
+
+    def __close_shard(self):
+        shard = len(self.__shards) - 1
+        for f in self.__files.values():
+            f.close()
+        for name, offsets in self.__offsets.items():
+            np.asarray(offsets, dtype=self.__arrays[name][0]).tofile(_array_file(self.path, shard, name))
+        for name, values in self.__column_values.items():
+            column = self.__columns[name]
+            values = np.asarray(values, dtype=np.dtype(column["dtype"]))
+            if list(values.shape[1:]) != column["shape"]:
+                raise ValueError("%s must be of shape %s" % (name, column["shape"]))
+            values.tofile(_array_file(self.path, shard, name))
+
+        self.__files = None
+        self.__offsets = None
+        self.__column_values = None
+
+
+class _Shard(object):
+    """The memory-mapped arrays of a shard."""
+
+    def __init__(self, path, shard, arrays, columns):
+        self.arrays = {}
+        for name, (dtype, width) in arrays.items():
+            self.arrays[name] = self.__map(_array_file(path, shard, name), dtype, (width,) if width else ())
+        for name, column in columns.items():
+            self.arrays[name] = self.__map(_array_file(path, shard, name), column["dtype"], tuple(column["shape"]))
+
+    @staticmethod
+    def __map(filename, dtype, row_shape):
+        dtype = np.dtype(dtype)
+        row_size = dtype.itemsize * int(np.prod(row_shape))
+        num_rows = os.path.getsize(filename) // row_size if row_size else 0
+        # np.memmap cannot map empty files
+        if num_rows == 0:
+            return np.zeros((0,) + row_shape, dtype=dtype)
+        return np.memmap(filename, dtype=dtype, mode="r", shape=(num_rows,) + row_shape)
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+
+class SampleStore(object):
+    """Random access to the samples of a store written by SampleStoreWriter.
+
+    The arrays of a store are memory-mapped, so that a sample is read from disk when it is accessed, without loading
+    the store into memory. store[i] returns the i-th sample as a dict like the ones written, with a Graph or Sequence
+    that refers to the types of the store. Its arrays are views of the mapped files. Use labels() to get the y column
+    of all samples, e.g. to split the store into folds, and subset() to access the samples of a fold:
+
+        store = SampleStore(path)
+        for train_idx, test_idx in StratifiedKFold(n_splits=10).split(np.zeros(len(store)), store.labels()):
+            model.train(store.subset(train_idx), store.subset(test_idx))
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+
+        self.kind = meta["kind"]
+        self.columns = meta["columns"]
+        self.__arrays = _GRAPH_ARRAYS if self.kind == "graph" else _SEQUENCE_ARRAYS
+        if self.kind == "graph":
+            self.node_types = Vocabulary.load(os.path.join(path, "node_types.json"))
+            self.edge_types = Vocabulary.load(os.path.join(path, "edge_types.json"))
+        elif self.kind == "sequence":
+            self.token_types = Vocabulary.load(os.path.join(path, "token_types.json"))
+
+        self.__starts = np.cumsum([0] + meta["shards"]).tolist()
+        self.__shards = [None] * len(meta["shards"])
+
+    def __len__(self):
+        return self.__starts[-1]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("sample index out of range")
+
+        shard_index = bisect.bisect_right(self.__starts, index) - 1
+        shard = self.__shard(shard_index)
+        i = index - self.__starts[shard_index]
+
+        if self.kind == "graph":
+            nodes = slice(shard["node_offsets"][i], shard["node_offsets"][i + 1])
+            edges = slice(shard["edge_offsets"][i], shard["edge_offsets"][i + 1])
+            code_rep = Graph.from_arrays(
+                self.node_types,
+                self.edge_types,
+                shard["nodes"][nodes],
+                shard["edges"][edges],
+                seq_order=shard["seq_order"][nodes],
+            )
+        else:
+            tokens = slice(shard["token_offsets"][i], shard["token_offsets"][i + 1])
+            code_rep = Sequence.from_array(shard["tokens"][tokens], self.token_types)
+
+        sample = {"x": {"code_rep": code_rep}}
+        if "aux_in" in self.columns:
+            sample["x"]["aux_in"] = shard["aux_in"][i]
+        if "y" in self.columns:
+            sample["y"] = shard["y"][i].item() if shard["y"].ndim == 1 else shard["y"][i]
+        return sample
+
+    def labels(self):
+        """Return the y column of all samples as a numpy array."""
+        if "y" not in self.columns:
+            raise KeyError("y")
+        column = self.columns["y"]
+        return np.concatenate(
+            [np.zeros([0] + column["shape"], dtype=column["dtype"])]
+            + [self.__shard(shard)["y"] for shard in range(len(self.__shards))]
+        )
+
+    def subset(self, indices):
+        """Return a sequence of the samples at indices, which are read when they are accessed."""
+        return _Subset(self, indices)
+
+    def __shard(self, shard):
+        if self.__shards[shard] is None:
+            self.__shards[shard] = _Shard(self.path, shard, self.__arrays, self.columns)
+        return self.__shards[shard]
+
+
+class _Subset(object):
+    def __init__(self, store, indices):
+        self.__store = store
+        self.__indices = np.asarray(indices, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.__indices)
+
+    def __getitem__(self, index):
+        return self.__store[int(self.__indices[index])]
+
+    def __iter__(self):
+        for index in self.__indices.tolist():
+            yield self.__store[index]
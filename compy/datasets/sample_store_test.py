@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from compy.datasets.sample_store import SampleStore
+from compy.datasets.sample_store import SampleStoreWriter
+from compy.representations import Graph
+from compy.representations import Sequence
+from compy.representations import Vocabulary
+
+
+def graph_sample(vocabulary, num_nodes, label):
+    nodes = np.arange(num_nodes) % 2
+    edges = [(i, 0, i + 1) for i in range(num_nodes - 1)]
+    seq_order = np.arange(num_nodes)
+    graph = Graph.from_arrays(vocabulary, ["cfg", "data"], nodes, edges, seq_order=seq_order)
+    return {"x": {"code_rep": graph, "aux_in": [label, 0.5]}, "y": label}
+
+
+def test_graphs_are_read_back_from_shards(tmp_path):
+    path = str(tmp_path / "store")
+    vocabulary = Vocabulary(["a", "b"])
+    samples = [graph_sample(vocabulary, num_nodes, num_nodes % 3) for num_nodes in range(1, 8)]
+
+    with SampleStoreWriter(path, shard_size=3) as writer:
+        for sample in samples:
+            writer.add(sample)
+        vocabulary.add(["c"])
+
+    store = SampleStore(path)
+    assert len(store) == len(samples)
+    assert list(store.node_types) == ["a", "b", "c"]
+    assert list(store.edge_types) == ["cfg", "data"]
+    assert store.labels().tolist() == [sample["y"] for sample in samples]
+
+    for i in (6, 0, 4, -1):
+        graph = store[i]["x"]["code_rep"]
+        expected = samples[i]["x"]["code_rep"]
+        assert graph.get_node_list() == expected.get_node_list()
+        assert graph.get_edge_list() == expected.get_edge_list()
+        assert graph.get_leaf_node_list() == expected.get_leaf_node_list()
+        assert store[i]["x"]["aux_in"].tolist() == samples[i]["x"]["aux_in"]
+        assert store[i]["y"] == samples[i]["y"]
+
+    with pytest.raises(IndexError):
+        store[len(samples)]
+
+
+def test_subset(tmp_path):
+    path = str(tmp_path / "store")
+    vocabulary = Vocabulary()
+    with SampleStoreWriter(path, shard_size=2) as writer:
+        for label in range(5):
+            tokens = ["t%d" % label] * label
+            vocabulary.add(tokens)
+            writer.add({"x": {"code_rep": Sequence(tokens, vocabulary)}, "y": label})
+
+    store = SampleStore(path)
+    subset = store.subset([4, 0, 2])
+
+    assert len(subset) == 3
+    assert [sample["y"] for sample in subset] == [4, 0, 2]
+    assert subset[0]["x"]["code_rep"].S == ["t4"] * 4
+    assert subset[1]["x"]["code_rep"].size() == 0
+    assert "aux_in" not in subset[0]["x"]
+
+
+def test_samples_must_be_alike(tmp_path):
+    vocabulary = Vocabulary(["a", "b"])
+    with SampleStoreWriter(str(tmp_path / "store")) as writer:
+        writer.add(graph_sample(vocabulary, 3, 0))
+
+        with pytest.raises(ValueError):
+            writer.add({"x": {"code_rep": Sequence(["a"], vocabulary)}, "y": 0})
+        with pytest.raises(ValueError):
+            writer.add(graph_sample(Vocabulary(["a", "b"]), 3, 0))
+        with pytest.raises(ValueError):
+            writer.add({"x": {"code_rep": graph_sample(vocabulary, 3, 0)["x"]["code_rep"]}, "y": 0})
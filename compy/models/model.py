@@ -18,9 +18,9 @@ class Model(object):
         print()
         for epoch in range(self.config["num_epochs"]):
             batch_size = self.config["batch_size"]
-            np.random.shuffle(data_train)
+            indices = np.random.permutation(len(data_train))
             batches = [
-                data_train[i * batch_size : (i + 1) * batch_size]
+                [data_train[j] for j in indices[i * batch_size : (i + 1) * batch_size]]
                 for i in range((len(data_train) + batch_size - 1) // batch_size)
             ]
 
@@ -34,9 +34,9 @@ class Model(object):
             self._test_init()
 
             batch_size = self.config["batch_size"]
-            np.random.shuffle(data_valid)
+            indices = np.random.permutation(len(data_valid))
             batches = [
-                data_valid[i * batch_size : (i + 1) * batch_size]
+                [data_valid[j] for j in indices[i * batch_size : (i + 1) * batch_size]]
                 for i in range((len(data_valid) + batch_size - 1) // batch_size)
             ]
 
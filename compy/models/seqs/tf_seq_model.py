@@ -4,6 +4,7 @@ import tensorflow as tf
 tf.compat.v1.disable_eager_execution()
 
 from compy.models.model import Model
+from compy.representations.common import Sequence
 
 
 class SummaryCallback(tf.keras.callbacks.Callback):
@@ -62,20 +63,15 @@ class RnnTfModel(Model):
     def __process_data(self, data):
         processed = {"sequences": [], "aux_in": [], "label": []}
         for item in data:
-            processed["sequences"].append(item["x"]["code_rep"].get_token_list())
+            processed["sequences"].append(item["x"]["code_rep"])
             processed["aux_in"].append(item["x"]["aux_in"])
             processed["label"].append(item["y"])
 
         return processed
 
     def __process(self, data):
-        # Pad sequences
-        encoded = np.array(
-            tf.keras.preprocessing.sequence.pad_sequences(
-                data["sequences"], maxlen=1024, value=self.__num_types
-            )
-        )
-        seqs = np.vstack([np.expand_dims(x, axis=0) for x in encoded])
+        # Encode and pad sequences
+        seqs = Sequence.encode_many(data["sequences"], maxlen=1024, pad=self.__num_types)
 
         aux_in = data["aux_in"]
 
@@ -1,4 +1,6 @@
 from .common import RepresentationBuilder, Sequence, Graph
+from .vocabulary import Vocabulary
+from .extraction_cache import ExtractionCache, default_cache_dir
 from .extractors import *
 from .ast_graphs import ASTVisitor, ASTDataVisitor, ASTDataCFGVisitor, ASTGraphBuilder, ASTCodeVisitor, ASTCodeBuilder
 from .llvm_graphs import (
@@ -6,7 +6,10 @@ import sys
 import multiprocessing
 
 from compy.representations import RepresentationBuilder
-from compy.representations.extractors import clang_driver_scoped_options
+from compy.representations.extractors import clang_drivers_for_batch
+from compy.representations.extractors import ExtractorPool
+from compy.representations.extractors import derive_clang_driver
+from compy.representations.extractors import function_filter_cache_kind
 from compy.representations.extractors.extractors import Visitor
 from compy.representations.extractors.extractors import ClangDriver
 from compy.representations.extractors.extractors import ClangExtractor
@@ -77,7 +80,7 @@ def add_token_ast_edges(g: nx.MultiDiGraph, node):
 
 
 def get_tokens(stmt):
-    ret = stmt.tokens
+    ret = list(stmt.tokens)
 
     if hasattr(stmt, 'ast_relations'):
         for s in stmt.ast_relations:
@@ -179,9 +182,20 @@ class ASTDataCFGTokenVisitor(Visitor):
         add_token_ast_edges(self.G, v)
 
 
+# Visitors with a native implementation. Only looked up by exact type, so subclasses of these visitors keep working.
+_NATIVE_VISITORS = {
+    ASTVisitor: clang.graph.GraphKind.AST,
+    ASTDataVisitor: clang.graph.GraphKind.AST_DATA,
+    ASTDataCFGVisitor: clang.graph.GraphKind.AST_DATA_CFG,
+    ASTDataCFGTokenVisitor: clang.graph.GraphKind.AST_DATA_CFG_TOKEN,
+}
+
+
 class ASTGraphBuilder(common.RepresentationBuilder):
-    def __init__(self, clang_driver=None):
-        common.RepresentationBuilder.__init__(self)
+    def __init__(self, clang_driver=None, cache=None, function_filter=None, vocabulary=None):
+        """If function_filter is given, e.g. FunctionFilter(names=["foo"]), only the functions it selects are
+        extracted. A filter with a predicate cannot be used with a cache."""
+        common.RepresentationBuilder.__init__(self, vocabulary)
 
         if clang_driver:
             self.__clang_driver = clang_driver
@@ -192,25 +206,47 @@ class ASTGraphBuilder(common.RepresentationBuilder):
                 [],
                 ["-Wall"],
             )
-        self.__extractor = ClangExtractor(self.__clang_driver)
+        self.__extractors = ExtractorPool(ClangExtractor, self.__clang_driver, function_filter)
+        self.__cache = cache
+        self.__kind = function_filter_cache_kind("clang_graph", function_filter, cache)
 
         self.__graphs = []
 
-    def string_to_info(self, src, additional_include_dir=None, filename=None):
-        with clang_driver_scoped_options(self.__clang_driver, additional_include_dir=additional_include_dir, filename=filename):
-            return self.__extractor.GraphFromString(src)
+    def string_to_info(self, src, additional_include_dir=None, filename=None, clang_driver=None):
+        extractor, driver = self.__extractors.get(clang_driver, additional_include_dir, filename)
+        if self.__cache is None:
+            return extractor.GraphFromString(src)
+        return self.__cache.lookup(self.__kind, driver, src, lambda: extractor.GraphFromString(src))
+
+    def batch_string_to_info(self, srcs, additional_include_dirs=None, filenames=None, clang_drivers=None,
+                             num_workers=0):
+        drivers = clang_drivers_for_batch(self.__clang_driver, len(srcs), additional_include_dirs, filenames, clang_drivers)
+        extractor, _ = self.__extractors.get()
+        return extractor.GraphFromStrings(srcs, num_workers, drivers)
+
+    def file_to_info(self, path, additional_include_dir=None, clang_driver=None):
+        path = os.fspath(path)
+        extractor, driver = self.__extractors.get(clang_driver, additional_include_dir)
+        if self.__cache is None:
+            return extractor.GraphFromFile(path)
+        return self.__cache.lookup_file(self.__kind, driver, path, lambda: extractor.GraphFromFile(path))
+
+    def batch_file_to_info(self, paths, additional_include_dirs=None, clang_drivers=None, num_workers=0):
+        drivers = clang_drivers_for_batch(self.__clang_driver, len(paths), additional_include_dirs, None, clang_drivers)
+        extractor, _ = self.__extractors.get()
+        return extractor.GraphFromFiles([os.fspath(path) for path in paths], num_workers, drivers)
 
     def info_to_representation(self, info, visitor=ASTDataVisitor):
+        kind = _NATIVE_VISITORS.get(visitor)
+        if kind is not None:
+            return self._arrays_to_graph(clang.graph.buildGraph(info, kind), visitor().edge_types)
+
         vis = visitor()
         info.accept(vis)
 
-        for (n, data) in vis.G.nodes(data=True):
-            attr = data["attr"]
-            if attr not in self._tokens:
-                self._tokens[attr] = 1
-            self._tokens[attr] += 1
+        node_types = self._add_tokens([data["attr"] for _, data in vis.G.nodes(data=True)])
 
-        return common.Graph(vis.G, self.get_tokens(), vis.edge_types)
+        return common.Graph.from_networkx(vis.G, node_types, vis.edge_types)
 
 
 class ASTCodeVisitor(Visitor):
@@ -231,10 +267,24 @@ class ASTCodeBuilder(RepresentationBuilder):
 
         self.loop_infos = []
 
-    def string_to_info(self, src, additional_include_dir=None, filename=None):
-        with clang_driver_scoped_options(self.clang_driver, additional_include_dir=additional_include_dir, filename=filename):
-            extractor = ClangExtractor(self.clang_driver)
-            return extractor.GraphFromString(src)
+    def string_to_info(self, src, additional_include_dir=None, filename=None, clang_driver=None):
+        driver = derive_clang_driver(clang_driver or self.clang_driver, additional_include_dir, filename)
+        return ClangExtractor(driver).GraphFromString(src)
+
+    def batch_string_to_info(self, srcs, additional_include_dirs=None, filenames=None, clang_drivers=None,
+                             num_workers=0):
+        drivers = clang_drivers_for_batch(self.clang_driver, len(srcs), additional_include_dirs, filenames,
+                                          clang_drivers)
+        return ClangExtractor(self.clang_driver).GraphFromStrings(srcs, num_workers, drivers)
+
+    def file_to_info(self, path, additional_include_dir=None, clang_driver=None):
+        driver = derive_clang_driver(clang_driver or self.clang_driver, additional_include_dir)
+        return ClangExtractor(driver).GraphFromFile(os.fspath(path))
+
+    def batch_file_to_info(self, paths, additional_include_dirs=None, clang_drivers=None, num_workers=0):
+        drivers = clang_drivers_for_batch(self.clang_driver, len(paths), additional_include_dirs, None, clang_drivers)
+        return ClangExtractor(self.clang_driver).GraphFromFiles([os.fspath(path) for path in paths], num_workers,
+                                                                drivers)
 
     def info_to_representation(self, functionInfo, visitor, meta):
         vis = visitor()
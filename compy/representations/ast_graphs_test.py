@@ -91,6 +91,27 @@ def test_all_visitors():
         assert ast
 
 
+@pytest.mark.parametrize(
+    "visitor",
+    [ASTVisitor, ASTDataVisitor, ASTDataCFGVisitor, ASTDataCFGTokenVisitor],
+)
+def test_native_visitors_match_python_visitors(visitor):
+    # Subclasses are not built natively.
+    class PythonVisitor(visitor):
+        pass
+
+    builder = ASTGraphBuilder()
+    info = builder.string_to_info(program_1fn_2)
+    native = builder.info_to_representation(info, visitor)
+    python = builder.info_to_representation(info, PythonVisitor)
+
+    assert native.get_node_str_list() == python.get_node_str_list()
+    assert native.get_node_list() == python.get_node_list()
+    assert native.get_edge_list() == python.get_edge_list()
+    assert native.get_leaf_node_list() == python.get_leaf_node_list()
+    assert native.G.number_of_edges() == python.G.number_of_edges()
+
+
 def test_token_visitor():
     builder = ASTGraphBuilder()
     info = builder.string_to_info(program_1fn_2)
@@ -1,41 +1,255 @@
-import collections
+import os
 
 import networkx as nx
+import numpy as np
 import pygraphviz as pgv
 
+from compy.representations.extractors import ResourceLimitExceeded
+from compy.representations.vocabulary import Vocabulary
+from compy.utils.process_pool import supervised_imap
+
 
 class RepresentationBuilder(object):
-    def __init__(self):
-        self._tokens = collections.OrderedDict()
+    """Base class of the builders.
+
+    The methods of a builder can be called from several threads at once. The extraction methods take per-call
+    options, including a clang_driver to use instead of the builder's, without changing the driver of the builder,
+    and the tokens recorded by info_to_representation() are counted under a lock.
+
+    The representations refer to the vocabulary of the builder for their token types. Pass a frozen vocabulary, e.g.
+    from Vocabulary.load(), to encode them with fixed ids.
+    """
+
+    def __init__(self, vocabulary=None):
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+
+    def strings_to_infos(self, sources, additional_include_dirs=None, filenames=None, workers=None, timeout=None,
+                         max_rss=None, retries=1, postprocess=None):
+        """Extract infos from many sources in supervised worker processes.
+
+        A source that crashes the extractor, runs longer than timeout seconds or makes a worker grow beyond max_rss
+        bytes only fails itself, see supervised_imap() for the details. Yields (index, result, error) tuples as the
+        sources finish.
+
+        The result is postprocess(info) if postprocess is given, otherwise the info itself. postprocess runs in the
+        worker and must return something picklable, e.g. the node and edge lists of a representation. Tokens
+        recorded by info_to_representation() in a worker are not merged back into this builder. Freeze the vocabulary
+        first to get the same ids in all workers.
+        """
+        num_sources = len(sources)
+        tasks = list(zip(sources, additional_include_dirs or [None] * num_sources, filenames or [None] * num_sources))
+
+        def extract(task):
+            src, additional_include_dir, filename = task
+            info = self.string_to_info(src, additional_include_dir=additional_include_dir, filename=filename)
+            return postprocess(info) if postprocess else info
+
+        return supervised_imap(extract, tasks, workers=workers, timeout=timeout, max_rss=max_rss, retries=retries)
+
+    def file_to_info(self, path, additional_include_dir=None, clang_driver=None):
+        """Extract the info of the source file at path.
+
+        This default is for builders that only implement string_to_info(src). It reads the file and passes it on, with
+        additional_include_dir if one is given. A clang_driver is set as the clang_driver attribute of the builder, as
+        the datasets did before they called file_to_info().
+        """
+        with open(os.fspath(path), "rb") as f:
+            src = f.read()
+        if clang_driver is not None:
+            self.clang_driver = clang_driver
+        if additional_include_dir is not None:
+            return self.string_to_info(src, additional_include_dir=additional_include_dir)
+        return self.string_to_info(src)
+
+    def batch_string_to_info(self, srcs, additional_include_dirs=None, filenames=None, clang_drivers=None,
+                             num_workers=0):
+        """Extract the infos of many sources. Returns the list of infos, the list of errors and a list that tells which
+        sources failed with ResourceLimitExceeded. A source that failed has None for its info and an error message,
+        the others an empty message.
+
+        This default calls string_to_info() for one source after the other. The native builders extract in parallel.
+        """
+        def extract(i):
+            if clang_drivers is not None:
+                self.clang_driver = clang_drivers[i]
+            kwargs = {}
+            if additional_include_dirs is not None:
+                kwargs["additional_include_dir"] = additional_include_dirs[i]
+            if filenames is not None:
+                kwargs["filename"] = filenames[i]
+            return self.string_to_info(srcs[i], **kwargs)
+
+        return _batch(extract, len(srcs))
+
+    def batch_file_to_info(self, paths, additional_include_dirs=None, clang_drivers=None, num_workers=0):
+        """Like batch_string_to_info(), reading the sources from paths. This default calls file_to_info()."""
+        def extract(i):
+            return self.file_to_info(
+                paths[i],
+                additional_include_dir=additional_include_dirs[i] if additional_include_dirs is not None else None,
+                clang_driver=clang_drivers[i] if clang_drivers is not None else None,
+            )
+
+        return _batch(extract, len(paths))
+
+    def _arrays_to_graph(self, arrays, edge_types):
+        """Turn the arrays of a native graph builder into a Graph, recording its node labels as tokens."""
+        labels = arrays.labels
+        counts = np.bincount(arrays.nodes, minlength=len(labels))
+        node_types = self._add_tokens(labels, counts.tolist())
+        label_ids = node_types.lookup(labels)
+
+        return Graph.from_arrays(
+            node_types,
+            edge_types,
+            label_ids[arrays.nodes],
+            arrays.edges,
+            seq_order=arrays.seq_order,
+            node_objects=arrays.nodeObjects,
+        )
+
+    def _add_tokens(self, tokens, counts=None):
+        """Record tokens, with counts[i] occurrences of tokens[i] (one each by default). Returns the vocabulary,
+        which includes tokens."""
+        self.vocabulary.add(tokens, counts)
+        return self.vocabulary
 
     def num_tokens(self):
-        return len(self._tokens)
+        return len(self.vocabulary)
 
     def get_tokens(self):
-        return list(self._tokens.keys())
+        return list(self.vocabulary)
 
     def print_tokens(self):
         print("-" * 50)
         print("{:<8} {:<25} {:<10}".format("NodeID", "Label", "Number"))
-        t_view = [(v, k) for k, v in self._tokens.items()]
+        t_view = [(v, k, idx) for idx, (k, v) in enumerate(self.vocabulary.items())]
         t_view = sorted(t_view, key=lambda x: x[0], reverse=True)
-        for v, k in t_view:
-            idx = list(self._tokens.keys()).index(k)
+        for v, k, idx in t_view:
             print("{:<8} {:<25} {:<10}".format(str(idx), str(k), str(v)))
         print("-" * 50)
 
 
+def _batch(extract, num_items):
+    infos, errors, limits_exceeded = [], [], []
+    for i in range(num_items):
+        try:
+            infos.append(extract(i))
+            errors.append("")
+            limits_exceeded.append(False)
+        except (RuntimeError, OSError) as e:
+            infos.append(None)
+            errors.append(str(e))
+            limits_exceeded.append(isinstance(e, ResourceLimitExceeded))
+    return infos, errors, limits_exceeded
+
+
+class _TypeIds(object):
+    """Maps types to their index in a list of types or a vocabulary, without copying it.
+
+    Types that are not in the list get negative ids, -1 minus their index in extra_types, unless a frozen vocabulary
+    maps them to its unknown token.
+    """
+
+    def __init__(self, types):
+        if isinstance(types, Vocabulary):
+            self.__ids, self.__unknown_id = types.ids, types.unknown_id
+        else:
+            self.__ids, self.__unknown_id = {}, None
+            for i, type_ in enumerate(types):
+                self.__ids.setdefault(type_, i)
+        self.extra_types = []
+        self.__extra_ids = {}
+
+    def __call__(self, type_):
+        type_id = self.__ids.get(type_, self.__unknown_id)
+        if type_id is None:
+            if type_ not in self.__extra_ids:
+                self.__extra_ids[type_] = -1 - len(self.extra_types)
+                self.extra_types.append(type_)
+            type_id = self.__extra_ids[type_]
+        return type_id
+
+
 class Sequence(object):
+    """A sequence of tokens.
+
+    token_types is a list of the token types or a Vocabulary, which builders share between all their sequences.
+    """
+
     def __init__(self, S, token_types):
-        self.S = S
+        self.__S = S
         self.__token_types = token_types
+        self.__token_ids = None
+        self.__tokens = None
+
+    @classmethod
+    def from_array(cls, tokens, token_types):
+        """Create a sequence from the indices into token_types of its tokens, e.g. read from a sample store.
+
+        S is only built when it is accessed.
+        """
+        sequence = cls(None, token_types)
+        sequence.__tokens = np.asarray(tokens, dtype=np.int32)
+        return sequence
+
+    @property
+    def token_types(self):
+        return self.__token_types
+
+    @property
+    def S(self):
+        if self.__S is None:
+            self.__S = [self.__token_types[token] for token in self.__tokens.tolist()]
+        return self.__S
+
+    @S.setter
+    def S(self, S):
+        self.__S = S
+        self.__tokens = None
 
     def get_token_list(self):
-        node_ints = [self.__token_types.index(token_str) for token_str in self.S]
+        return self.get_token_array().tolist()
+
+    def get_token_array(self):
+        """Return the index into token_types of every token as an int32 numpy array."""
+        if self.__tokens is not None:
+            return self.__tokens
+
+        try:
+            if isinstance(self.__token_types, Vocabulary):
+                return self.__token_types.lookup(self.S)
+
+            if self.__token_ids is None:
+                token_ids = {}
+                for i, token_type in enumerate(self.__token_types):
+                    token_ids.setdefault(token_type, i)
+                self.__token_ids = token_ids
+            return np.fromiter(map(self.__token_ids.__getitem__, self.S), dtype=np.int32, count=len(self.S))
+        except KeyError as e:
+            raise ValueError("%r is not in list" % (e.args[0],))
+
+    @staticmethod
+    def encode_many(sequences, maxlen=None, pad=0):
+        """Encode sequences into an int32 array of shape (number of sequences, maxlen).
+
+        Like keras' pad_sequences(), sequences longer than maxlen keep their last maxlen tokens, and shorter ones are
+        padded with pad in front. maxlen defaults to the length of the longest sequence.
+        """
+        arrays = [sequence.get_token_array() for sequence in sequences]
+        if maxlen is None:
+            maxlen = max((len(array) for array in arrays), default=0)
+
+        encoded = np.full((len(arrays), maxlen), pad, dtype=np.int32)
+        for row, array in zip(encoded, arrays):
+            array = array[len(array) - maxlen:] if len(array) > maxlen else array
+            row[maxlen - len(array):] = array
 
-        return node_ints
+        return encoded
 
     def size(self):
+        if self.__tokens is not None:
+            return len(self.__tokens)
         return len(self.S)
 
     def draw(self, width=8, limit=30, path=None):
@@ -86,50 +300,175 @@ class Sequence(object):
 
 
 class Graph(object):
+    """A graph of typed nodes and edges, stored in numpy arrays.
+
+    The nodes are numbered in order. The node array holds the index into node_types of every node, the edge array
+    the (source, edge type index, target) rows and the seq_order array the position of every node in the source, or
+    a negative value for nodes that are not leaves. node_types and edge_types are lists or vocabularies, which are
+    referred to instead of copied. Other node and edge attributes of a networkx graph are kept aside.
+
+    G is a networkx MultiDiGraph view of the graph, for draw() and map_to_leaves(). It is only built when it is
+    accessed, and changes to it are not reflected by the arrays. Assign a graph to G to replace the graph.
+    """
+
     def __init__(self, graph, node_types, edge_types):
-        self.G = graph
+        self._G = None
         self.__node_types = node_types
-        self.__node_types_dict = {n: i for i, n in enumerate(node_types)}
         self.__edge_types = edge_types
 
-    def _get_node_attr_dict(self):
-        return collections.OrderedDict(self.G.nodes(data="attr", default="N/A"))
+        self.__nodes = np.zeros(0, dtype=np.int32)
+        self.__edges = np.zeros((0, 3), dtype=np.int32)
+        self.__seq_order = np.zeros(0, dtype=np.int64)
+        self.__node_objects = None
+        # Types in the networkx graph that are not in node_types or edge_types, see _TypeIds
+        self.__extra_node_types = []
+        self.__extra_edge_types = []
+        self.__node_attrs = {}
+        self.__edge_attrs = {}
+
+        if graph is not None:
+            self.__set_networkx(graph)
+
+    @classmethod
+    def from_networkx(cls, graph, node_types, edge_types):
+        """Create a graph from a networkx MultiDiGraph, whose nodes and edges have their type in the attr attribute
+        and whose leaves have their position in the seq_order attribute, as built by the visitors."""
+        return cls(graph, node_types, edge_types)
+
+    @classmethod
+    def from_arrays(cls, node_types, edge_types, nodes, edges, seq_order=None, node_objects=None):
+        """Create a graph from arrays, as built by the native graph builders.
+
+        The nodes of G are the objects returned by node_objects(), or the node indices if it is not given.
+        """
+        graph = cls(None, node_types, edge_types)
+        graph.__nodes = np.asarray(nodes, dtype=np.int32)
+        graph.__edges = np.asarray(edges, dtype=np.int32).reshape(-1, 3)
+        if seq_order is None:
+            graph.__seq_order = np.full(len(graph.__nodes), -1, dtype=np.int64)
+        else:
+            graph.__seq_order = np.asarray(seq_order, dtype=np.int64)
+        graph.__node_objects = node_objects
+
+        return graph
+
+    @property
+    def node_types(self):
+        return self.__node_types
+
+    @property
+    def edge_types(self):
+        return self.__edge_types
+
+    @property
+    def G(self):
+        if self._G is None:
+            self._G = self.__arrays_to_networkx()
+        return self._G
+
+    @G.setter
+    def G(self, graph):
+        self.__set_networkx(graph)
+        self._G = graph
+
+    def __set_networkx(self, graph):
+        objects = list(graph.nodes)
+        node_keys = {obj: i for i, obj in enumerate(objects)}
+
+        node_type_id = _TypeIds(self.__node_types)
+        nodes = np.empty(len(objects), dtype=np.int32)
+        seq_order = np.full(len(objects), -1, dtype=np.int64)
+        node_attrs = {}
+        for i, (_, data) in enumerate(graph.nodes(data=True)):
+            nodes[i] = node_type_id(data.get("attr", "N/A"))
+            if data.get("seq_order") is not None:
+                seq_order[i] = data["seq_order"]
+            attrs = {key: value for key, value in data.items() if key not in ("attr", "seq_order")}
+            if attrs:
+                node_attrs[i] = attrs
+
+        edge_type_id = _TypeIds(self.__edge_types)
+        edges = np.empty((graph.number_of_edges(), 3), dtype=np.int32)
+        edge_attrs = {}
+        for i, (source, target, data) in enumerate(graph.edges(data=True)):
+            edges[i] = (node_keys[source], edge_type_id(data.get("attr")), node_keys[target])
+            attrs = {key: value for key, value in data.items() if key != "attr"}
+            if attrs:
+                edge_attrs[i] = attrs
+
+        self._G = None
+        self.__nodes = nodes
+        self.__edges = edges
+        self.__seq_order = seq_order
+        self.__node_objects = objects
+        self.__extra_node_types = node_type_id.extra_types
+        self.__extra_edge_types = edge_type_id.extra_types
+        self.__node_attrs = node_attrs
+        self.__edge_attrs = edge_attrs
+
+    def __arrays_to_networkx(self):
+        if self.__node_objects is None:
+            objects = list(range(len(self.__nodes)))
+        elif callable(self.__node_objects):
+            objects = self.__node_objects()
+        else:
+            objects = self.__node_objects
+
+        G = nx.MultiDiGraph()
+        for i, (obj, node_type, seq_order) in enumerate(
+            zip(objects, self.__nodes.tolist(), self.__seq_order.tolist())
+        ):
+            attrs = self.__node_attrs.get(i, {})
+            if seq_order >= 0:
+                G.add_node(obj, attr=self.__node_type(node_type), seq_order=seq_order, **attrs)
+            else:
+                G.add_node(obj, attr=self.__node_type(node_type), **attrs)
+        for i, (source, edge_type, target) in enumerate(self.__edges.tolist()):
+            G.add_edge(
+                objects[source], objects[target], attr=self.__edge_type(edge_type), **self.__edge_attrs.get(i, {})
+            )
 
-    def get_node_str_list(self):
-        node_strs = list(self._get_node_attr_dict().values())
+        return G
+
+    def __node_type(self, node_type):
+        return self.__node_types[node_type] if node_type >= 0 else self.__extra_node_types[-1 - node_type]
+
+    def __edge_type(self, edge_type):
+        return self.__edge_types[edge_type] if edge_type >= 0 else self.__extra_edge_types[-1 - edge_type]
 
-        return node_strs
+    def get_node_str_list(self):
+        return [self.__node_type(node_type) for node_type in self.__nodes.tolist()]
 
     def get_node_list(self):
-        node_strs = list(self._get_node_attr_dict().values())
-        node_ints = [self.__node_types_dict[node_str] for node_str in node_strs]
+        return self.get_node_array().tolist()
 
-        return node_ints
+    def get_node_array(self):
+        """Return get_node_list() as an int32 numpy array."""
+        if self.__extra_node_types:
+            raise KeyError(self.__extra_node_types[0])
+        return self.__nodes
 
     def get_edge_list(self):
-        nodes_keys = {n: i for i, n in enumerate(self._get_node_attr_dict().keys())}
-
-        edges = []
-        for node1, node2, data in self.G.edges(data=True):
-            edges.append(
-                (
-                    nodes_keys[node1],
-                    self.__edge_types.index(data["attr"]),
-                    nodes_keys[node2],
-                )
-            )
+        return [tuple(edge) for edge in self.get_edge_array().tolist()]
 
-        return edges
+    def get_edge_array(self):
+        """Return get_edge_list() as an int32 numpy array of shape (number of edges, 3)."""
+        if self.__extra_edge_types:
+            raise ValueError("%r is not in list" % (self.__extra_edge_types[0],))
+        return self.__edges
+
+    def get_seq_order_array(self):
+        """Return the position of every node in the source, or a negative value for nodes that are not leaves, as an
+        int64 numpy array."""
+        return self.__seq_order
 
     def get_leaf_node_list(self):
         """Return an ordered list of node indices for leaves of the graph.
 
         Only useful for graphs that are built based on a sequence (like ASTs on tokens)
         """
-        nodes_keys = list(self._get_node_attr_dict().keys())
-
-        data = { n: order for n, order in self.G.nodes(data='seq_order') if order is not None }
-        return [nodes_keys.index(n) for n, _ in sorted(data.items(), key=lambda x: x[1])]
+        leaves = np.flatnonzero(self.__seq_order >= 0)
+        return leaves[np.argsort(self.__seq_order[leaves], kind="stable")].tolist()
 
     def map_to_leaves(self, relations=None):
         """Map inner nodes of the graph to leaf nodes.
@@ -193,10 +532,23 @@ class Graph(object):
 
             result.add_edge(source, target, **data)
 
-        return Graph(result, list(self.__node_types), list(self.__edge_types))
+        return Graph(result, self.__node_types, self.__edge_types)
 
     def size(self):
-        return len(self.G)
+        return len(self.__nodes)
+
+    def detach(self):
+        """Drop the references of the graph to the infos it was built from, so that they can be freed.
+
+        The arrays shared with a native graph builder are copied, and the nodes of G become the node indices. Returns
+        the graph.
+        """
+        self._G = None
+        self.__nodes = np.array(self.__nodes)
+        self.__edges = np.array(self.__edges)
+        self.__seq_order = np.array(self.__seq_order)
+        self.__node_objects = None
+        return self
 
     def draw(self, path=None, with_legend=False, align_tokens=True):
         # Copy graph object because attr modifications for a cleaner view are needed.
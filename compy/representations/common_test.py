@@ -1,6 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import networkx as nx
+import numpy as np
+import pytest
 
 import compy.representations.common as common
+from compy.representations.vocabulary import Vocabulary
 
 
 def sample_graph():
@@ -78,3 +83,136 @@ def test_map_to_leaves_cycle():
     graph = common.Graph(cycle, [], ['leaf', "0", "1", "2", "4"])
     mapped = graph.map_to_leaves({'child': 'flow'})
     assert sorted(mapped.G.edges(data=False)) == [("leaf", "leaf")] * 5
+
+
+def test_tokens_are_counted_from_threads():
+    builder = common.RepresentationBuilder()
+    tokens = ["a", "b", "c", "d"] * 1000
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: builder._add_tokens(tokens), range(8)))
+
+    assert builder.get_tokens() == ["a", "b", "c", "d"]
+    assert [builder.vocabulary.count(token) for token in "abcd"] == [8 * 1000] * 4
+
+
+def test_graph_from_networkx_is_stored_in_arrays():
+    graph = sample_graph()
+
+    assert graph._G is None
+    assert graph.size() == 13
+    assert graph.get_node_array().dtype == np.int32
+    assert graph.get_edge_array().shape == (15, 3)
+    assert graph.get_node_str_list()[:3] == ["root", "n1", "n2"]
+    # root1 -child-> n1, with the edge types in sorted order
+    assert graph.get_edge_list()[0] == (0, 0, 1)
+    assert graph.get_leaf_node_list() == list(range(6, 13))
+
+
+def test_graph_networkx_view_matches_arrays():
+    G = nx.MultiDiGraph()
+    G.add_node("a", attr="x", color="red")
+    G.add_node("b", attr="y", seq_order=0)
+    G.add_edge("a", "b", attr="e", weight=2)
+    graph = common.Graph.from_networkx(G, ["x", "y"], ["e"])
+
+    assert graph.get_node_list() == [0, 1]
+    assert graph.get_edge_list() == [(0, 0, 1)]
+    assert list(graph.G.nodes(data=True)) == list(G.nodes(data=True))
+    assert list(graph.G.edges(data=True)) == list(G.edges(data=True))
+
+    G.add_node("c", attr="y")
+    graph.G = G
+    assert graph.get_node_list() == [0, 1, 1]
+
+
+def test_graph_with_unknown_types():
+    G = nx.MultiDiGraph()
+    G.add_node("a", attr="x")
+    G.add_edge("a", "a", attr="e")
+    graph = common.Graph(G, [], [])
+
+    assert graph.get_node_str_list() == ["x"]
+    with pytest.raises(KeyError):
+        graph.get_node_list()
+    with pytest.raises(ValueError):
+        graph.get_edge_list()
+
+
+def test_sequence_token_ids():
+    sequence = common.Sequence(["c", "a", "c"], Vocabulary(["a", "b", "c"]))
+
+    assert sequence.get_token_list() == [2, 0, 2]
+    assert sequence.get_token_array().dtype == np.int32
+    assert common.Sequence(["b"], ["a", "b"]).get_token_list() == [1]
+    with pytest.raises(ValueError):
+        common.Sequence(["d"], ["a", "b"]).get_token_list()
+
+
+def test_sequences_are_encoded_and_padded_in_front():
+    token_types = ["a", "b", "c"]
+    sequences = [common.Sequence(S, token_types) for S in [["a", "b"], ["c", "b", "a", "c"], []]]
+
+    encoded = common.Sequence.encode_many(sequences, maxlen=3, pad=3)
+    assert encoded.dtype == np.int32
+    assert encoded.tolist() == [[3, 0, 1], [1, 0, 2], [3, 3, 3]]
+
+    assert common.Sequence.encode_many(sequences, pad=-1).shape == (3, 4)
+
+
+def test_representations_refer_to_builder_vocabulary():
+    builder = common.RepresentationBuilder()
+    sequence = common.Sequence(["x", "y"], builder._add_tokens(["x", "y"]))
+    builder._add_tokens(["z", "x"])
+
+    assert sequence.get_token_list() == [0, 1]
+    assert builder.get_tokens() == ["x", "y", "z"]
+
+
+def test_graph_with_frozen_vocabulary():
+    G = nx.MultiDiGraph()
+    G.add_node("a", attr="x")
+    G.add_node("b", attr="new")
+    G.add_edge("a", "b", attr="e")
+    graph = common.Graph(G, Vocabulary(["x"], unknown_token="<unk>").freeze(), ["e"])
+
+    assert graph.get_node_list() == [0, 1]
+    assert graph.get_node_str_list() == ["x", "<unk>"]
+
+
+def test_detached_graph_keeps_arrays():
+    graph = sample_graph()
+    nodes = graph.get_node_list()
+    edges = graph.get_edge_list()
+
+    assert graph.detach() is graph
+    assert graph.get_node_list() == nodes
+    assert graph.get_edge_list() == edges
+    assert list(graph.G.nodes) == list(range(13))
+
+
+def test_sequence_from_array():
+    sequence = common.Sequence.from_array(np.array([2, 0], dtype=np.int32), ["a", "b", "c"])
+
+    assert sequence.get_token_list() == [2, 0]
+    assert sequence.size() == 2
+    assert sequence.S == ["c", "a"]
+
+
+def test_file_to_info_defaults_to_string_to_info(tmp_path):
+    class StringBuilder(common.RepresentationBuilder):
+        def string_to_info(self, src):
+            if not src:
+                raise RuntimeError("empty")
+            return src
+
+    (tmp_path / "a.c").write_text("int a;")
+    (tmp_path / "b.c").write_text("")
+    builder = StringBuilder()
+
+    assert builder.file_to_info(str(tmp_path / "a.c")) == b"int a;"
+    assert builder.batch_file_to_info([str(tmp_path / "a.c"), str(tmp_path / "b.c")]) == (
+        [b"int a;", None],
+        ["", "empty"],
+        [False, False],
+    )
@@ -0,0 +1,231 @@
+import collections
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+from appdirs import user_cache_dir
+
+from compy.representations.extractors import LLVM_VERSION
+from compy.representations.extractors import ResourceLimitExceeded
+
+
+# Bump when the layout of cached infos changes, so that stale entries are not picked up.
+CACHE_FORMAT_VERSION = 1
+
+
+def default_cache_dir():
+    return os.path.join(user_cache_dir(appname="compy-Learn", version="1.0"), "extraction")
+
+
+class _Failure(object):
+    """Negative cache entry for a source that failed to compile."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+class ExtractionCache(object):
+    """A content-addressed cache of extraction results.
+
+    Entries are keyed by a hash of the source, the relevant clang driver options including the prefix header, the kind
+    of extraction and the LLVM version. They are kept in an in-memory LRU and, if a directory is given, on disk. The
+    disk cache is bounded to max_disk_bytes, evicting the least recently used entries. Only results that can be
+    pickled are written to disk.
+
+    Sources that fail to compile are cached as well, so that they fail again without invoking the compiler. Sources
+    that exceed a resource limit of the driver are not, as they may succeed with other limits or on a less loaded
+    machine.
+
+    Lookups can run from several threads at once. Extractions of the same source that miss concurrently all run.
+    """
+
+    def __init__(self, directory=None, max_disk_bytes=2 ** 30, max_memory_entries=1024):
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_entries = max_memory_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self.__memory = collections.OrderedDict()
+        self.__disk_bytes = None
+        self.__lock = threading.RLock()
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self.__memory)}
+
+    @staticmethod
+    def key(kind, clang_driver, src):
+        if isinstance(src, str):
+            src = src.encode()
+
+        h = hashlib.sha256()
+        for part in [
+            str(CACHE_FORMAT_VERSION),
+            LLVM_VERSION,
+            kind,
+            str(int(clang_driver.getProgrammingLanguage())),
+            str(int(clang_driver.getOptimizationLevel())),
+            repr([(d, int(t)) for d, t in clang_driver.getIncludeDirs()]),
+            repr(clang_driver.getCompilerFlags()),
+            clang_driver.getFileName(),
+            ExtractionCache.__prefix_header_key(clang_driver.getPrefixHeader()),
+        ]:
+            h.update(part.encode())
+            h.update(b"\0")
+        h.update(src)
+
+        return h.hexdigest()
+
+    @staticmethod
+    def __prefix_header_key(path):
+        # The path, modification time and size of the prefix header, as the driver keys its precompiled header on
+        if not path:
+            return ""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return path
+        return "%s\0%d\0%d" % (path, stat.st_mtime_ns, stat.st_size)
+
+    def lookup(self, kind, clang_driver, src, extract):
+        """Return the cached result for src, calling extract() to compute it on a miss.
+
+        Raises RuntimeError if extract() raised it for the same input before. Nothing is cached while the driver has
+        virtual files, as the key cannot cover their content, which only the driver knows.
+        """
+        if clang_driver.getVirtualFiles():
+            return extract()
+
+        key = self.key(kind, clang_driver, src)
+
+        with self.__lock:
+            found, value = self.__get(key)
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if not found:
+            try:
+                value = extract()
+            except ResourceLimitExceeded:
+                raise
+            except RuntimeError as e:
+                value = _Failure(str(e))
+            with self.__lock:
+                self.__put(key, value)
+
+        if isinstance(value, _Failure):
+            raise RuntimeError(value.message)
+        return value
+
+    def lookup_file(self, kind, clang_driver, path, extract):
+        """Like lookup(), for a source that extract() reads from path itself.
+
+        The key covers the absolute path besides the content, as includes are resolved relative to the file.
+        """
+        if clang_driver.getVirtualFiles():
+            return extract()
+
+        path = os.path.abspath(path)
+
+        with open(path, "rb") as f:
+            src = path.encode() + b"\0" + f.read()
+        return self.lookup(kind, clang_driver, src, extract)
+
+    def clear(self):
+        with self.__lock:
+            self.__memory.clear()
+            if self.directory:
+                for path, _, _ in list(self.__disk_entries()):
+                    os.remove(path)
+                self.__disk_bytes = 0
+
+    def __get(self, key):
+        if key in self.__memory:
+            self.__memory.move_to_end(key)
+            return True, self.__memory[key]
+
+        if self.directory:
+            path = self.__path(key)
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+            except (OSError, EOFError, RuntimeError, pickle.UnpicklingError):
+                # Missing, or written with a different serialization format of the native infos.
+                pass
+            else:
+                # Mark as recently used for eviction.
+                os.utime(path)
+                self.__remember(key, value)
+                return True, value
+
+        return False, None
+
+    def __put(self, key, value):
+        self.__remember(key, value)
+
+        if not self.directory:
+            return
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (TypeError, pickle.PicklingError):
+            # Not picklable, e.g. infos post-processed into custom objects. Keep it in memory only.
+            return
+
+        path = self.__path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # The entry may exist already, e.g. if two threads missed the same key
+        try:
+            replaced_bytes = os.path.getsize(path)
+        except OSError:
+            replaced_bytes = 0
+        os.replace(tmp_path, path)
+
+        if self.__disk_bytes is None:
+            self.__disk_bytes = sum(size for _, size, _ in self.__disk_entries())
+        else:
+            self.__disk_bytes += len(data) - replaced_bytes
+        if self.__disk_bytes > self.max_disk_bytes:
+            self.__evict()
+
+    def __remember(self, key, value):
+        self.__memory[key] = value
+        self.__memory.move_to_end(key)
+        while len(self.__memory) > self.max_memory_entries:
+            self.__memory.popitem(last=False)
+
+    def __evict(self):
+        # Drop the least recently used entries until the cache is at 90% of its budget.
+        entries = sorted(self.__disk_entries(), key=lambda entry: entry[2])
+        self.__disk_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self.__disk_bytes <= self.max_disk_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.__disk_bytes -= size
+
+    def __disk_entries(self):
+        """Yield (path, size, last use) of all entries on disk."""
+        for subdir in os.scandir(self.directory):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.endswith(".pkl"):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def __path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pkl")
@@ -0,0 +1,187 @@
+import pickle
+
+import pytest
+
+from compy.representations.extraction_cache import ExtractionCache
+from compy.representations.extractors import ClangDriver
+from compy.representations.extractors import ResourceLimitExceeded
+
+
+program_1fn_1 = """
+int foo() {
+  return 1;
+}
+"""
+
+
+@pytest.fixture
+def clang_driver():
+    return ClangDriver(
+        ClangDriver.ProgrammingLanguage.C,
+        ClangDriver.OptimizationLevel.O0,
+        [],
+        ["-Wall"],
+    )
+
+
+class CountingExtractor(object):
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.result = result
+        self.error = error
+
+    def __call__(self):
+        self.calls += 1
+        if self.error:
+            raise RuntimeError(self.error)
+        return self.result
+
+
+def test_hit_skips_extraction(clang_driver):
+    cache = ExtractionCache()
+    extract = CountingExtractor(result={"info": 1})
+
+    assert cache.lookup("llvm_graph", clang_driver, program_1fn_1, extract) == {"info": 1}
+    assert cache.lookup("llvm_graph", clang_driver, program_1fn_1, extract) == {"info": 1}
+
+    assert extract.calls == 1
+    assert cache.hits == 1 and cache.misses == 1
+
+
+def test_key_depends_on_source_kind_and_options(clang_driver):
+    key = ExtractionCache.key("llvm_graph", clang_driver, program_1fn_1)
+
+    assert key == ExtractionCache.key("llvm_graph", clang_driver, program_1fn_1.encode())
+    assert key != ExtractionCache.key("llvm_graph", clang_driver, program_1fn_1 + " ")
+    assert key != ExtractionCache.key("llvm_seq", clang_driver, program_1fn_1)
+
+    clang_driver.addIncludeDir("/tmp", ClangDriver.IncludeDirType.User)
+    assert key != ExtractionCache.key("llvm_graph", clang_driver, program_1fn_1)
+
+
+def test_key_depends_on_prefix_header(clang_driver, tmp_path):
+    key = ExtractionCache.key("llvm_graph", clang_driver, program_1fn_1)
+
+    header = tmp_path / "prefix.h"
+    header.write_text("#define N 1\n")
+    clang_driver.setPrefixHeader(str(header))
+    prefixed_key = ExtractionCache.key("llvm_graph", clang_driver, program_1fn_1)
+    assert prefixed_key != key
+
+    header.write_text("#define N 10\n")
+    assert ExtractionCache.key("llvm_graph", clang_driver, program_1fn_1) != prefixed_key
+
+
+def test_failures_are_cached(clang_driver):
+    cache = ExtractionCache()
+    extract = CountingExtractor(error="Failed compiling to LLVM module")
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="Failed compiling"):
+            cache.lookup("llvm_graph", clang_driver, "foobar", extract)
+
+    assert extract.calls == 1
+
+
+def test_resource_limit_failures_are_not_cached(clang_driver):
+    cache = ExtractionCache()
+    calls = []
+
+    def extract():
+        calls.append(1)
+        raise ResourceLimitExceeded("Resource limit exceeded: timeout of 1 s")
+
+    for _ in range(2):
+        with pytest.raises(ResourceLimitExceeded):
+            cache.lookup("llvm_graph", clang_driver, program_1fn_1, extract)
+
+    assert len(calls) == 2
+
+
+def test_memory_lru_is_bounded(clang_driver):
+    cache = ExtractionCache(max_memory_entries=2)
+    for i in range(3):
+        cache.lookup("llvm_graph", clang_driver, str(i), CountingExtractor(result=i))
+
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_disk_cache_persists(clang_driver, tmp_path):
+    extract = CountingExtractor(result=[1, 2, 3])
+    ExtractionCache(str(tmp_path)).lookup("llvm_graph", clang_driver, program_1fn_1, extract)
+
+    cache = ExtractionCache(str(tmp_path))
+    assert cache.lookup("llvm_graph", clang_driver, program_1fn_1, extract) == [1, 2, 3]
+    assert extract.calls == 1 and cache.hits == 1
+
+
+def test_disk_cache_evicts_least_recently_used(clang_driver, tmp_path):
+    entry_size = len(pickle.dumps(b"x" * 1000, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = ExtractionCache(str(tmp_path), max_disk_bytes=3 * entry_size, max_memory_entries=0)
+
+    for i in range(5):
+        cache.lookup("llvm_graph", clang_driver, str(i), CountingExtractor(result=b"x" * 1000))
+
+    assert sum(f.stat().st_size for f in tmp_path.glob("*/*.pkl")) <= 3 * entry_size
+
+
+def test_disk_cache_counts_rewritten_entries_once(clang_driver, tmp_path):
+    entry_size = len(pickle.dumps(b"x" * 1000, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = ExtractionCache(str(tmp_path), max_disk_bytes=2 * entry_size, max_memory_entries=0)
+    cache.lookup("llvm_graph", clang_driver, "0", CountingExtractor(result=b"x" * 1000))
+
+    # Miss the same key again while it is being extracted, as concurrent lookups do
+    def extract():
+        cache.lookup("llvm_graph", clang_driver, "1", CountingExtractor(result=b"x" * 1000))
+        return b"x" * 1000
+
+    cache.lookup("llvm_graph", clang_driver, "1", extract)
+
+    assert len(list(tmp_path.glob("*/*.pkl"))) == 2
+
+
+def test_builder_uses_cache(clang_driver):
+    from compy.representations.llvm_graphs import LLVMGraphBuilder
+
+    cache = ExtractionCache()
+    builder = LLVMGraphBuilder(clang_driver, cache=cache)
+
+    info1 = builder.string_to_info(program_1fn_1)
+    info2 = builder.string_to_info(program_1fn_1)
+
+    assert info1 is info2
+    assert cache.stats()["hits"] == 1
+
+
+def test_file_entries_follow_file_content(clang_driver, tmp_path):
+    cache = ExtractionCache()
+    extract = CountingExtractor(result={"info": 1})
+    path = tmp_path / "program.c"
+
+    path.write_text(program_1fn_1)
+    cache.lookup_file("llvm_graph", clang_driver, str(path), extract)
+    cache.lookup_file("llvm_graph", clang_driver, str(path), extract)
+    assert extract.calls == 1
+
+    path.write_text(program_1fn_1 + " ")
+    cache.lookup_file("llvm_graph", clang_driver, str(path), extract)
+    assert extract.calls == 2
+
+
+def test_virtual_files_are_not_cached(clang_driver, tmp_path):
+    cache = ExtractionCache()
+    extract = CountingExtractor(result={"info": 1})
+    path = str(tmp_path / "program.c")
+
+    clang_driver.setVirtualFiles({path: program_1fn_1})
+    for _ in range(2):
+        assert cache.lookup_file("llvm_graph", clang_driver, path, extract) == {"info": 1}
+
+    assert extract.calls == 2
+
+    # Sources that include virtual headers are not cached either
+    clang_driver.setVirtualFiles({str(tmp_path / "limit.h"): "#define LIMIT 10\n"})
+    for _ in range(2):
+        cache.lookup("llvm_graph", clang_driver, '#include "limit.h"\n' + program_1fn_1, extract)
+
+    assert extract.calls == 4
@@ -3,13 +3,37 @@ import functools
 import itertools
 import shutil
 import subprocess
+import threading
 import warnings
 from typing import Optional
 
-from .extractors import ClangDriver, LLVM_VERSION, SimpleClangDriver
+from compy.utils.discovery_cache import discovery_cache, tool_stamp
+
+from .extractors import ClangDriver, FunctionFilter, LLVM_VERSION, ResourceLimitExceeded, SimpleClangDriver
+from .extractors import internString, internedString, numInternedStrings
 del extractors # HACK: don't override extractors
 
 
+def llvm_version_of_clang(path):
+    """Return the LLVM version of the clang binary at path.
+
+    The version is cached on disk, so that other processes do not run clang and llvm-config again for it.
+    """
+
+    def discover():
+        llvm_config_path = subprocess.run(
+            [path, "-print-prog-name=llvm-config"],
+            check=True, stdout=subprocess.PIPE
+        ).stdout.decode().strip()
+
+        return subprocess.run(
+            [llvm_config_path, "--version"],
+            check=True, stdout=subprocess.PIPE
+        ).stdout.decode().strip()
+
+    return discovery_cache().get("llvm_version", tool_stamp(path), discover)
+
+
 @functools.lru_cache()
 def clang_binary_path():
     """Find the clang compiler binary, trying to match the version that the native extension was compiled with.
@@ -28,15 +52,7 @@ def clang_binary_path():
         if path is None:
             continue
 
-        llvm_config_path = subprocess.run(
-            [path, "-print-prog-name=llvm-config"],
-            check=True, stdout=subprocess.PIPE
-        ).stdout.decode().strip()
-
-        this_version = subprocess.run(
-            [llvm_config_path, "--version"],
-            check=True, stdout=subprocess.PIPE
-        ).stdout.decode().strip()
+        this_version = llvm_version_of_clang(path)
 
         if this_version == LLVM_VERSION:
             return path
@@ -59,6 +75,9 @@ def clang_binary_path():
 def clang_driver_scoped_options(clang_driver, additional_include_dir: Optional[str] = None, filename: Optional[str] = None):
     """A context manager to set and restore options for the clang driver in a local scope.
 
+    The driver is changed in place, so it must not be used by other threads meanwhile. See derive_clang_driver() for
+    a copy with the options applied instead.
+
     >>> with clang_driver_scoped_options(clang_driver, filename="foo"):
     ...     # clang_driver's file name is set to foo in this scope
     ...     pass
@@ -84,3 +103,88 @@ def clang_driver_scoped_options(clang_driver, additional_include_dir: Optional[s
                 additional_include_dir, ClangDriver.IncludeDirType.User
             )
 
+
+def derive_clang_driver(clang_driver, additional_include_dir: Optional[str] = None, filename: Optional[str] = None):
+    """Return a copy of clang_driver with the per-call options applied, leaving clang_driver itself unchanged."""
+    driver = clang_driver.clone()
+    if filename is not None:
+        driver.setFileName(filename)
+    if additional_include_dir:
+        driver.addIncludeDir(additional_include_dir, ClangDriver.IncludeDirType.User)
+    return driver
+
+
+def clang_drivers_for_batch(clang_driver, num_sources, additional_include_dirs=None, filenames=None,
+                            clang_drivers=None):
+    """Build the per-source drivers for a batch extraction (GraphFromStrings / SeqFromStrings).
+
+    Every source gets a copy of its driver (clang_drivers[i] if given, clang_driver otherwise) with its additional
+    include dir and file name applied, so the drivers can be used concurrently. Returns an empty list if there is
+    nothing to apply per source, in which case the extractor's own driver is used for the whole batch.
+    """
+    if additional_include_dirs is None and filenames is None and clang_drivers is None:
+        return []
+
+    additional_include_dirs = additional_include_dirs or [None] * num_sources
+    filenames = filenames or [None] * num_sources
+    clang_drivers = clang_drivers or [clang_driver] * num_sources
+
+    return [
+        derive_clang_driver(base_driver, additional_include_dir, filename)
+        for base_driver, additional_include_dir, filename in zip(clang_drivers, additional_include_dirs, filenames)
+    ]
+
+
+class ExtractorPool(object):
+    """The extractors of a builder, so that concurrent calls of the builder never share a clang driver.
+
+    Calls without per-call options use the extractor of their thread. The thread that creates the pool uses
+    clang_driver itself, other threads use a copy of it made on their first call. A call with per-call options, i.e.
+    an additional include dir, a file name or a clang driver of its own, gets an extractor for a copy of its driver
+    with the options applied, so that neither the builder's driver nor the one passed in is ever changed.
+    """
+
+    def __init__(self, extractor_class, clang_driver, function_filter=None):
+        self.clang_driver = clang_driver
+        self.__extractor_class = extractor_class
+        self.__function_filter = function_filter
+        self.__owner = threading.get_ident()
+        self.__local = threading.local()
+
+    def get(self, clang_driver=None, additional_include_dir=None, filename=None):
+        """Return the extractor for a call, and the driver it uses."""
+        if clang_driver is None and not additional_include_dir and filename is None:
+            local = self.__local
+            if not hasattr(local, "extractor"):
+                if threading.get_ident() == self.__owner:
+                    local.driver = self.clang_driver
+                else:
+                    local.driver = self.clang_driver.clone()
+                local.extractor = self.__create(local.driver)
+            return local.extractor, local.driver
+
+        driver = derive_clang_driver(clang_driver or self.clang_driver, additional_include_dir, filename)
+        return self.__create(driver), driver
+
+    def __create(self, clang_driver):
+        extractor = self.__extractor_class(clang_driver)
+        extractor.setFunctionFilter(self.__function_filter)
+        return extractor
+
+
+def function_filter_cache_kind(kind, function_filter, cache):
+    """Extend the cache kind of a builder with what function_filter selects.
+
+    Raises ValueError if the filter has a predicate and a cache is given, as the predicate cannot be part of the key.
+    """
+    if function_filter is None:
+        return kind
+
+    if function_filter.predicate is not None and cache is not None:
+        raise ValueError("a function filter with a predicate cannot be used with a cache")
+
+    if function_filter.names:
+        kind += "-functions=" + ",".join(sorted(function_filter.names))
+    if function_filter.skipSystemHeaders:
+        kind += "-no-system-headers"
+    return kind
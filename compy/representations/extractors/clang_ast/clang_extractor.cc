@@ -1,5 +1,6 @@
 #include "clang_extractor.h"
 
+#include <stdexcept>
 #include <string>
 
 #include "clang/Config/config.h"
@@ -10,6 +11,7 @@
 
 #include "clang_graph_frontendaction.h"
 #include "clang_seq_frontendaction.h"
+#include "clang_seq_lexer.h"
 
 using namespace ::clang;
 using namespace ::llvm;
@@ -20,8 +22,17 @@ namespace clang {
 ClangExtractor::ClangExtractor(ClangDriverPtr clangDriver)
     : clangDriver_(clangDriver) {}
 
+void ClangExtractor::setFunctionFilter(FunctionFilterPtr filter) {
+  functionFilter_ = filter;
+}
+
+FunctionFilterPtr ClangExtractor::getFunctionFilter() const {
+  return functionFilter_;
+}
+
 graph::ExtractionInfoPtr ClangExtractor::GraphFromString(std::string src) {
   auto fa = std::make_unique<compy::clang::graph::ExtractorFrontendAction>();
+  fa->functionFilter = functionFilter_;
 
   std::vector<::clang::FrontendAction *> frontendActions;
   std::vector<::llvm::Pass *> passes;
@@ -33,8 +44,15 @@ graph::ExtractionInfoPtr ClangExtractor::GraphFromString(std::string src) {
   return fa->extractionInfo;
 }
 
-seq::ExtractionInfoPtr ClangExtractor::SeqFromString(std::string src) {
+seq::ExtractionInfoPtr ClangExtractor::SeqFromString(std::string src,
+                                                     bool lexOnly) {
+  if (lexOnly) {
+    return seq::LexFunctions(src, clangDriver_->getProgrammingLanguage(),
+                             functionFilter_);
+  }
+
   auto fa = std::make_unique<compy::clang::seq::ExtractorFrontendAction>();
+  fa->functionFilter = functionFilter_;
 
   std::vector<::clang::FrontendAction *> frontendActions;
   std::vector<::llvm::Pass *> passes;
@@ -46,5 +64,92 @@ seq::ExtractionInfoPtr ClangExtractor::SeqFromString(std::string src) {
   return fa->extractionInfo;
 }
 
+graph::ExtractionInfoPtr ClangExtractor::GraphFromFile(std::string path) {
+  auto fa = std::make_unique<compy::clang::graph::ExtractorFrontendAction>();
+  fa->functionFilter = functionFilter_;
+
+  std::vector<::clang::FrontendAction *> frontendActions;
+  std::vector<::llvm::Pass *> passes;
+
+  frontendActions.push_back(fa.get());
+
+  clangDriver_->InvokeFile(path, frontendActions, passes);
+
+  return fa->extractionInfo;
+}
+
+seq::ExtractionInfoPtr ClangExtractor::SeqFromFile(std::string path,
+                                                   bool lexOnly) {
+  if (lexOnly) {
+    return seq::LexFunctions(clangDriver_->readFile(path),
+                             clangDriver_->getProgrammingLanguage(),
+                             functionFilter_);
+  }
+
+  auto fa = std::make_unique<compy::clang::seq::ExtractorFrontendAction>();
+  fa->functionFilter = functionFilter_;
+
+  std::vector<::clang::FrontendAction *> frontendActions;
+  std::vector<::llvm::Pass *> passes;
+
+  frontendActions.push_back(fa.get());
+
+  clangDriver_->InvokeFile(path, frontendActions, passes);
+
+  return fa->extractionInfo;
+}
+
+BatchResult<graph::ExtractionInfoPtr> ClangExtractor::GraphFromStrings(
+    std::vector<std::string> srcs, unsigned numWorkers,
+    std::vector<ClangDriverPtr> drivers) {
+  return RunBatch<graph::ExtractionInfoPtr>(
+      clangDriver_, srcs, drivers, numWorkers,
+      [filter = functionFilter_](ClangDriverPtr driver,
+                                 const std::string &src) {
+        ClangExtractor extractor(driver);
+        extractor.setFunctionFilter(filter);
+        return extractor.GraphFromString(src);
+      });
+}
+
+BatchResult<seq::ExtractionInfoPtr> ClangExtractor::SeqFromStrings(
+    std::vector<std::string> srcs, unsigned numWorkers,
+    std::vector<ClangDriverPtr> drivers, bool lexOnly) {
+  return RunBatch<seq::ExtractionInfoPtr>(
+      clangDriver_, srcs, drivers, numWorkers,
+      [lexOnly, filter = functionFilter_](ClangDriverPtr driver,
+                                          const std::string &src) {
+        ClangExtractor extractor(driver);
+        extractor.setFunctionFilter(filter);
+        return extractor.SeqFromString(src, lexOnly);
+      });
+}
+
+BatchResult<graph::ExtractionInfoPtr> ClangExtractor::GraphFromFiles(
+    std::vector<std::string> paths, unsigned numWorkers,
+    std::vector<ClangDriverPtr> drivers) {
+  return RunBatch<graph::ExtractionInfoPtr>(
+      clangDriver_, paths, drivers, numWorkers,
+      [filter = functionFilter_](ClangDriverPtr driver,
+                                 const std::string &path) {
+        ClangExtractor extractor(driver);
+        extractor.setFunctionFilter(filter);
+        return extractor.GraphFromFile(path);
+      });
+}
+
+BatchResult<seq::ExtractionInfoPtr> ClangExtractor::SeqFromFiles(
+    std::vector<std::string> paths, unsigned numWorkers,
+    std::vector<ClangDriverPtr> drivers, bool lexOnly) {
+  return RunBatch<seq::ExtractionInfoPtr>(
+      clangDriver_, paths, drivers, numWorkers,
+      [lexOnly, filter = functionFilter_](ClangDriverPtr driver,
+                                          const std::string &path) {
+        ClangExtractor extractor(driver);
+        extractor.setFunctionFilter(filter);
+        return extractor.SeqFromFile(path, lexOnly);
+      });
+}
+
 }  // namespace clang
 }  // namespace compy
@@ -5,7 +5,10 @@
 #include <tuple>
 #include <vector>
 
+#include "common/batch.h"
 #include "common/clang_driver.h"
+#include "common/function_filter.h"
+#include "common/string_interner.h"
 #include "common/visitor.h"
 
 namespace compy {
@@ -21,9 +24,13 @@ using ExtractionInfoPtr = std::shared_ptr<ExtractionInfo>;
 struct TokenInfo;
 using TokenInfoPtr = std::shared_ptr<TokenInfo>;
 
+// nameId and kindId are the ids of name and kind in
+// StringInterner::global().
 struct TokenInfo : IVisitee {
   std::string name;
   std::string kind;
+  int32_t nameId = -1;
+  int32_t kindId = -1;
 
   void accept(IVisitor* v) override { v->visit(this); }
 };
@@ -76,17 +83,25 @@ using FunctionInfoPtr = std::shared_ptr<FunctionInfo>;
 struct ExtractionInfo;
 using ExtractionInfoPtr = std::shared_ptr<ExtractionInfo>;
 
+// nameId and kindId are the ids of name and kind in
+// StringInterner::global().
 struct TokenInfo : IVisitee {
   std::uint64_t index;
   std::string name;
   std::string kind;
+  int32_t nameId = -1;
+  int32_t kindId = -1;
   ::clang::SourceLocation location;
 
   void accept(IVisitor* v) override { v->visit(this); }
 };
 
 struct OperandInfo : IVisitee {
+  // Concrete type of an operand, as the extractors are built without RTTI.
+  enum class Kind { DECL, STMT, RECORD };
+
   virtual ~OperandInfo() = default;
+  virtual Kind operandKind() const = 0;
 };
 
 struct DeclInfo : OperandInfo {
@@ -98,6 +113,7 @@ struct DeclInfo : OperandInfo {
   TokenInfo nameToken;
   DeclInfoPtr referencedTypedef;
 
+  Kind operandKind() const override { return Kind::DECL; }
   void accept(IVisitor* v) override {
     v->visit(this);
     for (auto& it : tokens) it.accept(v);
@@ -130,6 +146,7 @@ struct StmtInfo : OperandInfo {
   std::vector<OperandInfoPtr> ast_relations;
   std::vector<OperandInfoPtr> ref_relations;
 
+  Kind operandKind() const override { return Kind::STMT; }
   void accept(IVisitor* v) override {
     v->visit(this);
     for (auto& it : tokens) it.accept(v);
@@ -145,6 +162,7 @@ struct RecordInfo : OperandInfo {
   std::vector<EnumDeclInfoPtr> referencedEnums;
   std::vector<DeclInfoPtr> referencedTypedefs;
 
+  Kind operandKind() const override { return Kind::RECORD; }
   void accept(IVisitor* v) override {
     v->visit(this);
   }
@@ -187,11 +205,39 @@ class ClangExtractor {
  public:
   ClangExtractor(ClangDriverPtr clangDriver);
 
+  // Restricts all extractions to the functions filter selects, or extracts
+  // all functions if it is null.
+  void setFunctionFilter(FunctionFilterPtr filter);
+  FunctionFilterPtr getFunctionFilter() const;
+
+  // With lexOnly, the sequences are extracted with the raw lexer instead of
+  // the frontend, which is much faster but finds the functions and variables
+  // syntactically, see LexFunctions().
   graph::ExtractionInfoPtr GraphFromString(std::string src);
-  seq::ExtractionInfoPtr SeqFromString(std::string src);
+  seq::ExtractionInfoPtr SeqFromString(std::string src, bool lexOnly = false);
+
+  // Read the source from a file, see ClangDriver::InvokeFile().
+  graph::ExtractionInfoPtr GraphFromFile(std::string path);
+  seq::ExtractionInfoPtr SeqFromFile(std::string path, bool lexOnly = false);
+
+  // Batch variants of the above, see RunBatch() for the semantics of
+  // numWorkers and drivers.
+  BatchResult<graph::ExtractionInfoPtr> GraphFromStrings(
+      std::vector<std::string> srcs, unsigned numWorkers,
+      std::vector<ClangDriverPtr> drivers = {});
+  BatchResult<seq::ExtractionInfoPtr> SeqFromStrings(
+      std::vector<std::string> srcs, unsigned numWorkers,
+      std::vector<ClangDriverPtr> drivers = {}, bool lexOnly = false);
+  BatchResult<graph::ExtractionInfoPtr> GraphFromFiles(
+      std::vector<std::string> paths, unsigned numWorkers,
+      std::vector<ClangDriverPtr> drivers = {});
+  BatchResult<seq::ExtractionInfoPtr> SeqFromFiles(
+      std::vector<std::string> paths, unsigned numWorkers,
+      std::vector<ClangDriverPtr> drivers = {}, bool lexOnly = false);
 
  private:
   ClangDriverPtr clangDriver_;
+  FunctionFilterPtr functionFilter_;
 };
 
 }  // namespace clang
@@ -93,6 +93,114 @@ TEST_F(ClangExtractorCFixture, ExtractGraphFromVarDefinitions) {
 }
 
 //
+TEST_F(ClangExtractorCFixture, ExtractBatchInInputOrder) {
+  std::vector<std::string> srcs = {kProgram6, "foobar", kProgram7};
+
+  auto result = extractor_->GraphFromStrings(srcs, 2);
+  auto& infos = std::get<0>(result);
+  auto& errors = std::get<1>(result);
+
+  ASSERT_EQ(infos.size(), srcs.size());
+  ASSERT_EQ(infos[0]->functionInfos.size(), 1UL);
+  ASSERT_EQ(infos[1], nullptr);
+  ASSERT_FALSE(errors[1].empty());
+  ASSERT_NE(infos[2], nullptr);
+  ASSERT_TRUE(errors[2].empty());
+}
+
+void ExpectSameSeqs(seq::ExtractionInfoPtr expected,
+                    seq::ExtractionInfoPtr actual) {
+  ASSERT_EQ(actual->functionInfos.size(), expected->functionInfos.size());
+  for (size_t i = 0; i < expected->functionInfos.size(); ++i) {
+    auto& expectedTokens = expected->functionInfos[i]->tokenInfos;
+    auto& actualTokens = actual->functionInfos[i]->tokenInfos;
+
+    ASSERT_EQ(actual->functionInfos[i]->name,
+              expected->functionInfos[i]->name);
+    ASSERT_EQ(actualTokens.size(), expectedTokens.size());
+    for (size_t j = 0; j < expectedTokens.size(); ++j) {
+      ASSERT_EQ(actualTokens[j]->name, expectedTokens[j]->name);
+      ASSERT_EQ(actualTokens[j]->kind, expectedTokens[j]->kind);
+    }
+  }
+}
+
+TEST_F(ClangExtractorCFixture, ExtractSeqLexOnlyLikeFrontend) {
+  for (auto src : {kProgram2, kProgram5, kProgram6}) {
+    ExpectSameSeqs(extractor_->SeqFromString(src),
+                   extractor_->SeqFromString(src, true));
+  }
+}
+
+TEST_F(ClangExtractorCFixture, ExtractSeqLexOnlyWithoutHeaders) {
+  // The header is neither read nor part of the sequence.
+  seq::ExtractionInfoPtr info = extractor_->SeqFromString(kProgram4, true);
+
+  ASSERT_EQ(info->functionInfos.size(), 1UL);
+  auto& tokens = info->functionInfos[0]->tokenInfos;
+  ASSERT_EQ(tokens.front()->name, "void");
+  ASSERT_EQ(tokens[1]->name, "fn_0");
+  ASSERT_EQ(tokens.back()->kind, "eof");
+  for (const auto& token : tokens) {
+    ASSERT_NE(token->name, "include");
+  }
+}
+
+TEST_F(ClangExtractorCFixture, ExtractWithFunctionFilter) {
+  auto filter = std::make_shared<FunctionFilter>();
+  filter->names = {"foo"};
+  extractor_->setFunctionFilter(filter);
+
+  graph::ExtractionInfoPtr graphInfo = extractor_->GraphFromString(kProgram5);
+  ASSERT_EQ(graphInfo->functionInfos.size(), 1UL);
+  ASSERT_EQ(graphInfo->functionInfos[0]->name, "foo");
+
+  // The names of the skipped functions are still renamed.
+  for (bool lexOnly : {false, true}) {
+    seq::ExtractionInfoPtr seqInfo =
+        extractor_->SeqFromString(kProgram5, lexOnly);
+    ASSERT_EQ(seqInfo->functionInfos.size(), 1UL);
+    ASSERT_EQ(seqInfo->functionInfos[0]->name, "foo");
+
+    bool callsMax = false;
+    for (const auto& token : seqInfo->functionInfos[0]->tokenInfos) {
+      ASSERT_NE(token->name, "max");
+      callsMax |= token->name == "fn_0";
+    }
+    ASSERT_TRUE(callsMax);
+  }
+}
+
+TEST_F(ClangExtractorCFixture, ExtractWithFunctionPredicate) {
+  auto filter = std::make_shared<FunctionFilter>();
+  filter->predicate = [](const std::string& name) { return name == "max"; };
+  extractor_->setFunctionFilter(filter);
+
+  auto result = extractor_->SeqFromStrings({kProgram5, kProgram2}, 2);
+
+  for (const auto& info : std::get<0>(result)) {
+    ASSERT_EQ(info->functionInfos.size(), 1UL);
+  }
+}
+
+TEST_F(ClangExtractorCFixture, ExtractWithInternedTokens) {
+  auto& interner = StringInterner::global();
+
+  for (bool lexOnly : {false, true}) {
+    seq::ExtractionInfoPtr info = extractor_->SeqFromString(kProgram5, lexOnly);
+    for (const auto& token : info->functionInfos[0]->tokenInfos) {
+      ASSERT_EQ(interner.lookup(token->nameId), token->name);
+      ASSERT_EQ(interner.lookup(token->kindId), token->kind);
+    }
+  }
+
+  graph::ExtractionInfoPtr info = extractor_->GraphFromString(kProgram5);
+  for (const auto& token : info->functionInfos[0]->tokens) {
+    ASSERT_EQ(interner.lookup(token.nameId), token.name);
+    ASSERT_EQ(interner.lookup(token.kindId), token.kind);
+  }
+}
+
 // TEST_F(ClangExtractorCFixture, ExtractSeqFromFunction5) {
 //  seq::ExtractionInfoPtr info = extractor_->SeqFromString(kProgram5);
 //}
@@ -0,0 +1,226 @@
+#include "clang_graph_builders.h"
+
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+namespace compy {
+namespace clang {
+namespace graph {
+
+namespace {
+
+// Same as filter_type() in ast_graphs.py.
+std::string filterType(const std::string &type) {
+  auto contains = [&](const char *s) {
+    return type.find(s) != std::string::npos;
+  };
+
+  if (contains("[") || contains("]")) return "arrayType";
+  if (contains("(") || contains(")")) return "fnType";
+  if (contains("int")) return "intType";
+  if (contains("float")) return "floatType";
+  return "type";
+}
+
+const std::string &nameOf(const OperandInfoPtr &operand) {
+  switch (operand->operandKind()) {
+    case OperandInfo::Kind::DECL:
+      return std::static_pointer_cast<DeclInfo>(operand)->name;
+    case OperandInfo::Kind::STMT:
+      return std::static_pointer_cast<StmtInfo>(operand)->name;
+    case OperandInfo::Kind::RECORD:
+      return std::static_pointer_cast<RecordInfo>(operand)->name;
+  }
+  throw std::invalid_argument("Unknown operand kind");
+}
+
+// Indices into the edge_types of the Python visitors, -1 where a visitor does
+// not have the edge type.
+struct EdgeTypes {
+  int32_t ast, cfg, in, data, token;
+};
+
+EdgeTypes edgeTypesOf(GraphKind kind) {
+  switch (kind) {
+    case GraphKind::AST:
+      return {0, -1, -1, -1, -1};
+    case GraphKind::AST_DATA:
+      return {0, -1, -1, 1, -1};
+    case GraphKind::AST_DATA_CFG:
+      return {0, 1, 2, 3, -1};
+    case GraphKind::AST_DATA_CFG_TOKEN:
+      return {0, 1, 2, 3, 4};
+  }
+  throw std::invalid_argument("Unknown graph kind");
+}
+
+class Builder {
+ public:
+  explicit Builder(GraphKind kind)
+      : withData_(kind != GraphKind::AST),
+        withCFG_(kind == GraphKind::AST_DATA_CFG ||
+                 kind == GraphKind::AST_DATA_CFG_TOKEN),
+        withTokens_(kind == GraphKind::AST_DATA_CFG_TOKEN),
+        e_(edgeTypesOf(kind)) {}
+
+  // Visits the objects in the order of FunctionInfo::accept(). Tokens are
+  // visited as well, but none of the visitors handles them.
+  void traverse(const FunctionInfoPtr &function) {
+    visitFunction(function);
+    for (const auto &arg : function->args) traverse(arg);
+    if (function->entryStmt) traverse(function->entryStmt);
+  }
+
+  GraphArraysPtr finish() { return b_.finish<GraphArrays>(); }
+
+ private:
+  void traverse(const OperandInfoPtr &operand) {
+    switch (operand->operandKind()) {
+      case OperandInfo::Kind::DECL: {
+        auto decl = std::static_pointer_cast<DeclInfo>(operand);
+        addTokenEdges(decl, decl->tokens);
+        break;
+      }
+      case OperandInfo::Kind::STMT: {
+        auto stmt = std::static_pointer_cast<StmtInfo>(operand);
+        visitStmt(stmt);
+        for (const auto &it : stmt->ast_relations) {
+          if (it) traverse(it);
+        }
+        break;
+      }
+      case OperandInfo::Kind::RECORD: {
+        auto record = std::static_pointer_cast<RecordInfo>(operand);
+        addTokenEdges(record, record->tokens);
+        break;
+      }
+    }
+  }
+
+  int32_t node(const FunctionInfoPtr &p) {
+    return b_.node(p, uint8_t(NodeType::FUNCTION));
+  }
+  int32_t node(const DeclInfoPtr &p) {
+    return b_.node(p, uint8_t(NodeType::DECL));
+  }
+  int32_t node(const StmtInfoPtr &p) {
+    return b_.node(p, uint8_t(NodeType::STMT));
+  }
+  int32_t node(const RecordInfoPtr &p) {
+    return b_.node(p, uint8_t(NodeType::RECORD));
+  }
+  int32_t node(const CFGBlockInfoPtr &p) {
+    return b_.node(p, uint8_t(NodeType::CFG_BLOCK));
+  }
+  int32_t node(const OperandInfoPtr &p) {
+    switch (p->operandKind()) {
+      case OperandInfo::Kind::DECL:
+        return node(std::static_pointer_cast<DeclInfo>(p));
+      case OperandInfo::Kind::STMT:
+        return node(std::static_pointer_cast<StmtInfo>(p));
+      case OperandInfo::Kind::RECORD:
+        return node(std::static_pointer_cast<RecordInfo>(p));
+    }
+    throw std::invalid_argument("Unknown operand kind");
+  }
+
+  // Adds an edge, adding its source before its target like networkx does.
+  template <typename S, typename T>
+  void edge(const S &source, const T &target, int32_t type) {
+    int32_t s = node(source);
+    int32_t t = node(target);
+    b_.addEdge(s, t, type);
+  }
+
+  void visitFunction(const FunctionInfoPtr &v) {
+    // AST edges.
+    b_.setLabel(node(v), "function");
+    for (const auto &arg : v->args) {
+      b_.setLabel(node(arg), GraphLabel{"argument", filterType(arg->type)});
+      edge(v, arg, e_.ast);
+    }
+    int32_t entry = node(v->entryStmt);
+    b_.setLabel(entry, v->entryStmt->name);
+    edge(v, v->entryStmt, e_.ast);
+
+    // CFG edges.
+    if (withCFG_) {
+      for (const auto &cfgBlock : v->cfgBlocks) {
+        b_.setLabel(node(cfgBlock), "cfg");
+        for (const auto &succ : cfgBlock->successors) {
+          edge(cfgBlock, succ, e_.cfg);
+          b_.setLabel(node(succ), "cfg");
+        }
+        for (const auto &stmt : cfgBlock->statements) {
+          edge(stmt, cfgBlock, e_.in);
+          b_.setLabel(node(stmt), stmt->name);
+        }
+      }
+    }
+
+    addTokenEdges(v, v->tokens);
+  }
+
+  void visitStmt(const StmtInfoPtr &v) {
+    // AST edges.
+    for (const auto &astRel : v->ast_relations) {
+      b_.setLabel(node(astRel), nameOf(astRel));
+      edge(v, astRel, e_.ast);
+    }
+
+    // Data reference edges.
+    if (withData_) {
+      for (const auto &refRel : v->ref_relations) {
+        if (refRel->operandKind() != OperandInfo::Kind::DECL) {
+          throw std::runtime_error("Data reference to a non-declaration");
+        }
+        auto decl = std::static_pointer_cast<DeclInfo>(refRel);
+        b_.setLabel(node(decl), filterType(decl->type));
+        edge(v, decl, e_.data);
+      }
+    }
+
+    addTokenEdges(v, v->tokens);
+  }
+
+  // Token nodes are copies of the tokens, distinct on every visit, as the
+  // Python visitors get fresh token objects on every access.
+  template <typename T>
+  void addTokenEdges(const std::shared_ptr<T> &v,
+                     const std::vector<TokenInfo> &tokens) {
+    if (!withTokens_) return;
+
+    for (const auto &token : tokens) {
+      int32_t t = b_.uniqueNode(std::make_shared<TokenInfo>(token),
+                                uint8_t(NodeType::TOKEN));
+      b_.setLabel(t, token.name);
+      b_.setSeqOrder(t, token.index);
+      b_.addEdge(node(v), t, e_.token);
+    }
+  }
+
+  bool withData_;
+  bool withCFG_;
+  bool withTokens_;
+  EdgeTypes e_;
+  GraphArraysBuilder b_;
+};
+
+}  // namespace
+
+GraphArraysPtr BuildGraph(const ExtractionInfoPtr &info, GraphKind kind) {
+  Builder builder(kind);
+  for (const auto &function : info->functionInfos) builder.traverse(function);
+  return builder.finish();
+}
+
+GraphArraysPtr BuildGraph(const FunctionInfoPtr &info, GraphKind kind) {
+  Builder builder(kind);
+  builder.traverse(info);
+  return builder.finish();
+}
+
+}  // namespace graph
+}  // namespace clang
+}  // namespace compy
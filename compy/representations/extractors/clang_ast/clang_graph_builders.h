@@ -0,0 +1,35 @@
+#pragma once
+
+#include <cstdint>
+#include <memory>
+
+#include "clang_extractor.h"
+#include "common/graph_arrays.h"
+
+namespace compy {
+namespace clang {
+namespace graph {
+
+// Native implementations of the graph visitors in
+// compy/representations/ast_graphs.py.
+enum class GraphKind { AST, AST_DATA, AST_DATA_CFG, AST_DATA_CFG_TOKEN };
+
+// Types of the objects behind the nodes of a graph.
+enum class NodeType : uint8_t {
+  FUNCTION,
+  DECL,
+  STMT,
+  RECORD,
+  CFG_BLOCK,
+  TOKEN
+};
+
+struct GraphArrays : compy::GraphArrays {};
+using GraphArraysPtr = std::shared_ptr<GraphArrays>;
+
+GraphArraysPtr BuildGraph(const ExtractionInfoPtr &info, GraphKind kind);
+GraphArraysPtr BuildGraph(const FunctionInfoPtr &info, GraphKind kind);
+
+}  // namespace graph
+}  // namespace clang
+}  // namespace compy
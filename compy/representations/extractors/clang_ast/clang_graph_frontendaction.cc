@@ -20,6 +20,18 @@ namespace compy {
 namespace clang {
 namespace graph {
 
+bool ExtractorASTVisitor::TraverseDecl(Decl *d) {
+  auto *f = dyn_cast_or_null<FunctionDecl>(d);
+  if (f && f->hasBody() && f->getDeclName().isIdentifier() &&
+      !selectsFunction(filter_, *f)) {
+    // throw away the tokens
+    tokenQueue_.popTokensForRange(f->getSourceRange(), false);
+    return true;
+  }
+
+  return RecursiveASTVisitor<ExtractorASTVisitor>::TraverseDecl(d);
+}
+
 bool ExtractorASTVisitor::VisitStmt(Stmt *s) {
   // Collect child stmts
   std::vector<OperandInfoPtr> ast_relations;
@@ -366,8 +378,10 @@ RecordInfoPtr ExtractorASTVisitor::getInfo(const RecordDecl &decl, bool consumeT
 }
 
 ExtractorASTConsumer::ExtractorASTConsumer(CompilerInstance &CI,
-                                           ExtractionInfoPtr extractionInfo)
-    : visitor_(CI.getASTContext(), std::move(extractionInfo), tokenQueue_),
+                                           ExtractionInfoPtr extractionInfo,
+                                           FunctionFilterPtr filter)
+    : visitor_(CI.getASTContext(), std::move(extractionInfo), tokenQueue_,
+               std::move(filter)),
       tokenQueue_(CI.getPreprocessor()) {}
 
 bool ExtractorASTConsumer::HandleTopLevelDecl(DeclGroupRef DR) {
@@ -382,7 +396,8 @@ std::unique_ptr<ASTConsumer> ExtractorFrontendAction::CreateASTConsumer(
     CompilerInstance &CI, StringRef file) {
   extractionInfo.reset(new ExtractionInfo());
   //  CI.getASTContext().getLangOpts().OpenCL
-  return std::make_unique<ExtractorASTConsumer>(CI, extractionInfo);
+  return std::make_unique<ExtractorASTConsumer>(CI, extractionInfo,
+                                                functionFilter);
 }
 
 std::vector<TokenInfo> TokenQueue::popTokensForRange(
@@ -413,6 +428,8 @@ void TokenQueue::addToken(::clang::Token token) {
   } else {
     info.name = pp_.getSpelling(token, nullptr);
   }
+  info.nameId = internString(info.name);
+  info.kindId = internString(info.kind);
 
   info.location = token.getLocation();
   tokens_.push_back(info);
@@ -12,6 +12,7 @@
 #include <clang/Analysis/CFG.h>
 
 #include "clang_extractor.h"
+#include "common/function_filter.h"
 
 namespace compy {
 namespace clang {
@@ -49,10 +50,15 @@ class ExtractorASTVisitor
     : public ::clang::RecursiveASTVisitor<ExtractorASTVisitor> {
  public:
   ExtractorASTVisitor(::clang::ASTContext &context,
-                      ExtractionInfoPtr extractionInfo, TokenQueue &tokenQueue)
+                      ExtractionInfoPtr extractionInfo, TokenQueue &tokenQueue,
+                      FunctionFilterPtr filter)
       : context_(context),
         extractionInfo_(extractionInfo),
-        tokenQueue_(tokenQueue) {}
+        tokenQueue_(tokenQueue),
+        filter_(filter) {}
+
+  // Skips the function definitions the filter does not select.
+  bool TraverseDecl(::clang::Decl *d);
 
   bool VisitStmt(::clang::Stmt *s);
   bool VisitFunctionDecl(::clang::FunctionDecl *f);
@@ -74,6 +80,7 @@ class ExtractorASTVisitor
   ::clang::ASTContext &context_;
   ExtractionInfoPtr extractionInfo_;
   TokenQueue &tokenQueue_;
+  FunctionFilterPtr filter_;
 
   std::unordered_map<const ::clang::Stmt *, StmtInfoPtr> stmtInfos_;
   std::unordered_map<const ::clang::CFGBlock *, CFGBlockInfoPtr> cfgBlockInfos_;
@@ -85,7 +92,8 @@ class ExtractorASTVisitor
 class ExtractorASTConsumer : public ::clang::ASTConsumer {
  public:
   ExtractorASTConsumer(::clang::CompilerInstance &CI,
-                       ExtractionInfoPtr extractionInfo);
+                       ExtractionInfoPtr extractionInfo,
+                       FunctionFilterPtr filter);
 
   bool HandleTopLevelDecl(::clang::DeclGroupRef DR) override;
 
@@ -94,12 +102,18 @@ class ExtractorASTConsumer : public ::clang::ASTConsumer {
   TokenQueue tokenQueue_;
 };
 
-class ExtractorFrontendAction : public ::clang::ASTFrontendAction {
+// Can run as an action of its own, or along with the lowering to LLVM IR, see
+// ClangDriver::InvokeSingleParse().
+class ExtractorFrontendAction : public ::clang::ASTFrontendAction,
+                                public ASTConsumerProvider {
  public:
   std::unique_ptr<::clang::ASTConsumer> CreateASTConsumer(
       ::clang::CompilerInstance &CI, ::llvm::StringRef file) override;
 
   ExtractionInfoPtr extractionInfo;
+
+  // Only the functions the filter selects are extracted, if it is set.
+  FunctionFilterPtr functionFilter;
 };
 
 }  // namespace graph
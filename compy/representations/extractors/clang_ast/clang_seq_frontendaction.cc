@@ -38,7 +38,7 @@ bool ExtractorASTVisitor::VisitFunctionDecl(FunctionDecl *f) {
     mapName(*f);
   }
 
-  else if (state_ == STATE::Capture) {
+  else if (state_ == STATE::Capture && selectsFunction(filter_, *f)) {
     FunctionInfoPtr functionInfo = getInfo(*f);
     extractionInfo_->functionInfos.push_back(functionInfo);
 
@@ -81,9 +81,11 @@ bool ExtractorASTVisitor::VisitFunctionDecl(FunctionDecl *f) {
       if (it != mappedNames_.end()) strToken = it->second;
 
       tokenInfo->name = strToken;
+      tokenInfo->nameId = internString(strToken);
 
       // Get token kind.
       tokenInfo->kind = tok.getName();
+      tokenInfo->kindId = internString(tokenInfo->kind);
 
       // Check if done and get next token if not.
       if (tok.getLocation() == sourceRange.getEnd() || tok.is(tok::eof)) {
@@ -133,8 +135,9 @@ std::string ExtractorASTVisitor::mapName(const NamedDecl &decl) {
 }
 
 ExtractorASTConsumer::ExtractorASTConsumer(ASTContext &context,
-                                           ExtractionInfoPtr extractionInfo)
-    : visitor_(context, extractionInfo) {}
+                                           ExtractionInfoPtr extractionInfo,
+                                           FunctionFilterPtr filter)
+    : visitor_(context, extractionInfo, filter) {}
 
 bool ExtractorASTConsumer::HandleTopLevelDecl(DeclGroupRef DR) {
   for (auto it = DR.begin(), e = DR.end(); it != e; ++it) {
@@ -153,7 +156,7 @@ std::unique_ptr<ASTConsumer> ExtractorFrontendAction::CreateASTConsumer(
   extractionInfo.reset(new ExtractionInfo());
 
   return std::make_unique<ExtractorASTConsumer>(CI.getASTContext(),
-                                                extractionInfo);
+                                                extractionInfo, functionFilter);
 }
 
 }  // namespace seq
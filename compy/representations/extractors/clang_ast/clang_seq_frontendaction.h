@@ -11,6 +11,7 @@
 #include "llvm/ADT/StringRef.h"
 
 #include "clang_extractor.h"
+#include "common/function_filter.h"
 
 namespace compy {
 namespace clang {
@@ -26,8 +27,12 @@ class ExtractorASTVisitor
 
  public:
   ExtractorASTVisitor(::clang::ASTContext &context,
-                      ExtractionInfoPtr extractionInfo)
-      : state_(STATE::Map), context_(context), extractionInfo_(extractionInfo) {
+                      ExtractionInfoPtr extractionInfo,
+                      FunctionFilterPtr filter)
+      : state_(STATE::Map),
+        context_(context),
+        extractionInfo_(extractionInfo),
+        filter_(filter) {
     init();
   }
 
@@ -46,6 +51,7 @@ class ExtractorASTVisitor
   STATE state_;
   ::clang::ASTContext &context_;
   ExtractionInfoPtr extractionInfo_;
+  FunctionFilterPtr filter_;
 
   std::unordered_map<std::string, std::string> mappedNames_;
   unsigned int num_functions_;
@@ -55,7 +61,8 @@ class ExtractorASTVisitor
 class ExtractorASTConsumer : public ::clang::ASTConsumer {
  public:
   ExtractorASTConsumer(::clang::ASTContext &context,
-                       ExtractionInfoPtr extractionInfo);
+                       ExtractionInfoPtr extractionInfo,
+                       FunctionFilterPtr filter);
 
   bool HandleTopLevelDecl(::clang::DeclGroupRef DR) override;
 
@@ -63,12 +70,19 @@ class ExtractorASTConsumer : public ::clang::ASTConsumer {
   ExtractorASTVisitor visitor_;
 };
 
-class ExtractorFrontendAction : public ::clang::ASTFrontendAction {
+// Can run as an action of its own, or along with the lowering to LLVM IR, see
+// ClangDriver::InvokeSingleParse().
+class ExtractorFrontendAction : public ::clang::ASTFrontendAction,
+                                public ASTConsumerProvider {
  public:
   std::unique_ptr<::clang::ASTConsumer> CreateASTConsumer(
       ::clang::CompilerInstance &CI, ::llvm::StringRef file) override;
 
   ExtractionInfoPtr extractionInfo;
+
+  // Only the functions the filter selects are extracted, if it is set. The
+  // names of the others are still normalized.
+  FunctionFilterPtr functionFilter;
 };
 
 }  // namespace seq
@@ -0,0 +1,394 @@
+#include "clang_seq_lexer.h"
+
+#include <memory>
+#include <stdexcept>
+#include <string>
+#include <unordered_map>
+#include <unordered_set>
+#include <utility>
+#include <vector>
+
+#include "clang/Basic/Diagnostic.h"
+#include "clang/Basic/DiagnosticOptions.h"
+#include "clang/Basic/FileManager.h"
+#include "clang/Basic/IdentifierTable.h"
+#include "clang/Basic/LangOptions.h"
+#include "clang/Basic/SourceManager.h"
+#include "clang/Lex/Lexer.h"
+#include "llvm/Support/MemoryBuffer.h"
+
+using namespace ::clang;
+using namespace ::llvm;
+
+namespace compy {
+namespace clang {
+namespace seq {
+
+namespace {
+
+// Keywords that can directly precede the name in a declaration.
+const std::unordered_set<std::string> kTypeKeywords = {
+    "int",      "char",     "short",      "long",       "float",
+    "double",   "signed",   "unsigned",   "void",       "bool",
+    "_Bool",    "_Complex", "const",      "volatile",   "restrict",
+    "auto",     "half",     "wchar_t",    "char8_t",    "char16_t",
+    "char32_t", "__global", "__local",    "__constant", "__private",
+    "global",   "local",    "constant",   "private"};
+
+// Keywords that can precede the type name in a declaration.
+const std::unordered_set<std::string> kSpecifierKeywords = {
+    "struct", "union",    "enum",     "class",  "static", "extern",
+    "register", "inline", "typename", "__kernel", "kernel"};
+
+const std::unordered_set<std::string> kRecordKeywords = {"struct", "union",
+                                                         "enum", "class"};
+
+// Tokens between the type and the name of a declaration.
+const std::unordered_set<std::string> kDeclaratorTokens = {
+    "*", "&", "&&", "const", "volatile", "restrict", "__restrict"};
+
+struct RawToken {
+  std::string spelling;
+  std::string kind;
+  bool isIdentifier = false;
+  bool isKeyword = false;
+};
+
+LangOptions langOptionsFor(ClangDriver::ProgrammingLanguage language) {
+  LangOptions opts;
+  opts.LineComment = 1;
+  opts.Digraphs = 1;
+  opts.GNUKeywords = 1;
+
+  switch (language) {
+    case ClangDriver::ProgrammingLanguage::C:
+      opts.C99 = 1;
+      opts.C11 = 1;
+      opts.C17 = 1;
+      break;
+    case ClangDriver::ProgrammingLanguage::CPLUSPLUS:
+      opts.CPlusPlus = 1;
+      opts.CPlusPlus11 = 1;
+      opts.CPlusPlus14 = 1;
+      opts.CPlusPlus17 = 1;
+      opts.Bool = 1;
+      opts.CXXOperatorNames = 1;
+      break;
+    case ClangDriver::ProgrammingLanguage::OPENCL:
+      opts.OpenCL = 1;
+      opts.OpenCLVersion = 120;
+      opts.C99 = 1;
+      opts.Bool = 1;
+      break;
+    case ClangDriver::ProgrammingLanguage::LLVM:
+      throw std::runtime_error("Cannot lex LLVM IR");
+  }
+
+  return opts;
+}
+
+// Finds the function definitions and variable declarations in a token
+// stream, and renames them like ExtractorASTVisitor does.
+class FunctionLexer {
+ public:
+  FunctionLexer(std::vector<RawToken> tokens, std::vector<size_t> code,
+                FunctionFilterPtr filter)
+      : tokens_(std::move(tokens)),
+        code_(std::move(code)),
+        filter_(std::move(filter)) {}
+
+  ExtractionInfoPtr extract();
+
+ private:
+  const RawToken &at(size_t i) const { return tokens_[code_[i]]; }
+  bool is(size_t i, const char *spelling) const {
+    return at(i).spelling == spelling;
+  }
+  bool isKeywordIn(size_t i,
+                   const std::unordered_set<std::string> &set) const {
+    return at(i).isKeyword && set.count(at(i).spelling);
+  }
+
+  bool isTransparent(size_t begin, size_t brace) const;
+  size_t findFunctionName(size_t begin, size_t brace) const;
+  bool opensRecord(size_t begin, size_t brace) const;
+
+  void mapDeclarations(size_t begin, size_t end);
+  void captureFunction(size_t begin, size_t end, size_t name);
+
+  std::string mapName(const std::string &name, bool isFunction);
+
+ private:
+  std::vector<RawToken> tokens_;
+  // Indices of the tokens outside of preprocessor directives.
+  std::vector<size_t> code_;
+  FunctionFilterPtr filter_;
+
+  ExtractionInfoPtr extractionInfo_;
+  std::unordered_map<std::string, std::string> mappedNames_;
+  unsigned int num_functions_ = 0;
+  unsigned int num_variables_ = 0;
+};
+
+ExtractionInfoPtr FunctionLexer::extract() {
+  extractionInfo_.reset(new ExtractionInfo());
+
+  // Split the top level into declarations, each ending either at a semicolon
+  // or at the end of a function body.
+  size_t begin = 0;
+  size_t name = std::string::npos;
+  int braces = 0;
+  for (size_t i = 0; i < code_.size(); ++i) {
+    if (braces == 0) {
+      if (is(i, "{")) {
+        // Namespaces and linkage specifications contain declarations.
+        if (isTransparent(begin, i)) {
+          begin = i + 1;
+          continue;
+        }
+        name = findFunctionName(begin, i);
+        braces++;
+      } else if (is(i, "}")) {
+        begin = i + 1;
+      } else if (is(i, ";")) {
+        mapDeclarations(begin, i + 1);
+        begin = i + 1;
+      }
+      continue;
+    }
+
+    if (is(i, "{")) {
+      braces++;
+    } else if (is(i, "}")) {
+      braces--;
+      if (braces == 0 && name != std::string::npos) {
+        captureFunction(begin, i + 1, name);
+        begin = i + 1;
+        name = std::string::npos;
+      }
+    }
+  }
+
+  return extractionInfo_;
+}
+
+bool FunctionLexer::isTransparent(size_t begin, size_t brace) const {
+  for (size_t i = begin; i < brace; ++i) {
+    if (at(i).isKeyword && is(i, "namespace")) return true;
+  }
+  return brace == begin + 2 && is(begin, "extern") &&
+         at(begin + 1).kind == "string_literal";
+}
+
+// Returns the position of the name of the function whose body starts at
+// brace, or npos if the brace does not start a function body.
+size_t FunctionLexer::findFunctionName(size_t begin, size_t brace) const {
+  size_t name = std::string::npos;
+  int parens = 0;
+  for (size_t i = begin; i < brace; ++i) {
+    if (parens == 0 && is(i, "=")) return std::string::npos;
+
+    if (is(i, "(")) {
+      if (parens == 0 && name == std::string::npos && i > begin &&
+          at(i - 1).isIdentifier) {
+        name = i - 1;
+      }
+      parens++;
+    } else if (is(i, ")")) {
+      parens--;
+    }
+  }
+
+  return parens == 0 ? name : std::string::npos;
+}
+
+bool FunctionLexer::opensRecord(size_t begin, size_t brace) const {
+  if (brace > begin && isKeywordIn(brace - 1, kRecordKeywords)) return true;
+  return brace > begin + 1 && at(brace - 1).isIdentifier &&
+         isKeywordIn(brace - 2, kRecordKeywords);
+}
+
+void FunctionLexer::mapDeclarations(size_t begin, size_t end) {
+  int braces = 0;
+  int parens = 0;
+  // Brace levels of the enclosing record bodies, which declare fields.
+  std::vector<int> records;
+  size_t recordEnd = std::string::npos;
+  // Paren levels with a declaration since the last statement, for the
+  // declarations after a comma.
+  std::unordered_set<int> declParens;
+  int typedefBraces = -1;
+  bool sawAssignment = false;
+
+  auto isDeclaratorBase = [&](size_t i) {
+    if (isKeywordIn(i, kTypeKeywords)) return true;
+    if (is(i, ",")) return declParens.count(parens) > 0;
+    return i == recordEnd;
+  };
+
+  // Whether the type name at i is at the start of a declaration.
+  auto isTypeName = [&](size_t i) {
+    if (i == begin) return true;
+    size_t prev = i - 1;
+    if (is(prev, ";") || is(prev, "{") || is(prev, "}")) return true;
+    if (isKeywordIn(prev, kSpecifierKeywords) ||
+        isKeywordIn(prev, kTypeKeywords)) {
+      return true;
+    }
+    if (is(prev, ",") && declParens.count(parens)) return true;
+    bool inParameters = braces == 0 && parens == 1 && !sawAssignment;
+    return inParameters && (is(prev, "(") || is(prev, ","));
+  };
+
+  auto isDeclaration = [&](size_t i) {
+    if (i == begin) return false;
+    if (i + 1 < end && (is(i + 1, "(") || is(i + 1, "::"))) return false;
+
+    size_t prev = i - 1;
+    if (at(prev).isIdentifier || isDeclaratorBase(prev)) return true;
+
+    // Pointers and references, e.g. "char *const p".
+    size_t base = prev;
+    while (base > begin && kDeclaratorTokens.count(at(base).spelling)) base--;
+    if (base == prev || kDeclaratorTokens.count(at(base).spelling)) {
+      return false;
+    }
+    if (isDeclaratorBase(base)) return true;
+    return at(base).isIdentifier && isTypeName(base);
+  };
+
+  for (size_t i = begin; i < end; ++i) {
+    const RawToken &tok = at(i);
+
+    if (is(i, "{")) {
+      if (opensRecord(begin, i)) records.push_back(braces);
+      braces++;
+      declParens.clear();
+    } else if (is(i, "}")) {
+      braces--;
+      if (!records.empty() && records.back() == braces) {
+        records.pop_back();
+        recordEnd = i;
+      }
+      declParens.clear();
+    } else if (is(i, ";")) {
+      if (typedefBraces == braces) typedefBraces = -1;
+      if (braces == 0) sawAssignment = false;
+      declParens.clear();
+    } else if (is(i, "(")) {
+      parens++;
+    } else if (is(i, ")")) {
+      parens--;
+    } else if (is(i, "=") && braces == 0 && parens == 0) {
+      sawAssignment = true;
+    } else if (tok.isKeyword && tok.spelling == "typedef") {
+      typedefBraces = braces;
+    } else if (tok.isIdentifier && typedefBraces < 0 && records.empty() &&
+               isDeclaration(i)) {
+      declParens.insert(parens);
+      mapName(tok.spelling, false);
+    }
+  }
+}
+
+void FunctionLexer::captureFunction(size_t begin, size_t end, size_t name) {
+  mapName(at(name).spelling, true);
+  mapDeclarations(begin, end);
+
+  // Names are mapped as for all functions, but only the selected ones are
+  // captured.
+  if (filter_ && !filter_->accepts(at(name).spelling)) return;
+
+  FunctionInfoPtr functionInfo(new FunctionInfo());
+  functionInfo->name = at(name).spelling;
+  extractionInfo_->functionInfos.push_back(functionInfo);
+
+  // Directives inside of the function are part of its text, as with the AST.
+  for (size_t i = code_[begin]; i <= code_[end - 1]; ++i) {
+    TokenInfoPtr tokenInfo(new TokenInfo());
+    functionInfo->tokenInfos.push_back(tokenInfo);
+
+    auto it = mappedNames_.find(tokens_[i].spelling);
+    tokenInfo->name =
+        it != mappedNames_.end() ? it->second : tokens_[i].spelling;
+    tokenInfo->kind = tokens_[i].kind;
+    tokenInfo->nameId = internString(tokenInfo->name);
+    tokenInfo->kindId = internString(tokenInfo->kind);
+  }
+
+  // The AST based extraction lexes the function text up to its end.
+  TokenInfoPtr eofInfo(new TokenInfo());
+  eofInfo->kind = tok::getTokenName(tok::eof);
+  eofInfo->nameId = internString(eofInfo->name);
+  eofInfo->kindId = internString(eofInfo->kind);
+  functionInfo->tokenInfos.push_back(eofInfo);
+}
+
+std::string FunctionLexer::mapName(const std::string &name, bool isFunction) {
+  auto it = mappedNames_.find(name);
+  if (it != mappedNames_.end()) return it->second;
+
+  std::string mappedName;
+  if (isFunction) {
+    mappedName = "fn_" + std::to_string(num_functions_);
+    num_functions_++;
+  } else {
+    mappedName = "var_" + std::to_string(num_variables_);
+    num_variables_++;
+  }
+  mappedNames_[name] = mappedName;
+
+  return mappedName;
+}
+
+}  // namespace
+
+ExtractionInfoPtr LexFunctions(const std::string &src,
+                               ClangDriver::ProgrammingLanguage language,
+                               FunctionFilterPtr filter) {
+  LangOptions opts = langOptionsFor(language);
+
+  FileSystemOptions fileSystemOptions;
+  FileManager fileManager(fileSystemOptions);
+  DiagnosticsEngine diagnostics(new DiagnosticIDs(), new DiagnosticOptions(),
+                                new IgnoringDiagConsumer());
+  SourceManager sourceManager(diagnostics, fileManager);
+  FileID fid = sourceManager.createFileID(MemoryBuffer::getMemBuffer(src));
+
+  ::clang::Lexer lex(sourceManager.getLocForStartOfFile(fid), opts,
+                     src.data(), src.data(), src.data() + src.size());
+  IdentifierTable identifiers(opts);
+
+  std::vector<RawToken> tokens;
+  std::vector<size_t> code;
+  bool inDirective = false;
+
+  Token tok;
+  lex.LexFromRawLexer(tok);
+  while (tok.isNot(tok::eof)) {
+    // A directive runs from a hash at the start of a line to the end of the
+    // line, including escaped newlines.
+    if (tok.isAtStartOfLine()) inDirective = tok.is(tok::hash);
+    if (!inDirective) code.push_back(tokens.size());
+
+    RawToken rawToken;
+    rawToken.spelling = ::clang::Lexer::getSpelling(tok, sourceManager, opts);
+    rawToken.kind = tok.getName();
+    if (tok.is(tok::raw_identifier)) {
+      bool isKeyword = identifiers.get(rawToken.spelling).getTokenID() !=
+                       tok::identifier;
+      rawToken.isKeyword = isKeyword;
+      rawToken.isIdentifier = !isKeyword;
+    }
+    tokens.push_back(std::move(rawToken));
+
+    lex.LexFromRawLexer(tok);
+  }
+
+  return FunctionLexer(std::move(tokens), std::move(code), std::move(filter))
+      .extract();
+}
+
+}  // namespace seq
+}  // namespace clang
+}  // namespace compy
@@ -0,0 +1,29 @@
+#pragma once
+
+#include <string>
+
+#include "common/clang_driver.h"
+#include "common/function_filter.h"
+
+#include "clang_extractor.h"
+
+namespace compy {
+namespace clang {
+namespace seq {
+
+// Extracts the token sequences of the function definitions in src with the
+// raw lexer only, without preprocessing, parsing or reading any headers.
+//
+// The result has the same form as that of ExtractorFrontendAction, but the
+// function definitions and the declarations of variables to rename are found
+// syntactically. For common C code the token sequences are the same, but e.g.
+// functions defined by macros or inside C++ classes are not found, and names
+// declared in headers are not renamed. As there are no headers, the filter
+// only selects functions by name.
+ExtractionInfoPtr LexFunctions(const std::string &src,
+                               ClangDriver::ProgrammingLanguage language,
+                               FunctionFilterPtr filter = nullptr);
+
+}  // namespace seq
+}  // namespace clang
+}  // namespace compy
@@ -0,0 +1,332 @@
+#include "clang_serialization.h"
+
+#include "common/serialization.h"
+
+namespace compy {
+namespace clang {
+
+using serialization::ObjectTable;
+using serialization::Reader;
+using serialization::Writer;
+
+namespace graph {
+
+constexpr char kMagic[] = "CLGR";
+constexpr uint64_t kVersion = 1;
+
+namespace {
+void writeToken(Writer &w, const TokenInfo &token) {
+  w.writeVarint(token.index);
+  w.writeString(token.name);
+  w.writeString(token.kind);
+  w.writeVarint(token.location.getRawEncoding());
+}
+
+void writeTokens(Writer &w, const std::vector<TokenInfo> &tokens) {
+  w.writeVarint(tokens.size());
+  for (const auto &token : tokens) writeToken(w, token);
+}
+
+TokenInfo readToken(Reader &r) {
+  TokenInfo token;
+  token.index = r.readVarint();
+  token.name = r.readString();
+  token.kind = r.readString();
+  // The ids are only valid in the process that assigned them.
+  token.nameId = internString(token.name);
+  token.kindId = internString(token.kind);
+  // Only meaningful together with the SourceManager of the original
+  // compilation, but kept so that a round trip is lossless.
+  token.location = ::clang::SourceLocation::getFromRawEncoding(
+      static_cast<::clang::SourceLocation::UIntTy>(r.readVarint()));
+  return token;
+}
+
+std::vector<TokenInfo> readTokens(Reader &r) {
+  std::vector<TokenInfo> tokens(r.readCount());
+  for (auto &token : tokens) token = readToken(r);
+  return tokens;
+}
+
+struct Tables {
+  ObjectTable<FunctionInfo> functions;
+  ObjectTable<CFGBlockInfo> cfgBlocks;
+  ObjectTable<StmtInfo> stmts;
+  ObjectTable<DeclInfo> decls;
+  ObjectTable<RecordInfo> records;
+  ObjectTable<EnumDeclInfo> enumDecls;
+
+  void addOperand(const OperandInfoPtr &operand) {
+    if (!operand) return;
+    switch (operand->operandKind()) {
+      case OperandInfo::Kind::DECL:
+        decls.add(std::static_pointer_cast<DeclInfo>(operand));
+        break;
+      case OperandInfo::Kind::STMT:
+        stmts.add(std::static_pointer_cast<StmtInfo>(operand));
+        break;
+      case OperandInfo::Kind::RECORD:
+        records.add(std::static_pointer_cast<RecordInfo>(operand));
+        break;
+    }
+  }
+
+  // Adds everything reachable from the objects already in the tables.
+  void collect() {
+    bool changed = true;
+    while (changed) {
+      changed = false;
+      while (auto function = functions.next()) {
+        changed = true;
+        decls.add(function->args);
+        cfgBlocks.add(function->cfgBlocks);
+        stmts.add(function->entryStmt);
+      }
+      while (auto cfgBlock = cfgBlocks.next()) {
+        changed = true;
+        stmts.add(cfgBlock->statements);
+        cfgBlocks.add(cfgBlock->successors);
+      }
+      while (auto stmt = stmts.next()) {
+        changed = true;
+        for (const auto &operand : stmt->ast_relations) addOperand(operand);
+        for (const auto &operand : stmt->ref_relations) addOperand(operand);
+      }
+      while (auto decl = decls.next()) {
+        changed = true;
+        records.add(decl->recordType);
+        decls.add(decl->referencedTypedef);
+      }
+      while (auto record = records.next()) {
+        changed = true;
+        records.add(record->referencedRecords);
+        enumDecls.add(record->referencedEnums);
+        decls.add(record->referencedTypedefs);
+      }
+    }
+  }
+
+  void writeOperand(Writer &w, const OperandInfoPtr &operand) const {
+    if (!operand) {
+      w.writeVarint(0);
+      return;
+    }
+    w.writeVarint(static_cast<uint64_t>(operand->operandKind()) + 1);
+    switch (operand->operandKind()) {
+      case OperandInfo::Kind::DECL:
+        decls.writeRef(w, std::static_pointer_cast<DeclInfo>(operand));
+        break;
+      case OperandInfo::Kind::STMT:
+        stmts.writeRef(w, std::static_pointer_cast<StmtInfo>(operand));
+        break;
+      case OperandInfo::Kind::RECORD:
+        records.writeRef(w, std::static_pointer_cast<RecordInfo>(operand));
+        break;
+    }
+  }
+
+  void writeOperands(Writer &w,
+                     const std::vector<OperandInfoPtr> &operands) const {
+    w.writeVarint(operands.size());
+    for (const auto &operand : operands) writeOperand(w, operand);
+  }
+
+  OperandInfoPtr readOperand(Reader &r) const {
+    uint64_t kind = r.readVarint();
+    if (kind == 0) return nullptr;
+    switch (static_cast<OperandInfo::Kind>(kind - 1)) {
+      case OperandInfo::Kind::DECL:
+        return decls.readRef(r);
+      case OperandInfo::Kind::STMT:
+        return stmts.readRef(r);
+      case OperandInfo::Kind::RECORD:
+        return records.readRef(r);
+    }
+    Reader::fail("unknown operand kind");
+  }
+
+  std::vector<OperandInfoPtr> readOperands(Reader &r) const {
+    std::vector<OperandInfoPtr> operands(r.readCount());
+    for (auto &operand : operands) operand = readOperand(r);
+    return operands;
+  }
+};
+}  // namespace
+
+std::string Serialize(const ExtractionInfo &info) {
+  Tables t;
+  t.functions.add(info.functionInfos);
+  t.records.add(info.recordInfos);
+  t.collect();
+
+  Writer w;
+  w.writeMagic(kMagic, kVersion);
+
+  w.writeVarint(t.functions.objects().size());
+  w.writeVarint(t.cfgBlocks.objects().size());
+  w.writeVarint(t.stmts.objects().size());
+  w.writeVarint(t.decls.objects().size());
+  w.writeVarint(t.records.objects().size());
+  w.writeVarint(t.enumDecls.objects().size());
+
+  for (const auto &function : t.functions.objects()) {
+    w.writeString(function->name);
+    w.writeString(function->type);
+    writeTokens(w, function->tokens);
+    t.decls.writeRefs(w, function->args);
+    t.cfgBlocks.writeRefs(w, function->cfgBlocks);
+    t.stmts.writeRef(w, function->entryStmt);
+  }
+  for (const auto &cfgBlock : t.cfgBlocks.objects()) {
+    w.writeString(cfgBlock->name);
+    t.stmts.writeRefs(w, cfgBlock->statements);
+    t.cfgBlocks.writeRefs(w, cfgBlock->successors);
+  }
+  for (const auto &stmt : t.stmts.objects()) {
+    w.writeString(stmt->name);
+    writeTokens(w, stmt->tokens);
+    w.writeString(stmt->operation);
+    t.writeOperands(w, stmt->ast_relations);
+    t.writeOperands(w, stmt->ref_relations);
+  }
+  for (const auto &decl : t.decls.objects()) {
+    w.writeString(decl->name);
+    w.writeString(decl->type);
+    t.records.writeRef(w, decl->recordType);
+    w.writeString(decl->kind);
+    writeTokens(w, decl->tokens);
+    writeToken(w, decl->nameToken);
+    t.decls.writeRef(w, decl->referencedTypedef);
+  }
+  for (const auto &record : t.records.objects()) {
+    w.writeString(record->name);
+    w.writeBool(record->isTypedef);
+    writeTokens(w, record->tokens);
+    t.records.writeRefs(w, record->referencedRecords);
+    t.enumDecls.writeRefs(w, record->referencedEnums);
+    t.decls.writeRefs(w, record->referencedTypedefs);
+  }
+  for (const auto &enumDecl : t.enumDecls.objects()) {
+    w.writeString(enumDecl->name);
+    writeTokens(w, enumDecl->tokens);
+  }
+
+  t.functions.writeRefs(w, info.functionInfos);
+  t.records.writeRefs(w, info.recordInfos);
+
+  return w.data();
+}
+
+ExtractionInfoPtr Deserialize(const std::string &data) {
+  Reader r(data);
+  r.readMagic(kMagic, kVersion);
+
+  Tables t;
+  t.functions.allocate(r);
+  t.cfgBlocks.allocate(r);
+  t.stmts.allocate(r);
+  t.decls.allocate(r);
+  t.records.allocate(r);
+  t.enumDecls.allocate(r);
+
+  for (const auto &function : t.functions.objects()) {
+    function->name = r.readString();
+    function->type = r.readString();
+    function->tokens = readTokens(r);
+    function->args = t.decls.readRefs(r);
+    function->cfgBlocks = t.cfgBlocks.readRefs(r);
+    function->entryStmt = t.stmts.readRef(r);
+  }
+  for (const auto &cfgBlock : t.cfgBlocks.objects()) {
+    cfgBlock->name = r.readString();
+    cfgBlock->statements = t.stmts.readRefs(r);
+    cfgBlock->successors = t.cfgBlocks.readRefs(r);
+  }
+  for (const auto &stmt : t.stmts.objects()) {
+    stmt->name = r.readString();
+    stmt->tokens = readTokens(r);
+    stmt->operation = r.readString();
+    stmt->ast_relations = t.readOperands(r);
+    stmt->ref_relations = t.readOperands(r);
+  }
+  for (const auto &decl : t.decls.objects()) {
+    decl->name = r.readString();
+    decl->type = r.readString();
+    decl->recordType = t.records.readRef(r);
+    decl->kind = r.readString();
+    decl->tokens = readTokens(r);
+    decl->nameToken = readToken(r);
+    decl->referencedTypedef = t.decls.readRef(r);
+  }
+  for (const auto &record : t.records.objects()) {
+    record->name = r.readString();
+    record->isTypedef = r.readBool();
+    record->tokens = readTokens(r);
+    record->referencedRecords = t.records.readRefs(r);
+    record->referencedEnums = t.enumDecls.readRefs(r);
+    record->referencedTypedefs = t.decls.readRefs(r);
+  }
+  for (const auto &enumDecl : t.enumDecls.objects()) {
+    enumDecl->name = r.readString();
+    enumDecl->tokens = readTokens(r);
+  }
+
+  auto info = std::make_shared<ExtractionInfo>();
+  info->functionInfos = t.functions.readRefs(r);
+  info->recordInfos = t.records.readRefs(r);
+  r.expectEnd();
+
+  return info;
+}
+
+}  // namespace graph
+
+namespace seq {
+
+constexpr char kMagic[] = "CLSQ";
+constexpr uint64_t kVersion = 1;
+
+std::string Serialize(const ExtractionInfo &info) {
+  Writer w;
+  w.writeMagic(kMagic, kVersion);
+
+  w.writeVarint(info.functionInfos.size());
+  for (const auto &function : info.functionInfos) {
+    w.writeString(function->name);
+    w.writeVarint(function->tokenInfos.size());
+    for (const auto &token : function->tokenInfos) {
+      w.writeString(token->name);
+      w.writeString(token->kind);
+    }
+  }
+
+  return w.data();
+}
+
+ExtractionInfoPtr Deserialize(const std::string &data) {
+  Reader r(data);
+  r.readMagic(kMagic, kVersion);
+
+  auto info = std::make_shared<ExtractionInfo>();
+  info->functionInfos.resize(r.readCount());
+  for (auto &function : info->functionInfos) {
+    function = std::make_shared<FunctionInfo>();
+    function->name = r.readString();
+    function->tokenInfos.resize(r.readCount());
+    for (auto &token : function->tokenInfos) {
+      token = std::make_shared<TokenInfo>();
+      token->name = r.readString();
+      token->kind = r.readString();
+      token->nameId = internString(token->name);
+      token->kindId = internString(token->kind);
+    }
+  }
+  r.expectEnd();
+
+  return info;
+}
+
+}  // namespace seq
+
+}  // namespace clang
+}  // namespace compy
@@ -0,0 +1,71 @@
+#include "clang_serialization.h"
+
+#include <stdexcept>
+#include <string>
+
+#include "clang_extractor.h"
+#include "common/clang_driver.h"
+#include "common/common_test.h"
+#include "gtest/gtest.h"
+
+using namespace compy;
+using namespace compy::clang;
+
+using CE = ClangExtractor;
+using CD = ClangDriver;
+
+class ClangSerializationFixture : public testing::Test {
+ protected:
+  void SetUp() override {
+    std::vector<std::tuple<std::string, CD::IncludeDirType>> includeDirs = {};
+    std::vector<std::string> compilerFlags = {"-Werror"};
+
+    driver_.reset(new ClangDriver(CD::ProgrammingLanguage::C,
+                                  CD::OptimizationLevel::O0, includeDirs,
+                                  compilerFlags));
+    extractor_.reset(new CE(driver_));
+  }
+
+  std::shared_ptr<CD> driver_;
+  std::shared_ptr<CE> extractor_;
+};
+
+TEST_F(ClangSerializationFixture, GraphRoundTrip) {
+  graph::ExtractionInfoPtr info = extractor_->GraphFromString(kProgram6);
+
+  std::string data = graph::Serialize(*info);
+  graph::ExtractionInfoPtr restored = graph::Deserialize(data);
+
+  ASSERT_EQ(restored->functionInfos.size(), info->functionInfos.size());
+  ASSERT_EQ(restored->recordInfos.size(), info->recordInfos.size());
+  ASSERT_EQ(restored->functionInfos[0]->name, info->functionInfos[0]->name);
+  ASSERT_EQ(restored->functionInfos[0]->cfgBlocks.size(),
+            info->functionInfos[0]->cfgBlocks.size());
+  ASSERT_EQ(graph::Serialize(*restored), data);
+}
+
+TEST_F(ClangSerializationFixture, SeqRoundTrip) {
+  seq::ExtractionInfoPtr info = extractor_->SeqFromString(kProgram2);
+
+  std::string data = seq::Serialize(*info);
+  seq::ExtractionInfoPtr restored = seq::Deserialize(data);
+
+  ASSERT_EQ(restored->functionInfos.size(), 1UL);
+  ASSERT_EQ(restored->functionInfos[0]->tokenInfos.size(),
+            info->functionInfos[0]->tokenInfos.size());
+  for (size_t i = 0; i < info->functionInfos[0]->tokenInfos.size(); ++i) {
+    auto &token = restored->functionInfos[0]->tokenInfos[i];
+    auto &original = info->functionInfos[0]->tokenInfos[i];
+    ASSERT_EQ(token->nameId, original->nameId);
+    ASSERT_EQ(token->kindId, original->kindId);
+  }
+  ASSERT_EQ(seq::Serialize(*restored), data);
+}
+
+TEST_F(ClangSerializationFixture, RejectsCorruptData) {
+  std::string data = graph::Serialize(*extractor_->GraphFromString(kProgram6));
+
+  ASSERT_THROW(graph::Deserialize(data.substr(0, data.size() / 2)),
+               std::runtime_error);
+  ASSERT_THROW(seq::Deserialize(data), std::runtime_error);
+}
@@ -0,0 +1,88 @@
+#include "combined_extractor.h"
+
+#include <string>
+
+#include "clang_ast/clang_graph_frontendaction.h"
+#include "llvm_ir/llvm_graph_pass.h"
+
+namespace compy {
+
+CombinedExtractor::CombinedExtractor(ClangDriverPtr clangDriver)
+    : clangDriver_(clangDriver) {}
+
+void CombinedExtractor::setFunctionFilter(FunctionFilterPtr filter) {
+  functionFilter_ = filter;
+}
+
+FunctionFilterPtr CombinedExtractor::getFunctionFilter() const {
+  return functionFilter_;
+}
+
+GraphInfosPtr CombinedExtractor::GraphsFromString(std::string src) {
+  return extract(&src, nullptr);
+}
+
+GraphInfosPtr CombinedExtractor::GraphsFromFile(std::string path) {
+  return extract(nullptr, &path);
+}
+
+// Extracts from src, or from path if src is null.
+GraphInfosPtr CombinedExtractor::extract(const std::string *src,
+                                         const std::string *path) {
+  auto fa = std::make_unique<clang::graph::ExtractorFrontendAction>();
+  fa->functionFilter = functionFilter_;
+
+  std::vector<ASTConsumerProvider *> providers;
+  std::vector<::llvm::Pass *> passes;
+
+  providers.push_back(fa.get());
+
+  SystemHeaderFunctionsPtr systemHeaderFunctions;
+  if (functionFilter_ && functionFilter_->skipSystemHeaders) {
+    systemHeaderFunctions = std::make_shared<SystemHeaderFunctions>();
+    providers.push_back(systemHeaderFunctions.get());
+  }
+
+  llvm::graph::ExtractorPass *extractorPass = new llvm::graph::ExtractorPass(
+      {}, functionFilter_, systemHeaderFunctions);
+  passes.push_back(extractorPass);
+
+  if (src) {
+    clangDriver_->InvokeSingleParse(*src, providers, passes);
+  } else {
+    clangDriver_->InvokeFileSingleParse(*path, providers, passes);
+  }
+
+  auto infos = std::make_shared<GraphInfos>();
+  infos->clangInfo = fa->extractionInfo;
+  infos->llvmInfo = extractorPass->extractionInfo;
+  return infos;
+}
+
+BatchResult<GraphInfosPtr> CombinedExtractor::GraphsFromStrings(
+    std::vector<std::string> srcs, unsigned numWorkers,
+    std::vector<ClangDriverPtr> drivers) {
+  return RunBatch<GraphInfosPtr>(
+      clangDriver_, srcs, drivers, numWorkers,
+      [filter = functionFilter_](ClangDriverPtr driver,
+                                 const std::string &src) {
+        CombinedExtractor extractor(driver);
+        extractor.setFunctionFilter(filter);
+        return extractor.GraphsFromString(src);
+      });
+}
+
+BatchResult<GraphInfosPtr> CombinedExtractor::GraphsFromFiles(
+    std::vector<std::string> paths, unsigned numWorkers,
+    std::vector<ClangDriverPtr> drivers) {
+  return RunBatch<GraphInfosPtr>(
+      clangDriver_, paths, drivers, numWorkers,
+      [filter = functionFilter_](ClangDriverPtr driver,
+                                 const std::string &path) {
+        CombinedExtractor extractor(driver);
+        extractor.setFunctionFilter(filter);
+        return extractor.GraphsFromFile(path);
+      });
+}
+
+}  // namespace compy
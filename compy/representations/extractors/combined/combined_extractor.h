@@ -0,0 +1,57 @@
+#pragma once
+
+#include <memory>
+#include <string>
+#include <vector>
+
+#include "clang_ast/clang_extractor.h"
+#include "common/batch.h"
+#include "common/clang_driver.h"
+#include "common/function_filter.h"
+#include "llvm_ir/llvm_extractor.h"
+
+namespace compy {
+
+struct GraphInfos;
+using GraphInfosPtr = std::shared_ptr<GraphInfos>;
+
+// The clang AST graph and the LLVM IR graph of the same source.
+struct GraphInfos {
+  clang::graph::ExtractionInfoPtr clangInfo;
+  llvm::graph::ExtractionInfoPtr llvmInfo;
+};
+
+// Extracts both the clang AST graph and the LLVM IR graph of a source in a
+// single compiler invocation, so that the source is parsed only once instead
+// of once for every extractor.
+class CombinedExtractor {
+ public:
+  CombinedExtractor(ClangDriverPtr clangDriver);
+
+  // Restricts both graphs to the functions filter selects, see
+  // ClangExtractor::setFunctionFilter().
+  void setFunctionFilter(FunctionFilterPtr filter);
+  FunctionFilterPtr getFunctionFilter() const;
+
+  GraphInfosPtr GraphsFromString(std::string src);
+
+  // Read the source from a file, see ClangDriver::InvokeFile().
+  GraphInfosPtr GraphsFromFile(std::string path);
+
+  // Batch variants of the above, see RunBatch() for the semantics of
+  // numWorkers and drivers.
+  BatchResult<GraphInfosPtr> GraphsFromStrings(
+      std::vector<std::string> srcs, unsigned numWorkers,
+      std::vector<ClangDriverPtr> drivers = {});
+  BatchResult<GraphInfosPtr> GraphsFromFiles(
+      std::vector<std::string> paths, unsigned numWorkers,
+      std::vector<ClangDriverPtr> drivers = {});
+
+ private:
+  GraphInfosPtr extract(const std::string *src, const std::string *path);
+
+  ClangDriverPtr clangDriver_;
+  FunctionFilterPtr functionFilter_;
+};
+
+}  // namespace compy
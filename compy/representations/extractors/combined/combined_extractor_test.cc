@@ -0,0 +1,107 @@
+#include "combined_extractor.h"
+
+#include <cstdio>
+#include <fstream>
+#include <string>
+
+#include "common/common_test.h"
+#include "gtest/gtest.h"
+
+#define TO_STRING(prefix) #prefix
+#define COMPILER_BINARY(prefix) TO_STRING(prefix) "/bin/clang"
+
+using namespace compy;
+
+using CD = ClangDriver;
+
+class CombinedExtractorFixture : public testing::Test {
+ protected:
+  void SetUp() override {
+    std::vector<std::tuple<std::string, CD::IncludeDirType>> includeDirs = {};
+    std::vector<std::string> compilerFlags = {"-Werror"};
+
+    driver_.reset(new ClangDriver(CD::ProgrammingLanguage::C,
+                                  CD::OptimizationLevel::O0, includeDirs,
+                                  compilerFlags));
+    driver_->setCompilerBinary(COMPILER_BINARY(CLANG_INSTALL_PREFIX));
+    extractor_.reset(new CombinedExtractor(driver_));
+  }
+
+  std::shared_ptr<CD> driver_;
+  std::shared_ptr<CombinedExtractor> extractor_;
+};
+
+TEST_F(CombinedExtractorFixture, ExtractBothGraphsFromString) {
+  GraphInfosPtr infos = extractor_->GraphsFromString(kProgram2);
+
+  ASSERT_EQ(infos->clangInfo->functionInfos.size(), 1UL);
+  ASSERT_EQ(infos->llvmInfo->functionInfos.size(), 1UL);
+  ASSERT_EQ(infos->clangInfo->functionInfos[0]->name, "max");
+  ASSERT_EQ(infos->llvmInfo->functionInfos[0]->name, "max");
+}
+
+TEST_F(CombinedExtractorFixture, MatchesSeparateExtraction) {
+  GraphInfosPtr infos = extractor_->GraphsFromString(kProgram2);
+
+  auto clangInfo = clang::ClangExtractor(driver_).GraphFromString(kProgram2);
+  auto llvmInfo = llvm::LLVMIRExtractor(driver_).GraphFromString(kProgram2);
+
+  ASSERT_EQ(infos->clangInfo->functionInfos.size(),
+            clangInfo->functionInfos.size());
+  ASSERT_EQ(infos->llvmInfo->functionInfos.size(),
+            llvmInfo->functionInfos.size());
+  for (size_t i = 0; i < llvmInfo->functionInfos.size(); ++i) {
+    ASSERT_EQ(infos->llvmInfo->functionInfos[i]->basicBlocks.size(),
+              llvmInfo->functionInfos[i]->basicBlocks.size());
+  }
+  for (size_t i = 0; i < clangInfo->functionInfos.size(); ++i) {
+    ASSERT_EQ(infos->clangInfo->functionInfos[i]->tokens.size(),
+              clangInfo->functionInfos[i]->tokens.size());
+    ASSERT_EQ(infos->clangInfo->functionInfos[i]->cfgBlocks.size(),
+              clangInfo->functionInfos[i]->cfgBlocks.size());
+  }
+}
+
+TEST_F(CombinedExtractorFixture, ExtractBothGraphsFromFile) {
+  std::string path = "/tmp/combined_extractor_test.c";
+  {
+    std::ofstream file(path);
+    file << kProgram1 << std::endl;
+  }
+
+  GraphInfosPtr infos = extractor_->GraphsFromFile(path);
+  std::remove(path.c_str());
+
+  ASSERT_EQ(infos->clangInfo->functionInfos.size(), 1UL);
+  ASSERT_EQ(infos->llvmInfo->functionInfos.size(), 1UL);
+}
+
+TEST_F(CombinedExtractorFixture, ExtractBatchFromStrings) {
+  auto result = extractor_->GraphsFromStrings(
+      {kProgram1, "int broken( {", kProgram2}, 2);
+
+  auto &infos = std::get<0>(result);
+  auto &errors = std::get<1>(result);
+  ASSERT_EQ(infos.size(), 3UL);
+  ASSERT_TRUE(infos[0] && errors[0].empty());
+  ASSERT_FALSE(infos[1]);
+  ASSERT_FALSE(errors[1].empty());
+  ASSERT_EQ(infos[2]->llvmInfo->functionInfos[0]->name, "max");
+}
+
+TEST_F(CombinedExtractorFixture, FailsOnInvalidCode) {
+  EXPECT_THROW(extractor_->GraphsFromString("int foo( {"), std::runtime_error);
+}
+
+TEST_F(CombinedExtractorFixture, ExtractWithFunctionFilter) {
+  auto filter = std::make_shared<FunctionFilter>();
+  filter->names = {"foo"};
+  extractor_->setFunctionFilter(filter);
+
+  GraphInfosPtr infos = extractor_->GraphsFromString(kProgram5);
+
+  ASSERT_EQ(infos->clangInfo->functionInfos.size(), 1UL);
+  ASSERT_EQ(infos->llvmInfo->functionInfos.size(), 1UL);
+  ASSERT_EQ(infos->clangInfo->functionInfos[0]->name, "foo");
+  ASSERT_EQ(infos->llvmInfo->functionInfos[0]->name, "foo");
+}
@@ -0,0 +1,89 @@
+#pragma once
+
+#include <algorithm>
+#include <atomic>
+#include <exception>
+#include <functional>
+#include <stdexcept>
+#include <string>
+#include <thread>
+#include <tuple>
+#include <vector>
+
+#include "common/clang_driver.h"
+
+namespace compy {
+
+template <typename ResultPtr>
+using BatchResult = std::tuple<std::vector<ResultPtr>, std::vector<std::string>,
+                               std::vector<bool>>;
+
+// Runs fn on every source of a batch, spread over numWorkers native threads
+// (0 selects the number of hardware threads). Each worker owns a private copy
+// of the driver, as a driver must not be used concurrently. If drivers is not
+// empty, it holds one driver per source, which is copied for that source only.
+//
+// Results and errors are returned in input order. A source that fails leaves
+// a null result and a non-empty error message, without affecting the rest of
+// the batch. The third vector tells which of the sources failed because they
+// exceeded a resource limit of the driver (ResourceLimitExceeded) rather than
+// because they did not compile.
+template <typename ResultPtr>
+BatchResult<ResultPtr> RunBatch(
+    const ClangDriverPtr &driver, const std::vector<std::string> &srcs,
+    const std::vector<ClangDriverPtr> &drivers, unsigned numWorkers,
+    std::function<ResultPtr(ClangDriverPtr, const std::string &)> fn) {
+  if (!drivers.empty() && drivers.size() != srcs.size()) {
+    throw std::invalid_argument(
+        "Number of drivers does not match number of sources");
+  }
+
+  std::vector<ResultPtr> results(srcs.size());
+  std::vector<std::string> errors(srcs.size());
+  // Not a vector<bool>, whose elements cannot be written concurrently
+  std::vector<char> limitsExceeded(srcs.size(), false);
+
+  if (numWorkers == 0) {
+    numWorkers = std::max(1u, std::thread::hardware_concurrency());
+  }
+  numWorkers = std::min<size_t>(numWorkers, srcs.size());
+
+  std::atomic<size_t> next(0);
+  auto work = [&]() {
+    ClangDriverPtr workerDriver = drivers.empty() ? driver->clone() : nullptr;
+
+    for (size_t i = next++; i < srcs.size(); i = next++) {
+      ClangDriverPtr itemDriver =
+          drivers.empty() ? workerDriver : drivers[i]->clone();
+
+      try {
+        results[i] = fn(itemDriver, srcs[i]);
+      } catch (const ResourceLimitExceeded &e) {
+        errors[i] = e.what();
+        limitsExceeded[i] = true;
+      } catch (const std::exception &e) {
+        errors[i] = e.what();
+      } catch (...) {
+      }
+      if (!results[i] && errors[i].empty()) {
+        errors[i] = "Unknown error during extraction";
+      }
+    }
+  };
+
+  // The calling thread takes part in the work as well.
+  std::vector<std::thread> threads;
+  for (unsigned i = 1; i < numWorkers; ++i) {
+    threads.emplace_back(work);
+  }
+  if (numWorkers > 0) work();
+  for (auto &thread : threads) {
+    thread.join();
+  }
+
+  return std::make_tuple(
+      std::move(results), std::move(errors),
+      std::vector<bool>(limitsExceeded.begin(), limitsExceeded.end()));
+}
+
+}  // namespace compy
@@ -1,16 +1,22 @@
 #include "clang_driver.h"
 
+#include <algorithm>
+#include <chrono>
 #include <iostream>
+#include <mutex>
 #include <string>
 #include <utility>
 #include <vector>
 
+#include "clang/Basic/Version.h"
 #include "clang/CodeGen/CodeGenAction.h"
 #include "clang/CodeGen/ObjectFilePCHContainerOperations.h"
 #include "clang/Config/config.h"
 #include "clang/Frontend/CompilerInstance.h"
 #include "clang/Frontend/CompilerInvocation.h"
+#include "clang/Frontend/FrontendActions.h"
 #include "clang/Frontend/FrontendDiagnostic.h"
+#include "clang/Frontend/MultiplexConsumer.h"
 #include "clang/Frontend/TextDiagnosticBuffer.h"
 #include "clang/FrontendTool/Utils.h"
 #include "clang/Lex/PreprocessorOptions.h"
@@ -19,25 +25,197 @@
 #include "llvm/IRReader/IRReader.h"
 #include "llvm/InitializePasses.h"
 #include "llvm/LinkAllPasses.h"
+#include "llvm/MC/TargetRegistry.h"
+#include "llvm/Passes/PassBuilder.h"
 #include "llvm/Support/Compiler.h"
 #include "llvm/Support/ErrorHandling.h"
+#include "llvm/Support/FileSystem.h"
+#include "llvm/Support/FormatVariadic.h"
+#include "llvm/Support/Path.h"
+#include "llvm/Support/Process.h"
 #include "llvm/Support/Signals.h"
 #include "llvm/Support/SourceMgr.h"
 #include "llvm/Support/TargetSelect.h"
 #include "llvm/Support/Timer.h"
 #include "llvm/Support/raw_ostream.h"
+#include "llvm/Support/xxhash.h"
+#include "llvm/Target/TargetMachine.h"
+#include "llvm/Target/TargetOptions.h"
 #include "llvm/Transforms/IPO.h"
+#include "llvm/Transforms/Utils/Cloning.h"
 
 using namespace ::clang;
 using namespace ::llvm;
 
 namespace compy {
 
+// Diagnostics engine of the compilation running on the current thread. The
+// fatal error handler is process-wide, so it cannot carry the engine itself
+// when several drivers run in parallel.
+static thread_local DiagnosticsEngine *CurrentDiags = nullptr;
+
+// Checks the resource limits of a driver during one invocation. Exceptions
+// cannot be thrown through clang, so the AST consumers it provides stop the
+// parse instead, and the driver throws once the frontend action returned.
+class ResourceGuard : public ASTConsumerProvider {
+ public:
+  ResourceGuard(double timeout, uint64_t maxASTSize, uint64_t maxIRSize,
+                uint64_t memoryLimit)
+      : timeout_(timeout),
+        maxASTSize_(maxASTSize),
+        maxIRSize_(maxIRSize),
+        memoryLimit_(memoryLimit),
+        start_(std::chrono::steady_clock::now()),
+        startMemory_(memoryLimit ? ::llvm::sys::Process::GetMallocUsage()
+                                 : 0) {}
+
+  bool enabled() const {
+    return timeout_ > 0 || maxASTSize_ || maxIRSize_ || memoryLimit_;
+  }
+
+  // Returns whether a limit is exceeded, and remembers the first one that is.
+  bool exceeded(const ASTContext *context, const ::llvm::Module *module) {
+    if (!error_.empty()) return true;
+
+    std::chrono::duration<double> elapsed =
+        std::chrono::steady_clock::now() - start_;
+    if (timeout_ > 0 && elapsed.count() > timeout_) {
+      error_ = "timeout of " + formatv("{0}", timeout_).str() + " s";
+    } else if (maxASTSize_ && context &&
+               context->getASTAllocatedMemory() > maxASTSize_) {
+      error_ = "AST size of " + std::to_string(maxASTSize_) + " bytes";
+    } else if (maxIRSize_ && module &&
+               module->getInstructionCount() > maxIRSize_) {
+      error_ = "IR size of " + std::to_string(maxIRSize_) + " instructions";
+    } else if (memoryLimit_ && ::llvm::sys::Process::GetMallocUsage() >
+                                   startMemory_ + memoryLimit_) {
+      error_ = "memory limit of " + std::to_string(memoryLimit_) + " bytes";
+    }
+    return !error_.empty();
+  }
+
+  void check(const ::llvm::Module *module = nullptr) {
+    if (exceeded(nullptr, module)) {
+      throw ResourceLimitExceeded("Resource limit exceeded: " + error_);
+    }
+  }
+
+  std::unique_ptr<ASTConsumer> CreateASTConsumer(CompilerInstance &CI,
+                                                 StringRef file) override;
+
+ private:
+  double timeout_;
+  uint64_t maxASTSize_;
+  uint64_t maxIRSize_;
+  uint64_t memoryLimit_;
+  std::chrono::steady_clock::time_point start_;
+  size_t startMemory_;
+  std::string error_;
+};
+
+namespace {
+// Stops the parse after the first top-level declaration with which a limit is
+// exceeded. A limit exceeded by the end of the translation unit is reported as
+// an error, so that code generation drops the module instead of optimizing it.
+class ResourceGuardConsumer : public ASTConsumer {
+ public:
+  explicit ResourceGuardConsumer(ResourceGuard &guard) : guard_(guard) {}
+
+  void Initialize(ASTContext &Context) override { context_ = &Context; }
+
+  bool HandleTopLevelDecl(DeclGroupRef) override {
+    return !guard_.exceeded(context_, nullptr);
+  }
+
+  void HandleTranslationUnit(ASTContext &Context) override {
+    if (guard_.exceeded(&Context, nullptr)) {
+      DiagnosticsEngine &diags = Context.getDiagnostics();
+      diags.Report(diags.getCustomDiagID(DiagnosticsEngine::Error,
+                                         "resource limit exceeded"));
+    }
+  }
+
+ private:
+  ResourceGuard &guard_;
+  ASTContext *context_ = nullptr;
+};
+
+// Runs a frontend action owned by the caller, with the consumer of guard in
+// front of its own AST consumer.
+class GuardedFrontendAction : public WrapperFrontendAction {
+ public:
+  GuardedFrontendAction(FrontendAction *action, ResourceGuard &guard)
+      : WrapperFrontendAction(std::unique_ptr<FrontendAction>(action)),
+        guard_(guard) {}
+  ~GuardedFrontendAction() override { WrappedAction.release(); }
+
+ protected:
+  std::unique_ptr<ASTConsumer> CreateASTConsumer(CompilerInstance &CI,
+                                                 StringRef file) override {
+    auto consumer = WrapperFrontendAction::CreateASTConsumer(CI, file);
+    if (!consumer) return nullptr;
+
+    std::vector<std::unique_ptr<ASTConsumer>> consumers;
+    consumers.push_back(guard_.CreateASTConsumer(CI, file));
+    consumers.push_back(std::move(consumer));
+    return std::make_unique<MultiplexConsumer>(std::move(consumers));
+  }
+
+ private:
+  ResourceGuard &guard_;
+};
+}  // namespace
+
+std::unique_ptr<ASTConsumer> ResourceGuard::CreateASTConsumer(
+    CompilerInstance &CI, StringRef file) {
+  return std::make_unique<ResourceGuardConsumer>(*this);
+}
+
+namespace {
+struct CurrentDiagsScope {
+  CurrentDiagsScope(DiagnosticsEngine *Diags) { CurrentDiags = Diags; }
+  ~CurrentDiagsScope() { CurrentDiags = nullptr; }
+};
+
+// Lowers to LLVM IR, while also feeding the AST to the consumers of the
+// providers.
+class MultiplexCodeGenAction : public EmitLLVMOnlyAction {
+ public:
+  explicit MultiplexCodeGenAction(
+      const std::vector<ASTConsumerProvider *> &providers)
+      : providers_(providers) {}
+
+ protected:
+  std::unique_ptr<ASTConsumer> CreateASTConsumer(CompilerInstance &CI,
+                                                 StringRef file) override {
+    std::vector<std::unique_ptr<ASTConsumer>> consumers;
+    for (auto provider : providers_) {
+      auto consumer = provider->CreateASTConsumer(CI, file);
+      if (!consumer) return nullptr;
+      consumers.push_back(std::move(consumer));
+    }
+
+    // Code generation comes last, so that the other consumers see every
+    // declaration before it is lowered.
+    auto codeGen = EmitLLVMOnlyAction::CreateASTConsumer(CI, file);
+    if (!codeGen) return nullptr;
+    consumers.push_back(std::move(codeGen));
+
+    return std::make_unique<MultiplexConsumer>(std::move(consumers));
+  }
+
+ private:
+  const std::vector<ASTConsumerProvider *> &providers_;
+};
+}  // namespace
+
 static void LLVMErrorHandler(void *UserData, const char *Message,
                              bool GenCrashDiag) {
-  DiagnosticsEngine &Diags = *static_cast<DiagnosticsEngine *>(UserData);
-
-  Diags.Report(diag::err_fe_error_backend) << Message;
+  if (CurrentDiags) {
+    CurrentDiags->Report(diag::err_fe_error_backend) << Message;
+  } else {
+    errs() << "LLVM ERROR: " << Message << "\n";
+  }
 
   // Run the interrupt handlers to make sure any special cleanups get done, in
   // particular that we remove files registered with RemoveFileOnSignal.
@@ -49,6 +227,28 @@ static void LLVMErrorHandler(void *UserData, const char *Message,
   exit(GenCrashDiag ? 70 : 1);
 }
 
+// Target registration and pass registry initialization are process-wide and
+// only need to happen once, not on every invocation.
+static void InitializeLLVMOnce() {
+  static std::once_flag initialized;
+  std::call_once(initialized, []() {
+    ::llvm::InitializeAllTargets();
+    ::llvm::InitializeAllTargetMCs();
+    ::llvm::InitializeAllAsmPrinters();
+    ::llvm::InitializeAllAsmParsers();
+
+    // Register other llvm passes.
+    PassRegistry &reg = *PassRegistry::getPassRegistry();
+    initializeCallGraphWrapperPassPass(reg);
+    initializeMemorySSAWrapperPassPass(reg);
+    // initializeStripSymbolsPass(reg);
+
+    // Set an error handler, so that any LLVM backend diagnostics go through
+    // our error handler.
+    ::llvm::install_fatal_error_handler(LLVMErrorHandler, nullptr);
+  });
+}
+
 ClangDriver::ClangDriver(
     ProgrammingLanguage programmingLanguage,
     OptimizationLevel optimizationLevel,
@@ -116,26 +316,284 @@ void ClangDriver::setCompilerBinary(std::string path) {
 
 std::string ClangDriver::getCompilerBinary() const { return compilerBinary_; }
 
+void ClangDriver::setPrefixHeader(std::string path) {
+  prefixHeader_ = std::move(path);
+}
+
+std::string ClangDriver::getPrefixHeader() const { return prefixHeader_; }
+
+void ClangDriver::setPCHDirectory(std::string path) {
+  pchDirectory_ = std::move(path);
+}
+
+std::string ClangDriver::getPCHDirectory() const {
+  if (!pchDirectory_.empty()) return pchDirectory_;
+
+  SmallString<128> path;
+  ::llvm::sys::path::system_temp_directory(true, path);
+  ::llvm::sys::path::append(path, "compy-pch");
+  return std::string(path);
+}
+
+ClangDriver::ProgrammingLanguage ClangDriver::getProgrammingLanguage() const {
+  return programmingLanguage_;
+}
+
+ClangDriver::OptimizationLevel ClangDriver::getOptimizationLevel() const {
+  return optimizationLevel_;
+}
+
+std::vector<std::tuple<std::string, ClangDriver::IncludeDirType>>
+ClangDriver::getIncludeDirs() const {
+  return includeDirs_;
+}
+
+std::vector<std::string> ClangDriver::getCompilerFlags() const {
+  return compilerFlags_;
+}
+
+void ClangDriver::setTimeout(double seconds) { timeout_ = seconds; }
+
+double ClangDriver::getTimeout() const { return timeout_; }
+
+void ClangDriver::setMaxASTSize(uint64_t bytes) { maxASTSize_ = bytes; }
+
+uint64_t ClangDriver::getMaxASTSize() const { return maxASTSize_; }
+
+void ClangDriver::setMaxIRSize(uint64_t instructions) {
+  maxIRSize_ = instructions;
+}
+
+uint64_t ClangDriver::getMaxIRSize() const { return maxIRSize_; }
+
+void ClangDriver::setMemoryLimit(uint64_t bytes) { memoryLimit_ = bytes; }
+
+uint64_t ClangDriver::getMemoryLimit() const { return memoryLimit_; }
+
+void ClangDriver::setVirtualFiles(std::map<std::string, std::string> files) {
+  if (files.empty()) {
+    setVirtualFileSystem(nullptr);
+    return;
+  }
+
+  IntrusiveRefCntPtr<::llvm::vfs::InMemoryFileSystem> inMemory(
+      new ::llvm::vfs::InMemoryFileSystem());
+  std::vector<std::string> paths;
+  for (const auto &file : files) {
+    SmallString<128> path(file.first);
+    if (::llvm::sys::fs::make_absolute(path)) {
+      throw std::runtime_error("Invalid virtual file path " + file.first);
+    }
+    ::llvm::sys::path::remove_dots(path, true);
+    inMemory->addFile(path, 0,
+                      MemoryBuffer::getMemBufferCopy(file.second, path));
+    paths.push_back(std::string(path));
+  }
+
+  setVirtualFileSystem(inMemory);
+  virtualFiles_ = std::move(paths);
+}
+
+void ClangDriver::setVirtualFileSystem(
+    IntrusiveRefCntPtr<::llvm::vfs::FileSystem> fileSystem) {
+  virtualFiles_.clear();
+  if (fileSystem) {
+    IntrusiveRefCntPtr<::llvm::vfs::OverlayFileSystem> overlay(
+        new ::llvm::vfs::OverlayFileSystem(::llvm::vfs::getRealFileSystem()));
+    overlay->pushOverlay(fileSystem);
+    overlayFileSystem_ = overlay;
+  } else {
+    overlayFileSystem_ = nullptr;
+  }
+  // Files looked up in the session might be hidden by the new overlay.
+  resetSession();
+}
+
+std::vector<std::string> ClangDriver::getVirtualFiles() const {
+  return virtualFiles_;
+}
+
+IntrusiveRefCntPtr<::llvm::vfs::FileSystem> ClangDriver::fileSystem() const {
+  if (overlayFileSystem_) return overlayFileSystem_;
+  return ::llvm::vfs::getRealFileSystem();
+}
+
+std::string ClangDriver::readFile(const std::string &path) const {
+  auto buffer = fileSystem()->getBufferForFile(path);
+  if (!buffer) {
+    throw std::runtime_error("File not found: " + path);
+  }
+  return (*buffer)->getBuffer().str();
+}
+
+std::shared_ptr<ClangDriver> ClangDriver::clone() const {
+  auto driver = std::make_shared<ClangDriver>(*this);
+  driver->pms_.clear();
+  driver->guard_.reset();
+  driver->sessionFileManager_.reset();
+  return driver;
+}
+
+void ClangDriver::setSessionEnabled(bool enabled) {
+  sessionEnabled_ = enabled;
+  if (!enabled) resetSession();
+}
+
+bool ClangDriver::isSessionEnabled() const { return sessionEnabled_; }
+
+void ClangDriver::resetSession() { sessionFileManager_.reset(); }
+
 void ClangDriver::Invoke(std::string src,
                          std::vector<::clang::FrontendAction *> frontendActions,
                          std::vector<::llvm::Pass *> passes) {
+  InitializeLLVMOnce();
 
   switch (programmingLanguage_) {
     case ProgrammingLanguage::C:
     case ProgrammingLanguage::CPLUSPLUS:
-    case ProgrammingLanguage::OPENCL:
-      InvokeClangAndLLVM(&src, frontendActions, passes);
+    case ProgrammingLanguage::OPENCL: {
+      std::vector<ASTConsumerProvider *> providers;
+      InvokeClangAndLLVM(&src, fileName_, frontendActions, providers,
+                         optimizationLevel_, false, passesHandler(passes));
       break;
+    }
     case ProgrammingLanguage::LLVM:
-      InvokeLLVM(src, passes);
+      InvokeLLVM(src, passesHandler(passes));
       break;
   }
 }
 
-// note that src is optionally null.
-void ClangDriver::InvokeClangAndLLVM(std::string *src,
+void ClangDriver::InvokeSingleParse(
+    std::string src, std::vector<ASTConsumerProvider *> providers,
+    std::vector<::llvm::Pass *> passes) {
+  InitializeLLVMOnce();
+
+  if (programmingLanguage_ == ProgrammingLanguage::LLVM) {
+    if (!providers.empty()) {
+      throw std::runtime_error("Cannot run clang frontend actions on LLVM IR");
+    }
+    InvokeLLVM(src, passesHandler(passes));
+    return;
+  }
+
+  std::vector<::clang::FrontendAction *> frontendActions;
+  InvokeClangAndLLVM(&src, fileName_, frontendActions, providers,
+                     optimizationLevel_, false, passesHandler(passes));
+}
+
+// The highest of levels, O0 for none.
+static ClangDriver::OptimizationLevel HighestOptimizationLevel(
+    const std::vector<ClangDriver::OptimizationLevel> &levels) {
+  auto highest = ClangDriver::OptimizationLevel::O0;
+  for (auto level : levels) {
+    if (level == ClangDriver::OptimizationLevel::Unspecified) {
+      throw std::invalid_argument("Optimization level must be specified");
+    }
+    highest = std::max(highest, level);
+  }
+  return highest;
+}
+
+void ClangDriver::InvokeOptimizationLevels(
+    std::string src, std::vector<OptimizationLevel> levels,
+    std::vector<std::vector<::llvm::Pass *>> passesPerLevel,
+    std::vector<ASTConsumerProvider *> providers) {
+  InitializeLLVMOnce();
+
+  auto handleModule = optimizationLevelsHandler(levels, passesPerLevel);
+  if (programmingLanguage_ == ProgrammingLanguage::LLVM) {
+    if (!providers.empty()) {
+      throw std::runtime_error("Cannot run clang frontend actions on LLVM IR");
+    }
+    InvokeLLVM(src, handleModule);
+    return;
+  }
+
+  std::vector<::clang::FrontendAction *> frontendActions;
+  InvokeClangAndLLVM(&src, fileName_, frontendActions, providers,
+                     HighestOptimizationLevel(levels), true, handleModule);
+}
+
+bool ClangDriver::isLLVMIRFile(const std::string &path) {
+  StringRef extension = ::llvm::sys::path::extension(path);
+  return extension == ".bc" || extension == ".ll";
+}
+
+void ClangDriver::InvokeFile(
+    std::string path, std::vector<::clang::FrontendAction *> frontendActions,
+    std::vector<::llvm::Pass *> passes) {
+  InitializeLLVMOnce();
+
+  if (!fileSystem()->exists(path)) {
+    throw std::runtime_error("File not found: " + path);
+  }
+
+  if (programmingLanguage_ == ProgrammingLanguage::LLVM || isLLVMIRFile(path)) {
+    if (!frontendActions.empty()) {
+      throw std::runtime_error("Cannot run clang frontend actions on LLVM IR");
+    }
+    InvokeLLVMFile(path, passesHandler(passes));
+  } else {
+    std::vector<ASTConsumerProvider *> providers;
+    InvokeClangAndLLVM(nullptr, path, frontendActions, providers,
+                       optimizationLevel_, false, passesHandler(passes));
+  }
+}
+
+void ClangDriver::InvokeFileSingleParse(
+    std::string path, std::vector<ASTConsumerProvider *> providers,
+    std::vector<::llvm::Pass *> passes) {
+  InitializeLLVMOnce();
+
+  if (!fileSystem()->exists(path)) {
+    throw std::runtime_error("File not found: " + path);
+  }
+
+  if (programmingLanguage_ == ProgrammingLanguage::LLVM || isLLVMIRFile(path)) {
+    if (!providers.empty()) {
+      throw std::runtime_error("Cannot run clang frontend actions on LLVM IR");
+    }
+    InvokeLLVMFile(path, passesHandler(passes));
+  } else {
+    std::vector<::clang::FrontendAction *> frontendActions;
+    InvokeClangAndLLVM(nullptr, path, frontendActions, providers,
+                       optimizationLevel_, false, passesHandler(passes));
+  }
+}
+
+void ClangDriver::InvokeFileOptimizationLevels(
+    std::string path, std::vector<OptimizationLevel> levels,
+    std::vector<std::vector<::llvm::Pass *>> passesPerLevel,
+    std::vector<ASTConsumerProvider *> providers) {
+  InitializeLLVMOnce();
+
+  if (!fileSystem()->exists(path)) {
+    throw std::runtime_error("File not found: " + path);
+  }
+
+  auto handleModule = optimizationLevelsHandler(levels, passesPerLevel);
+  if (programmingLanguage_ == ProgrammingLanguage::LLVM || isLLVMIRFile(path)) {
+    if (!providers.empty()) {
+      throw std::runtime_error("Cannot run clang frontend actions on LLVM IR");
+    }
+    InvokeLLVMFile(path, handleModule);
+  } else {
+    std::vector<::clang::FrontendAction *> frontendActions;
+    InvokeClangAndLLVM(nullptr, path, frontendActions, providers,
+                       HighestOptimizationLevel(levels), true, handleModule);
+  }
+}
+
+// note that src is optionally null, in which case clang reads fileName from
+// disk.
+void ClangDriver::InvokeClangAndLLVM(const std::string *src,
+                                     const std::string &fileName,
                                      std::vector<::clang::FrontendAction *>& frontendActions,
-                                     std::vector<::llvm::Pass *>& passes) {
+                                     std::vector<ASTConsumerProvider *>& providers,
+                                     OptimizationLevel optimizationLevel,
+                                     bool disableLLVMPasses,
+                                     const ModuleHandler &handleModule) {
+  startInvocation();
 
   const char *code = nullptr;
   if (src != nullptr) {
@@ -144,15 +602,33 @@ void ClangDriver::InvokeClangAndLLVM(std::string *src,
 
   std::vector<const char *> args;
   args.push_back(compilerBinary_.c_str());
+
+  // When reading from disk, the language is set explicitly instead of being
+  // derived from the file extension, as it is for the remapped program file.
+  if (code == nullptr) {
+    args.push_back("-x");
+    switch (programmingLanguage_) {
+      case ProgrammingLanguage::CPLUSPLUS:
+        args.push_back("c++");
+        break;
+      case ProgrammingLanguage::OPENCL:
+        args.push_back("cl");
+        break;
+      default:
+        args.push_back("c");
+        break;
+    }
+  }
+
   const char *filename;
-  if (fileName_.compare("")) {
-      filename = fileName_.c_str();
+  if (fileName.compare("")) {
+      filename = fileName.c_str();
       args.push_back(filename);
   }
 
   // Optimization level.
   const char *optimizationLevelChr;
-  switch (optimizationLevel_) {
+  switch (optimizationLevel) {
     case OptimizationLevel::O0:
       optimizationLevelChr = "-O0";
       break;
@@ -185,12 +661,6 @@ void ClangDriver::InvokeClangAndLLVM(std::string *src,
   PCHOps->registerWriter(std::make_unique<ObjectFilePCHContainerWriter>());
   PCHOps->registerReader(std::make_unique<ObjectFilePCHContainerReader>());
 
-  // Initialize targets first, so that --version shows registered targets.
-  ::llvm::InitializeAllTargets();
-  ::llvm::InitializeAllTargetMCs();
-  ::llvm::InitializeAllAsmPrinters();
-  ::llvm::InitializeAllAsmParsers();
-
   // Buffer diagnostics from argument parsing so that we can output them using a
   // well formed diagnostic object.
   IntrusiveRefCntPtr<DiagnosticOptions> DiagOpts = new DiagnosticOptions();
@@ -220,6 +690,14 @@ void ClangDriver::InvokeClangAndLLVM(std::string *src,
   // We should not leak memory
   invocation->getFrontendOpts().DisableFree = 0;
 
+  // Lower without running the optimization pipeline, which is left to the
+  // caller. Functions are not marked optnone at O0, so that they can still be
+  // optimized.
+  if (disableLLVMPasses) {
+    invocation->getCodeGenOpts().DisableLLVMPasses = true;
+    invocation->getCodeGenOpts().DisableO0ImplyOptNone = true;
+  }
+
   Clang->setInvocation(invocation);
 
   // Map code filename to a memoryBuffer if we are using
@@ -249,19 +727,44 @@ void ClangDriver::InvokeClangAndLLVM(std::string *src,
                                    false, false));
   }
 
+  // Include the precompiled prefix header.
+  if (!prefixHeader_.empty()) {
+    Clang->getPreprocessorOpts().ImplicitPCHInclude =
+        preparePCH(Clang->getInvocation(), optimizationLevel);
+  }
+
   // Create the actual diagnostics engine.
   Clang->createDiagnostics();
 
-  // Set an error handler, so that any LLVM backend diagnostics go through our
-  // error handler.
-  ::llvm::install_fatal_error_handler(
-      LLVMErrorHandler, static_cast<void *>(&Clang->getDiagnostics()));
+  // Reuse the file manager of the current session, so that files and
+  // directories already looked up by previous invocations are not stat'ed
+  // again.
+  if (sessionEnabled_) {
+    if (!sessionFileManager_) {
+      sessionFileManager_ =
+          new FileManager(Clang->getFileSystemOpts(), fileSystem());
+    }
+    Clang->setFileManager(sessionFileManager_.get());
+  } else if (overlayFileSystem_) {
+    Clang->createFileManager(overlayFileSystem_);
+  }
+
+  // Route LLVM backend errors of this thread to our diagnostics engine.
+  CurrentDiagsScope diagsScope(&Clang->getDiagnostics());
 
   DiagsBuffer->FlushDiagnostics(Clang->getDiagnostics());
 
   // Run clang frontend actions.
   for (auto frontendAction : frontendActions) {
-    if (!Clang->ExecuteAction(*frontendAction)) {
+    bool success;
+    if (guard_->enabled()) {
+      GuardedFrontendAction guardedAction(frontendAction, *guard_);
+      success = Clang->ExecuteAction(guardedAction);
+    } else {
+      success = Clang->ExecuteAction(*frontendAction);
+    }
+    guard_->check();
+    if (!success) {
       for (TextDiagnosticBuffer::const_iterator I = DiagsBuffer->err_begin(),
                                                 E = DiagsBuffer->err_end();
            I != E; ++I)
@@ -270,11 +773,25 @@ void ClangDriver::InvokeClangAndLLVM(std::string *src,
     }
   }
 
-  // Convert to LLVM module if needed (if there are any LLVM passes).
-  if (!passes.empty()) {
+  // Convert to LLVM module if needed (if there is anything to do with it, or
+  // AST consumers to run along with the lowering).
+  if (handleModule || !providers.empty()) {
+    // The resource guard sees every declaration first.
+    std::vector<ASTConsumerProvider *> codeGenProviders(providers);
+    if (guard_->enabled()) {
+      codeGenProviders.insert(codeGenProviders.begin(), guard_.get());
+    }
+
     // Lower Clang AST to LLVM bitcode module.
-    std::unique_ptr<CodeGenAction> Act(new EmitLLVMOnlyAction());
-    if (!Clang->ExecuteAction(*Act)) {
+    std::unique_ptr<CodeGenAction> Act;
+    if (codeGenProviders.empty()) {
+      Act.reset(new EmitLLVMOnlyAction());
+    } else {
+      Act.reset(new MultiplexCodeGenAction(codeGenProviders));
+    }
+    bool success = Clang->ExecuteAction(*Act);
+    guard_->check();
+    if (!success) {
       for (TextDiagnosticBuffer::const_iterator I = DiagsBuffer->err_begin(),
                                                 E = DiagsBuffer->err_end();
            I != E; ++I)
@@ -284,12 +801,96 @@ void ClangDriver::InvokeClangAndLLVM(std::string *src,
     }
     std::unique_ptr<::llvm::Module> Module = Act->takeModule();
 
-    this->runLLVMPasses(std::move(Module), passes);
+    if (handleModule) handleModule(std::move(Module));
+  }
+}
+
+// Returns the path of the PCH of the prefix header for the configuration of
+// invocation, and builds it if it does not exist yet.
+std::string ClangDriver::preparePCH(const CompilerInvocation &invocation,
+                                    OptimizationLevel optimizationLevel) {
+  ::llvm::sys::fs::file_status status;
+  if (::llvm::sys::fs::status(prefixHeader_, status) ||
+      !::llvm::sys::fs::is_regular_file(status)) {
+    throw std::runtime_error("File not found: " + prefixHeader_);
+  }
+
+  // Key the PCH by everything it depends on, including the modification time
+  // of the prefix header. The headers it includes are not part of the key,
+  // clang reports an error when one of them changed after the PCH was built.
+  std::string key;
+  raw_string_ostream keyStream(key);
+  keyStream << getClangFullVersion() << '\0' << programmingLanguage_ << '\0'
+            << optimizationLevel << '\0' << prefixHeader_ << '\0'
+            << status.getLastModificationTime().time_since_epoch().count()
+            << '\0' << status.getSize() << '\0';
+  for (const auto &includeDir : includeDirs_) {
+    keyStream << std::get<0>(includeDir) << '\0' << std::get<1>(includeDir)
+              << '\0';
+  }
+  for (const auto &flag : compilerFlags_) {
+    keyStream << flag << '\0';
+  }
+  keyStream.flush();
+
+  std::string pchDirectory = getPCHDirectory();
+  SmallString<128> pchPath(pchDirectory);
+  ::llvm::sys::path::append(
+      pchPath, ::llvm::sys::path::filename(prefixHeader_) + "-" +
+                   ::llvm::utohexstr(::llvm::xxHash64(key)) + ".pch");
+  if (::llvm::sys::fs::exists(pchPath)) {
+    return std::string(pchPath);
+  }
+
+  if (::llvm::sys::fs::create_directories(pchDirectory)) {
+    throw std::runtime_error("Cannot create PCH directory " + pchDirectory);
+  }
+
+  // Compile the prefix header instead of the source, without the remapped
+  // source buffer, which is owned by the invocation of the source.
+  auto pchInvocation = std::make_shared<CompilerInvocation>(invocation);
+  pchInvocation->getPreprocessorOpts().clearRemappedFiles();
+  pchInvocation->getPreprocessorOpts().ImplicitPCHInclude.clear();
+
+  auto &frontendOpts = pchInvocation->getFrontendOpts();
+  if (frontendOpts.Inputs.empty()) {
+    throw std::runtime_error("Cannot precompile prefix header without input");
+  }
+  InputKind kind = frontendOpts.Inputs[0].getKind().getHeader();
+  frontendOpts.Inputs.clear();
+  frontendOpts.Inputs.emplace_back(prefixHeader_, kind);
+  frontendOpts.ProgramAction = frontend::GeneratePCH;
+
+  // Build into a temporary file first, so that concurrent invocations never
+  // read a partially written PCH.
+  SmallString<128> tmpPath;
+  if (::llvm::sys::fs::createUniqueFile(Twine(pchPath) + "-%%%%%%%%",
+                                        tmpPath)) {
+    throw std::runtime_error("Cannot create PCH in " + pchDirectory);
+  }
+  frontendOpts.OutputFile = std::string(tmpPath);
+
+  CompilerInstance pchClang;
+  auto PCHOps = pchClang.getPCHContainerOperations();
+  PCHOps->registerWriter(std::make_unique<ObjectFilePCHContainerWriter>());
+  PCHOps->registerReader(std::make_unique<ObjectFilePCHContainerReader>());
+  pchClang.setInvocation(pchInvocation);
+  pchClang.createDiagnostics();
+
+  GeneratePCHAction action;
+  if (!pchClang.ExecuteAction(action) ||
+      ::llvm::sys::fs::rename(tmpPath, pchPath)) {
+    ::llvm::sys::fs::remove(tmpPath);
+    throw std::runtime_error("Failed precompiling prefix header " +
+                             prefixHeader_);
   }
+
+  return std::string(pchPath);
 }
 
 void ClangDriver::InvokeLLVM(std::string& src,
-                         std::vector<::llvm::Pass *>& passes) {
+                             const ModuleHandler &handleModule) {
+  startInvocation();
 
   SMDiagnostic err;
   LLVMContext context;
@@ -299,27 +900,135 @@ void ClangDriver::InvokeLLVM(std::string& src,
     throw std::runtime_error("Failed compiling to LLVM module");
   }
 
-  this->runLLVMPasses(std::move(Module), passes);
+  if (handleModule) handleModule(std::move(Module));
 }
 
-void ClangDriver::runLLVMPasses(std::unique_ptr<::llvm::Module> Module,
-                                std::vector<::llvm::Pass *>& passes) {
-  ::llvm::remove_fatal_error_handler();
+void ClangDriver::InvokeLLVMFile(const std::string &path,
+                                 const ModuleHandler &handleModule) {
+  startInvocation();
+
+  SMDiagnostic err;
+  LLVMContext context;
+  // Detects bitcode by its magic number. Files on disk are memory-mapped.
+  auto buffer = fileSystem()->getBufferForFile(path);
+  if (!buffer) {
+    throw std::runtime_error("Failed reading LLVM module from " + path + ": " +
+                             buffer.getError().message());
+  }
+  std::unique_ptr<::llvm::Module> Module =
+      ::llvm::parseIR((*buffer)->getMemBufferRef(), err, context);
+  if (!Module) {
+    throw std::runtime_error("Failed reading LLVM module from " + path + ": " +
+                             err.getMessage().str());
+  }
+
+  if (handleModule) handleModule(std::move(Module));
+}
 
-  // Register other llvm passes.
-  PassRegistry &reg = *PassRegistry::getPassRegistry();
-  initializeCallGraphWrapperPassPass(reg);
-  initializeMemorySSAWrapperPassPass(reg);
-  // initializeStripSymbolsPass(reg);
+ClangDriver::ModuleHandler ClangDriver::passesHandler(
+    std::vector<::llvm::Pass *> &passes) {
+  if (passes.empty()) return nullptr;
+
+  return [this, &passes](std::unique_ptr<::llvm::Module> Module) {
+    runLLVMPasses(*Module, passes);
+  };
+}
+
+// Runs the default optimization pipeline of a level on module, as clang does.
+static void OptimizeModule(::llvm::Module &module,
+                           ClangDriver::OptimizationLevel level) {
+  // Without a target machine, the pipeline would use generic cost models.
+  std::unique_ptr<::llvm::TargetMachine> targetMachine;
+  std::string error;
+  const ::llvm::Target *target =
+      ::llvm::TargetRegistry::lookupTarget(module.getTargetTriple(), error);
+  if (target) {
+    targetMachine.reset(target->createTargetMachine(
+        module.getTargetTriple(), "", "", ::llvm::TargetOptions(),
+        std::nullopt));
+  }
+
+  LoopAnalysisManager LAM;
+  FunctionAnalysisManager FAM;
+  CGSCCAnalysisManager CGAM;
+  ModuleAnalysisManager MAM;
+
+  // Loop unrolling and vectorization are enabled from O2, as by the clang
+  // driver.
+  bool aggressive = level == ClangDriver::OptimizationLevel::O2 ||
+                    level == ClangDriver::OptimizationLevel::O3;
+  PipelineTuningOptions PTO;
+  PTO.LoopUnrolling = aggressive;
+  PTO.LoopInterleaving = aggressive;
+  PTO.LoopVectorization = aggressive;
+  PTO.SLPVectorization = aggressive;
+
+  PassBuilder PB(targetMachine.get(), PTO);
+  PB.registerModuleAnalyses(MAM);
+  PB.registerCGSCCAnalyses(CGAM);
+  PB.registerFunctionAnalyses(FAM);
+  PB.registerLoopAnalyses(LAM);
+  PB.crossRegisterProxies(LAM, FAM, CGAM, MAM);
+
+  ModulePassManager MPM;
+  switch (level) {
+    case ClangDriver::OptimizationLevel::O1:
+      MPM = PB.buildPerModuleDefaultPipeline(::llvm::OptimizationLevel::O1);
+      break;
+    case ClangDriver::OptimizationLevel::O2:
+      MPM = PB.buildPerModuleDefaultPipeline(::llvm::OptimizationLevel::O2);
+      break;
+    case ClangDriver::OptimizationLevel::O3:
+      MPM = PB.buildPerModuleDefaultPipeline(::llvm::OptimizationLevel::O3);
+      break;
+    default:
+      MPM = PB.buildO0DefaultPipeline(::llvm::OptimizationLevel::O0);
+      break;
+  }
+  MPM.run(module, MAM);
+}
+
+ClangDriver::ModuleHandler ClangDriver::optimizationLevelsHandler(
+    const std::vector<OptimizationLevel> &levels,
+    std::vector<std::vector<::llvm::Pass *>> &passesPerLevel) {
+  if (levels.size() != passesPerLevel.size()) {
+    throw std::invalid_argument(
+        "Number of pass lists does not match number of optimization levels");
+  }
+  HighestOptimizationLevel(levels);
+
+  return [this, &levels, &passesPerLevel](
+             std::unique_ptr<::llvm::Module> Module) {
+    for (size_t i = 0; i < levels.size(); ++i) {
+      // The last level can take the module itself instead of a copy.
+      std::unique_ptr<::llvm::Module> levelModule =
+          i + 1 < levels.size() ? CloneModule(*Module) : std::move(Module);
+      guard_->check(levelModule.get());
+      OptimizeModule(*levelModule, levels[i]);
+      runLLVMPasses(*levelModule, passesPerLevel[i]);
+    }
+  };
+}
+
+void ClangDriver::runLLVMPasses(::llvm::Module &Module,
+                                std::vector<::llvm::Pass *>& passes) {
+  guard_->check(&Module);
 
   // Setup the pass manager and add passes.
-  pm_.reset(new legacy::PassManager());
+  auto pm = std::make_shared<legacy::PassManager>();
+  pms_.push_back(pm);
   for (auto pass : passes) {
-    pm_->add(pass);
+    pm->add(pass);
   }
 
   // Run passes.
-  pm_->run(*Module);
+  pm->run(Module);
+}
+
+void ClangDriver::startInvocation() {
+  pms_.clear();
+  guard_ = std::make_shared<ResourceGuard>(timeout_, maxASTSize_, maxIRSize_,
+                                           memoryLimit_);
 }
 
 SimpleClangDriver::SimpleClangDriver(std::vector<std::string> compilerFlags): ClangDriver(ClangDriver::ProgrammingLanguage::C, compilerFlags) {
@@ -1,17 +1,43 @@
 #pragma once
 
+#include <cstdint>
+#include <functional>
+#include <map>
 #include <memory>
+#include <stdexcept>
 #include <string>
 #include <tuple>
 #include <vector>
 
+#include "clang/Basic/FileManager.h"
+#include "clang/Frontend/CompilerInvocation.h"
 #include "clang/Frontend/FrontendAction.h"
 #include "llvm/IR/LegacyPassManager.h"
 #include "llvm/IR/Module.h"
 #include "llvm/Pass.h"
+#include "llvm/Support/VirtualFileSystem.h"
 
 namespace compy {
 
+// Creates an AST consumer for a compilation, like an ASTFrontendAction does.
+// Providers run in the same parse as the lowering to LLVM IR, see
+// ClangDriver::InvokeSingleParse().
+class ASTConsumerProvider {
+ public:
+  virtual ~ASTConsumerProvider() = default;
+
+  virtual std::unique_ptr<::clang::ASTConsumer> CreateASTConsumer(
+      ::clang::CompilerInstance &CI, ::llvm::StringRef file) = 0;
+};
+
+// Thrown when an invocation exceeds one of the resource limits of its driver.
+class ResourceLimitExceeded : public std::runtime_error {
+ public:
+  using std::runtime_error::runtime_error;
+};
+
+class ResourceGuard;
+
 class ClangDriver {
  public:
   enum ProgrammingLanguage {
@@ -43,22 +69,154 @@ class ClangDriver {
   std::string getFileName() const;
   void setCompilerBinary(std::string path);
   std::string getCompilerBinary() const;
+  ProgrammingLanguage getProgrammingLanguage() const;
+  OptimizationLevel getOptimizationLevel() const;
+  std::vector<std::tuple<std::string, IncludeDirType>> getIncludeDirs() const;
+  std::vector<std::string> getCompilerFlags() const;
+
+  // Session mode keeps state that is expensive to rebuild (the FileManager
+  // with its stat cache and header lookups) alive between invocations. Headers
+  // are assumed not to change on disk while a session is active; call
+  // resetSession() otherwise.
+  void setSessionEnabled(bool enabled);
+  bool isSessionEnabled() const;
+  void resetSession();
+
+  // The prefix header is included before the source of every invocation, like
+  // with -include. It is precompiled once per configuration (language,
+  // optimization level, include dirs and flags) and the PCH is reused by all
+  // later invocations, also from other drivers and processes. PCHs are stored
+  // in the PCH directory, which defaults to a directory in the system
+  // temporary directory, and are rebuilt when the prefix header changes (but
+  // not when only the headers it includes change).
+  // Pass an empty path to disable it.
+  void setPrefixHeader(std::string path);
+  std::string getPrefixHeader() const;
+  void setPCHDirectory(std::string path);
+  std::string getPCHDirectory() const;
+
+  // Virtual files are read from memory instead of the disk, e.g. the sources
+  // and headers of an archive that is not extracted. They are overlaid over the
+  // real file system: a virtual file hides a file on disk with the same path,
+  // and other paths are still looked up on disk. Relative paths are relative to
+  // the current working directory at the time of the call. Both
+  // setVirtualFiles() and setVirtualFileSystem() replace the previous overlay,
+  // an empty map or a null file system removes it. The overlay is shared with
+  // clones, and must not be changed while it is in use. The prefix header is
+  // always read from disk.
+  void setVirtualFiles(std::map<std::string, std::string> files);
+  void setVirtualFileSystem(
+      ::llvm::IntrusiveRefCntPtr<::llvm::vfs::FileSystem> fileSystem);
+  std::vector<std::string> getVirtualFiles() const;
+  // Returns the content of the file at path, read through the overlay.
+  std::string readFile(const std::string &path) const;
+
+  // Resource limits of a single invocation, 0 for none. An invocation that
+  // exceeds one is aborted with ResourceLimitExceeded, without running the
+  // remaining frontend actions and passes:
+  // - timeout: wall-clock time in seconds.
+  // - maxASTSize: memory in bytes allocated for the AST.
+  // - maxIRSize: number of instructions of the LLVM module.
+  // - memoryLimit: growth in bytes of the heap of the process. As the heap is
+  //   shared, it includes allocations of other threads.
+  // The limits are checked after every top-level declaration while parsing, at
+  // the end of the translation unit and before every optimization and pass
+  // pipeline, so a single declaration or pipeline can overrun them.
+  void setTimeout(double seconds);
+  double getTimeout() const;
+  void setMaxASTSize(uint64_t bytes);
+  uint64_t getMaxASTSize() const;
+  void setMaxIRSize(uint64_t instructions);
+  uint64_t getMaxIRSize() const;
+  void setMemoryLimit(uint64_t bytes);
+  uint64_t getMemoryLimit() const;
+
+  // Returns a copy of this driver with the same configuration, but without
+  // any session state, so that it can be used from another thread.
+  std::shared_ptr<ClangDriver> clone() const;
 
   void Invoke(std::string src,
               std::vector<::clang::FrontendAction *> frontendActions,
               std::vector<::llvm::Pass *> passes);
 
+  // Like Invoke(), but reads the input from a file, which clang and LLVM map
+  // into memory directly instead of copying it. LLVM IR is accepted both as
+  // bitcode (.bc) and as text (.ll), and is read without running the clang
+  // frontend.
+  void InvokeFile(std::string path,
+                  std::vector<::clang::FrontendAction *> frontendActions,
+                  std::vector<::llvm::Pass *> passes);
+
+  // Like Invoke(), but the source is parsed only once: the AST consumers of
+  // providers see the AST while it is lowered to the LLVM module the passes
+  // run on. Invoke() parses the source again for every frontend action and
+  // for the lowering.
+  void InvokeSingleParse(std::string src,
+                         std::vector<ASTConsumerProvider *> providers,
+                         std::vector<::llvm::Pass *> passes);
+  void InvokeFileSingleParse(std::string path,
+                             std::vector<ASTConsumerProvider *> providers,
+                             std::vector<::llvm::Pass *> passes);
+
+  // Like Invoke(), but for several optimization levels at once: the source is
+  // lowered to LLVM IR only once, without optimizations, and passesPerLevel[i]
+  // run on a copy of the module optimized at levels[i]. If any level is above
+  // O0, the source is lowered with the frontend settings of the highest level
+  // (e.g. type-based alias analysis metadata), so that the modules match
+  // compiling at these levels. The optimization level of the driver is not
+  // used.
+  // The AST consumers of providers see the AST while it is lowered, as with
+  // InvokeSingleParse().
+  void InvokeOptimizationLevels(
+      std::string src, std::vector<OptimizationLevel> levels,
+      std::vector<std::vector<::llvm::Pass *>> passesPerLevel,
+      std::vector<ASTConsumerProvider *> providers = {});
+  void InvokeFileOptimizationLevels(
+      std::string path, std::vector<OptimizationLevel> levels,
+      std::vector<std::vector<::llvm::Pass *>> passesPerLevel,
+      std::vector<ASTConsumerProvider *> providers = {});
+
+  // Whether InvokeFile() and its variants read path as LLVM IR, regardless of
+  // the programming language.
+  static bool isLLVMIRFile(const std::string &path);
+
  private:
-  void InvokeClangAndLLVM(std::string *src,
+  using ModuleHandler = std::function<void(std::unique_ptr<::llvm::Module>)>;
+
+  void InvokeClangAndLLVM(const std::string *src, const std::string &fileName,
                           std::vector<::clang::FrontendAction *>& frontendActions,
-                          std::vector<::llvm::Pass *>& passes);
-  void InvokeLLVM(std::string& src,
-                  std::vector<::llvm::Pass *>& passes);
-  void runLLVMPasses(std::unique_ptr<::llvm::Module> Module,
+                          std::vector<ASTConsumerProvider *>& providers,
+                          OptimizationLevel optimizationLevel,
+                          bool disableLLVMPasses,
+                          const ModuleHandler &handleModule);
+  void InvokeLLVM(std::string& src, const ModuleHandler &handleModule);
+  void InvokeLLVMFile(const std::string &path,
+                      const ModuleHandler &handleModule);
+  std::string preparePCH(const ::clang::CompilerInvocation &invocation,
+                         OptimizationLevel optimizationLevel);
+  ModuleHandler passesHandler(std::vector<::llvm::Pass *>& passes);
+  ModuleHandler optimizationLevelsHandler(
+      const std::vector<OptimizationLevel> &levels,
+      std::vector<std::vector<::llvm::Pass *>> &passesPerLevel);
+  void runLLVMPasses(::llvm::Module &Module,
                      std::vector<::llvm::Pass *>& passes);
+  void startInvocation();
+  ::llvm::IntrusiveRefCntPtr<::llvm::vfs::FileSystem> fileSystem() const;
 
  private:
-  std::shared_ptr<::llvm::legacy::PassManager> pm_;
+  // Pass managers of the last invocation. They own the passes, which hold the
+  // extraction results.
+  std::vector<std::shared_ptr<::llvm::legacy::PassManager>> pms_;
+
+  // Checks the resource limits of the current invocation.
+  std::shared_ptr<ResourceGuard> guard_;
+
+  // The real file system with the virtual files overlaid, or null.
+  ::llvm::IntrusiveRefCntPtr<::llvm::vfs::FileSystem> overlayFileSystem_;
+  std::vector<std::string> virtualFiles_;
+
+  bool sessionEnabled_ = false;
+  ::llvm::IntrusiveRefCntPtr<::clang::FileManager> sessionFileManager_;
 
   ProgrammingLanguage programmingLanguage_;
   OptimizationLevel optimizationLevel_;
@@ -66,6 +224,12 @@ class ClangDriver {
   std::vector<std::string> compilerFlags_;
   std::string fileName_;
   std::string compilerBinary_;
+  std::string prefixHeader_;
+  std::string pchDirectory_;
+  double timeout_ = 0;
+  uint64_t maxASTSize_ = 0;
+  uint64_t maxIRSize_ = 0;
+  uint64_t memoryLimit_ = 0;
 };
 using ClangDriverPtr = std::shared_ptr<ClangDriver>;
 
@@ -1,7 +1,10 @@
 #include "clang_driver.h"
 
+#include <fstream>
 #include <iostream>
+#include <memory>
 
+#include "clang/Frontend/FrontendActions.h"
 #include "common/common_test.h"
 #include "gmock/gmock.h"
 #include "gtest/gtest.h"
@@ -53,3 +56,136 @@ TEST_F(ClangDriverFixture, CompileWithPassFunction1) {
 
   clang_->Invoke(kProgram1, frontendActions, passes);
 }
+
+TEST_F(ClangDriverFixture, CompileWithPassFunctionInSession) {
+  clang_->setSessionEnabled(true);
+  ASSERT_TRUE(clang_->isSessionEnabled());
+
+  for (auto program : {kProgram1, kProgram2, kProgram1}) {
+    NiceMock<MockPass> *pass = new NiceMock<MockPass>();
+    EXPECT_CALL(*pass, runOnModule(_)).Times(AtLeast(1));
+
+    std::vector<::clang::FrontendAction *> frontendActions;
+    std::vector<::llvm::Pass *> passes;
+    passes.push_back(pass);
+
+    clang_->Invoke(program, frontendActions, passes);
+  }
+
+  clang_->setSessionEnabled(false);
+  ASSERT_FALSE(clang_->isSessionEnabled());
+}
+
+TEST_F(ClangDriverFixture, CompileWithPrefixHeader) {
+  std::string pchDirectory = ::testing::TempDir() + "compy-pch-test";
+  std::string prefixHeader = ::testing::TempDir() + "compy-prefix.h";
+  std::ofstream(prefixHeader) << "#define RESULT 1\n";
+
+  clang_->setPrefixHeader(prefixHeader);
+  clang_->setPCHDirectory(pchDirectory);
+  ASSERT_EQ(clang_->getPrefixHeader(), prefixHeader);
+  ASSERT_EQ(clang_->getPCHDirectory(), pchDirectory);
+
+  // The second invocation reuses the PCH of the first one.
+  for (int i = 0; i < 2; ++i) {
+    NiceMock<MockPass> *pass = new NiceMock<MockPass>();
+    EXPECT_CALL(*pass, runOnModule(_)).Times(AtLeast(1));
+
+    std::vector<::clang::FrontendAction *> frontendActions;
+    std::vector<::llvm::Pass *> passes;
+    passes.push_back(pass);
+
+    clang_->Invoke("int foo() { return RESULT; }", frontendActions, passes);
+  }
+}
+
+TEST_F(ClangDriverFixture, CompileVirtualFiles) {
+  clang_->addIncludeDir("/compy-virtual/include",
+                        ClangDriver::IncludeDirType::USER);
+  clang_->setVirtualFiles(
+      {{"/compy-virtual/include/result.h", "#define RESULT 1\n"},
+       {"/compy-virtual/src/foo.c",
+        "#include \"result.h\"\nint foo() { return RESULT; }\n"}});
+  ASSERT_THAT(clang_->getVirtualFiles(),
+              ElementsAre("/compy-virtual/include/result.h",
+                          "/compy-virtual/src/foo.c"));
+
+  NiceMock<MockPass> *pass = new NiceMock<MockPass>();
+  EXPECT_CALL(*pass, runOnModule(_)).Times(AtLeast(1));
+
+  std::vector<::clang::FrontendAction *> frontendActions;
+  std::vector<::llvm::Pass *> passes;
+  passes.push_back(pass);
+
+  clang_->InvokeFile("/compy-virtual/src/foo.c", frontendActions, passes);
+
+  // Without the overlay, the files are looked up on disk again.
+  clang_->setVirtualFiles({});
+  ASSERT_TRUE(clang_->getVirtualFiles().empty());
+  std::vector<::llvm::Pass *> noPasses;
+  ASSERT_THROW(clang_->InvokeFile("/compy-virtual/src/foo.c", frontendActions,
+                                  noPasses),
+               std::runtime_error);
+}
+
+TEST_F(ClangDriverFixture, ReadVirtualFile) {
+  clang_->setVirtualFiles({{"/compy-virtual/src/foo.c", "int foo;\n"}});
+
+  ASSERT_EQ(clang_->readFile("/compy-virtual/src/foo.c"), "int foo;\n");
+  ASSERT_THROW(clang_->readFile("/compy-virtual/src/bar.c"),
+               std::runtime_error);
+}
+
+TEST_F(ClangDriverFixture, ResourceLimitsDefaultToNone) {
+  ASSERT_EQ(clang_->getTimeout(), 0);
+  ASSERT_EQ(clang_->getMaxASTSize(), 0u);
+  ASSERT_EQ(clang_->getMaxIRSize(), 0u);
+  ASSERT_EQ(clang_->getMemoryLimit(), 0u);
+
+  clang_->setTimeout(2.5);
+  clang_->setMemoryLimit(1u << 30);
+  auto driver = clang_->clone();
+  ASSERT_EQ(driver->getTimeout(), 2.5);
+  ASSERT_EQ(driver->getMemoryLimit(), 1u << 30);
+}
+
+TEST_F(ClangDriverFixture, TimeoutAbortsInvocation) {
+  auto pass = std::make_unique<NiceMock<MockPass>>();
+  EXPECT_CALL(*pass, runOnModule(_)).Times(0);
+
+  std::vector<::clang::FrontendAction *> frontendActions;
+  std::vector<::llvm::Pass *> passes = {pass.get()};
+
+  clang_->setTimeout(1e-9);
+  ASSERT_THROW(clang_->Invoke(kProgram1, frontendActions, passes),
+               ResourceLimitExceeded);
+}
+
+TEST_F(ClangDriverFixture, MaxASTSizeAbortsFrontendAction) {
+  ::clang::SyntaxOnlyAction action;
+  std::vector<::clang::FrontendAction *> frontendActions = {&action};
+  std::vector<::llvm::Pass *> passes;
+
+  clang_->setMaxASTSize(1);
+  ASSERT_THROW(clang_->Invoke(kProgram1, frontendActions, passes),
+               ResourceLimitExceeded);
+}
+
+TEST_F(ClangDriverFixture, MaxIRSizeAbortsInvocationAndDriverRecovers) {
+  auto pass = std::make_unique<NiceMock<MockPass>>();
+  EXPECT_CALL(*pass, runOnModule(_)).Times(0);
+
+  std::vector<::clang::FrontendAction *> frontendActions;
+  std::vector<::llvm::Pass *> passes = {pass.get()};
+
+  clang_->setMaxIRSize(1);
+  ASSERT_THROW(clang_->Invoke(kProgram1, frontendActions, passes),
+               ResourceLimitExceeded);
+
+  // The driver is still usable once the limit is lifted.
+  NiceMock<MockPass> *nextPass = new NiceMock<MockPass>();
+  EXPECT_CALL(*nextPass, runOnModule(_)).Times(AtLeast(1));
+
+  clang_->setMaxIRSize(0);
+  clang_->Invoke(kProgram1, frontendActions, {nextPass});
+}
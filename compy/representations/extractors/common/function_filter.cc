@@ -0,0 +1,95 @@
+#include "function_filter.h"
+
+#include <algorithm>
+#include <memory>
+#include <string>
+#include <unordered_set>
+
+#include "clang/AST/ASTConsumer.h"
+#include "clang/AST/ASTContext.h"
+#include "clang/AST/Decl.h"
+#include "clang/AST/DeclCXX.h"
+#include "clang/AST/Mangle.h"
+#include "clang/Basic/SourceManager.h"
+#include "clang/Frontend/CompilerInstance.h"
+
+using namespace ::clang;
+using namespace ::llvm;
+
+namespace compy {
+
+bool FunctionFilter::accepts(const std::string &name) const {
+  if (!names.empty() &&
+      std::find(names.begin(), names.end(), name) == names.end()) {
+    return false;
+  }
+  return !predicate || predicate(name);
+}
+
+bool selectsFunction(const FunctionFilterPtr &filter, const FunctionDecl &f) {
+  if (!filter) return true;
+
+  if (filter->skipSystemHeaders &&
+      f.getASTContext().getSourceManager().isInSystemHeader(f.getLocation())) {
+    return false;
+  }
+  return filter->accepts(f.getNameAsString());
+}
+
+namespace {
+
+class SystemHeaderFunctionsConsumer : public ASTConsumer {
+ public:
+  SystemHeaderFunctionsConsumer(std::unordered_set<std::string> &names)
+      : names_(names) {}
+
+  void Initialize(ASTContext &context) override {
+    context_ = &context;
+    nameGenerator_ = std::make_unique<ASTNameGenerator>(context);
+  }
+
+  bool HandleTopLevelDecl(DeclGroupRef DR) override {
+    for (auto decl : DR) {
+      add(decl);
+    }
+    return true;
+  }
+
+  // Member functions defined in their class are handed over separately.
+  void HandleInlineFunctionDefinition(FunctionDecl *f) override { add(f); }
+
+ private:
+  void add(Decl *decl) {
+    if (isa<NamespaceDecl>(decl) || isa<LinkageSpecDecl>(decl)) {
+      for (auto inner : cast<DeclContext>(decl)->decls()) {
+        add(inner);
+      }
+      return;
+    }
+
+    auto *f = dyn_cast<FunctionDecl>(decl);
+    if (!f || !f->doesThisDeclarationHaveABody()) return;
+
+    if (context_->getSourceManager().isInSystemHeader(f->getLocation())) {
+      names_.insert(nameGenerator_->getName(f));
+    }
+  }
+
+  std::unordered_set<std::string> &names_;
+  ASTContext *context_ = nullptr;
+  std::unique_ptr<ASTNameGenerator> nameGenerator_;
+};
+
+}  // namespace
+
+std::unique_ptr<ASTConsumer> SystemHeaderFunctions::CreateASTConsumer(
+    CompilerInstance &CI, StringRef file) {
+  names_.clear();
+  return std::make_unique<SystemHeaderFunctionsConsumer>(names_);
+}
+
+bool SystemHeaderFunctions::contains(const std::string &name) const {
+  return names_.count(name) > 0;
+}
+
+}  // namespace compy
@@ -0,0 +1,56 @@
+#pragma once
+
+#include <functional>
+#include <memory>
+#include <string>
+#include <unordered_set>
+#include <vector>
+
+#include "clang_driver.h"
+
+namespace clang {
+class FunctionDecl;
+}
+
+namespace compy {
+
+// Selects the functions to extract, by default all of them. The infos of the
+// other functions are never built.
+struct FunctionFilter {
+  // Names of the functions to extract, or empty for all. For LLVM IR, these
+  // are the names of the functions in the module, i.e. mangled for C++.
+  std::vector<std::string> names;
+
+  // Called with the name of every function the other criteria select, which
+  // is only extracted if it returns true.
+  std::function<bool(const std::string &)> predicate;
+
+  // Skip the functions defined in system headers, e.g. inline functions. This
+  // has no effect on LLVM IR inputs, which have no headers.
+  bool skipSystemHeaders = false;
+
+  bool accepts(const std::string &name) const;
+};
+using FunctionFilterPtr = std::shared_ptr<FunctionFilter>;
+
+// Whether filter selects the function f of a clang AST, or true without
+// filter.
+bool selectsFunction(const FunctionFilterPtr &filter,
+                     const ::clang::FunctionDecl &f);
+
+// Collects the functions defined in system headers, by their names in LLVM
+// IR, while the source is lowered, see ClangDriver::InvokeSingleParse(). The
+// LLVM IR extractors use it to apply FunctionFilter::skipSystemHeaders.
+class SystemHeaderFunctions : public ASTConsumerProvider {
+ public:
+  std::unique_ptr<::clang::ASTConsumer> CreateASTConsumer(
+      ::clang::CompilerInstance &CI, ::llvm::StringRef file) override;
+
+  bool contains(const std::string &name) const;
+
+ private:
+  std::unordered_set<std::string> names_;
+};
+using SystemHeaderFunctionsPtr = std::shared_ptr<SystemHeaderFunctions>;
+
+}  // namespace compy
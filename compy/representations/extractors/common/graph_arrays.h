@@ -0,0 +1,182 @@
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <map>
+#include <memory>
+#include <stdexcept>
+#include <string>
+#include <unordered_map>
+#include <utility>
+#include <vector>
+
+namespace compy {
+
+// A node label, either a single string or a tuple of strings.
+using GraphLabel = std::vector<std::string>;
+
+// A graph representation as flat arrays, as built natively for the standard
+// visitors of the Python package.
+struct GraphArrays {
+  // Distinct node labels, in order of first appearance in nodes.
+  std::vector<GraphLabel> labels;
+  // Label index of every node.
+  std::vector<int32_t> nodes;
+  // Position of token nodes in the source, -1 for all other nodes.
+  std::vector<int64_t> seqOrder;
+  // Rows of (source, edge type, target), grouped by source node.
+  std::vector<int32_t> edges;
+  // The edges of node i are the rows offsets[i] to offsets[i + 1] - 1.
+  std::vector<int32_t> offsets;
+
+  // The objects the nodes stand for, so that they can be handed to Python,
+  // with their type. Only nodes for pairs of objects use the second one.
+  std::vector<std::pair<std::shared_ptr<void>, std::shared_ptr<void>>> objects;
+  std::vector<uint8_t> objectTypes;
+};
+
+// Builds GraphArrays with the semantics of a networkx MultiDiGraph, so that
+// the result matches the graph of the corresponding Python visitor node for
+// node and edge for edge:
+// - Nodes are numbered in order of first insertion, either explicitly or as
+//   an end of an edge.
+// - Labelling a node again replaces its label.
+// - Edges are ordered by source node, then by first insertion of their
+//   target for that source, then by insertion.
+class GraphArraysBuilder {
+ public:
+  // Returns the node of object, adding it if needed.
+  template <typename T>
+  int32_t node(const std::shared_ptr<T> &object, uint8_t type) {
+    return node(Key(object.get(), nullptr), object, nullptr, type);
+  }
+
+  // Returns the node of a pair of objects, adding it if needed.
+  template <typename T, typename U>
+  int32_t pairNode(const std::shared_ptr<T> &first,
+                   const std::shared_ptr<U> &second, uint8_t type) {
+    return node(Key(first.get(), second.get()), first, second, type);
+  }
+
+  // Adds a node that is distinct from all other nodes.
+  int32_t uniqueNode(std::shared_ptr<void> object, uint8_t type) {
+    return append(std::move(object), nullptr, type);
+  }
+
+  void setLabel(int32_t node, GraphLabel label) {
+    labels_[node] = std::move(label);
+    hasLabel_[node] = true;
+  }
+
+  void setLabel(int32_t node, std::string label) {
+    setLabel(node, GraphLabel{std::move(label)});
+  }
+
+  void setSeqOrder(int32_t node, int64_t seqOrder) {
+    seqOrder_[node] = seqOrder;
+  }
+
+  void addEdge(int32_t source, int32_t target, int32_t type) {
+    adjacency_[source].emplace_back(target, type);
+  }
+
+  template <typename Arrays>
+  std::shared_ptr<Arrays> finish() {
+    auto result = std::make_shared<Arrays>();
+    const size_t numNodes = labels_.size();
+
+    std::map<GraphLabel, int32_t> labelIds;
+    result->nodes.reserve(numNodes);
+    for (size_t i = 0; i < numNodes; ++i) {
+      if (!hasLabel_[i]) {
+        throw std::runtime_error("Graph node without label");
+      }
+      auto inserted = labelIds.emplace(labels_[i], result->labels.size());
+      if (inserted.second) {
+        result->labels.push_back(labels_[i]);
+      }
+      result->nodes.push_back(inserted.first->second);
+    }
+
+    result->offsets.reserve(numNodes + 1);
+    result->offsets.push_back(0);
+    for (size_t i = 0; i < numNodes; ++i) {
+      auto &targets = adjacency_[i];
+      groupByTarget(targets);
+      for (const auto &target : targets) {
+        result->edges.push_back(i);
+        result->edges.push_back(target.second);
+        result->edges.push_back(target.first);
+      }
+      result->offsets.push_back(result->edges.size() / 3);
+    }
+
+    result->seqOrder = std::move(seqOrder_);
+    result->objects = std::move(objects_);
+    result->objectTypes = std::move(objectTypes_);
+    return result;
+  }
+
+ private:
+  using Key = std::pair<const void *, const void *>;
+
+  struct KeyHash {
+    size_t operator()(const Key &key) const {
+      auto first = reinterpret_cast<uintptr_t>(key.first);
+      auto second = reinterpret_cast<uintptr_t>(key.second);
+      return std::hash<uintptr_t>()(first ^ (second * 0x9e3779b97f4a7c15ULL));
+    }
+  };
+
+  int32_t node(Key key, std::shared_ptr<void> first,
+               std::shared_ptr<void> second, uint8_t type) {
+    if (!key.first) {
+      throw std::invalid_argument("None cannot be a node");
+    }
+    auto it = ids_.find(key);
+    if (it != ids_.end()) return it->second;
+
+    int32_t id = append(std::move(first), std::move(second), type);
+    ids_.emplace(key, id);
+    return id;
+  }
+
+  int32_t append(std::shared_ptr<void> first, std::shared_ptr<void> second,
+                 uint8_t type) {
+    labels_.emplace_back();
+    hasLabel_.push_back(false);
+    seqOrder_.push_back(-1);
+    adjacency_.emplace_back();
+    objects_.emplace_back(std::move(first), std::move(second));
+    objectTypes_.push_back(type);
+    return labels_.size() - 1;
+  }
+
+  // Stable-sorts the (target, type) edges of a node by first occurrence of
+  // their target.
+  static void groupByTarget(std::vector<std::pair<int32_t, int32_t>> &edges) {
+    if (edges.size() < 2) return;
+
+    std::unordered_map<int32_t, size_t> firstOccurrence;
+    for (size_t i = 0; i < edges.size(); ++i) {
+      firstOccurrence.emplace(edges[i].first, i);
+    }
+    std::stable_sort(edges.begin(), edges.end(),
+                     [&](const std::pair<int32_t, int32_t> &a,
+                         const std::pair<int32_t, int32_t> &b) {
+                       return firstOccurrence[a.first] <
+                              firstOccurrence[b.first];
+                     });
+  }
+
+  std::unordered_map<Key, int32_t, KeyHash> ids_;
+  std::vector<GraphLabel> labels_;
+  std::vector<bool> hasLabel_;
+  std::vector<int64_t> seqOrder_;
+  std::vector<std::vector<std::pair<int32_t, int32_t>>> adjacency_;
+  std::vector<std::pair<std::shared_ptr<void>, std::shared_ptr<void>>>
+      objects_;
+  std::vector<uint8_t> objectTypes_;
+};
+
+}  // namespace compy
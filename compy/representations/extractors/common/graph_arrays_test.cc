@@ -0,0 +1,88 @@
+#include "graph_arrays.h"
+
+#include <memory>
+#include <string>
+#include <vector>
+
+#include "gtest/gtest.h"
+
+using namespace ::testing;
+using namespace compy;
+
+TEST(GraphArraysBuilderTest, NumbersNodesInOrderOfFirstInsertion) {
+  auto a = std::make_shared<int>(0);
+  auto b = std::make_shared<int>(1);
+
+  GraphArraysBuilder builder;
+  EXPECT_EQ(builder.node(a, 0), 0);
+  EXPECT_EQ(builder.node(b, 0), 1);
+  EXPECT_EQ(builder.node(a, 0), 0);
+  builder.setLabel(0, "a");
+  builder.setLabel(1, "b");
+  builder.setLabel(0, "c");
+
+  auto arrays = builder.finish<GraphArrays>();
+  ASSERT_EQ(arrays->labels.size(), 2UL);
+  EXPECT_EQ(arrays->labels[0], GraphLabel{"c"});
+  EXPECT_EQ(arrays->labels[1], GraphLabel{"b"});
+  EXPECT_EQ(arrays->nodes, std::vector<int32_t>({0, 1}));
+  EXPECT_EQ(arrays->objects[1].first, b);
+}
+
+TEST(GraphArraysBuilderTest, SharesLabels) {
+  GraphArraysBuilder builder;
+  for (int i = 0; i < 3; ++i) {
+    int32_t n = builder.uniqueNode(std::make_shared<int>(i), 0);
+    builder.setLabel(n, i == 1 ? GraphLabel{"argument", "intType"}
+                               : GraphLabel{"x"});
+  }
+
+  auto arrays = builder.finish<GraphArrays>();
+  ASSERT_EQ(arrays->labels.size(), 2UL);
+  EXPECT_EQ(arrays->labels[1], GraphLabel({"argument", "intType"}));
+  EXPECT_EQ(arrays->nodes, std::vector<int32_t>({0, 1, 0}));
+}
+
+TEST(GraphArraysBuilderTest, OrdersEdgesLikeNetworkx) {
+  GraphArraysBuilder builder;
+  std::vector<int32_t> nodes;
+  for (int i = 0; i < 3; ++i) {
+    nodes.push_back(builder.uniqueNode(std::make_shared<int>(i), 0));
+    builder.setLabel(nodes.back(), "n");
+  }
+  builder.addEdge(1, 0, 0);
+  builder.addEdge(0, 2, 0);
+  builder.addEdge(0, 1, 1);
+  builder.addEdge(0, 2, 1);
+
+  auto arrays = builder.finish<GraphArrays>();
+  EXPECT_EQ(arrays->edges, std::vector<int32_t>({0, 0, 2,  //
+                                                 0, 1, 2,  //
+                                                 0, 1, 1,  //
+                                                 1, 0, 0}));
+  EXPECT_EQ(arrays->offsets, std::vector<int32_t>({0, 3, 4, 4}));
+}
+
+TEST(GraphArraysBuilderTest, DistinguishesPairNodes) {
+  auto a = std::make_shared<int>(0);
+  auto b = std::make_shared<int>(1);
+
+  GraphArraysBuilder builder;
+  EXPECT_EQ(builder.node(a, 0), 0);
+  EXPECT_EQ(builder.pairNode(a, b, 1), 1);
+  EXPECT_EQ(builder.pairNode(b, a, 1), 2);
+  EXPECT_EQ(builder.pairNode(a, b, 1), 1);
+}
+
+TEST(GraphArraysBuilderTest, ThrowsOnNodesWithoutLabel) {
+  GraphArraysBuilder builder;
+  builder.uniqueNode(std::make_shared<int>(0), 0);
+
+  EXPECT_THROW(builder.finish<GraphArrays>(), std::runtime_error);
+}
+
+TEST(GraphArraysBuilderTest, ThrowsOnNullNodes) {
+  GraphArraysBuilder builder;
+
+  EXPECT_THROW(builder.node(std::shared_ptr<int>(), 0), std::invalid_argument);
+}
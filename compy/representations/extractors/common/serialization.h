@@ -0,0 +1,177 @@
+#pragma once
+
+#include <cstdint>
+#include <memory>
+#include <stdexcept>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+namespace compy {
+namespace serialization {
+
+// Building blocks for the binary format of the extraction infos.
+//
+// All integers are LEB128 varints and strings are length-prefixed. Objects
+// referenced through shared pointers are stored once in a table per type and
+// referenced by their index in that table, so that shared objects and cycles
+// survive a round trip. A reference is written as index + 1, with 0 for null.
+
+class Writer {
+ public:
+  void writeVarint(uint64_t value) {
+    while (value >= 0x80) {
+      buffer_.push_back(static_cast<char>((value & 0x7f) | 0x80));
+      value >>= 7;
+    }
+    buffer_.push_back(static_cast<char>(value));
+  }
+
+  void writeBool(bool value) { writeVarint(value ? 1 : 0); }
+
+  void writeString(const std::string &value) {
+    writeVarint(value.size());
+    buffer_.append(value);
+  }
+
+  void writeStrings(const std::vector<std::string> &values) {
+    writeVarint(values.size());
+    for (const auto &value : values) writeString(value);
+  }
+
+  void writeMagic(const char *magic, uint64_t version) {
+    buffer_.append(magic, 4);
+    writeVarint(version);
+  }
+
+  const std::string &data() const { return buffer_; }
+
+ private:
+  std::string buffer_;
+};
+
+class Reader {
+ public:
+  explicit Reader(const std::string &data)
+      : pos_(data.data()), end_(data.data() + data.size()) {}
+
+  uint64_t readVarint() {
+    uint64_t value = 0;
+    for (unsigned shift = 0; shift < 64; shift += 7) {
+      if (pos_ == end_) fail("unexpected end of data");
+      uint8_t byte = static_cast<uint8_t>(*pos_++);
+      value |= static_cast<uint64_t>(byte & 0x7f) << shift;
+      if (!(byte & 0x80)) return value;
+    }
+    fail("varint too long");
+    return 0;
+  }
+
+  bool readBool() { return readVarint() != 0; }
+
+  std::string readString() {
+    uint64_t size = readVarint();
+    if (size > static_cast<uint64_t>(end_ - pos_)) fail("string out of bounds");
+    std::string value(pos_, size);
+    pos_ += size;
+    return value;
+  }
+
+  std::vector<std::string> readStrings() {
+    std::vector<std::string> values(readCount());
+    for (auto &value : values) value = readString();
+    return values;
+  }
+
+  // Reads an element count. Every element takes at least one byte, which
+  // bounds the count and prevents huge allocations on corrupt data.
+  uint64_t readCount() {
+    uint64_t count = readVarint();
+    if (count > static_cast<uint64_t>(end_ - pos_)) fail("count out of bounds");
+    return count;
+  }
+
+  void readMagic(const char *magic, uint64_t version) {
+    if (end_ - pos_ < 4 || std::string(pos_, 4) != std::string(magic, 4)) {
+      fail("not a serialized " + std::string(magic, 4) + " info");
+    }
+    pos_ += 4;
+    if (readVarint() != version) fail("unsupported format version");
+  }
+
+  void expectEnd() {
+    if (pos_ != end_) fail("trailing data");
+  }
+
+  [[noreturn]] static void fail(const std::string &message) {
+    throw std::runtime_error("Failed deserializing extraction info: " +
+                             message);
+  }
+
+ private:
+  const char *pos_;
+  const char *end_;
+};
+
+// Table of the objects of one type that are reachable from a root. When
+// serializing, objects are added in order of discovery and processed
+// afterwards, which avoids deep recursion on long chains of references. When
+// deserializing, all objects are allocated up front so that references can
+// be resolved while the fields are read.
+template <typename T>
+class ObjectTable {
+ public:
+  using Ptr = std::shared_ptr<T>;
+
+  void add(const Ptr &object) {
+    if (object && ids_.emplace(object.get(), objects_.size()).second) {
+      objects_.push_back(object);
+    }
+  }
+
+  void add(const std::vector<Ptr> &objects) {
+    for (const auto &object : objects) add(object);
+  }
+
+  // Returns the next object that has been added but not processed yet, or
+  // null if there is none.
+  Ptr next() {
+    return processed_ < objects_.size() ? objects_[processed_++] : nullptr;
+  }
+
+  void writeRef(Writer &writer, const Ptr &object) const {
+    writer.writeVarint(object ? ids_.at(object.get()) + 1 : 0);
+  }
+
+  void writeRefs(Writer &writer, const std::vector<Ptr> &objects) const {
+    writer.writeVarint(objects.size());
+    for (const auto &object : objects) writeRef(writer, object);
+  }
+
+  void allocate(Reader &reader) {
+    objects_.resize(reader.readCount());
+    for (auto &object : objects_) object = std::make_shared<T>();
+  }
+
+  Ptr readRef(Reader &reader) const {
+    uint64_t ref = reader.readVarint();
+    if (ref > objects_.size()) Reader::fail("reference out of bounds");
+    return ref ? objects_[ref - 1] : nullptr;
+  }
+
+  std::vector<Ptr> readRefs(Reader &reader) const {
+    std::vector<Ptr> objects(reader.readCount());
+    for (auto &object : objects) object = readRef(reader);
+    return objects;
+  }
+
+  const std::vector<Ptr> &objects() const { return objects_; }
+
+ private:
+  std::vector<Ptr> objects_;
+  std::unordered_map<const T *, uint64_t> ids_;
+  size_t processed_ = 0;
+};
+
+}  // namespace serialization
+}  // namespace compy
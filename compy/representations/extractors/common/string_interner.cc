@@ -0,0 +1,41 @@
+#include "string_interner.h"
+
+#include <mutex>
+#include <stdexcept>
+
+namespace compy {
+
+StringInterner &StringInterner::global() {
+  static StringInterner interner;
+  return interner;
+}
+
+int32_t StringInterner::intern(const std::string &s) {
+  {
+    std::shared_lock<std::shared_mutex> lock(mutex_);
+    auto it = ids_.find(s);
+    if (it != ids_.end()) return it->second;
+  }
+
+  std::unique_lock<std::shared_mutex> lock(mutex_);
+  auto inserted = ids_.emplace(s, static_cast<int32_t>(strings_.size()));
+  if (inserted.second) {
+    strings_.push_back(&inserted.first->first);
+  }
+  return inserted.first->second;
+}
+
+std::string StringInterner::lookup(int32_t id) const {
+  std::shared_lock<std::shared_mutex> lock(mutex_);
+  if (id < 0 || static_cast<size_t>(id) >= strings_.size()) {
+    throw std::out_of_range("Unknown string id " + std::to_string(id));
+  }
+  return *strings_[id];
+}
+
+size_t StringInterner::size() const {
+  std::shared_lock<std::shared_mutex> lock(mutex_);
+  return strings_.size();
+}
+
+}  // namespace compy
@@ -0,0 +1,40 @@
+#pragma once
+
+#include <cstdint>
+#include <shared_mutex>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+namespace compy {
+
+// A table of distinct strings with dense integer ids, so that the infos can
+// carry ids next to strings like opcodes, types and token names. The global
+// table is shared by all extractors and threads, and its ids are stable for
+// the lifetime of the process. They are not serialized with the infos, but
+// assigned again when the infos are read.
+class StringInterner {
+ public:
+  static StringInterner &global();
+
+  // Returns the id of s, adding it if needed.
+  int32_t intern(const std::string &s);
+
+  // Returns the string with id, or throws std::out_of_range.
+  std::string lookup(int32_t id) const;
+
+  size_t size() const;
+
+ private:
+  mutable std::shared_mutex mutex_;
+  std::unordered_map<std::string, int32_t> ids_;
+  // The keys of ids_, which do not move, by id.
+  std::vector<const std::string *> strings_;
+};
+
+// Returns the id of s in the global table.
+inline int32_t internString(const std::string &s) {
+  return StringInterner::global().intern(s);
+}
+
+}  // namespace compy
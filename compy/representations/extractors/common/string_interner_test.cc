@@ -0,0 +1,44 @@
+#include "string_interner.h"
+
+#include <stdexcept>
+#include <string>
+#include <thread>
+#include <vector>
+
+#include "gtest/gtest.h"
+
+using namespace ::testing;
+using namespace compy;
+
+TEST(StringInternerTest, AssignsDenseIdsInOrderOfFirstIntern) {
+  StringInterner interner;
+
+  EXPECT_EQ(interner.intern("add"), 0);
+  EXPECT_EQ(interner.intern("i32"), 1);
+  EXPECT_EQ(interner.intern("add"), 0);
+  EXPECT_EQ(interner.size(), 2UL);
+  EXPECT_EQ(interner.lookup(1), "i32");
+  EXPECT_THROW(interner.lookup(2), std::out_of_range);
+  EXPECT_THROW(interner.lookup(-1), std::out_of_range);
+}
+
+TEST(StringInternerTest, InternsConcurrently) {
+  StringInterner interner;
+
+  std::vector<std::thread> threads;
+  std::vector<std::vector<int32_t>> ids(4);
+  for (size_t t = 0; t < ids.size(); ++t) {
+    threads.emplace_back([&, t] {
+      for (int i = 0; i < 1000; ++i) {
+        ids[t].push_back(interner.intern(std::to_string(i)));
+      }
+    });
+  }
+  for (auto &thread : threads) thread.join();
+
+  EXPECT_EQ(interner.size(), 1000UL);
+  for (const auto &threadIds : ids) {
+    EXPECT_EQ(threadIds, ids[0]);
+  }
+  EXPECT_EQ(interner.lookup(ids[0][42]), "42");
+}
@@ -1,10 +1,20 @@
 #include <memory>
+#include <pybind11/functional.h>
+#include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
 #include "clang_ast/clang_extractor.h"
+#include "clang_ast/clang_graph_builders.h"
+#include "clang_ast/clang_serialization.h"
+#include "combined/combined_extractor.h"
 #include "common/clang_driver.h"
+#include "common/function_filter.h"
+#include "common/graph_arrays.h"
+#include "common/string_interner.h"
 #include "llvm_ir/llvm_extractor.h"
+#include "llvm_ir/llvm_graph_builders.h"
+#include "llvm_ir/llvm_serialization.h"
 
 using namespace compy;
 
@@ -18,6 +28,29 @@ using CD = compy::ClangDriver;
 using SCD = compy::SimpleClangDriver;
 using CE = compy::clang::ClangExtractor;
 using LE = compy::llvm::LLVMIRExtractor;
+using CBE = compy::CombinedExtractor;
+
+// The vector fields of the infos are bound as read-only sequences by
+// defInfoSequence() instead of being converted to lists on every access.
+PYBIND11_MAKE_OPAQUE(std::vector<cg::FunctionInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<cg::RecordInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<cg::EnumDeclInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<cg::DeclInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<cg::CFGBlockInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<cg::StmtInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<cg::OperandInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<cg::TokenInfo>);
+PYBIND11_MAKE_OPAQUE(std::vector<cs::FunctionInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<cs::TokenInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<lg::FunctionInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<lg::BasicBlockInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<lg::InstructionInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<lg::OperandInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<lg::ArgInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<lg::MemoryAccessInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<ls::FunctionInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<ls::BasicBlockInfoPtr>);
+PYBIND11_MAKE_OPAQUE(std::vector<ls::InstructionInfoPtr>);
 
 namespace pybind11 {
 template <>
@@ -79,6 +112,231 @@ class PyVisitor : public IVisitor {
   }
 };
 
+// Adds to_bytes(), from_bytes() and pickle support to an ExtractionInfo class.
+template <typename Info>
+void defSerialization(py::class_<Info, std::shared_ptr<Info>> &cls,
+                      std::string (*serialize)(const Info &),
+                      std::shared_ptr<Info> (*deserialize)(const std::string &)) {
+  cls.def("to_bytes",
+          [serialize](const Info &info) { return py::bytes(serialize(info)); })
+      .def_static("from_bytes",
+                  [deserialize](const py::bytes &data) {
+                    return deserialize(std::string(data));
+                  })
+      .def(py::pickle(
+          [serialize](const Info &info) { return py::bytes(serialize(info)); },
+          [deserialize](const py::bytes &data) {
+            return deserialize(std::string(data));
+          }));
+}
+
+// Same for a FunctionInfo, which is serialized as an ExtractionInfo holding
+// only this function.
+template <typename ExtractionInfo, typename FunctionInfo>
+void defFunctionSerialization(
+    py::class_<FunctionInfo, std::shared_ptr<FunctionInfo>> &cls,
+    std::string (*serialize)(const ExtractionInfo &),
+    std::shared_ptr<ExtractionInfo> (*deserialize)(const std::string &)) {
+  auto getState = [serialize](const std::shared_ptr<FunctionInfo> &function) {
+    ExtractionInfo info;
+    info.functionInfos.push_back(function);
+    return py::bytes(serialize(info));
+  };
+  auto setState = [deserialize](const py::bytes &data) {
+    auto info = deserialize(std::string(data));
+    if (info->functionInfos.size() != 1) {
+      throw std::runtime_error("Data does not hold a single function");
+    }
+    return info->functionInfos[0];
+  };
+
+  cls.def("to_bytes", getState)
+      .def_static("from_bytes", setState)
+      .def(py::pickle(getState, setState));
+}
+
+// Same for a part of the infos, e.g. a statement or an instruction. wrap()
+// adds the part to an ExtractionInfo, together with the objects it refers to
+// only weakly, and unwrap() finds it in the deserialized ExtractionInfo. The
+// returned part keeps that ExtractionInfo alive.
+template <typename ExtractionInfo, typename Part, typename Wrap,
+          typename Unwrap>
+void defPartSerialization(
+    py::class_<Part, std::shared_ptr<Part>> &cls,
+    std::string (*serialize)(const ExtractionInfo &),
+    std::shared_ptr<ExtractionInfo> (*deserialize)(const std::string &),
+    Wrap wrap, Unwrap unwrap) {
+  auto getState = [serialize, wrap](const std::shared_ptr<Part> &part) {
+    ExtractionInfo info;
+    wrap(info, part);
+    return py::bytes(serialize(info));
+  };
+  auto setState = [deserialize, unwrap](const py::bytes &data) {
+    std::shared_ptr<ExtractionInfo> info = deserialize(std::string(data));
+    std::shared_ptr<Part> part = unwrap(*info);
+    if (!part) {
+      throw std::runtime_error("Data does not hold a single info");
+    }
+    return std::shared_ptr<Part>(info, part.get());
+  };
+
+  cls.def("to_bytes", getState)
+      .def_static("from_bytes", setState)
+      .def(py::pickle(getState, setState));
+}
+
+// Binds a vector field of the infos as a read-only sequence that converts its
+// elements on access. Elements are returned as copies, which for the shared
+// pointers are the same Python objects as elsewhere and for value types like
+// clang::graph::TokenInfo fresh objects on every access, as with lists.
+template <typename Vector>
+void defInfoSequence(py::module m, const char *name) {
+  using Value = typename Vector::value_type;
+
+  py::class_<Vector>(m, name)
+      .def("__len__", [](const Vector &v) { return v.size(); })
+      .def("__getitem__",
+           [](const Vector &v, py::ssize_t i) -> Value {
+             if (i < 0) i += v.size();
+             if (i < 0 || size_t(i) >= v.size()) throw py::index_error();
+             return v[i];
+           })
+      .def("__getitem__",
+           [](const Vector &v, py::slice slice) {
+             size_t start, stop, step, length;
+             if (!slice.compute(v.size(), &start, &stop, &step, &length)) {
+               throw py::error_already_set();
+             }
+             py::list items;
+             for (size_t i = 0; i < length; ++i, start += step) {
+               items.append(py::cast(v[start], py::return_value_policy::copy));
+             }
+             return items;
+           })
+      .def("__iter__",
+           [](const Vector &v) {
+             return py::make_iterator<py::return_value_policy::copy>(v.begin(),
+                                                                     v.end());
+           },
+           py::keep_alive<0, 1>())
+      // Compares like a list, so that e.g. comparing with a list of infos
+      // keeps working.
+      .def("__eq__",
+           [](py::object self, py::object other) {
+             if (py::isinstance<Vector>(other)) other = py::list(other);
+             return py::list(self).equal(other);
+           })
+      .def("__repr__",
+           [](py::object self) { return py::repr(py::list(self)); });
+}
+
+// Returns a read-only numpy array that shares memory with values, which are
+// kept alive by owner.
+template <typename T>
+py::array_t<T> arrayView(const std::vector<T> &values,
+                         std::vector<py::ssize_t> shape, py::handle owner) {
+  if (values.empty()) return py::array_t<T>(shape);
+
+  py::array_t<T> array(shape, values.data(), owner);
+  array.attr("setflags")(py::arg("write") = false);
+  return array;
+}
+
+using NodeCaster = py::object (*)(uint8_t, const std::shared_ptr<void> &,
+                                  const std::shared_ptr<void> &);
+
+// Binds the arrays of a native graph builder. castNode converts the objects
+// behind a node to Python.
+template <typename Arrays>
+void defGraphArrays(py::module m, NodeCaster castNode) {
+  py::class_<Arrays, std::shared_ptr<Arrays>>(m, "GraphArrays")
+      .def_property_readonly("labels",
+                             [](const Arrays &arrays) {
+                               py::list labels;
+                               for (const auto &label : arrays.labels) {
+                                 if (label.size() == 1) {
+                                   labels.append(py::str(label[0]));
+                                 } else {
+                                   labels.append(py::tuple(py::cast(label)));
+                                 }
+                               }
+                               return labels;
+                             })
+      .def_property_readonly("nodes",
+                             [](py::object self) {
+                               const auto &nodes = self.cast<const Arrays &>().nodes;
+                               return arrayView(nodes, {py::ssize_t(nodes.size())}, self);
+                             })
+      .def_property_readonly("seq_order",
+                             [](py::object self) {
+                               const auto &order = self.cast<const Arrays &>().seqOrder;
+                               return arrayView(order, {py::ssize_t(order.size())}, self);
+                             })
+      .def_property_readonly("edges",
+                             [](py::object self) {
+                               const auto &edges = self.cast<const Arrays &>().edges;
+                               return arrayView(edges, {py::ssize_t(edges.size() / 3), 3}, self);
+                             })
+      .def_property_readonly("offsets",
+                             [](py::object self) {
+                               const auto &offsets = self.cast<const Arrays &>().offsets;
+                               return arrayView(offsets, {py::ssize_t(offsets.size())}, self);
+                             })
+      .def("nodeObjects", [castNode](const Arrays &arrays) {
+        py::list objects;
+        for (size_t i = 0; i < arrays.objects.size(); ++i) {
+          objects.append(castNode(arrays.objectTypes[i],
+                                  arrays.objects[i].first,
+                                  arrays.objects[i].second));
+        }
+        return objects;
+      });
+}
+
+template <typename T>
+py::object castShared(const std::shared_ptr<void> &object) {
+  return py::cast(std::static_pointer_cast<T>(object));
+}
+
+py::object castClangNode(uint8_t type, const std::shared_ptr<void> &first,
+                         const std::shared_ptr<void> &second) {
+  switch (static_cast<cg::NodeType>(type)) {
+    case cg::NodeType::FUNCTION:
+      return castShared<cg::FunctionInfo>(first);
+    case cg::NodeType::DECL:
+      return castShared<cg::DeclInfo>(first);
+    case cg::NodeType::STMT:
+      return castShared<cg::StmtInfo>(first);
+    case cg::NodeType::RECORD:
+      return castShared<cg::RecordInfo>(first);
+    case cg::NodeType::CFG_BLOCK:
+      return castShared<cg::CFGBlockInfo>(first);
+    case cg::NodeType::TOKEN:
+      return castShared<cg::TokenInfo>(first);
+  }
+  throw std::invalid_argument("Unknown node type");
+}
+
+py::object castLLVMNode(uint8_t type, const std::shared_ptr<void> &first,
+                        const std::shared_ptr<void> &second) {
+  switch (static_cast<lg::NodeType>(type)) {
+    case lg::NodeType::FUNCTION:
+      return castShared<lg::FunctionInfo>(first);
+    case lg::NodeType::BASIC_BLOCK:
+      return castShared<lg::BasicBlockInfo>(first);
+    case lg::NodeType::INSTRUCTION:
+      return castShared<lg::InstructionInfo>(first);
+    case lg::NodeType::ARG:
+      return castShared<lg::ArgInfo>(first);
+    case lg::NodeType::CONSTANT:
+      return castShared<lg::ConstantInfo>(first);
+    case lg::NodeType::OPERAND_USE:
+      return py::make_tuple(castShared<lg::InstructionInfo>(first),
+                            castShared<lg::InstructionInfo>(second));
+  }
+  throw std::invalid_argument("Unknown node type");
+}
+
 void registerSimpleClangDriver(py::module m) {
   py::class_<SCD, std::shared_ptr<SCD>> simpleClangDriver(m, "SimpleClangDriver");
   simpleClangDriver
@@ -112,7 +370,34 @@ void registerClangDriver(py::module m) {
       .def("getFileName", &CD::getFileName)
       .def("setFileName", &CD::setFileName)
       .def("getCompilerBinary", &CD::getCompilerBinary)
-      .def("setCompilerBinary", &CD::setCompilerBinary);
+      .def("setCompilerBinary", &CD::setCompilerBinary)
+      .def("getProgrammingLanguage", &CD::getProgrammingLanguage)
+      .def("getOptimizationLevel", &CD::getOptimizationLevel)
+      .def("getIncludeDirs", &CD::getIncludeDirs)
+      .def("getCompilerFlags", &CD::getCompilerFlags)
+      .def("setVirtualFiles", &CD::setVirtualFiles)
+      .def("getVirtualFiles", &CD::getVirtualFiles)
+      .def("setPrefixHeader", &CD::setPrefixHeader)
+      .def("getPrefixHeader", &CD::getPrefixHeader)
+      .def("setPCHDirectory", &CD::setPCHDirectory)
+      .def("getPCHDirectory", &CD::getPCHDirectory)
+      .def("setSessionEnabled", &CD::setSessionEnabled)
+      .def("isSessionEnabled", &CD::isSessionEnabled)
+      .def("resetSession", &CD::resetSession)
+      .def("setTimeout", &CD::setTimeout)
+      .def("getTimeout", &CD::getTimeout)
+      .def("setMaxASTSize", &CD::setMaxASTSize)
+      .def("getMaxASTSize", &CD::getMaxASTSize)
+      .def("setMaxIRSize", &CD::setMaxIRSize)
+      .def("getMaxIRSize", &CD::getMaxIRSize)
+      .def("setMemoryLimit", &CD::setMemoryLimit)
+      .def("getMemoryLimit", &CD::getMemoryLimit)
+      .def("clone", &CD::clone);
+
+  // A RuntimeError, so that callers that skip sources which fail to compile
+  // skip these as well.
+  py::register_exception<ResourceLimitExceeded>(m, "ResourceLimitExceeded",
+                                                PyExc_RuntimeError);
 
   py::enum_<CD::ProgrammingLanguage>(clangDriver, "ProgrammingLanguage")
       .value("C", CD::ProgrammingLanguage::C)
@@ -135,24 +420,103 @@ void registerClangDriver(py::module m) {
       .export_values();
 }
 
+void registerStringInterner(py::module m) {
+  // The ids of the ...Id fields of the infos, see StringInterner::global().
+  m.def("internString", [](const std::string &s) {
+    return StringInterner::global().intern(s);
+  });
+  m.def("internedString", [](int32_t id) {
+    return StringInterner::global().lookup(id);
+  });
+  m.def("numInternedStrings",
+        []() { return StringInterner::global().size(); });
+}
+
+void registerFunctionFilter(py::module m) {
+  // A Python predicate is called with the GIL acquired, also from the workers
+  // of the batch methods.
+  py::class_<FunctionFilter, FunctionFilterPtr>(m, "FunctionFilter")
+      .def(py::init([](std::vector<std::string> names, py::object predicate,
+                       bool skipSystemHeaders) {
+             auto filter = std::make_shared<FunctionFilter>();
+             filter->names = std::move(names);
+             if (!predicate.is_none()) {
+               filter->predicate =
+                   predicate.cast<std::function<bool(const std::string &)>>();
+             }
+             filter->skipSystemHeaders = skipSystemHeaders;
+             return filter;
+           }),
+           py::arg("names") = std::vector<std::string>(),
+           py::arg("predicate") = py::none(),
+           py::arg("skipSystemHeaders") = false)
+      .def_readwrite("names", &FunctionFilter::names)
+      .def_readwrite("predicate", &FunctionFilter::predicate)
+      .def_readwrite("skipSystemHeaders", &FunctionFilter::skipSystemHeaders)
+      .def("accepts", &FunctionFilter::accepts);
+}
+
 void registerClangExtractor(py::module m_parent) {
   // Extractor
   py::class_<CE> clangExtractor(m_parent, "ClangExtractor");
   clangExtractor.def(py::init<ClangDriverPtr>());
-  clangExtractor.def("GraphFromString", &CE::GraphFromString);
-  clangExtractor.def("SeqFromString", &CE::SeqFromString);
+  clangExtractor.def("setFunctionFilter", &CE::setFunctionFilter);
+  clangExtractor.def("getFunctionFilter", &CE::getFunctionFilter);
+  // The single-source methods release the GIL as well, so that several
+  // threads can extract at once, each with an extractor of its own.
+  clangExtractor.def("GraphFromString", &CE::GraphFromString, py::arg("src"),
+                     py::call_guard<py::gil_scoped_release>());
+  clangExtractor.def("SeqFromString", &CE::SeqFromString, py::arg("src"),
+                     py::arg("lex_only") = false,
+                     py::call_guard<py::gil_scoped_release>());
+  clangExtractor.def("GraphFromStrings", &CE::GraphFromStrings, py::arg("srcs"),
+                     py::arg("num_workers") = 0,
+                     py::arg("drivers") = std::vector<ClangDriverPtr>(),
+                     py::call_guard<py::gil_scoped_release>());
+  clangExtractor.def("SeqFromStrings", &CE::SeqFromStrings, py::arg("srcs"),
+                     py::arg("num_workers") = 0,
+                     py::arg("drivers") = std::vector<ClangDriverPtr>(),
+                     py::arg("lex_only") = false,
+                     py::call_guard<py::gil_scoped_release>());
+  clangExtractor.def("GraphFromFile", &CE::GraphFromFile, py::arg("path"),
+                     py::call_guard<py::gil_scoped_release>());
+  clangExtractor.def("SeqFromFile", &CE::SeqFromFile, py::arg("path"),
+                     py::arg("lex_only") = false,
+                     py::call_guard<py::gil_scoped_release>());
+  clangExtractor.def("GraphFromFiles", &CE::GraphFromFiles, py::arg("paths"),
+                     py::arg("num_workers") = 0,
+                     py::arg("drivers") = std::vector<ClangDriverPtr>(),
+                     py::call_guard<py::gil_scoped_release>());
+  clangExtractor.def("SeqFromFiles", &CE::SeqFromFiles, py::arg("paths"),
+                     py::arg("num_workers") = 0,
+                     py::arg("drivers") = std::vector<ClangDriverPtr>(),
+                     py::arg("lex_only") = false,
+                     py::call_guard<py::gil_scoped_release>());
 
   py::module m = m_parent.def_submodule("clang");
 
   // Subtypes
   py::module m_graph = m.def_submodule("graph");
 
+  defInfoSequence<std::vector<cg::FunctionInfoPtr>>(m_graph,
+                                                    "FunctionInfoList");
+  defInfoSequence<std::vector<cg::RecordInfoPtr>>(m_graph, "RecordInfoList");
+  defInfoSequence<std::vector<cg::EnumDeclInfoPtr>>(m_graph,
+                                                    "EnumDeclInfoList");
+  defInfoSequence<std::vector<cg::DeclInfoPtr>>(m_graph, "DeclInfoList");
+  defInfoSequence<std::vector<cg::CFGBlockInfoPtr>>(m_graph,
+                                                    "CFGBlockInfoList");
+  defInfoSequence<std::vector<cg::StmtInfoPtr>>(m_graph, "StmtInfoList");
+  defInfoSequence<std::vector<cg::OperandInfoPtr>>(m_graph, "OperandInfoList");
+  defInfoSequence<std::vector<cg::TokenInfo>>(m_graph, "TokenInfoList");
+
   // Graph extractor
-  py::class_<cg::ExtractionInfo, std::shared_ptr<cg::ExtractionInfo>>(
-      m_graph, "ExtractionInfo")
-      .def("accept", &cg::ExtractionInfo::accept)
+  py::class_<cg::ExtractionInfo, std::shared_ptr<cg::ExtractionInfo>>
+      cgExtractionInfo(m_graph, "ExtractionInfo");
+  cgExtractionInfo.def("accept", &cg::ExtractionInfo::accept)
       .def_readonly("functionInfos", &cg::ExtractionInfo::functionInfos)
       .def_readonly("recordInfos", &cg::ExtractionInfo::recordInfos);
+  defSerialization(cgExtractionInfo, &cg::Serialize, &cg::Deserialize);
 
   py::class_<cg::DeclInfo, std::shared_ptr<cg::DeclInfo>>(m_graph, "DeclInfo")
       .def_readonly("name", &cg::DeclInfo::name)
@@ -167,9 +531,10 @@ void registerClangExtractor(py::module m_parent) {
       .def_readonly("name", &cg::EnumDeclInfo::name)
       .def_readonly("tokens", &cg::EnumDeclInfo::tokens);
 
-  py::class_<cg::FunctionInfo, std::shared_ptr<cg::FunctionInfo>>(
-      m_graph, "FunctionInfo")
-      .def("accept", &cg::FunctionInfo::accept)
+  py::class_<cg::FunctionInfo, std::shared_ptr<cg::FunctionInfo>>
+      cgFunctionInfo(m_graph, "FunctionInfo");
+  defFunctionSerialization(cgFunctionInfo, &cg::Serialize, &cg::Deserialize);
+  cgFunctionInfo.def("accept", &cg::FunctionInfo::accept)
       .def_readonly("name", &cg::FunctionInfo::name)
       .def_readonly("tokens", &cg::FunctionInfo::tokens)
       .def_readonly("type", &cg::FunctionInfo::type)
@@ -183,8 +548,22 @@ void registerClangExtractor(py::module m_parent) {
       .def_readonly("statements", &cg::CFGBlockInfo::statements)
       .def_readonly("successors", &cg::CFGBlockInfo::successors);
 
-  py::class_<cg::StmtInfo, std::shared_ptr<cg::StmtInfo>>(m_graph, "StmtInfo")
-      .def_readonly("name", &cg::StmtInfo::name)
+  // A statement is serialized as the entry statement of an empty function.
+  py::class_<cg::StmtInfo, std::shared_ptr<cg::StmtInfo>> cgStmtInfo(
+      m_graph, "StmtInfo");
+  defPartSerialization(
+      cgStmtInfo, &cg::Serialize, &cg::Deserialize,
+      [](cg::ExtractionInfo &info, const cg::StmtInfoPtr &stmt) {
+        auto function = std::make_shared<cg::FunctionInfo>();
+        function->entryStmt = stmt;
+        info.functionInfos.push_back(function);
+      },
+      [](const cg::ExtractionInfo &info) {
+        return info.functionInfos.size() == 1
+                   ? info.functionInfos[0]->entryStmt
+                   : nullptr;
+      });
+  cgStmtInfo.def_readonly("name", &cg::StmtInfo::name)
       .def_readonly("tokens", &cg::StmtInfo::tokens)
       .def_readonly("ast_relations", &cg::StmtInfo::ast_relations)
       .def_readonly("ref_relations", &cg::StmtInfo::ref_relations);
@@ -201,54 +580,186 @@ void registerClangExtractor(py::module m_parent) {
                                                             "TokenInfo")
       .def_readonly("name", &cg::TokenInfo::name)
       .def_readonly("kind", &cg::TokenInfo::kind)
+      .def_readonly("nameId", &cg::TokenInfo::nameId)
+      .def_readonly("kindId", &cg::TokenInfo::kindId)
       .def_readonly("index", &cg::TokenInfo::index);
 
+  // Native graph builders
+  py::enum_<cg::GraphKind>(m_graph, "GraphKind")
+      .value("AST", cg::GraphKind::AST)
+      .value("AST_DATA", cg::GraphKind::AST_DATA)
+      .value("AST_DATA_CFG", cg::GraphKind::AST_DATA_CFG)
+      .value("AST_DATA_CFG_TOKEN", cg::GraphKind::AST_DATA_CFG_TOKEN);
+
+  defGraphArrays<cg::GraphArrays>(m_graph, &castClangNode);
+
+  m_graph.def("buildGraph",
+              py::overload_cast<const cg::ExtractionInfoPtr &, cg::GraphKind>(
+                  &cg::BuildGraph),
+              py::arg("info"), py::arg("kind"),
+              py::call_guard<py::gil_scoped_release>());
+  m_graph.def("buildGraph",
+              py::overload_cast<const cg::FunctionInfoPtr &, cg::GraphKind>(
+                  &cg::BuildGraph),
+              py::arg("info"), py::arg("kind"),
+              py::call_guard<py::gil_scoped_release>());
+
   // Sequence extractor
   py::module m_seq = m.def_submodule("seq");
 
-  py::class_<cs::ExtractionInfo, std::shared_ptr<cs::ExtractionInfo>>(
-      m_seq, "ExtractionInfo")
-      .def("accept", &cs::ExtractionInfo::accept)
+  defInfoSequence<std::vector<cs::FunctionInfoPtr>>(m_seq, "FunctionInfoList");
+  defInfoSequence<std::vector<cs::TokenInfoPtr>>(m_seq, "TokenInfoList");
+
+  py::class_<cs::ExtractionInfo, std::shared_ptr<cs::ExtractionInfo>>
+      csExtractionInfo(m_seq, "ExtractionInfo");
+  csExtractionInfo.def("accept", &cs::ExtractionInfo::accept)
       .def_readonly("functionInfos", &cs::ExtractionInfo::functionInfos);
+  defSerialization(csExtractionInfo, &cs::Serialize, &cs::Deserialize);
 
-  py::class_<cs::FunctionInfo, std::shared_ptr<cs::FunctionInfo>>(
-      m_seq, "FunctionInfo")
-      .def("accept", &cs::FunctionInfo::accept)
+  py::class_<cs::FunctionInfo, std::shared_ptr<cs::FunctionInfo>>
+      csFunctionInfo(m_seq, "FunctionInfo");
+  defFunctionSerialization(csFunctionInfo, &cs::Serialize, &cs::Deserialize);
+  csFunctionInfo.def("accept", &cs::FunctionInfo::accept)
       .def_readonly("name", &cs::FunctionInfo::name)
       .def_readonly("tokenInfos", &cs::FunctionInfo::tokenInfos);
 
   py::class_<cs::TokenInfo, std::shared_ptr<cs::TokenInfo>>(m_seq, "TokenInfo")
       .def_readonly("name", &cs::TokenInfo::name)
-      .def_readonly("kind", &cs::TokenInfo::kind);
+      .def_readonly("kind", &cs::TokenInfo::kind)
+      .def_readonly("nameId", &cs::TokenInfo::nameId)
+      .def_readonly("kindId", &cs::TokenInfo::kindId);
 }
 
 void registerLLVMExtractor(py::module m_parent) {
+  // Subtypes
+  py::module m = m_parent.def_submodule("llvm");
+  py::module m_graph = m.def_submodule("graph");
+
+  // Extraction options, registered before they are used as default arguments
+  py::class_<lg::ExtractionOptions>(m_graph, "ExtractionOptions")
+      .def(py::init([](bool memoryAccesses, bool callGraph, bool constants) {
+             return lg::ExtractionOptions{memoryAccesses, callGraph, constants};
+           }),
+           py::arg("memoryAccesses") = true, py::arg("callGraph") = true,
+           py::arg("constants") = true)
+      .def_readwrite("memoryAccesses", &lg::ExtractionOptions::memoryAccesses)
+      .def_readwrite("callGraph", &lg::ExtractionOptions::callGraph)
+      .def_readwrite("constants", &lg::ExtractionOptions::constants);
+
   // Extractor
   py::class_<LE> llvmExtractor(m_parent, "LLVMIRExtractor");
   llvmExtractor.def(py::init<ClangDriverPtr>());
-  llvmExtractor.def("GraphFromString", &LE::GraphFromString);
-  llvmExtractor.def("SeqFromString", &LE::SeqFromString);
-
-  // Subtypes
-  py::module m = m_parent.def_submodule("llvm");
+  llvmExtractor.def("setFunctionFilter", &LE::setFunctionFilter);
+  llvmExtractor.def("getFunctionFilter", &LE::getFunctionFilter);
+  // The single-source methods release the GIL as well, so that several
+  // threads can extract at once, each with an extractor of its own.
+  llvmExtractor.def("GraphFromString", &LE::GraphFromString, py::arg("src"),
+                    py::arg("options") = lg::ExtractionOptions(),
+                    py::call_guard<py::gil_scoped_release>());
+  llvmExtractor.def("SeqFromString", &LE::SeqFromString, py::arg("src"),
+                    py::call_guard<py::gil_scoped_release>());
+  llvmExtractor.def("GraphFromStrings", &LE::GraphFromStrings, py::arg("srcs"),
+                    py::arg("num_workers") = 0,
+                    py::arg("drivers") = std::vector<ClangDriverPtr>(),
+                    py::arg("options") = lg::ExtractionOptions(),
+                    py::call_guard<py::gil_scoped_release>());
+  llvmExtractor.def("SeqFromStrings", &LE::SeqFromStrings, py::arg("srcs"),
+                    py::arg("num_workers") = 0,
+                    py::arg("drivers") = std::vector<ClangDriverPtr>(),
+                    py::call_guard<py::gil_scoped_release>());
+  llvmExtractor.def("GraphFromFile", &LE::GraphFromFile, py::arg("path"),
+                    py::arg("options") = lg::ExtractionOptions(),
+                    py::call_guard<py::gil_scoped_release>());
+  llvmExtractor.def("SeqFromFile", &LE::SeqFromFile, py::arg("path"),
+                    py::call_guard<py::gil_scoped_release>());
+  // The callbacks are called with the GIL acquired.
+  llvmExtractor.def("GraphFunctionsFromString", &LE::GraphFunctionsFromString,
+                    py::arg("src"), py::arg("callback"),
+                    py::arg("options") = lg::ExtractionOptions(),
+                    py::call_guard<py::gil_scoped_release>());
+  llvmExtractor.def("SeqFunctionsFromString", &LE::SeqFunctionsFromString,
+                    py::arg("src"), py::arg("callback"),
+                    py::call_guard<py::gil_scoped_release>());
+  llvmExtractor.def("GraphFunctionsFromFile", &LE::GraphFunctionsFromFile,
+                    py::arg("path"), py::arg("callback"),
+                    py::arg("options") = lg::ExtractionOptions(),
+                    py::call_guard<py::gil_scoped_release>());
+  llvmExtractor.def("SeqFunctionsFromFile", &LE::SeqFunctionsFromFile,
+                    py::arg("path"), py::arg("callback"),
+                    py::call_guard<py::gil_scoped_release>());
+  llvmExtractor.def("GraphFromStringAtLevels", &LE::GraphFromStringAtLevels,
+                    py::arg("src"), py::arg("levels"),
+                    py::arg("options") = lg::ExtractionOptions(),
+                    py::call_guard<py::gil_scoped_release>());
+  llvmExtractor.def("SeqFromStringAtLevels", &LE::SeqFromStringAtLevels,
+                    py::arg("src"), py::arg("levels"),
+                    py::call_guard<py::gil_scoped_release>());
+  llvmExtractor.def("GraphFromFileAtLevels", &LE::GraphFromFileAtLevels,
+                    py::arg("path"), py::arg("levels"),
+                    py::arg("options") = lg::ExtractionOptions(),
+                    py::call_guard<py::gil_scoped_release>());
+  llvmExtractor.def("SeqFromFileAtLevels", &LE::SeqFromFileAtLevels,
+                    py::arg("path"), py::arg("levels"),
+                    py::call_guard<py::gil_scoped_release>());
+  llvmExtractor.def("GraphFromFiles", &LE::GraphFromFiles, py::arg("paths"),
+                    py::arg("num_workers") = 0,
+                    py::arg("drivers") = std::vector<ClangDriverPtr>(),
+                    py::arg("options") = lg::ExtractionOptions(),
+                    py::call_guard<py::gil_scoped_release>());
+  llvmExtractor.def("SeqFromFiles", &LE::SeqFromFiles, py::arg("paths"),
+                    py::arg("num_workers") = 0,
+                    py::arg("drivers") = std::vector<ClangDriverPtr>(),
+                    py::call_guard<py::gil_scoped_release>());
 
   // Graph extractor
-  py::module m_graph = m.def_submodule("graph");
-
-  py::class_<lg::ExtractionInfo, std::shared_ptr<lg::ExtractionInfo>>(
-      m_graph, "ExtractionInfo")
-      .def("accept", &lg::ExtractionInfo::accept)
+  defInfoSequence<std::vector<lg::FunctionInfoPtr>>(m_graph,
+                                                    "FunctionInfoList");
+  defInfoSequence<std::vector<lg::BasicBlockInfoPtr>>(m_graph,
+                                                      "BasicBlockInfoList");
+  defInfoSequence<std::vector<lg::InstructionInfoPtr>>(m_graph,
+                                                       "InstructionInfoList");
+  defInfoSequence<std::vector<lg::OperandInfoPtr>>(m_graph, "OperandInfoList");
+  defInfoSequence<std::vector<lg::ArgInfoPtr>>(m_graph, "ArgInfoList");
+  defInfoSequence<std::vector<lg::MemoryAccessInfoPtr>>(
+      m_graph, "MemoryAccessInfoList");
+
+  py::class_<lg::ExtractionInfo, std::shared_ptr<lg::ExtractionInfo>>
+      lgExtractionInfo(m_graph, "ExtractionInfo");
+  lgExtractionInfo.def("accept", &lg::ExtractionInfo::accept)
       .def_readonly("functionInfos", &lg::ExtractionInfo::functionInfos)
       .def_readonly("callGraphInfo", &lg::ExtractionInfo::callGraphInfo);
-
-  py::class_<lg::InstructionInfo, std::shared_ptr<lg::InstructionInfo>>(
-      m_graph, "InstructionInfo")
-      .def_readonly("type", &lg::InstructionInfo::type)
+  defSerialization(lgExtractionInfo, &lg::Serialize, &lg::Deserialize);
+
+  // An instruction is serialized as the entry instruction of an empty
+  // function, followed by the function it belongs to, which it only refers
+  // to weakly.
+  py::class_<lg::InstructionInfo, std::shared_ptr<lg::InstructionInfo>>
+      lgInstructionInfo(m_graph, "InstructionInfo");
+  defPartSerialization(
+      lgInstructionInfo, &lg::Serialize, &lg::Deserialize,
+      [](lg::ExtractionInfo &info, const lg::InstructionInfoPtr &instruction) {
+        auto function = std::make_shared<lg::FunctionInfo>();
+        function->entryInstruction = instruction;
+        info.functionInfos.push_back(function);
+        if (auto owner = instruction->function.lock()) {
+          info.functionInfos.push_back(owner);
+        }
+      },
+      [](const lg::ExtractionInfo &info) {
+        return info.functionInfos.empty()
+                   ? nullptr
+                   : info.functionInfos[0]->entryInstruction;
+      });
+  lgInstructionInfo.def_readonly("type", &lg::InstructionInfo::type)
       .def_readonly("opcode", &lg::InstructionInfo::opcode)
+      .def_readonly("typeId", &lg::InstructionInfo::typeId)
+      .def_readonly("opcodeId", &lg::InstructionInfo::opcodeId)
       .def_readonly("callTarget", &lg::InstructionInfo::callTarget)
       .def_readonly("isLoadOrStore", &lg::InstructionInfo::isLoadOrStore)
       .def_readonly("operands", &lg::InstructionInfo::operands)
-      .def_readonly("function", &lg::InstructionInfo::function);
+      .def_property_readonly("function", [](const lg::InstructionInfo &info) {
+        return info.function.lock();
+      });
 
   py::class_<lg::MemoryAccessInfo, std::shared_ptr<lg::MemoryAccessInfo>>(
       m_graph, "MemoryAccessInfo")
@@ -263,11 +774,13 @@ void registerLLVMExtractor(py::module m_parent) {
       .def_readonly("instructions", &lg::BasicBlockInfo::instructions)
       .def_readonly("successors", &lg::BasicBlockInfo::successors);
 
-  py::class_<lg::FunctionInfo, std::shared_ptr<lg::FunctionInfo>>(
-      m_graph, "FunctionInfo")
-      .def("accept", &lg::FunctionInfo::accept)
+  py::class_<lg::FunctionInfo, std::shared_ptr<lg::FunctionInfo>>
+      lgFunctionInfo(m_graph, "FunctionInfo");
+  defFunctionSerialization(lgFunctionInfo, &lg::Serialize, &lg::Deserialize);
+  lgFunctionInfo.def("accept", &lg::FunctionInfo::accept)
       .def_readonly("name", &lg::FunctionInfo::name)
       .def_readonly("type", &lg::FunctionInfo::type)
+      .def_readonly("typeId", &lg::FunctionInfo::typeId)
       .def_readonly("entryInstruction", &lg::FunctionInfo::entryInstruction)
       .def_readonly("exitInstructions", &lg::FunctionInfo::exitInstructions)
       .def_readonly("args", &lg::FunctionInfo::args)
@@ -280,23 +793,53 @@ void registerLLVMExtractor(py::module m_parent) {
 
   py::class_<lg::ArgInfo, std::shared_ptr<lg::ArgInfo>>(m_graph, "ArgInfo")
       .def_readonly("name", &lg::ArgInfo::name)
-      .def_readonly("type", &lg::ArgInfo::type);
+      .def_readonly("type", &lg::ArgInfo::type)
+      .def_readonly("typeId", &lg::ArgInfo::typeId);
 
   py::class_<lg::ConstantInfo, std::shared_ptr<lg::ConstantInfo>>(
       m_graph, "ConstantInfo")
-      .def_readonly("type", &lg::ConstantInfo::type);
+      .def_readonly("type", &lg::ConstantInfo::type)
+      .def_readonly("typeId", &lg::ConstantInfo::typeId);
+
+  // Native graph builders
+  py::enum_<lg::GraphKind>(m_graph, "GraphKind")
+      .value("CDFG", lg::GraphKind::CDFG)
+      .value("CDFG_CALL", lg::GraphKind::CDFG_CALL)
+      .value("CDFG_PLUS", lg::GraphKind::CDFG_PLUS)
+      .value("PROGRAML", lg::GraphKind::PROGRAML);
+
+  defGraphArrays<lg::GraphArrays>(m_graph, &castLLVMNode);
+
+  m_graph.def("buildGraph",
+              py::overload_cast<const lg::ExtractionInfoPtr &, lg::GraphKind>(
+                  &lg::BuildGraph),
+              py::arg("info"), py::arg("kind"),
+              py::call_guard<py::gil_scoped_release>());
+  m_graph.def("buildGraph",
+              py::overload_cast<const lg::FunctionInfoPtr &, lg::GraphKind>(
+                  &lg::BuildGraph),
+              py::arg("info"), py::arg("kind"),
+              py::call_guard<py::gil_scoped_release>());
 
   // Sequence extractor
   py::module m_seq = m.def_submodule("seq");
 
-  py::class_<ls::ExtractionInfo, std::shared_ptr<ls::ExtractionInfo>>(
-      m_seq, "ExtractionInfo")
-      .def("accept", &ls::ExtractionInfo::accept)
+  defInfoSequence<std::vector<ls::FunctionInfoPtr>>(m_seq, "FunctionInfoList");
+  defInfoSequence<std::vector<ls::BasicBlockInfoPtr>>(m_seq,
+                                                      "BasicBlockInfoList");
+  defInfoSequence<std::vector<ls::InstructionInfoPtr>>(m_seq,
+                                                       "InstructionInfoList");
+
+  py::class_<ls::ExtractionInfo, std::shared_ptr<ls::ExtractionInfo>>
+      lsExtractionInfo(m_seq, "ExtractionInfo");
+  lsExtractionInfo.def("accept", &ls::ExtractionInfo::accept)
       .def_readonly("functionInfos", &ls::ExtractionInfo::functionInfos);
+  defSerialization(lsExtractionInfo, &ls::Serialize, &ls::Deserialize);
 
-  py::class_<ls::FunctionInfo, std::shared_ptr<ls::FunctionInfo>>(
-      m_seq, "FunctionInfo")
-      .def("accept", &ls::FunctionInfo::accept)
+  py::class_<ls::FunctionInfo, std::shared_ptr<ls::FunctionInfo>>
+      lsFunctionInfo(m_seq, "FunctionInfo");
+  defFunctionSerialization(lsFunctionInfo, &ls::Serialize, &ls::Deserialize);
+  lsFunctionInfo.def("accept", &ls::FunctionInfo::accept)
       .def_readonly("name", &ls::FunctionInfo::name)
       .def_readonly("signature", &ls::FunctionInfo::signature)
       .def_readonly("basicBlocks", &ls::FunctionInfo::basicBlocks)
@@ -307,9 +850,53 @@ void registerLLVMExtractor(py::module m_parent) {
       .def_readonly("name", &ls::BasicBlockInfo::name)
       .def_readonly("instructions", &ls::BasicBlockInfo::instructions);
 
-  py::class_<ls::InstructionInfo, std::shared_ptr<ls::InstructionInfo>>(
-      m_seq, "InstructionInfo")
-      .def_readonly("tokens", &ls::InstructionInfo::tokens);
+  // An instruction is serialized in a function with a single basic block.
+  py::class_<ls::InstructionInfo, std::shared_ptr<ls::InstructionInfo>>
+      lsInstructionInfo(m_seq, "InstructionInfo");
+  defPartSerialization(
+      lsInstructionInfo, &ls::Serialize, &ls::Deserialize,
+      [](ls::ExtractionInfo &info, const ls::InstructionInfoPtr &instruction) {
+        auto basicBlock = std::make_shared<ls::BasicBlockInfo>();
+        basicBlock->instructions.push_back(instruction);
+        auto function = std::make_shared<ls::FunctionInfo>();
+        function->basicBlocks.push_back(basicBlock);
+        info.functionInfos.push_back(function);
+      },
+      [](const ls::ExtractionInfo &info) -> ls::InstructionInfoPtr {
+        if (info.functionInfos.size() != 1 ||
+            info.functionInfos[0]->basicBlocks.size() != 1 ||
+            info.functionInfos[0]->basicBlocks[0]->instructions.size() != 1) {
+          return nullptr;
+        }
+        return info.functionInfos[0]->basicBlocks[0]->instructions[0];
+      });
+  lsInstructionInfo.def_readonly("tokens", &ls::InstructionInfo::tokens);
+}
+
+void registerCombinedExtractor(py::module m) {
+  py::class_<compy::GraphInfos, compy::GraphInfosPtr>(m, "GraphInfos")
+      .def_readonly("clangInfo", &compy::GraphInfos::clangInfo)
+      .def_readonly("llvmInfo", &compy::GraphInfos::llvmInfo);
+
+  // Extractor
+  py::class_<CBE> combinedExtractor(m, "CombinedExtractor");
+  combinedExtractor.def(py::init<ClangDriverPtr>());
+  combinedExtractor.def("setFunctionFilter", &CBE::setFunctionFilter);
+  combinedExtractor.def("getFunctionFilter", &CBE::getFunctionFilter);
+  combinedExtractor.def("GraphsFromString", &CBE::GraphsFromString,
+                        py::arg("src"),
+                        py::call_guard<py::gil_scoped_release>());
+  combinedExtractor.def("GraphsFromFile", &CBE::GraphsFromFile,
+                        py::arg("path"),
+                        py::call_guard<py::gil_scoped_release>());
+  combinedExtractor.def("GraphsFromStrings", &CBE::GraphsFromStrings,
+                        py::arg("srcs"), py::arg("num_workers") = 0,
+                        py::arg("drivers") = std::vector<ClangDriverPtr>(),
+                        py::call_guard<py::gil_scoped_release>());
+  combinedExtractor.def("GraphsFromFiles", &CBE::GraphsFromFiles,
+                        py::arg("paths"), py::arg("num_workers") = 0,
+                        py::arg("drivers") = std::vector<ClangDriverPtr>(),
+                        py::call_guard<py::gil_scoped_release>());
 }
 
 PYBIND11_MODULE(extractors, m) {
@@ -319,7 +906,10 @@ PYBIND11_MODULE(extractors, m) {
 
   registerSimpleClangDriver(m);
   registerClangDriver(m);
+  registerFunctionFilter(m);
+  registerStringInterner(m);
 
   registerClangExtractor(m);
   registerLLVMExtractor(m);
+  registerCombinedExtractor(m);
 }
@@ -1,9 +1,17 @@
+import os
+import pickle
+
 import pytest
 
 from compy.representations.extractors.extractors import Visitor
 from compy.representations.extractors.extractors import ClangDriver
 from compy.representations.extractors.extractors import ClangExtractor
+from compy.representations.extractors.extractors import CombinedExtractor
+from compy.representations.extractors.extractors import FunctionFilter
+from compy.representations.extractors.extractors import internString
+from compy.representations.extractors.extractors import internedString
 from compy.representations.extractors.extractors import LLVMIRExtractor
+from compy.representations.extractors.extractors import ResourceLimitExceeded
 from compy.representations.extractors.extractors import clang
 from compy.representations.extractors.extractors import llvm
 
@@ -99,6 +107,139 @@ def test_llvm_graph_from_several_functions(llvm_extractor_fixture):
     assert len(info2.functionInfos) == 2
 
 
+def test_llvm_graph_without_optional_analyses(llvm_extractor_fixture):
+    options = llvm.graph.ExtractionOptions(memoryAccesses=False, callGraph=False, constants=False)
+    info = llvm_extractor_fixture.GraphFromString(program_2fn, options=options)
+
+    assert [x.name for x in info.functionInfos] == ["max", "foo"]
+    assert info.callGraphInfo is None
+    for functionInfo in info.functionInfos:
+        assert len(functionInfo.memoryAccesses) == 0
+        for bb in functionInfo.basicBlocks:
+            for instr in bb.instructions:
+                assert not any(isinstance(x, llvm.graph.ConstantInfo) for x in instr.operands)
+
+    infos, errors, _ = llvm_extractor_fixture.GraphFromStrings([program_2fn], options=options)
+    assert infos[0].callGraphInfo is None
+
+
+def test_llvm_graph_in_session():
+    clang_driver = ClangDriver(
+        ClangDriver.ProgrammingLanguage.C,
+        ClangDriver.OptimizationLevel.O0,
+        [],
+        ["-Wall"],
+    )
+    clang_driver.setSessionEnabled(True)
+    llvm_extractor = LLVMIRExtractor(clang_driver)
+
+    for program, num_functions in [(program_1fn_1, 1), (program_2fn, 2), (program_1fn_2, 1)]:
+        info = llvm_extractor.GraphFromString(program)
+        assert len(info.functionInfos) == num_functions
+
+    clang_driver.resetSession()
+    info = llvm_extractor.GraphFromString(program_2fn)
+    assert [x.name for x in info.functionInfos] == ["max", "foo"]
+
+
+def test_llvm_graph_with_prefix_header(tmp_path):
+    header = tmp_path / "prefix.h"
+    header.write_text("typedef int myint;\n#define LIMIT 10\n")
+    pch_dir = tmp_path / "pch"
+
+    clang_driver = ClangDriver(
+        ClangDriver.ProgrammingLanguage.C,
+        ClangDriver.OptimizationLevel.O0,
+        [],
+        ["-Wall"],
+    )
+    clang_driver.setPrefixHeader(str(header))
+    clang_driver.setPCHDirectory(str(pch_dir))
+    llvm_extractor = LLVMIRExtractor(clang_driver)
+
+    program = "myint bar(myint a) { return a > LIMIT ? a : LIMIT; }"
+    for _ in range(2):
+        info = llvm_extractor.GraphFromString(program)
+        assert [x.name for x in info.functionInfos] == ["bar"]
+    assert len(list(pch_dir.iterdir())) == 1
+
+    # A changed prefix header gets a PCH of its own
+    header.write_text("typedef long myint;\n#define LIMIT 20\n")
+    os.utime(header, (0, 0))
+    info = llvm_extractor.GraphFromString(program)
+    assert [x.name for x in info.functionInfos] == ["bar"]
+    assert len(list(pch_dir.iterdir())) == 2
+
+
+def test_llvm_graph_with_resource_limits():
+    clang_driver = ClangDriver(
+        ClangDriver.ProgrammingLanguage.C,
+        ClangDriver.OptimizationLevel.O0,
+        [],
+        ["-Wall"],
+    )
+    llvm_extractor = LLVMIRExtractor(clang_driver)
+
+    clang_driver.setMaxIRSize(1)
+    with pytest.raises(ResourceLimitExceeded, match="IR size"):
+        llvm_extractor.GraphFromString(program_2fn)
+
+    # A resource limit is a RuntimeError, and the batch flags it apart from compile errors
+    infos, errors, limits_exceeded = llvm_extractor.GraphFromStrings([program_1fn_1, program_2fn, "foobar"])
+    assert all(info is None for info in infos)
+    assert all("Resource limit exceeded" in error for error in errors[:2])
+    assert limits_exceeded == [True, True, False]
+
+    clang_driver.setMaxIRSize(0)
+    clang_driver.setTimeout(60)
+    info = llvm_extractor.GraphFromString(program_2fn)
+    assert [x.name for x in info.functionInfos] == ["max", "foo"]
+
+
+def test_clang_graph_with_ast_size_limit():
+    clang_driver = ClangDriver(
+        ClangDriver.ProgrammingLanguage.C,
+        ClangDriver.OptimizationLevel.O0,
+        [],
+        ["-Wall"],
+    )
+    clang_driver.setMaxASTSize(1)
+    clang_extractor = ClangExtractor(clang_driver)
+
+    with pytest.raises(RuntimeError, match="AST size"):
+        clang_extractor.GraphFromString(program_1fn_1)
+
+
+def test_llvm_graph_batch_in_input_order(llvm_extractor_fixture):
+    programs = [program_1fn_1, program_2fn, "foobar", program_1fn_2]
+    infos, errors, _ = llvm_extractor_fixture.GraphFromStrings(programs, num_workers=2)
+
+    assert [len(info.functionInfos) if info else None for info in infos] == [1, 2, None, 1]
+    assert [bool(error) for error in errors] == [False, False, True, False]
+
+
+def test_llvm_seq_batch_with_drivers(llvm_extractor_fixture):
+    clang_driver = ClangDriver(
+        ClangDriver.ProgrammingLanguage.C,
+        ClangDriver.OptimizationLevel.O0,
+        [],
+        ["-Wall"],
+    )
+    cpp_driver = ClangDriver(
+        ClangDriver.ProgrammingLanguage.CPlusPlus,
+        ClangDriver.OptimizationLevel.O0,
+        [],
+        ["-Wall"],
+    )
+    infos, errors, _ = llvm_extractor_fixture.SeqFromStrings(
+        [program_1fn_1, program_1fn_1], drivers=[clang_driver, cpp_driver]
+    )
+
+    assert errors == ["", ""]
+    assert infos[0].functionInfos[0].name == "foo"
+    assert infos[1].functionInfos[0].name == "_Z3foov"
+
+
 # Graph tests: Visitors
 def test_llvm_graph_visitor(llvm_extractor_fixture):
     info = llvm_extractor_fixture.GraphFromString(program_1fn_2)
@@ -210,6 +351,25 @@ def test_llvm_graph_basicblocks_have_instructions(llvm_extractor_fixture):
     assert len(bb_entry.instructions) > 0
 
 
+def test_llvm_graph_basicblocks_are_read_only_sequences(llvm_extractor_fixture):
+    info = llvm_extractor_fixture.GraphFromString(program_1fn_2)
+    fn = info.functionInfos[0]
+    bbs = fn.basicBlocks
+
+    assert isinstance(bbs, llvm.graph.BasicBlockInfoList)
+    assert len(bbs) == 4
+    assert bbs[-1] is bbs[3]
+    assert bbs[1:3] == [bbs[1], bbs[2]]
+    assert list(bbs) == [bbs[0], bbs[1], bbs[2], bbs[3]]
+    assert bbs == fn.basicBlocks
+    assert bbs != [bbs[0]]
+    assert bbs[0] in bbs
+    with pytest.raises(IndexError):
+        bbs[4]
+    with pytest.raises(AttributeError):
+        bbs.append(bbs[0])
+
+
 # Graph tests: Instructions
 def test_llvm_graph_instructions_have_type_and_opcode(llvm_extractor_fixture):
     info = llvm_extractor_fixture.GraphFromString(program_1fn_2)
@@ -379,6 +539,16 @@ def test_clang_graph_statements_have_ast_relations(clang_extractor_fixture):
     assert get_clang_ast_hierarchy(fn.entryStmt) == ast_hierarchy
 
 
+def test_clang_graph_tokens_are_fresh_on_every_access(clang_extractor_fixture):
+    info = clang_extractor_fixture.GraphFromString(program_1fn_2)
+    tokens = info.functionInfos[0].tokens
+
+    assert isinstance(tokens, clang.graph.TokenInfoList)
+    assert [t.name for t in tokens] == [t.name for t in list(tokens)]
+    assert tokens[0] is not tokens[0]
+    assert tokens[0].index == tokens[0].index
+
+
 # Graph tests: Arguments
 def test_clang_graph_declarations_args_have_name_and_type(clang_extractor_fixture):
     info = clang_extractor_fixture.GraphFromString(program_2fn)
@@ -472,6 +642,328 @@ def test_clang_seq_variable_names_are_normalized(clang_extractor_fixture):
     assert [tokenInfo.name for tokenInfo in fn.tokenInfos].count("var_0") == 3
 
 
+def test_clang_graph_batch_in_input_order(clang_extractor_fixture):
+    programs = [program_2fn, "foobar", program_1fn_1]
+    infos, errors, _ = clang_extractor_fixture.GraphFromStrings(programs)
+
+    assert [len(info.functionInfos) if info else None for info in infos] == [2, None, 1]
+    assert [bool(error) for error in errors] == [False, True, False]
+
+
+# File tests
+def test_llvm_graph_from_file(llvm_extractor_fixture, tmp_path):
+    path = tmp_path / "program.c"
+    path.write_text(program_2fn)
+
+    info = llvm_extractor_fixture.GraphFromFile(str(path))
+
+    assert [fn.name for fn in info.functionInfos] == ["max", "foo"]
+
+
+def test_llvm_graph_from_ir_file(tmp_path):
+    path = tmp_path / "program.ll"
+    path.write_text(
+        """
+define i32 @bar(i32 %a) {
+  %1 = add i32 %a, 1
+  ret i32 %1
+}
+"""
+    )
+
+    clang_driver = ClangDriver(
+        ClangDriver.ProgrammingLanguage.LLVM,
+        ClangDriver.OptimizationLevel.O0,
+        [],
+        [],
+    )
+    info = LLVMIRExtractor(clang_driver).GraphFromFile(str(path))
+
+    assert [fn.name for fn in info.functionInfos] == ["bar"]
+
+
+def test_llvm_graph_from_virtual_files(tmp_path):
+    clang_driver = ClangDriver(
+        ClangDriver.ProgrammingLanguage.C,
+        ClangDriver.OptimizationLevel.O0,
+        [(str(tmp_path / "include"), ClangDriver.IncludeDirType.User)],
+        ["-Wall"],
+    )
+    clang_driver.setVirtualFiles(
+        {
+            str(tmp_path / "include" / "limit.h"): b"#define LIMIT 10\n",
+            str(tmp_path / "program.c"): b'#include "limit.h"\nint bar(int a) { return a > LIMIT ? a : LIMIT; }\n',
+        }
+    )
+    llvm_extractor = LLVMIRExtractor(clang_driver)
+
+    info = llvm_extractor.GraphFromFile(str(tmp_path / "program.c"))
+    assert [fn.name for fn in info.functionInfos] == ["bar"]
+    # Nothing was written to disk
+    assert list(tmp_path.iterdir()) == []
+
+    # Headers of sources from strings are found in the overlay as well
+    info = llvm_extractor.GraphFromString('#include "limit.h"\nint baz() { return LIMIT; }')
+    assert [fn.name for fn in info.functionInfos] == ["baz"]
+
+    clang_driver.setVirtualFiles({})
+    assert clang_driver.getVirtualFiles() == []
+    with pytest.raises(RuntimeError):
+        llvm_extractor.GraphFromFile(str(tmp_path / "program.c"))
+
+
+def test_clang_seq_from_files_in_input_order(clang_extractor_fixture, tmp_path):
+    path = tmp_path / "program.c"
+    path.write_text(program_1fn_1)
+
+    infos, errors, _ = clang_extractor_fixture.SeqFromFiles([str(path), str(tmp_path / "missing.c")])
+
+    assert len(infos[0].functionInfos) == 1
+    assert infos[1] is None
+    assert errors[1]
+
+
+# Optimization level tests
+def test_llvm_graph_at_levels(llvm_extractor_fixture):
+    levels = [ClangDriver.OptimizationLevel.O0, ClangDriver.OptimizationLevel.O3]
+    infos = llvm_extractor_fixture.GraphFromStringAtLevels(program_2fn, levels)
+
+    assert len(infos) == 2
+    assert [fn.name for fn in infos[0].functionInfos] == ["max", "foo"]
+    # Both functions are branch-free at O3.
+    assert [len(fn.basicBlocks) for fn in infos[1].functionInfos] == [1, 1]
+    assert len(infos[0].functionInfos[0].basicBlocks) > 1
+
+
+def test_llvm_seq_at_levels_from_file(llvm_extractor_fixture, tmp_path):
+    path = tmp_path / "program.c"
+    path.write_text(program_1fn_2)
+
+    levels = [ClangDriver.OptimizationLevel.O1, ClangDriver.OptimizationLevel.O2]
+    infos = llvm_extractor_fixture.SeqFromFileAtLevels(str(path), levels)
+
+    assert [len(info.functionInfos) for info in infos] == [1, 1]
+
+
+# Combined extraction tests
+@pytest.fixture
+def combined_extractor_fixture():
+    clang_driver = ClangDriver(
+        ClangDriver.ProgrammingLanguage.C,
+        ClangDriver.OptimizationLevel.O0,
+        [],
+        ["-Wall"],
+    )
+    return CombinedExtractor(clang_driver)
+
+
+def test_combined_graphs_match_separate_extraction(
+    combined_extractor_fixture, clang_extractor_fixture, llvm_extractor_fixture
+):
+    infos = combined_extractor_fixture.GraphsFromString(program_2fn)
+
+    assert infos.clangInfo.to_bytes() == clang_extractor_fixture.GraphFromString(program_2fn).to_bytes()
+    assert infos.llvmInfo.to_bytes() == llvm_extractor_fixture.GraphFromString(program_2fn).to_bytes()
+
+
+def test_combined_graphs_from_file(combined_extractor_fixture, tmp_path):
+    path = tmp_path / "program.c"
+    path.write_text(program_2fn)
+
+    infos = combined_extractor_fixture.GraphsFromFile(str(path))
+
+    assert [fn.name for fn in infos.clangInfo.functionInfos] == ["max", "foo"]
+    assert [fn.name for fn in infos.llvmInfo.functionInfos] == ["max", "foo"]
+
+
+def test_combined_graphs_batch_in_input_order(combined_extractor_fixture):
+    infos, errors, _ = combined_extractor_fixture.GraphsFromStrings([program_2fn, "foobar", program_1fn_1])
+
+    assert [len(info.llvmInfo.functionInfos) if info else None for info in infos] == [2, None, 1]
+    assert [len(info.clangInfo.functionInfos) if info else None for info in infos] == [2, None, 1]
+    assert [bool(error) for error in errors] == [False, True, False]
+
+
+# Serialization tests
+def test_llvm_function_filter_by_names(llvm_extractor_fixture):
+    llvm_extractor_fixture.setFunctionFilter(FunctionFilter(names=["foo"]))
+
+    info = llvm_extractor_fixture.GraphFromString(program_2fn)
+    assert [x.name for x in info.functionInfos] == ["foo"]
+
+    info = llvm_extractor_fixture.SeqFromString(program_2fn)
+    assert [x.name for x in info.functionInfos] == ["foo"]
+
+
+def test_clang_function_filter_by_predicate_in_batch(clang_extractor_fixture):
+    seen = []
+
+    def predicate(name):
+        seen.append(name)
+        return name == "max"
+
+    clang_extractor_fixture.setFunctionFilter(FunctionFilter(predicate=predicate))
+    infos, errors, _ = clang_extractor_fixture.GraphFromStrings([program_2fn, program_1fn_2], 2)
+
+    assert [[x.name for x in info.functionInfos] for info in infos] == [["max"], []]
+    assert set(seen) == {"bar", "foo", "max"}
+
+
+def test_function_filter_skips_system_headers(tmp_path):
+    (tmp_path / "helpers.h").write_text("static int twice(int x) { return 2 * x; }\n")
+    program = "#include <helpers.h>\nint foo(int x) { return twice(x); }\n"
+
+    clang_driver = ClangDriver(
+        ClangDriver.ProgrammingLanguage.C,
+        ClangDriver.OptimizationLevel.O0,
+        [(str(tmp_path), ClangDriver.IncludeDirType.System)],
+        ["-Wall"],
+    )
+    llvm_extractor = LLVMIRExtractor(clang_driver)
+    combined_extractor = CombinedExtractor(clang_driver)
+    assert len(llvm_extractor.GraphFromString(program).functionInfos) == 2
+
+    function_filter = FunctionFilter(skipSystemHeaders=True)
+    llvm_extractor.setFunctionFilter(function_filter)
+    combined_extractor.setFunctionFilter(function_filter)
+
+    assert [x.name for x in llvm_extractor.GraphFromString(program).functionInfos] == ["foo"]
+    infos = combined_extractor.GraphsFromString(program)
+    assert [x.name for x in infos.clangInfo.functionInfos] == ["foo"]
+    assert [x.name for x in infos.llvmInfo.functionInfos] == ["foo"]
+
+
+def test_llvm_graph_functions_are_streamed(llvm_extractor_fixture):
+    names = []
+    info = llvm_extractor_fixture.GraphFunctionsFromString(program_2fn, lambda function: names.append(function.name))
+
+    assert names == ["max", "foo"]
+    assert len(info.functionInfos) == 0
+    assert info.callGraphInfo is not None
+
+
+def test_llvm_seq_functions_are_streamed_from_file(llvm_extractor_fixture, tmp_path):
+    path = tmp_path / "program.c"
+    path.write_text(program_2fn)
+
+    functions = []
+    llvm_extractor_fixture.SeqFunctionsFromFile(str(path), functions.append)
+
+    assert [x.name for x in functions] == ["max", "foo"]
+    assert all(len(x.basicBlocks) > 0 for x in functions)
+
+
+def test_llvm_function_stream_stops_on_callback_error(llvm_extractor_fixture):
+    names = []
+
+    def callback(function):
+        names.append(function.name)
+        raise ValueError("stop")
+
+    with pytest.raises(ValueError):
+        llvm_extractor_fixture.GraphFunctionsFromString(program_2fn, callback)
+    assert names == ["max"]
+
+
+def test_llvm_instruction_function_is_its_function(llvm_extractor_fixture):
+    info = llvm_extractor_fixture.GraphFromString(program_1fn_2)
+    function = info.functionInfos[0]
+
+    assert function.basicBlocks[0].instructions[0].function.name == function.name
+
+
+def test_llvm_graph_has_interned_ids(llvm_extractor_fixture):
+    info = llvm_extractor_fixture.GraphFromString(program_2fn)
+
+    for function in info.functionInfos:
+        assert internedString(function.typeId) == function.type
+        for bb in function.basicBlocks:
+            for instr in bb.instructions:
+                assert internedString(instr.opcodeId) == instr.opcode
+                assert internedString(instr.typeId) == instr.type
+    assert internString("ret") == info.functionInfos[0].exitInstructions[0].opcodeId
+
+
+def test_clang_seq_has_interned_ids_after_round_trip(clang_extractor_fixture):
+    info = clang_extractor_fixture.SeqFromString(program_1fn_2)
+    restored = clang.seq.ExtractionInfo.from_bytes(info.to_bytes())
+
+    tokens = restored.functionInfos[0].tokenInfos
+    assert [t.nameId for t in tokens] == [t.nameId for t in info.functionInfos[0].tokenInfos]
+    assert [internedString(t.kindId) for t in tokens] == [t.kind for t in tokens]
+
+    with pytest.raises(IndexError):
+        internedString(-1)
+
+
+def test_llvm_graph_pickle_round_trip(llvm_extractor_fixture):
+    info = llvm_extractor_fixture.GraphFromString(program_2fn)
+    restored = pickle.loads(pickle.dumps(info))
+
+    assert [fn.name for fn in restored.functionInfos] == ["max", "foo"]
+    assert restored.callGraphInfo.calls == info.callGraphInfo.calls
+    assert restored.to_bytes() == info.to_bytes()
+
+
+def test_llvm_seq_bytes_round_trip(llvm_extractor_fixture):
+    info = llvm_extractor_fixture.SeqFromString(program_2fn)
+    restored = llvm.seq.ExtractionInfo.from_bytes(info.to_bytes())
+
+    assert [fn.name for fn in restored.functionInfos] == ["max", "foo"]
+
+
+def test_llvm_function_info_pickle_round_trip(llvm_extractor_fixture):
+    info = llvm_extractor_fixture.GraphFromString(program_1fn_2)
+    restored = pickle.loads(pickle.dumps(info.functionInfos[0]))
+
+    assert restored.name == "bar"
+    assert len(restored.basicBlocks) == len(info.functionInfos[0].basicBlocks)
+
+
+def test_clang_graph_pickle_round_trip(clang_extractor_fixture):
+    info = clang_extractor_fixture.GraphFromString(program_2fn)
+    restored = pickle.loads(pickle.dumps(info))
+
+    assert [fn.name for fn in restored.functionInfos] == ["max", "foo"]
+    assert restored.to_bytes() == info.to_bytes()
+
+
+def test_clang_seq_bytes_round_trip(clang_extractor_fixture):
+    info = clang_extractor_fixture.SeqFromString(program_1fn_1)
+    restored = clang.seq.ExtractionInfo.from_bytes(info.to_bytes())
+
+    assert [t.name for t in restored.functionInfos[0].tokenInfos] == [
+        t.name for t in info.functionInfos[0].tokenInfos
+    ]
+
+
+def test_info_parts_pickle_round_trip(clang_extractor_fixture, llvm_extractor_fixture):
+    clang_function = clang_extractor_fixture.GraphFromString(program_1fn_2).functionInfos[0]
+    stmt = pickle.loads(pickle.dumps(clang_function.entryStmt))
+    assert stmt.name == clang_function.entryStmt.name
+    assert len(stmt.ast_relations) == len(clang_function.entryStmt.ast_relations)
+
+    instruction = llvm_extractor_fixture.GraphFromString(program_1fn_2).functionInfos[0].entryInstruction
+    restored = pickle.loads(pickle.dumps(instruction))
+    assert restored.opcode == instruction.opcode
+    assert restored.function.name == "bar"
+
+    seq_function = llvm_extractor_fixture.SeqFromString(program_1fn_2).functionInfos[0]
+    assert pickle.loads(pickle.dumps(seq_function)).str == seq_function.str
+    seq_instruction = seq_function.basicBlocks[0].instructions[0]
+    assert llvm.seq.InstructionInfo.from_bytes(seq_instruction.to_bytes()).tokens == seq_instruction.tokens
+
+    clang_seq_function = clang_extractor_fixture.SeqFromString(program_1fn_2).functionInfos[0]
+    assert pickle.loads(pickle.dumps(clang_seq_function)).name == clang_seq_function.name
+
+
+def test_from_bytes_rejects_corrupt_data(llvm_extractor_fixture):
+    data = llvm_extractor_fixture.GraphFromString(program_1fn_1).to_bytes()
+
+    with pytest.raises(RuntimeError):
+        llvm.graph.ExtractionInfo.from_bytes(data[: len(data) // 2])
+
+
 # Seq tests: Visitors
 def test_clang_graph_visitor(clang_extractor_fixture):
     info = clang_extractor_fixture.SeqFromString(program_1fn_1)
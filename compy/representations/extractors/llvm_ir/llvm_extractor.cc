@@ -1,5 +1,6 @@
 #include "llvm_extractor.h"
 
+#include <exception>
 #include <string>
 
 #include "clang/Config/config.h"
@@ -20,35 +21,265 @@ using namespace ::llvm;
 namespace compy {
 namespace llvm {
 
+namespace {
+
+// Creates an extractor pass per level, as the pass managers of the levels
+// take ownership of their passes.
+template <typename ExtractorPass, typename... Args>
+std::vector<ExtractorPass *> createPassesPerLevel(
+    size_t numLevels, std::vector<std::vector<::llvm::Pass *>> &passesPerLevel,
+    const Args &... args) {
+  std::vector<ExtractorPass *> extractorPasses;
+  for (size_t i = 0; i < numLevels; ++i) {
+    extractorPasses.push_back(new ExtractorPass(args...));
+    passesPerLevel.push_back({extractorPasses.back()});
+  }
+  return extractorPasses;
+}
+
+template <typename ExtractorPass>
+std::vector<decltype(ExtractorPass::extractionInfo)> extractionInfos(
+    const std::vector<ExtractorPass *> &extractorPasses) {
+  std::vector<decltype(ExtractorPass::extractionInfo)> infos;
+  for (auto pass : extractorPasses) {
+    infos.push_back(pass->extractionInfo);
+  }
+  return infos;
+}
+
+// Rethrows the exception the function callback of pass threw, if any.
+template <typename ExtractorPass>
+void rethrowCallbackError(ExtractorPass *pass) {
+  std::exception_ptr error = std::move(pass->callbackError);
+  if (error) std::rethrow_exception(error);
+}
+
+}  // namespace
+
 LLVMIRExtractor::LLVMIRExtractor(ClangDriverPtr clangDriver)
     : clangDriver_(clangDriver) {}
 
-graph::ExtractionInfoPtr LLVMIRExtractor::GraphFromString(std::string src) {
-  std::vector<::clang::FrontendAction *> frontendActions;
+void LLVMIRExtractor::setFunctionFilter(FunctionFilterPtr filter) {
+  functionFilter_ = filter;
+}
+
+FunctionFilterPtr LLVMIRExtractor::getFunctionFilter() const {
+  return functionFilter_;
+}
+
+// Adds the provider that finds the functions in system headers to providers,
+// if the function filter skips them and the input is lowered by clang. path
+// is null for sources given as strings.
+SystemHeaderFunctionsPtr LLVMIRExtractor::systemHeaderFunctions(
+    std::vector<ASTConsumerProvider *> &providers, const std::string *path) {
+  if (!functionFilter_ || !functionFilter_->skipSystemHeaders ||
+      clangDriver_->getProgrammingLanguage() ==
+          ClangDriver::ProgrammingLanguage::LLVM ||
+      (path && ClangDriver::isLLVMIRFile(*path))) {
+    return nullptr;
+  }
+
+  auto functions = std::make_shared<SystemHeaderFunctions>();
+  providers.push_back(functions.get());
+  return functions;
+}
+
+graph::ExtractionInfoPtr LLVMIRExtractor::GraphFromString(
+    std::string src, graph::ExtractionOptions options) {
+  return GraphFunctionsFromString(std::move(src), nullptr, options);
+}
+
+seq::ExtractionInfoPtr LLVMIRExtractor::SeqFromString(std::string src) {
+  return SeqFunctionsFromString(std::move(src), nullptr);
+}
+
+graph::ExtractionInfoPtr LLVMIRExtractor::GraphFromFile(
+    std::string path, graph::ExtractionOptions options) {
+  return GraphFunctionsFromFile(std::move(path), nullptr, options);
+}
+
+seq::ExtractionInfoPtr LLVMIRExtractor::SeqFromFile(std::string path) {
+  return SeqFunctionsFromFile(std::move(path), nullptr);
+}
+
+graph::ExtractionInfoPtr LLVMIRExtractor::GraphFunctionsFromString(
+    std::string src, graph::FunctionCallback callback,
+    graph::ExtractionOptions options) {
+  std::vector<ASTConsumerProvider *> providers;
   std::vector<::llvm::Pass *> passes;
 
   // passes.push_back(createStripSymbolsPass());
 
-  graph::ExtractorPass *extractorPass = new graph::ExtractorPass();
+  graph::ExtractorPass *extractorPass = new graph::ExtractorPass(
+      options, functionFilter_, systemHeaderFunctions(providers, nullptr));
+  extractorPass->functionCallback = std::move(callback);
   passes.push_back(extractorPass);
 
-  clangDriver_->Invoke(src, frontendActions, passes);
+  clangDriver_->InvokeSingleParse(src, providers, passes);
+  rethrowCallbackError(extractorPass);
 
   return extractorPass->extractionInfo;
 }
 
-seq::ExtractionInfoPtr LLVMIRExtractor::SeqFromString(std::string src) {
-  std::vector<::clang::FrontendAction *> frontendActions;
+seq::ExtractionInfoPtr LLVMIRExtractor::SeqFunctionsFromString(
+    std::string src, seq::FunctionCallback callback) {
+  std::vector<ASTConsumerProvider *> providers;
   std::vector<::llvm::Pass *> passes;
 
   // passes.push_back(createStripSymbolsPass());
-  seq::ExtractorPass *pass = new seq::ExtractorPass();
+  seq::ExtractorPass *pass = new seq::ExtractorPass(
+      functionFilter_, systemHeaderFunctions(providers, nullptr));
+  pass->functionCallback = std::move(callback);
   passes.push_back(pass);
 
-  clangDriver_->Invoke(src, frontendActions, passes);
+  clangDriver_->InvokeSingleParse(src, providers, passes);
+  rethrowCallbackError(pass);
 
   return pass->extractionInfo;
 }
 
+graph::ExtractionInfoPtr LLVMIRExtractor::GraphFunctionsFromFile(
+    std::string path, graph::FunctionCallback callback,
+    graph::ExtractionOptions options) {
+  std::vector<ASTConsumerProvider *> providers;
+  std::vector<::llvm::Pass *> passes;
+
+  graph::ExtractorPass *extractorPass = new graph::ExtractorPass(
+      options, functionFilter_, systemHeaderFunctions(providers, &path));
+  extractorPass->functionCallback = std::move(callback);
+  passes.push_back(extractorPass);
+
+  clangDriver_->InvokeFileSingleParse(path, providers, passes);
+  rethrowCallbackError(extractorPass);
+
+  return extractorPass->extractionInfo;
+}
+
+seq::ExtractionInfoPtr LLVMIRExtractor::SeqFunctionsFromFile(
+    std::string path, seq::FunctionCallback callback) {
+  std::vector<ASTConsumerProvider *> providers;
+  std::vector<::llvm::Pass *> passes;
+
+  seq::ExtractorPass *pass = new seq::ExtractorPass(
+      functionFilter_, systemHeaderFunctions(providers, &path));
+  pass->functionCallback = std::move(callback);
+  passes.push_back(pass);
+
+  clangDriver_->InvokeFileSingleParse(path, providers, passes);
+  rethrowCallbackError(pass);
+
+  return pass->extractionInfo;
+}
+
+std::vector<graph::ExtractionInfoPtr> LLVMIRExtractor::GraphFromStringAtLevels(
+    std::string src, std::vector<ClangDriver::OptimizationLevel> levels,
+    graph::ExtractionOptions options) {
+  std::vector<ASTConsumerProvider *> providers;
+  std::vector<std::vector<::llvm::Pass *>> passesPerLevel;
+  auto extractorPasses = createPassesPerLevel<graph::ExtractorPass>(
+      levels.size(), passesPerLevel, options, functionFilter_,
+      systemHeaderFunctions(providers, nullptr));
+
+  clangDriver_->InvokeOptimizationLevels(src, levels, passesPerLevel,
+                                         providers);
+
+  return extractionInfos(extractorPasses);
+}
+
+std::vector<seq::ExtractionInfoPtr> LLVMIRExtractor::SeqFromStringAtLevels(
+    std::string src, std::vector<ClangDriver::OptimizationLevel> levels) {
+  std::vector<ASTConsumerProvider *> providers;
+  std::vector<std::vector<::llvm::Pass *>> passesPerLevel;
+  auto extractorPasses = createPassesPerLevel<seq::ExtractorPass>(
+      levels.size(), passesPerLevel, functionFilter_,
+      systemHeaderFunctions(providers, nullptr));
+
+  clangDriver_->InvokeOptimizationLevels(src, levels, passesPerLevel,
+                                         providers);
+
+  return extractionInfos(extractorPasses);
+}
+
+std::vector<graph::ExtractionInfoPtr> LLVMIRExtractor::GraphFromFileAtLevels(
+    std::string path, std::vector<ClangDriver::OptimizationLevel> levels,
+    graph::ExtractionOptions options) {
+  std::vector<ASTConsumerProvider *> providers;
+  std::vector<std::vector<::llvm::Pass *>> passesPerLevel;
+  auto extractorPasses = createPassesPerLevel<graph::ExtractorPass>(
+      levels.size(), passesPerLevel, options, functionFilter_,
+      systemHeaderFunctions(providers, &path));
+
+  clangDriver_->InvokeFileOptimizationLevels(path, levels, passesPerLevel,
+                                             providers);
+
+  return extractionInfos(extractorPasses);
+}
+
+std::vector<seq::ExtractionInfoPtr> LLVMIRExtractor::SeqFromFileAtLevels(
+    std::string path, std::vector<ClangDriver::OptimizationLevel> levels) {
+  std::vector<ASTConsumerProvider *> providers;
+  std::vector<std::vector<::llvm::Pass *>> passesPerLevel;
+  auto extractorPasses = createPassesPerLevel<seq::ExtractorPass>(
+      levels.size(), passesPerLevel, functionFilter_,
+      systemHeaderFunctions(providers, &path));
+
+  clangDriver_->InvokeFileOptimizationLevels(path, levels, passesPerLevel,
+                                             providers);
+
+  return extractionInfos(extractorPasses);
+}
+
+BatchResult<graph::ExtractionInfoPtr> LLVMIRExtractor::GraphFromStrings(
+    std::vector<std::string> srcs, unsigned numWorkers,
+    std::vector<ClangDriverPtr> drivers, graph::ExtractionOptions options) {
+  return RunBatch<graph::ExtractionInfoPtr>(
+      clangDriver_, srcs, drivers, numWorkers,
+      [options, filter = functionFilter_](ClangDriverPtr driver,
+                                          const std::string &src) {
+        LLVMIRExtractor extractor(driver);
+        extractor.setFunctionFilter(filter);
+        return extractor.GraphFromString(src, options);
+      });
+}
+
+BatchResult<seq::ExtractionInfoPtr> LLVMIRExtractor::SeqFromStrings(
+    std::vector<std::string> srcs, unsigned numWorkers,
+    std::vector<ClangDriverPtr> drivers) {
+  return RunBatch<seq::ExtractionInfoPtr>(
+      clangDriver_, srcs, drivers, numWorkers,
+      [filter = functionFilter_](ClangDriverPtr driver,
+                                 const std::string &src) {
+        LLVMIRExtractor extractor(driver);
+        extractor.setFunctionFilter(filter);
+        return extractor.SeqFromString(src);
+      });
+}
+
+BatchResult<graph::ExtractionInfoPtr> LLVMIRExtractor::GraphFromFiles(
+    std::vector<std::string> paths, unsigned numWorkers,
+    std::vector<ClangDriverPtr> drivers, graph::ExtractionOptions options) {
+  return RunBatch<graph::ExtractionInfoPtr>(
+      clangDriver_, paths, drivers, numWorkers,
+      [options, filter = functionFilter_](ClangDriverPtr driver,
+                                          const std::string &path) {
+        LLVMIRExtractor extractor(driver);
+        extractor.setFunctionFilter(filter);
+        return extractor.GraphFromFile(path, options);
+      });
+}
+
+BatchResult<seq::ExtractionInfoPtr> LLVMIRExtractor::SeqFromFiles(
+    std::vector<std::string> paths, unsigned numWorkers,
+    std::vector<ClangDriverPtr> drivers) {
+  return RunBatch<seq::ExtractionInfoPtr>(
+      clangDriver_, paths, drivers, numWorkers,
+      [filter = functionFilter_](ClangDriverPtr driver,
+                                 const std::string &path) {
+        LLVMIRExtractor extractor(driver);
+        extractor.setFunctionFilter(filter);
+        return extractor.SeqFromFile(path);
+      });
+}
+
 }  // namespace llvm
 }  // namespace compy
@@ -1,10 +1,14 @@
 #pragma once
 
+#include <functional>
 #include <memory>
 #include <tuple>
 #include <vector>
 
+#include "common/batch.h"
 #include "common/clang_driver.h"
+#include "common/function_filter.h"
+#include "common/string_interner.h"
 #include "common/visitor.h"
 
 namespace compy {
@@ -59,6 +63,10 @@ struct ExtractionInfo : IVisitee {
     for (const auto& it : functionInfos) it->accept(v);
   }
 };
+
+// Called with every function as soon as it is extracted, see
+// LLVMIRExtractor::SeqFunctionsFromString().
+using FunctionCallback = std::function<void(const FunctionInfoPtr&)>;
 }  // namespace seq
 
 namespace graph {
@@ -90,31 +98,46 @@ struct ExtractionInfo;
 using ExtractionInfoPtr = std::shared_ptr<ExtractionInfo>;
 
 struct OperandInfo : IVisitee {
+  // Concrete type of an operand, as the extractors are built without RTTI.
+  enum class Kind { ARG, CONSTANT, INSTRUCTION };
+
   virtual ~OperandInfo() = default;
+  virtual Kind operandKind() const = 0;
 };
 
+// The ...Id fields hold the ids of the strings next to them in
+// StringInterner::global().
 struct ArgInfo : OperandInfo {
   std::string name;
   std::string type;
+  int32_t typeId = -1;
 
+  Kind operandKind() const override { return Kind::ARG; }
   void accept(IVisitor* v) override { v->visit(this); }
 };
 
 struct ConstantInfo : OperandInfo {
   std::string type;
+  int32_t typeId = -1;
   std::string value;
 
+  Kind operandKind() const override { return Kind::CONSTANT; }
   void accept(IVisitor* v) override { v->visit(this); }
 };
 
 struct InstructionInfo : OperandInfo {
   std::string type;
   std::string opcode;
+  int32_t typeId = -1;
+  int32_t opcodeId = -1;
   std::string callTarget;
   bool isLoadOrStore;
   std::vector<OperandInfoPtr> operands;
-  FunctionInfoPtr function;
+  // Weak, as the function owns its instructions and would otherwise never be
+  // released.
+  std::weak_ptr<FunctionInfo> function;
 
+  Kind operandKind() const override { return Kind::INSTRUCTION; }
   void accept(IVisitor* v) override { v->visit(this); }
 };
 
@@ -139,6 +162,7 @@ struct MemoryAccessInfo {
 struct FunctionInfo : IVisitee {
   std::string name;
   std::string type;
+  int32_t typeId = -1;
   InstructionInfoPtr entryInstruction;
   std::vector<InstructionInfoPtr> exitInstructions;
   std::vector<ArgInfoPtr> args;
@@ -155,6 +179,17 @@ struct CallGraphInfo {
   std::vector<std::string> calls;
 };
 
+// The parts of the graph extraction that can be turned off when they are not
+// needed, each saving the analysis behind it:
+// - memoryAccesses: FunctionInfo::memoryAccesses, computed with MemorySSA.
+// - callGraph: ExtractionInfo::callGraphInfo, which is null without it.
+// - constants: the constant operands of InstructionInfo::operands.
+struct ExtractionOptions {
+  bool memoryAccesses = true;
+  bool callGraph = true;
+  bool constants = true;
+};
+
 struct ExtractionInfo : IVisitee {
   std::vector<FunctionInfoPtr> functionInfos;
   CallGraphInfoPtr callGraphInfo;
@@ -164,17 +199,82 @@ struct ExtractionInfo : IVisitee {
     for (const auto& it : functionInfos) it->accept(v);
   }
 };
+
+// Called with every function as soon as it is extracted, see
+// LLVMIRExtractor::GraphFunctionsFromString().
+using FunctionCallback = std::function<void(const FunctionInfoPtr&)>;
 }  // namespace graph
 
 class LLVMIRExtractor {
  public:
   LLVMIRExtractor(ClangDriverPtr clangDriver);
 
-  graph::ExtractionInfoPtr GraphFromString(std::string src);
+  // Restricts all extractions to the functions filter selects, or extracts
+  // all functions if it is null.
+  void setFunctionFilter(FunctionFilterPtr filter);
+  FunctionFilterPtr getFunctionFilter() const;
+
+  // The graph variants only run the analyses selected by options.
+  graph::ExtractionInfoPtr GraphFromString(
+      std::string src, graph::ExtractionOptions options = {});
   seq::ExtractionInfoPtr SeqFromString(std::string src);
 
+  // Read the source from a file, see ClangDriver::InvokeFile().
+  graph::ExtractionInfoPtr GraphFromFile(
+      std::string path, graph::ExtractionOptions options = {});
+  seq::ExtractionInfoPtr SeqFromFile(std::string path);
+
+  // Hand every function to callback as soon as it is extracted instead of
+  // collecting them, so that only one function is held at a time unless the
+  // callback keeps it. The result holds everything else, i.e. the call graph.
+  // An exception thrown by the callback stops the extraction and is rethrown.
+  graph::ExtractionInfoPtr GraphFunctionsFromString(
+      std::string src, graph::FunctionCallback callback,
+      graph::ExtractionOptions options = {});
+  seq::ExtractionInfoPtr SeqFunctionsFromString(
+      std::string src, seq::FunctionCallback callback);
+  graph::ExtractionInfoPtr GraphFunctionsFromFile(
+      std::string path, graph::FunctionCallback callback,
+      graph::ExtractionOptions options = {});
+  seq::ExtractionInfoPtr SeqFunctionsFromFile(std::string path,
+                                              seq::FunctionCallback callback);
+
+  // Extract at several optimization levels from a single frontend run, with
+  // one result per level, see ClangDriver::InvokeOptimizationLevels().
+  std::vector<graph::ExtractionInfoPtr> GraphFromStringAtLevels(
+      std::string src, std::vector<ClangDriver::OptimizationLevel> levels,
+      graph::ExtractionOptions options = {});
+  std::vector<seq::ExtractionInfoPtr> SeqFromStringAtLevels(
+      std::string src, std::vector<ClangDriver::OptimizationLevel> levels);
+  std::vector<graph::ExtractionInfoPtr> GraphFromFileAtLevels(
+      std::string path, std::vector<ClangDriver::OptimizationLevel> levels,
+      graph::ExtractionOptions options = {});
+  std::vector<seq::ExtractionInfoPtr> SeqFromFileAtLevels(
+      std::string path, std::vector<ClangDriver::OptimizationLevel> levels);
+
+  // Batch variants of the above, see RunBatch() for the semantics of
+  // numWorkers and drivers.
+  BatchResult<graph::ExtractionInfoPtr> GraphFromStrings(
+      std::vector<std::string> srcs, unsigned numWorkers,
+      std::vector<ClangDriverPtr> drivers = {},
+      graph::ExtractionOptions options = {});
+  BatchResult<seq::ExtractionInfoPtr> SeqFromStrings(
+      std::vector<std::string> srcs, unsigned numWorkers,
+      std::vector<ClangDriverPtr> drivers = {});
+  BatchResult<graph::ExtractionInfoPtr> GraphFromFiles(
+      std::vector<std::string> paths, unsigned numWorkers,
+      std::vector<ClangDriverPtr> drivers = {},
+      graph::ExtractionOptions options = {});
+  BatchResult<seq::ExtractionInfoPtr> SeqFromFiles(
+      std::vector<std::string> paths, unsigned numWorkers,
+      std::vector<ClangDriverPtr> drivers = {});
+
  private:
+  SystemHeaderFunctionsPtr systemHeaderFunctions(
+      std::vector<ASTConsumerProvider *> &providers, const std::string *path);
+
   ClangDriverPtr clangDriver_;
+  FunctionFilterPtr functionFilter_;
 };
 
 }  // namespace llvm
@@ -1,7 +1,12 @@
 #include "llvm_extractor.h"
 
+#include <cstdlib>
 #include <fstream>
 #include <iostream>
+#include <memory>
+#include <stdexcept>
+#include <string>
+#include <vector>
 
 #include "common/common_test.h"
 #include "gtest/gtest.h"
@@ -134,6 +139,80 @@ TEST_F(LLVMExtractorCFixture, ExtractWithDifferentOptimizationlevels) {
               infoO1->functionInfos[0]->basicBlocks.size());
 }
 
+bool hasConstantOperands(const graph::ExtractionInfoPtr &info) {
+  for (const auto &function : info->functionInfos) {
+    for (const auto &basicBlock : function->basicBlocks) {
+      for (const auto &instruction : basicBlock->instructions) {
+        for (const auto &operand : instruction->operands) {
+          if (operand->operandKind() == graph::OperandInfo::Kind::CONSTANT) {
+            return true;
+          }
+        }
+      }
+    }
+  }
+  return false;
+}
+
+TEST_F(LLVMExtractorCFixture, ExtractWithAllOptions) {
+  graph::ExtractionInfoPtr info = extractor_->GraphFromString(kProgram2);
+
+  ASSERT_FALSE(info->functionInfos[0]->memoryAccesses.empty());
+  ASSERT_NE(info->callGraphInfo, nullptr);
+  ASSERT_TRUE(hasConstantOperands(info));
+}
+
+TEST_F(LLVMExtractorCFixture, ExtractWithoutOptionalAnalyses) {
+  graph::ExtractionOptions options;
+  options.memoryAccesses = false;
+  options.callGraph = false;
+  options.constants = false;
+  graph::ExtractionInfoPtr info =
+      extractor_->GraphFromString(kProgram2, options);
+  graph::ExtractionInfoPtr full = extractor_->GraphFromString(kProgram2);
+
+  ASSERT_EQ(info->functionInfos.size(), 1UL);
+  ASSERT_TRUE(info->functionInfos[0]->memoryAccesses.empty());
+  ASSERT_EQ(info->callGraphInfo, nullptr);
+  ASSERT_FALSE(hasConstantOperands(info));
+
+  // The rest of the info is the same.
+  ASSERT_EQ(info->functionInfos[0]->args.size(), 2UL);
+  ASSERT_EQ(info->functionInfos[0]->basicBlocks.size(),
+            full->functionInfos[0]->basicBlocks.size());
+}
+
+TEST_F(LLVMExtractorCFixture, ExtractBatchInInputOrder) {
+  std::vector<std::string> srcs = {kProgram1, kProgram2, "foobar", kProgram5};
+
+  auto result = extractor_->GraphFromStrings(srcs, 3);
+  auto& infos = std::get<0>(result);
+  auto& errors = std::get<1>(result);
+
+  ASSERT_EQ(infos.size(), srcs.size());
+  ASSERT_EQ(errors.size(), srcs.size());
+
+  ASSERT_EQ(infos[0]->functionInfos[0]->name, "foo");
+  ASSERT_EQ(infos[1]->functionInfos[0]->name, "max");
+  ASSERT_EQ(infos[2], nullptr);
+  ASSERT_EQ(errors[2], "Failed compiling to LLVM module");
+  ASSERT_EQ(infos[3]->functionInfos.size(), 2UL);
+  ASSERT_TRUE(errors[0].empty() && errors[1].empty() && errors[3].empty());
+}
+
+TEST_F(LLVMExtractorCFixture, ExtractBatchWithDrivers) {
+  std::vector<std::string> srcs = {kProgram2, kProgram2};
+
+  auto driverO1 = driver_->clone();
+  driverO1->setOptimizationLevel(CD::OptimizationLevel::O1);
+
+  auto result = extractor_->SeqFromStrings(srcs, 0, {driver_, driverO1});
+  auto& infos = std::get<0>(result);
+
+  ASSERT_TRUE(infos[0]->functionInfos[0]->basicBlocks.size() >
+              infos[1]->functionInfos[0]->basicBlocks.size());
+}
+
 // C++ tests
 TEST_F(LLVMExtractorCPlusPlusFixture, ExtractFromFunction1) {
   graph::ExtractionInfoPtr info = extractor_->GraphFromString(kProgram1);
@@ -180,3 +259,227 @@ TEST_F(LLVMExtractorLLVMFixture, ExtractFromFunction1) {
   ASSERT_EQ(info->functionInfos[0]->name, "A");
   ASSERT_EQ(info->functionInfos[0]->args.size(), 1UL);
 }
+
+// File tests
+TEST_F(LLVMExtractorCFixture, ExtractGraphAtLevels) {
+  std::vector<graph::ExtractionInfoPtr> infos =
+      extractor_->GraphFromStringAtLevels(
+          kProgram2, {CD::OptimizationLevel::O0, CD::OptimizationLevel::O3});
+
+  ASSERT_EQ(infos.size(), 2UL);
+  ASSERT_EQ(infos[0]->functionInfos.size(), 1UL);
+  ASSERT_EQ(infos[1]->functionInfos.size(), 1UL);
+
+  // The branches of max() are turned into a select at O3.
+  ASSERT_GT(infos[0]->functionInfos[0]->basicBlocks.size(), 1UL);
+  ASSERT_EQ(infos[1]->functionInfos[0]->basicBlocks.size(), 1UL);
+}
+
+TEST_F(LLVMExtractorCFixture, ExtractGraphAtLevelsMatchesSeparateExtraction) {
+  std::vector<graph::ExtractionInfoPtr> infos =
+      extractor_->GraphFromStringAtLevels(kProgram2,
+                                          {CD::OptimizationLevel::O2});
+
+  driver_->setOptimizationLevel(CD::OptimizationLevel::O2);
+  graph::ExtractionInfoPtr info = extractor_->GraphFromString(kProgram2);
+
+  ASSERT_EQ(infos.size(), 1UL);
+  ASSERT_EQ(infos[0]->functionInfos[0]->basicBlocks.size(),
+            info->functionInfos[0]->basicBlocks.size());
+}
+
+TEST_F(LLVMExtractorCFixture, ExtractSeqAtLevels) {
+  std::vector<seq::ExtractionInfoPtr> infos = extractor_->SeqFromStringAtLevels(
+      kProgram1, {CD::OptimizationLevel::O0, CD::OptimizationLevel::O1,
+                  CD::OptimizationLevel::O2});
+
+  ASSERT_EQ(infos.size(), 3UL);
+  for (const auto &info : infos) {
+    ASSERT_EQ(info->functionInfos.size(), 1UL);
+  }
+}
+
+TEST_F(LLVMExtractorCFixture, ExtractAtUnspecifiedLevelThrows) {
+  EXPECT_THROW(extractor_->GraphFromStringAtLevels(
+                   kProgram1, {CD::OptimizationLevel::Unspecified}),
+               std::invalid_argument);
+}
+
+TEST_F(LLVMExtractorCFixture, ExtractFromFile) {
+  std::string filename = "/tmp/compy_file_test.c";
+  createFileWithContents(filename, kProgram2);
+
+  graph::ExtractionInfoPtr info = extractor_->GraphFromFile(filename);
+
+  removeFile(filename);
+
+  ASSERT_EQ(info->functionInfos.size(), 1UL);
+  ASSERT_EQ(info->functionInfos[0]->name, "max");
+}
+
+TEST_F(LLVMExtractorCFixture, ExtractFromMissingFile) {
+  ASSERT_THROW(extractor_->GraphFromFile("/tmp/compy_does_not_exist.c"),
+               std::runtime_error);
+}
+
+TEST_F(LLVMExtractorLLVMFixture, ExtractFromTextualIRFile) {
+  std::string filename = "/tmp/compy_file_test.ll";
+  createFileWithContents(filename, kLLVM1);
+
+  graph::ExtractionInfoPtr info = extractor_->GraphFromFile(filename);
+
+  removeFile(filename);
+
+  ASSERT_EQ(info->functionInfos.size(), 1UL);
+  ASSERT_EQ(info->functionInfos[0]->name, "A");
+}
+
+TEST_F(LLVMExtractorLLVMFixture, ExtractFromBitcodeFile) {
+  std::string sourceFilename = "/tmp/compy_file_test.c";
+  std::string bitcodeFilename = "/tmp/compy_file_test.bc";
+  createFileWithContents(sourceFilename, kProgram2);
+
+  std::string command = std::string(COMPILER_BINARY(CLANG_INSTALL_PREFIX)) +
+                        " -c -emit-llvm -o " + bitcodeFilename + " " +
+                        sourceFilename;
+  ASSERT_EQ(std::system(command.c_str()), 0);
+
+  seq::ExtractionInfoPtr info = extractor_->SeqFromFile(bitcodeFilename);
+
+  removeFile(sourceFilename);
+  removeFile(bitcodeFilename);
+
+  ASSERT_EQ(info->functionInfos.size(), 1UL);
+  ASSERT_EQ(info->functionInfos[0]->name, "max");
+}
+
+TEST_F(LLVMExtractorCFixture, ExtractBatchFromFiles) {
+  std::string filename = "/tmp/compy_file_test.c";
+  createFileWithContents(filename, kProgram2);
+
+  auto result = extractor_->GraphFromFiles(
+      {filename, "/tmp/compy_does_not_exist.c"}, 2);
+
+  removeFile(filename);
+
+  ASSERT_EQ(std::get<0>(result)[0]->functionInfos.size(), 1UL);
+  ASSERT_EQ(std::get<0>(result)[1], nullptr);
+  ASSERT_FALSE(std::get<1>(result)[1].empty());
+}
+
+TEST_F(LLVMExtractorCFixture, ExtractWithFunctionFilter) {
+  auto filter = std::make_shared<FunctionFilter>();
+  filter->names = {"foo"};
+  extractor_->setFunctionFilter(filter);
+
+  graph::ExtractionInfoPtr graphInfo = extractor_->GraphFromString(kProgram5);
+  seq::ExtractionInfoPtr seqInfo = extractor_->SeqFromString(kProgram5);
+
+  ASSERT_EQ(graphInfo->functionInfos.size(), 1UL);
+  ASSERT_EQ(graphInfo->functionInfos[0]->name, "foo");
+  ASSERT_EQ(seqInfo->functionInfos.size(), 1UL);
+  ASSERT_EQ(seqInfo->functionInfos[0]->name, "foo");
+}
+
+TEST_F(LLVMExtractorCFixture, ExtractWithFunctionPredicateInBatch) {
+  auto filter = std::make_shared<FunctionFilter>();
+  filter->predicate = [](const std::string &name) { return name != "foo"; };
+  extractor_->setFunctionFilter(filter);
+
+  auto result = extractor_->GraphFromStrings({kProgram5, kProgram5}, 2);
+
+  for (const auto &info : std::get<0>(result)) {
+    ASSERT_EQ(info->functionInfos.size(), 1UL);
+    ASSERT_EQ(info->functionInfos[0]->name, "max");
+  }
+}
+
+TEST_F(LLVMExtractorCFixture, ExtractSkippingSystemHeaderFunctions) {
+  std::string headerFilename = "/tmp/compy_system_hdr.h";
+  createFileWithContents(headerFilename,
+                         "static int twice(int x) { return 2 * x; }");
+  driver_->addIncludeDir("/tmp", CD::IncludeDirType::SYSTEM);
+  constexpr char src[] =
+      "#include <compy_system_hdr.h>\n"
+      "int foo(int x) { return twice(x); }";
+
+  graph::ExtractionInfoPtr all = extractor_->GraphFromString(src);
+
+  auto filter = std::make_shared<FunctionFilter>();
+  filter->skipSystemHeaders = true;
+  extractor_->setFunctionFilter(filter);
+  graph::ExtractionInfoPtr info = extractor_->GraphFromString(src);
+
+  removeFile(headerFilename);
+
+  ASSERT_EQ(all->functionInfos.size(), 2UL);
+  ASSERT_EQ(info->functionInfos.size(), 1UL);
+  ASSERT_EQ(info->functionInfos[0]->name, "foo");
+}
+
+TEST_F(LLVMExtractorCFixture, StreamFunctions) {
+  std::vector<std::string> names;
+  std::vector<std::weak_ptr<graph::FunctionInfo>> functions;
+
+  graph::ExtractionInfoPtr info = extractor_->GraphFunctionsFromString(
+      kProgram5, [&](const graph::FunctionInfoPtr &function) {
+        names.push_back(function->name);
+        functions.push_back(function);
+      });
+
+  ASSERT_EQ(names, std::vector<std::string>({"max", "foo"}));
+  ASSERT_TRUE(info->functionInfos.empty());
+  ASSERT_NE(info->callGraphInfo, nullptr);
+
+  // The functions are released once the callback is done with them.
+  for (const auto &function : functions) {
+    ASSERT_TRUE(function.expired());
+  }
+}
+
+TEST_F(LLVMExtractorCFixture, StreamSeqFunctions) {
+  std::vector<std::string> names;
+
+  seq::ExtractionInfoPtr info = extractor_->SeqFunctionsFromString(
+      kProgram5, [&](const seq::FunctionInfoPtr &function) {
+        names.push_back(function->name);
+      });
+
+  ASSERT_EQ(names, std::vector<std::string>({"max", "foo"}));
+  ASSERT_TRUE(info->functionInfos.empty());
+}
+
+TEST_F(LLVMExtractorCFixture, StreamFunctionsStopsOnCallbackError) {
+  size_t numCalls = 0;
+  auto callback = [&](const graph::FunctionInfoPtr &) {
+    ++numCalls;
+    throw std::invalid_argument("stop");
+  };
+
+  EXPECT_THROW(extractor_->GraphFunctionsFromString(kProgram5, callback),
+               std::invalid_argument);
+  ASSERT_EQ(numCalls, 1UL);
+}
+
+TEST_F(LLVMExtractorCFixture, ExtractWithInternedStrings) {
+  graph::ExtractionInfoPtr info = extractor_->GraphFromString(kProgram5);
+  auto &interner = StringInterner::global();
+
+  for (const auto &function : info->functionInfos) {
+    ASSERT_EQ(interner.lookup(function->typeId), function->type);
+    for (const auto &arg : function->args) {
+      ASSERT_EQ(interner.lookup(arg->typeId), arg->type);
+    }
+    for (const auto &basicBlock : function->basicBlocks) {
+      for (const auto &instruction : basicBlock->instructions) {
+        ASSERT_EQ(interner.lookup(instruction->opcodeId), instruction->opcode);
+        ASSERT_EQ(interner.lookup(instruction->typeId), instruction->type);
+      }
+    }
+  }
+
+  // The ids are shared by all extractions.
+  graph::ExtractionInfoPtr again = extractor_->GraphFromString(kProgram5);
+  ASSERT_EQ(again->functionInfos[0]->entryInstruction->opcodeId,
+            info->functionInfos[0]->entryInstruction->opcodeId);
+}
@@ -0,0 +1,208 @@
+#include "llvm_graph_builders.h"
+
+#include <stdexcept>
+#include <string>
+#include <unordered_map>
+
+namespace compy {
+namespace llvm {
+namespace graph {
+
+namespace {
+
+// Indices into the edge_types of the Python visitors, -1 where a visitor does
+// not have the edge type.
+struct EdgeTypes {
+  int32_t cfg, data, mem, call, bb;
+};
+
+EdgeTypes edgeTypesOf(GraphKind kind) {
+  switch (kind) {
+    case GraphKind::CDFG:
+      return {0, 1, 2, -1, -1};
+    case GraphKind::CDFG_CALL:
+      return {0, 1, 2, 3, -1};
+    case GraphKind::CDFG_PLUS:
+      return {0, 1, 2, 3, 4};
+    case GraphKind::PROGRAML:
+      return {0, 1, -1, 2, -1};
+  }
+  throw std::invalid_argument("Unknown graph kind");
+}
+
+class Builder {
+ public:
+  explicit Builder(GraphKind kind) : kind_(kind), e_(edgeTypesOf(kind)) {}
+
+  // Visits the objects in the order of FunctionInfo::accept().
+  void traverse(const FunctionInfoPtr &function) {
+    visitFunction(function);
+    for (const auto &basicBlock : function->basicBlocks) {
+      visitBasicBlock(basicBlock);
+      for (const auto &instruction : basicBlock->instructions) {
+        visitInstruction(instruction);
+      }
+    }
+  }
+
+  GraphArraysPtr finish() { return b_.finish<GraphArrays>(); }
+
+ private:
+  int32_t node(const FunctionInfoPtr &p) {
+    return b_.node(p, uint8_t(NodeType::FUNCTION));
+  }
+  int32_t node(const BasicBlockInfoPtr &p) {
+    return b_.node(p, uint8_t(NodeType::BASIC_BLOCK));
+  }
+  int32_t node(const InstructionInfoPtr &p) {
+    return b_.node(p, uint8_t(NodeType::INSTRUCTION));
+  }
+  int32_t node(const ArgInfoPtr &p) {
+    return b_.node(p, uint8_t(NodeType::ARG));
+  }
+  int32_t node(const OperandInfoPtr &p) {
+    switch (p->operandKind()) {
+      case OperandInfo::Kind::ARG:
+        return node(std::static_pointer_cast<ArgInfo>(p));
+      case OperandInfo::Kind::CONSTANT:
+        return b_.node(std::static_pointer_cast<ConstantInfo>(p),
+                       uint8_t(NodeType::CONSTANT));
+      case OperandInfo::Kind::INSTRUCTION:
+        return node(std::static_pointer_cast<InstructionInfo>(p));
+    }
+    throw std::invalid_argument("Unknown operand kind");
+  }
+
+  // Adds an edge, adding its source before its target like networkx does.
+  template <typename S, typename T>
+  void edge(const S &source, const T &target, int32_t type) {
+    int32_t s = node(source);
+    int32_t t = node(target);
+    b_.addEdge(s, t, type);
+  }
+
+  void visitFunction(const FunctionInfoPtr &v) {
+    if (kind_ == GraphKind::CDFG_CALL || kind_ == GraphKind::PROGRAML) {
+      functions_[v->name] = v;
+    }
+
+    // Function root node.
+    if (kind_ != GraphKind::CDFG) {
+      b_.setLabel(node(v), "function");
+      edge(v, v->entryInstruction,
+           kind_ == GraphKind::CDFG_PLUS ? e_.cfg : e_.call);
+    }
+
+    // Function arg nodes.
+    for (const auto &arg : v->args) {
+      b_.setLabel(node(arg), arg->type);
+      if (kind_ == GraphKind::CDFG_PLUS) edge(v, arg, e_.data);
+    }
+
+    // Memory accesses edges.
+    if (kind_ != GraphKind::PROGRAML) {
+      for (const auto &memacc : v->memoryAccesses) {
+        if (!memacc->inst) continue;
+        for (const auto &dep : memacc->dependencies) {
+          if (dep->inst) edge(dep->inst, memacc->inst, e_.mem);
+        }
+      }
+    }
+  }
+
+  void visitBasicBlock(const BasicBlockInfoPtr &v) {
+    // BB nodes.
+    if (kind_ == GraphKind::CDFG_PLUS) {
+      b_.setLabel(node(v), "bb");
+      for (const auto &instr : v->instructions) edge(instr, v, e_.bb);
+      for (const auto &succ : v->successors) edge(v, succ, e_.bb);
+    }
+
+    // CFG edges: Inner-BB.
+    const auto &instructions = v->instructions;
+    if (instructions.empty()) {
+      throw std::out_of_range("Basic block without instructions");
+    }
+    for (size_t i = 1; i < instructions.size(); ++i) {
+      edge(instructions[i - 1], instructions[i], e_.cfg);
+    }
+
+    // CFG edges: Inter-BB.
+    for (const auto &succ : v->successors) {
+      if (succ->instructions.empty()) {
+        throw std::out_of_range("Basic block without instructions");
+      }
+      edge(instructions.back(), succ->instructions.front(), e_.cfg);
+    }
+  }
+
+  void visitInstruction(const InstructionInfoPtr &v) {
+    // Instruction nodes.
+    b_.setLabel(node(v), v->opcode);
+
+    // Call edges.
+    if (kind_ == GraphKind::CDFG_CALL || kind_ == GraphKind::PROGRAML) {
+      if (v->opcode == "ret") {
+        edge(v, v->function.lock(), e_.call);
+      }
+      if (v->opcode == "call") {
+        auto it = functions_.find(v->callTarget);
+        if (it != functions_.end()) {
+          const FunctionInfoPtr &called = it->second;
+          edge(v, called->entryInstruction, e_.call);
+          for (const auto &exit : called->exitInstructions) {
+            edge(exit, v, e_.call);
+          }
+        }
+      }
+    }
+
+    // Operands.
+    for (const auto &operand : v->operands) {
+      if (!operand) continue;
+      auto operandKind = operand->operandKind();
+
+      if (kind_ != GraphKind::PROGRAML) {
+        if (operandKind != OperandInfo::Kind::CONSTANT) {
+          edge(operand, v, e_.data);
+        }
+      } else if (operandKind == OperandInfo::Kind::INSTRUCTION) {
+        auto instr = std::static_pointer_cast<InstructionInfo>(operand);
+        int32_t use = b_.pairNode(v, instr, uint8_t(NodeType::OPERAND_USE));
+        b_.setLabel(use, instr->type);
+        b_.addEdge(node(instr), use, e_.data);
+        b_.addEdge(use, node(v), e_.data);
+      } else {
+        int32_t n = node(operand);
+        b_.setLabel(n, operandKind == OperandInfo::Kind::ARG
+                           ? std::static_pointer_cast<ArgInfo>(operand)->type
+                           : std::static_pointer_cast<ConstantInfo>(operand)
+                                 ->type);
+        b_.addEdge(n, node(v), e_.data);
+      }
+    }
+  }
+
+  GraphKind kind_;
+  EdgeTypes e_;
+  GraphArraysBuilder b_;
+  std::unordered_map<std::string, FunctionInfoPtr> functions_;
+};
+
+}  // namespace
+
+GraphArraysPtr BuildGraph(const ExtractionInfoPtr &info, GraphKind kind) {
+  Builder builder(kind);
+  for (const auto &function : info->functionInfos) builder.traverse(function);
+  return builder.finish();
+}
+
+GraphArraysPtr BuildGraph(const FunctionInfoPtr &info, GraphKind kind) {
+  Builder builder(kind);
+  builder.traverse(info);
+  return builder.finish();
+}
+
+}  // namespace graph
+}  // namespace llvm
+}  // namespace compy
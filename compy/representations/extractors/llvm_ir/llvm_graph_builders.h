@@ -0,0 +1,36 @@
+#pragma once
+
+#include <cstdint>
+#include <memory>
+
+#include "common/graph_arrays.h"
+#include "llvm_extractor.h"
+
+namespace compy {
+namespace llvm {
+namespace graph {
+
+// Native implementations of the graph visitors in
+// compy/representations/llvm_graphs.py.
+enum class GraphKind { CDFG, CDFG_CALL, CDFG_PLUS, PROGRAML };
+
+// Types of the objects behind the nodes of a graph. OPERAND_USE nodes stand
+// for the pair of an instruction and one of its instruction operands.
+enum class NodeType : uint8_t {
+  FUNCTION,
+  BASIC_BLOCK,
+  INSTRUCTION,
+  ARG,
+  CONSTANT,
+  OPERAND_USE
+};
+
+struct GraphArrays : compy::GraphArrays {};
+using GraphArraysPtr = std::shared_ptr<GraphArrays>;
+
+GraphArraysPtr BuildGraph(const ExtractionInfoPtr &info, GraphKind kind);
+GraphArraysPtr BuildGraph(const FunctionInfoPtr &info, GraphKind kind);
+
+}  // namespace graph
+}  // namespace llvm
+}  // namespace compy
@@ -47,6 +47,15 @@ std::string FunctionInfoPass::getUniqueName(const Value &v) {
   return ss.str();
 }
 
+const FunctionInfoPass::TypeName &FunctionInfoPass::getTypeName(Type *type) {
+  auto it = typeNames.find(type);
+  if (it != typeNames.end()) return it->second;
+
+  std::string name = llvmTypeToString(type);
+  int32_t id = internString(name);
+  return typeNames.emplace(type, TypeName{std::move(name), id}).first->second;
+}
+
 ArgInfoPtr FunctionInfoPass::getInfo(const Argument &arg) {
   auto it = argInfos.find(&arg);
   if (it != argInfos.end()) return it->second;
@@ -57,7 +66,9 @@ ArgInfoPtr FunctionInfoPass::getInfo(const Argument &arg) {
   info->name = getUniqueName(arg);
 
   // collect the type
-  info->type = llvmTypeToString(arg.getType());
+  const TypeName &typeName = getTypeName(arg.getType());
+  info->type = typeName.name;
+  info->typeId = typeName.id;
 
   return info;
 }
@@ -70,7 +81,9 @@ ConstantInfoPtr FunctionInfoPass::getInfo(const ::llvm::Constant &con) {
   constantInfos[&con] = info;
 
   // collect the type
-  info->type = llvmTypeToString(con.getType());
+  const TypeName &typeName = getTypeName(con.getType());
+  info->type = typeName.name;
+  info->typeId = typeName.id;
 
   return info;
 }
@@ -84,16 +97,21 @@ InstructionInfoPtr FunctionInfoPass::getInfo(const Instruction &inst) {
 
   // collect opcode
   info->opcode = inst.getOpcodeName();
+  auto opcodeIt = opcodeIds.find(inst.getOpcode());
+  if (opcodeIt == opcodeIds.end()) {
+    opcodeIt =
+        opcodeIds.emplace(inst.getOpcode(), internString(info->opcode)).first;
+  }
+  info->opcodeId = opcodeIt->second;
 
   if (inst.getOpcodeName() == std::string("ret")) {
     info_->exitInstructions.push_back(info);
   }
 
   // collect type
-  std::string typeName;
-  raw_string_ostream rso(typeName);
-  inst.getType()->print(rso);
-  info->type = rso.str();
+  const TypeName &typeName = getTypeName(inst.getType());
+  info->type = typeName.name;
+  info->typeId = typeName.id;
 
   // collect data dependencies
   for (auto &use : inst.operands()) {
@@ -107,7 +125,7 @@ InstructionInfoPtr FunctionInfoPass::getInfo(const Instruction &inst) {
       info->operands.push_back(getInfo(opInst));
     }
 
-    if (isa<Constant>(use.get())) {
+    if (isa<Constant>(use.get()) && options_.constants) {
       auto &opInst = *cast<Constant>(use.get());
       info->operands.push_back(getInfo(opInst));
     }
@@ -193,7 +211,25 @@ MemoryAccessInfoPtr FunctionInfoPass::getInfo(MemoryAccess &acc) {
   return info;
 }
 
+bool FunctionInfoPass::doInitialization(Module &module) {
+  // The types of a previous module may be gone
+  typeNames.clear();
+  return false;
+}
+
 bool FunctionInfoPass::runOnFunction(::llvm::Function &func) {
+  MemorySSA *mssa = nullptr;
+  if (options_.memoryAccesses) {
+    mssa = &getAnalysis<MemorySSAWrapperPass>().getMSSA();
+  }
+  extract(func, mssa);
+
+  // indicate that nothing was changed
+  return false;
+}
+
+FunctionInfoPtr &FunctionInfoPass::extract(::llvm::Function &func,
+                                           MemorySSA *mssa) {
   // wipe all data from the previous run
   valueNames.clear();
   argInfos.clear();
@@ -209,10 +245,9 @@ bool FunctionInfoPass::runOnFunction(::llvm::Function &func) {
   info_->entryInstruction =
       getInfo(*func.getEntryBlock().getFirstNonPHIOrDbg());
 
-  std::string rtypeName;
-  raw_string_ostream rso(rtypeName);
-  func.getReturnType()->print(rso);
-  info_->type = rso.str();
+  const TypeName &typeName = getTypeName(func.getReturnType());
+  info_->type = typeName.name;
+  info_->typeId = typeName.id;
 
   // collect all basic blocks and their instructions
   for (auto &bb : func) {
@@ -229,34 +264,32 @@ bool FunctionInfoPass::runOnFunction(::llvm::Function &func) {
   }
 
   // dump app memory accesses
-  auto &mssaPass = getAnalysis<MemorySSAWrapperPass>();
-  auto &mssa = mssaPass.getMSSA();
+  if (!options_.memoryAccesses) return info_;
   for (auto &bb : func) {
     // live on entry
-    auto entry = mssa.getLiveOnEntryDef();
+    auto entry = mssa->getLiveOnEntryDef();
     info_->memoryAccesses.push_back(getInfo(*entry));
 
     // memory phis
-    auto phi = mssa.getMemoryAccess(&bb);
+    auto phi = mssa->getMemoryAccess(&bb);
     if (phi != nullptr) {
       info_->memoryAccesses.push_back(getInfo(*phi));
     }
 
     // memory use or defs
     for (auto &inst : bb) {
-      auto access = mssa.getMemoryAccess(&inst);
+      auto access = mssa->getMemoryAccess(&inst);
       if (access != nullptr) {
         info_->memoryAccesses.push_back(getInfo(*access));
       }
     }
   }
 
-  // indicate that nothing was changed
-  return false;
+  return info_;
 }
 
 void FunctionInfoPass::getAnalysisUsage(AnalysisUsage &au) const {
-  au.addRequired<MemorySSAWrapperPass>();
+  if (options_.memoryAccesses) au.addRequired<MemorySSAWrapperPass>();
   au.setPreservesAll();
 }
 
@@ -23,16 +23,28 @@ class FunctionInfoPass : public ::llvm::FunctionPass {
  public:
   static char ID;
 
-  FunctionInfoPass() : ::llvm::FunctionPass(ID), info_(nullptr) {}
+  explicit FunctionInfoPass(ExtractionOptions options = {})
+      : ::llvm::FunctionPass(ID), info_(nullptr), options_(options) {}
 
+  bool doInitialization(::llvm::Module &module) override;
   bool runOnFunction(::llvm::Function &func) override;
   void getAnalysisUsage(::llvm::AnalysisUsage &au) const override;
 
+  // Extracts the info of func without running as a pass. mssa is only used
+  // if the memory accesses are extracted.
+  FunctionInfoPtr &extract(::llvm::Function &func, ::llvm::MemorySSA *mssa);
+
   const FunctionInfoPtr &getInfo() const { return info_; }
   FunctionInfoPtr &getInfo() { return info_; }
 
  private:
+  struct TypeName {
+    std::string name;
+    int32_t id;
+  };
+
   std::string getUniqueName(const ::llvm::Value &v);
+  const TypeName &getTypeName(::llvm::Type *type);
   ArgInfoPtr getInfo(const ::llvm::Argument &arg);
   ConstantInfoPtr getInfo(const ::llvm::Constant &con);
   BasicBlockInfoPtr getInfo(const ::llvm::BasicBlock &bb);
@@ -40,6 +52,7 @@ class FunctionInfoPass : public ::llvm::FunctionPass {
   MemoryAccessInfoPtr getInfo(::llvm::MemoryAccess &acc);
 
  private:
+  ExtractionOptions options_;
   std::unordered_map<const ::llvm::Argument *, ArgInfoPtr> argInfos;
   std::unordered_map<const ::llvm::Constant *, ConstantInfoPtr> constantInfos;
   std::unordered_map<const ::llvm::BasicBlock *, BasicBlockInfoPtr>
@@ -49,6 +62,11 @@ class FunctionInfoPass : public ::llvm::FunctionPass {
   std::unordered_map<const ::llvm::MemoryAccess *, MemoryAccessInfoPtr>
       memoryAccessInfos;
   std::unordered_map<const ::llvm::Value *, std::string> valueNames;
+
+  // Printed types and opcode ids, kept for all functions of a module as
+  // printing a type is expensive and most values share a few types.
+  std::unordered_map<const ::llvm::Type *, TypeName> typeNames;
+  std::unordered_map<unsigned, int32_t> opcodeIds;
 };
 
 }  // namespace graph
@@ -16,35 +16,61 @@ namespace graph {
 bool ExtractorPass::runOnModule(::llvm::Module &module) {
   ExtractionInfoPtr info(new ExtractionInfo());
 
-  // Collect and dump all the function information
+  // Collect and dump all the function information. The function infos are
+  // collected here rather than by requiring FunctionInfoPass, so that MemorySSA
+  // is only computed if the memory accesses are extracted.
+  FunctionInfoPass functionInfoPass(options_);
   for (auto &func : module.functions()) {
     // Skip functions without definition (fwd declarations)
     if (func.isDeclaration()) {
       continue;
     }
 
-    auto &pass = getAnalysis<FunctionInfoPass>(func);
-    auto functionInfo = std::move(pass.getInfo());
-    info->functionInfos.push_back(std::move(functionInfo));
+    // Skip functions that are not selected
+    std::string name = func.getName().str();
+    if (systemHeaderFunctions_ && systemHeaderFunctions_->contains(name)) {
+      continue;
+    }
+    if (filter_ && !filter_->accepts(name)) {
+      continue;
+    }
+
+    MemorySSA *mssa = nullptr;
+    if (options_.memoryAccesses) {
+      mssa = &getAnalysis<MemorySSAWrapperPass>(func).getMSSA();
+    }
+    auto functionInfo = std::move(functionInfoPass.extract(func, mssa));
+    if (!functionCallback) {
+      info->functionInfos.push_back(std::move(functionInfo));
+      continue;
+    }
+    try {
+      functionCallback(functionInfo);
+    } catch (...) {
+      callbackError = std::current_exception();
+      break;
+    }
   }
 
   // Dump the call graph
-  info->callGraphInfo.reset(new CallGraphInfo());
-
-  const auto &callGraph = getAnalysis<CallGraphWrapperPass>().getCallGraph();
-  for (auto &kv : callGraph) {
-    auto *func = kv.first;
-    auto &node = kv.second;
-
-    // Skip the null entry
-    if (func == nullptr) continue;
-
-    // -1, because the null entry references everything
-    for (auto &kv : *node) {
-      // Skip for functions without definition (fwd declarations)
-      if (kv.second->getFunction()) {
-        info->callGraphInfo->calls.push_back(
-            kv.second->getFunction()->getName().str());
+  if (options_.callGraph) {
+    info->callGraphInfo.reset(new CallGraphInfo());
+
+    const auto &callGraph = getAnalysis<CallGraphWrapperPass>().getCallGraph();
+    for (auto &kv : callGraph) {
+      auto *func = kv.first;
+      auto &node = kv.second;
+
+      // Skip the null entry
+      if (func == nullptr) continue;
+
+      // -1, because the null entry references everything
+      for (auto &kv : *node) {
+        // Skip for functions without definition (fwd declarations)
+        if (kv.second->getFunction()) {
+          info->callGraphInfo->calls.push_back(
+              kv.second->getFunction()->getName().str());
+        }
       }
     }
   }
@@ -56,8 +82,8 @@ bool ExtractorPass::runOnModule(::llvm::Module &module) {
 }
 
 void ExtractorPass::getAnalysisUsage(AnalysisUsage &au) const {
-  au.addRequired<CallGraphWrapperPass>();
-  au.addRequired<FunctionInfoPass>();
+  if (options_.callGraph) au.addRequired<CallGraphWrapperPass>();
+  if (options_.memoryAccesses) au.addRequired<MemorySSAWrapperPass>();
   au.setPreservesAll();
 }
 
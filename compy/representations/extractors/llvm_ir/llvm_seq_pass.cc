@@ -155,6 +155,14 @@ bool ExtractorPass::runOnModule(::llvm::Module &module) {
   ExtractionInfoPtr info(new ExtractionInfo);
 
   for (const auto &F : module.functions()) {
+    std::string name = F.getName().str();
+    if (systemHeaderFunctions_ && systemHeaderFunctions_->contains(name)) {
+      continue;
+    }
+    if (filter_ && !filter_->accepts(name)) {
+      continue;
+    }
+
     // InfoBuilder holds the state of the tokenization. It is built using a
     // custom stream that captures token by token. An Annotator object with hook
     // functions is regularly called by the LLVM stack, structuring the token
@@ -168,9 +176,18 @@ bool ExtractorPass::runOnModule(::llvm::Module &module) {
     F.print(TokenStream, tokenAnnotator.get());
 
     FunctionInfoPtr functionInfo = infoBuilder->getInfo();
-    functionInfo->name = F.getName().str();
+    functionInfo->name = name;
     functionInfo->str = TokenStream.getStr();
-    info->functionInfos.push_back(functionInfo);
+    if (!functionCallback) {
+      info->functionInfos.push_back(functionInfo);
+      continue;
+    }
+    try {
+      functionCallback(functionInfo);
+    } catch (...) {
+      callbackError = std::current_exception();
+      break;
+    }
   }
 
   this->extractionInfo = info;
@@ -1,5 +1,6 @@
 #pragma once
 
+#include <exception>
 #include <memory>
 #include <string>
 #include <vector>
@@ -7,6 +8,7 @@
 #include "llvm/IR/Module.h"
 #include "llvm/Pass.h"
 
+#include "common/function_filter.h"
 #include "llvm_extractor.h"
 
 namespace compy {
@@ -16,12 +18,29 @@ namespace seq {
 class ExtractorPass : public ::llvm::ModulePass {
  public:
   static char ID;
-  ExtractorPass() : ::llvm::ModulePass(ID) {}
+  // Only the functions filter accepts are extracted, without the ones in
+  // systemHeaderFunctions, if given.
+  explicit ExtractorPass(
+      FunctionFilterPtr filter = nullptr,
+      SystemHeaderFunctionsPtr systemHeaderFunctions = nullptr)
+      : ::llvm::ModulePass(ID),
+        filter_(filter),
+        systemHeaderFunctions_(systemHeaderFunctions) {}
 
   bool runOnModule(::llvm::Module &M) override;
   void getAnalysisUsage(::llvm::AnalysisUsage &au) const override;
 
   ExtractionInfoPtr extractionInfo;
+
+  // If set, the functions are passed to it instead of being collected in
+  // extractionInfo. The first exception it throws ends the extraction and is
+  // kept in callbackError, as it must not unwind through the pass manager.
+  FunctionCallback functionCallback;
+  std::exception_ptr callbackError;
+
+ private:
+  FunctionFilterPtr filter_;
+  SystemHeaderFunctionsPtr systemHeaderFunctions_;
 };
 
 }  // namespace seq
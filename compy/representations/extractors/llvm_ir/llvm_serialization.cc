@@ -0,0 +1,305 @@
+#include "llvm_serialization.h"
+
+#include "common/serialization.h"
+
+namespace compy {
+namespace llvm {
+
+using serialization::ObjectTable;
+using serialization::Reader;
+using serialization::Writer;
+
+namespace graph {
+
+constexpr char kMagic[] = "LLGR";
+constexpr uint64_t kVersion = 1;
+
+namespace {
+struct Tables {
+  ObjectTable<FunctionInfo> functions;
+  ObjectTable<BasicBlockInfo> basicBlocks;
+  ObjectTable<InstructionInfo> instructions;
+  ObjectTable<ArgInfo> args;
+  ObjectTable<ConstantInfo> constants;
+  ObjectTable<MemoryAccessInfo> memoryAccesses;
+  ObjectTable<CallGraphInfo> callGraphs;
+
+  void addOperand(const OperandInfoPtr &operand) {
+    if (!operand) return;
+    switch (operand->operandKind()) {
+      case OperandInfo::Kind::ARG:
+        args.add(std::static_pointer_cast<ArgInfo>(operand));
+        break;
+      case OperandInfo::Kind::CONSTANT:
+        constants.add(std::static_pointer_cast<ConstantInfo>(operand));
+        break;
+      case OperandInfo::Kind::INSTRUCTION:
+        instructions.add(std::static_pointer_cast<InstructionInfo>(operand));
+        break;
+    }
+  }
+
+  // Adds everything reachable from the objects already in the tables.
+  void collect() {
+    bool changed = true;
+    while (changed) {
+      changed = false;
+      while (auto function = functions.next()) {
+        changed = true;
+        instructions.add(function->entryInstruction);
+        instructions.add(function->exitInstructions);
+        args.add(function->args);
+        basicBlocks.add(function->basicBlocks);
+        memoryAccesses.add(function->memoryAccesses);
+      }
+      while (auto basicBlock = basicBlocks.next()) {
+        changed = true;
+        instructions.add(basicBlock->instructions);
+        basicBlocks.add(basicBlock->successors);
+      }
+      while (auto instruction = instructions.next()) {
+        changed = true;
+        for (const auto &operand : instruction->operands) addOperand(operand);
+        functions.add(instruction->function.lock());
+      }
+      while (auto memoryAccess = memoryAccesses.next()) {
+        changed = true;
+        instructions.add(memoryAccess->inst);
+        basicBlocks.add(memoryAccess->block);
+        memoryAccesses.add(memoryAccess->dependencies);
+      }
+    }
+  }
+
+  void writeOperand(Writer &w, const OperandInfoPtr &operand) const {
+    if (!operand) {
+      w.writeVarint(0);
+      return;
+    }
+    w.writeVarint(static_cast<uint64_t>(operand->operandKind()) + 1);
+    switch (operand->operandKind()) {
+      case OperandInfo::Kind::ARG:
+        args.writeRef(w, std::static_pointer_cast<ArgInfo>(operand));
+        break;
+      case OperandInfo::Kind::CONSTANT:
+        constants.writeRef(w, std::static_pointer_cast<ConstantInfo>(operand));
+        break;
+      case OperandInfo::Kind::INSTRUCTION:
+        instructions.writeRef(
+            w, std::static_pointer_cast<InstructionInfo>(operand));
+        break;
+    }
+  }
+
+  OperandInfoPtr readOperand(Reader &r) const {
+    uint64_t kind = r.readVarint();
+    if (kind == 0) return nullptr;
+    switch (static_cast<OperandInfo::Kind>(kind - 1)) {
+      case OperandInfo::Kind::ARG:
+        return args.readRef(r);
+      case OperandInfo::Kind::CONSTANT:
+        return constants.readRef(r);
+      case OperandInfo::Kind::INSTRUCTION:
+        return instructions.readRef(r);
+    }
+    Reader::fail("unknown operand kind");
+  }
+};
+}  // namespace
+
+std::string Serialize(const ExtractionInfo &info) {
+  Tables t;
+  t.functions.add(info.functionInfos);
+  t.callGraphs.add(info.callGraphInfo);
+  t.collect();
+
+  Writer w;
+  w.writeMagic(kMagic, kVersion);
+
+  w.writeVarint(t.functions.objects().size());
+  w.writeVarint(t.basicBlocks.objects().size());
+  w.writeVarint(t.instructions.objects().size());
+  w.writeVarint(t.args.objects().size());
+  w.writeVarint(t.constants.objects().size());
+  w.writeVarint(t.memoryAccesses.objects().size());
+  w.writeVarint(t.callGraphs.objects().size());
+
+  for (const auto &function : t.functions.objects()) {
+    w.writeString(function->name);
+    w.writeString(function->type);
+    t.instructions.writeRef(w, function->entryInstruction);
+    t.instructions.writeRefs(w, function->exitInstructions);
+    t.args.writeRefs(w, function->args);
+    t.basicBlocks.writeRefs(w, function->basicBlocks);
+    t.memoryAccesses.writeRefs(w, function->memoryAccesses);
+  }
+  for (const auto &basicBlock : t.basicBlocks.objects()) {
+    w.writeString(basicBlock->name);
+    t.instructions.writeRefs(w, basicBlock->instructions);
+    t.basicBlocks.writeRefs(w, basicBlock->successors);
+  }
+  for (const auto &instruction : t.instructions.objects()) {
+    w.writeString(instruction->type);
+    w.writeString(instruction->opcode);
+    w.writeString(instruction->callTarget);
+    w.writeBool(instruction->isLoadOrStore);
+    w.writeVarint(instruction->operands.size());
+    for (const auto &operand : instruction->operands) {
+      t.writeOperand(w, operand);
+    }
+    t.functions.writeRef(w, instruction->function.lock());
+  }
+  for (const auto &arg : t.args.objects()) {
+    w.writeString(arg->name);
+    w.writeString(arg->type);
+  }
+  for (const auto &constant : t.constants.objects()) {
+    w.writeString(constant->type);
+    w.writeString(constant->value);
+  }
+  for (const auto &memoryAccess : t.memoryAccesses.objects()) {
+    w.writeString(memoryAccess->type);
+    t.instructions.writeRef(w, memoryAccess->inst);
+    t.basicBlocks.writeRef(w, memoryAccess->block);
+    t.memoryAccesses.writeRefs(w, memoryAccess->dependencies);
+  }
+  for (const auto &callGraph : t.callGraphs.objects()) {
+    w.writeStrings(callGraph->calls);
+  }
+
+  t.functions.writeRefs(w, info.functionInfos);
+  t.callGraphs.writeRef(w, info.callGraphInfo);
+
+  return w.data();
+}
+
+ExtractionInfoPtr Deserialize(const std::string &data) {
+  Reader r(data);
+  r.readMagic(kMagic, kVersion);
+
+  Tables t;
+  t.functions.allocate(r);
+  t.basicBlocks.allocate(r);
+  t.instructions.allocate(r);
+  t.args.allocate(r);
+  t.constants.allocate(r);
+  t.memoryAccesses.allocate(r);
+  t.callGraphs.allocate(r);
+
+  for (const auto &function : t.functions.objects()) {
+    function->name = r.readString();
+    function->type = r.readString();
+    // The ids are only valid in the process that assigned them.
+    function->typeId = internString(function->type);
+    function->entryInstruction = t.instructions.readRef(r);
+    function->exitInstructions = t.instructions.readRefs(r);
+    function->args = t.args.readRefs(r);
+    function->basicBlocks = t.basicBlocks.readRefs(r);
+    function->memoryAccesses = t.memoryAccesses.readRefs(r);
+  }
+  for (const auto &basicBlock : t.basicBlocks.objects()) {
+    basicBlock->name = r.readString();
+    basicBlock->instructions = t.instructions.readRefs(r);
+    basicBlock->successors = t.basicBlocks.readRefs(r);
+  }
+  for (const auto &instruction : t.instructions.objects()) {
+    instruction->type = r.readString();
+    instruction->opcode = r.readString();
+    instruction->typeId = internString(instruction->type);
+    instruction->opcodeId = internString(instruction->opcode);
+    instruction->callTarget = r.readString();
+    instruction->isLoadOrStore = r.readBool();
+    instruction->operands.resize(r.readCount());
+    for (auto &operand : instruction->operands) {
+      operand = t.readOperand(r);
+    }
+    instruction->function = t.functions.readRef(r);
+  }
+  for (const auto &arg : t.args.objects()) {
+    arg->name = r.readString();
+    arg->type = r.readString();
+    arg->typeId = internString(arg->type);
+  }
+  for (const auto &constant : t.constants.objects()) {
+    constant->type = r.readString();
+    constant->typeId = internString(constant->type);
+    constant->value = r.readString();
+  }
+  for (const auto &memoryAccess : t.memoryAccesses.objects()) {
+    memoryAccess->type = r.readString();
+    memoryAccess->inst = t.instructions.readRef(r);
+    memoryAccess->block = t.basicBlocks.readRef(r);
+    memoryAccess->dependencies = t.memoryAccesses.readRefs(r);
+  }
+  for (const auto &callGraph : t.callGraphs.objects()) {
+    callGraph->calls = r.readStrings();
+  }
+
+  auto info = std::make_shared<ExtractionInfo>();
+  info->functionInfos = t.functions.readRefs(r);
+  info->callGraphInfo = t.callGraphs.readRef(r);
+  r.expectEnd();
+
+  return info;
+}
+
+}  // namespace graph
+
+namespace seq {
+
+constexpr char kMagic[] = "LLSQ";
+constexpr uint64_t kVersion = 1;
+
+std::string Serialize(const ExtractionInfo &info) {
+  Writer w;
+  w.writeMagic(kMagic, kVersion);
+
+  w.writeVarint(info.functionInfos.size());
+  for (const auto &function : info.functionInfos) {
+    w.writeString(function->name);
+    w.writeStrings(function->signature);
+    w.writeString(function->str);
+    w.writeVarint(function->basicBlocks.size());
+    for (const auto &basicBlock : function->basicBlocks) {
+      w.writeString(basicBlock->name);
+      w.writeVarint(basicBlock->instructions.size());
+      for (const auto &instruction : basicBlock->instructions) {
+        w.writeStrings(instruction->tokens);
+      }
+    }
+  }
+
+  return w.data();
+}
+
+ExtractionInfoPtr Deserialize(const std::string &data) {
+  Reader r(data);
+  r.readMagic(kMagic, kVersion);
+
+  auto info = std::make_shared<ExtractionInfo>();
+  info->functionInfos.resize(r.readCount());
+  for (auto &function : info->functionInfos) {
+    function = std::make_shared<FunctionInfo>();
+    function->name = r.readString();
+    function->signature = r.readStrings();
+    function->str = r.readString();
+    function->basicBlocks.resize(r.readCount());
+    for (auto &basicBlock : function->basicBlocks) {
+      basicBlock = std::make_shared<BasicBlockInfo>();
+      basicBlock->name = r.readString();
+      basicBlock->instructions.resize(r.readCount());
+      for (auto &instruction : basicBlock->instructions) {
+        instruction = std::make_shared<InstructionInfo>();
+        instruction->tokens = r.readStrings();
+      }
+    }
+  }
+  r.expectEnd();
+
+  return info;
+}
+
+}  // namespace seq
+
+}  // namespace llvm
+}  // namespace compy
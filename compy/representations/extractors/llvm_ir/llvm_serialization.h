@@ -0,0 +1,21 @@
+#pragma once
+
+#include <string>
+
+#include "llvm_extractor.h"
+
+namespace compy {
+namespace llvm {
+
+namespace graph {
+std::string Serialize(const ExtractionInfo &info);
+ExtractionInfoPtr Deserialize(const std::string &data);
+}  // namespace graph
+
+namespace seq {
+std::string Serialize(const ExtractionInfo &info);
+ExtractionInfoPtr Deserialize(const std::string &data);
+}  // namespace seq
+
+}  // namespace llvm
+}  // namespace compy
@@ -0,0 +1,85 @@
+#include "llvm_serialization.h"
+
+#include <stdexcept>
+#include <string>
+
+#include "common/common_test.h"
+#include "gtest/gtest.h"
+#include "llvm_extractor.h"
+
+#define TO_STRING(prefix) #prefix
+#define COMPILER_BINARY(prefix) TO_STRING(prefix) "/bin/clang"
+
+using namespace compy;
+using namespace compy::llvm;
+
+using LE = LLVMIRExtractor;
+using CD = ClangDriver;
+
+class LLVMSerializationFixture : public testing::Test {
+ protected:
+  void SetUp() override {
+    std::vector<std::tuple<std::string, CD::IncludeDirType>> includeDirs = {};
+    std::vector<std::string> compilerFlags = {"-Werror"};
+
+    driver_.reset(new ClangDriver(CD::ProgrammingLanguage::C,
+                                  CD::OptimizationLevel::O0, includeDirs,
+                                  compilerFlags));
+    driver_->setCompilerBinary(COMPILER_BINARY(CLANG_INSTALL_PREFIX));
+    extractor_.reset(new LE(driver_));
+  }
+
+  std::shared_ptr<CD> driver_;
+  std::shared_ptr<LE> extractor_;
+};
+
+TEST_F(LLVMSerializationFixture, GraphRoundTrip) {
+  graph::ExtractionInfoPtr info = extractor_->GraphFromString(kProgram2);
+
+  std::string data = graph::Serialize(*info);
+  graph::ExtractionInfoPtr restored = graph::Deserialize(data);
+
+  ASSERT_EQ(restored->functionInfos.size(), 1UL);
+  auto function = restored->functionInfos[0];
+  ASSERT_EQ(function->name, "max");
+  ASSERT_EQ(function->args.size(), 2UL);
+  ASSERT_EQ(function->basicBlocks.size(),
+            info->functionInfos[0]->basicBlocks.size());
+
+  // Instructions point back to the same function object.
+  for (const auto &basicBlock : function->basicBlocks) {
+    for (const auto &instruction : basicBlock->instructions) {
+      ASSERT_EQ(instruction->function.lock(), function);
+    }
+  }
+
+  // The string ids are assigned again, which in the same process gives the
+  // same ids.
+  auto &original = info->functionInfos[0]->basicBlocks[0]->instructions[0];
+  auto &instruction = function->basicBlocks[0]->instructions[0];
+  ASSERT_EQ(instruction->opcodeId, original->opcodeId);
+  ASSERT_EQ(instruction->typeId, original->typeId);
+  ASSERT_EQ(function->typeId, info->functionInfos[0]->typeId);
+
+  ASSERT_EQ(graph::Serialize(*restored), data);
+}
+
+TEST_F(LLVMSerializationFixture, SeqRoundTrip) {
+  seq::ExtractionInfoPtr info = extractor_->SeqFromString(kProgram2);
+
+  std::string data = seq::Serialize(*info);
+  seq::ExtractionInfoPtr restored = seq::Deserialize(data);
+
+  ASSERT_EQ(restored->functionInfos.size(), 1UL);
+  ASSERT_EQ(restored->functionInfos[0]->name, "max");
+  ASSERT_EQ(seq::Serialize(*restored), data);
+}
+
+TEST_F(LLVMSerializationFixture, RejectsCorruptData) {
+  std::string data =
+      graph::Serialize(*extractor_->GraphFromString(kProgram2));
+
+  ASSERT_THROW(graph::Deserialize(data.substr(0, data.size() / 2)),
+               std::runtime_error);
+  ASSERT_THROW(seq::Deserialize(data), std::runtime_error);
+}
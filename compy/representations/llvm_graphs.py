@@ -1,6 +1,10 @@
+import os
+
 import networkx as nx
 
-from compy.representations.extractors import clang_driver_scoped_options
+from compy.representations.extractors import clang_drivers_for_batch
+from compy.representations.extractors import ExtractorPool
+from compy.representations.extractors import function_filter_cache_kind
 from compy.representations.extractors.extractors import Visitor
 from compy.representations.extractors.extractors import ClangDriver
 from compy.representations.extractors.extractors import LLVMIRExtractor
@@ -8,7 +12,25 @@ from compy.representations.extractors.extractors import llvm
 from compy.representations import common
 
 
+# The optional parts of the graph extraction, see ExtractionOptions. Visitors declare the ones they read in their
+# extraction_features attribute, visitors without it are assumed to read all of them.
+EXTRACTION_FEATURES = frozenset(["memoryAccesses", "callGraph", "constants"])
+
+
+def extraction_options(*visitors):
+    """Options for LLVMGraphBuilder that only extract what the given visitors read."""
+    features = set()
+    for visitor in visitors:
+        features |= set(getattr(visitor, "extraction_features", EXTRACTION_FEATURES))
+    unknown = features - EXTRACTION_FEATURES
+    if unknown:
+        raise ValueError("Unknown extraction features: %s" % ", ".join(sorted(unknown)))
+    return llvm.graph.ExtractionOptions(**{feature: feature in features for feature in EXTRACTION_FEATURES})
+
+
 class LLVMCDFGVisitor(Visitor):
+    extraction_features = {"memoryAccesses"}
+
     def __init__(self):
         Visitor.__init__(self)
         self.edge_types = ["cfg", "data", "mem"]
@@ -51,6 +73,8 @@ class LLVMCDFGVisitor(Visitor):
 
 
 class LLVMCDFGCallVisitor(Visitor):
+    extraction_features = {"memoryAccesses"}
+
     def __init__(self):
         Visitor.__init__(self)
         self.edge_types = ["cfg", "data", "mem", "call"]
@@ -114,6 +138,8 @@ class LLVMCDFGCallVisitor(Visitor):
 
 
 class LLVMCDFGPlusVisitor(Visitor):
+    extraction_features = {"memoryAccesses"}
+
     def __init__(self):
         Visitor.__init__(self)
         self.edge_types = ["cfg", "data", "mem", "call", "bb"]
@@ -168,6 +194,8 @@ class LLVMCDFGPlusVisitor(Visitor):
 
 
 class LLVMProGraMLVisitor(Visitor):
+    extraction_features = {"constants"}
+
     def __init__(self):
         Visitor.__init__(self)
         self.edge_types = ["cfg", "data", "call"]
@@ -228,9 +256,21 @@ class LLVMProGraMLVisitor(Visitor):
                     self.G.add_edge((v, operand), v, attr="data")
 
 
+# Visitors with a native implementation. Only looked up by exact type, so subclasses of these visitors keep working.
+_NATIVE_VISITORS = {
+    LLVMCDFGVisitor: llvm.graph.GraphKind.CDFG,
+    LLVMCDFGCallVisitor: llvm.graph.GraphKind.CDFG_CALL,
+    LLVMCDFGPlusVisitor: llvm.graph.GraphKind.CDFG_PLUS,
+    LLVMProGraMLVisitor: llvm.graph.GraphKind.PROGRAML,
+}
+
+
 class LLVMGraphBuilder(common.RepresentationBuilder):
-    def __init__(self, clang_driver=None):
-        common.RepresentationBuilder.__init__(self)
+    def __init__(self, clang_driver=None, cache=None, options=None, function_filter=None, vocabulary=None):
+        """If options is given, e.g. extraction_options(LLVMProGraMLVisitor), the extracted infos only contain what
+        the options select and must only be used with visitors that read no more. If function_filter is given, e.g.
+        FunctionFilter(names=["foo"]), only the functions it selects are extracted."""
+        common.RepresentationBuilder.__init__(self, vocabulary)
 
         if clang_driver:
             self.__clang_driver = clang_driver
@@ -241,20 +281,84 @@ class LLVMGraphBuilder(common.RepresentationBuilder):
                 [],
                 ["-Wall"],
             )
-        self.__extractor = LLVMIRExtractor(self.__clang_driver)
-
-    def string_to_info(self, src, additional_include_dir=None, filename=None):
-        with clang_driver_scoped_options(self.__clang_driver, additional_include_dir=additional_include_dir, filename=filename):
-            return self.__extractor.GraphFromString(src)
+        self.__extractors = ExtractorPool(LLVMIRExtractor, self.__clang_driver, function_filter)
+        self.__cache = cache
+        self.__options = options if options is not None else llvm.graph.ExtractionOptions()
+        self.__kind = "llvm_graph"
+        disabled = [feature for feature in sorted(EXTRACTION_FEATURES) if not getattr(self.__options, feature)]
+        if disabled:
+            self.__kind += "-no-" + ",".join(disabled)
+        self.__kind = function_filter_cache_kind(self.__kind, function_filter, cache)
+
+    def string_to_info(self, src, additional_include_dir=None, filename=None, clang_driver=None):
+        extractor, driver = self.__extractors.get(clang_driver, additional_include_dir, filename)
+        if self.__cache is None:
+            return extractor.GraphFromString(src, self.__options)
+        return self.__cache.lookup(self.__kind, driver, src, lambda: extractor.GraphFromString(src, self.__options))
+
+    def batch_string_to_info(self, srcs, additional_include_dirs=None, filenames=None, clang_drivers=None,
+                             num_workers=0):
+        drivers = clang_drivers_for_batch(self.__clang_driver, len(srcs), additional_include_dirs, filenames, clang_drivers)
+        extractor, _ = self.__extractors.get()
+        return extractor.GraphFromStrings(srcs, num_workers, drivers, self.__options)
+
+    def file_to_info(self, path, additional_include_dir=None, clang_driver=None):
+        path = os.fspath(path)
+        extractor, driver = self.__extractors.get(clang_driver, additional_include_dir)
+        if self.__cache is None:
+            return extractor.GraphFromFile(path, self.__options)
+        return self.__cache.lookup_file(self.__kind, driver, path, lambda: extractor.GraphFromFile(path, self.__options))
+
+    def batch_file_to_info(self, paths, additional_include_dirs=None, clang_drivers=None, num_workers=0):
+        drivers = clang_drivers_for_batch(self.__clang_driver, len(paths), additional_include_dirs, None, clang_drivers)
+        extractor, _ = self.__extractors.get()
+        return extractor.GraphFromFiles([os.fspath(path) for path in paths], num_workers, drivers, self.__options)
+
+    def string_to_function_infos(self, src, callback, additional_include_dir=None, filename=None, clang_driver=None):
+        """Like string_to_info(), but pass every FunctionInfo to callback as soon as it is extracted, so that only one
+        function is held at a time unless callback keeps it.
+
+        Returns the info without its functions, i.e. only the call graph. The cache is not used.
+        """
+        extractor, _ = self.__extractors.get(clang_driver, additional_include_dir, filename)
+        return extractor.GraphFunctionsFromString(src, callback, self.__options)
+
+    def file_to_function_infos(self, path, callback, additional_include_dir=None, clang_driver=None):
+        """Like string_to_function_infos(), reading the source from path."""
+        extractor, _ = self.__extractors.get(clang_driver, additional_include_dir)
+        return extractor.GraphFunctionsFromFile(os.fspath(path), callback, self.__options)
+
+    def string_to_infos_at_levels(self, src, levels, additional_include_dir=None, filename=None, clang_driver=None):
+        """Extract infos for several optimization levels, lowering the source to LLVM IR only once.
+
+        Returns one info per level in levels, e.g. [ClangDriver.OptimizationLevel.O0, ClangDriver.OptimizationLevel.O3].
+        The optimization level of the clang driver is not used.
+        """
+        levels = list(levels)
+        kind = self.__kind + "@" + ",".join(str(int(level)) for level in levels)
+        extractor, driver = self.__extractors.get(clang_driver, additional_include_dir, filename)
+        if self.__cache is None:
+            return extractor.GraphFromStringAtLevels(src, levels, self.__options)
+        return self.__cache.lookup(kind, driver, src, lambda: extractor.GraphFromStringAtLevels(src, levels, self.__options))
+
+    def file_to_infos_at_levels(self, path, levels, additional_include_dir=None, clang_driver=None):
+        """Like string_to_infos_at_levels(), reading the source from path."""
+        path = os.fspath(path)
+        levels = list(levels)
+        kind = self.__kind + "@" + ",".join(str(int(level)) for level in levels)
+        extractor, driver = self.__extractors.get(clang_driver, additional_include_dir)
+        if self.__cache is None:
+            return extractor.GraphFromFileAtLevels(path, levels, self.__options)
+        return self.__cache.lookup_file(kind, driver, path, lambda: extractor.GraphFromFileAtLevels(path, levels, self.__options))
 
     def info_to_representation(self, info, visitor=LLVMCDFGVisitor):
+        kind = _NATIVE_VISITORS.get(visitor)
+        if kind is not None:
+            return self._arrays_to_graph(llvm.graph.buildGraph(info, kind), visitor().edge_types)
+
         vis = visitor()
         info.accept(vis)
 
-        for (n, data) in vis.G.nodes(data=True):
-            attr = data["attr"]
-            if attr not in self._tokens:
-                self._tokens[attr] = 1
-            self._tokens[attr] += 1
+        node_types = self._add_tokens([data["attr"] for _, data in vis.G.nodes(data=True)])
 
-        return common.Graph(vis.G, self.get_tokens(), vis.edge_types)
+        return common.Graph.from_networkx(vis.G, node_types, vis.edge_types)
@@ -1,8 +1,12 @@
 import os
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 
 import networkx as nx
 
+from compy.representations.extraction_cache import ExtractionCache
+from compy.representations.extractors.extractors import ClangDriver
+from compy.representations.extractors.extractors import FunctionFilter
 from compy.representations.extractors.extractors import Visitor
 from compy.representations.extractors.extractors import llvm
 from compy.representations.llvm_graphs import LLVMGraphBuilder
@@ -10,6 +14,7 @@ from compy.representations.llvm_graphs import LLVMCDFGVisitor
 from compy.representations.llvm_graphs import LLVMCDFGCallVisitor
 from compy.representations.llvm_graphs import LLVMCDFGPlusVisitor
 from compy.representations.llvm_graphs import LLVMProGraMLVisitor
+from compy.representations.llvm_graphs import extraction_options
 
 
 program_1fn_2 = """
@@ -148,6 +153,149 @@ def test_all_visitors():
         assert ast
 
 
+@pytest.mark.parametrize(
+    "visitor",
+    [LLVMCDFGVisitor, LLVMCDFGCallVisitor, LLVMCDFGPlusVisitor, LLVMProGraMLVisitor],
+)
+def test_native_visitors_match_python_visitors(visitor):
+    # Subclasses are not built natively.
+    class PythonVisitor(visitor):
+        pass
+
+    builder = LLVMGraphBuilder()
+    info = builder.string_to_info(program_fib)
+    native = builder.info_to_representation(info, visitor)
+    python = builder.info_to_representation(info, PythonVisitor)
+
+    assert native.get_node_str_list() == python.get_node_str_list()
+    assert native.get_node_list() == python.get_node_list()
+    assert native.get_edge_list() == python.get_edge_list()
+    assert list(native.G.nodes) == list(python.G.nodes)
+    assert list(native.G.edges(data="attr")) == list(python.G.edges(data="attr"))
+
+
+def test_native_visitors_count_tokens_like_python_visitors():
+    class PythonVisitor(LLVMCDFGVisitor):
+        pass
+
+    native_builder = LLVMGraphBuilder()
+    python_builder = LLVMGraphBuilder()
+    for src in [program_1fn_2, program_fib]:
+        native_builder.info_to_representation(native_builder.string_to_info(src), LLVMCDFGVisitor)
+        python_builder.info_to_representation(python_builder.string_to_info(src), PythonVisitor)
+
+    assert native_builder.vocabulary.items() == python_builder.vocabulary.items()
+
+
+@pytest.mark.parametrize(
+    "visitor",
+    [LLVMCDFGVisitor, LLVMCDFGCallVisitor, LLVMCDFGPlusVisitor, LLVMProGraMLVisitor],
+)
+def test_extraction_options_of_visitor_give_same_graph(visitor):
+    full_builder = LLVMGraphBuilder()
+    builder = LLVMGraphBuilder(options=extraction_options(visitor))
+    full = full_builder.info_to_representation(full_builder.string_to_info(program_fib), visitor)
+    graph = builder.info_to_representation(builder.string_to_info(program_fib), visitor)
+
+    assert graph.get_node_str_list() == full.get_node_str_list()
+    assert graph.get_edge_list() == full.get_edge_list()
+
+
+def test_extraction_options():
+    options = extraction_options(LLVMProGraMLVisitor)
+    assert not options.memoryAccesses
+    assert not options.callGraph
+    assert options.constants
+
+    options = extraction_options(LLVMCDFGVisitor, LLVMProGraMLVisitor)
+    assert options.memoryAccesses
+    assert not options.callGraph
+    assert options.constants
+
+    # Visitors that do not declare what they read get everything.
+    class CustomVisitor(Visitor):
+        pass
+
+    options = extraction_options(LLVMCDFGVisitor, CustomVisitor)
+    assert options.memoryAccesses and options.callGraph and options.constants
+
+    class BadVisitor(Visitor):
+        extraction_features = {"foo"}
+
+    with pytest.raises(ValueError):
+        extraction_options(BadVisitor)
+
+
+def test_string_to_infos_at_levels():
+    builder = LLVMGraphBuilder()
+    levels = [ClangDriver.OptimizationLevel.O0, ClangDriver.OptimizationLevel.O3]
+    infos = builder.string_to_infos_at_levels(program_fib, levels)
+
+    graphs = [builder.info_to_representation(info) for info in infos]
+    assert len(graphs) == 2
+    assert graphs[0].size() != graphs[1].size()
+
+
+def test_function_filter():
+    builder = LLVMGraphBuilder(function_filter=FunctionFilter(names=["fib"]))
+    info = builder.string_to_info(program_1fn_2 + program_fib)
+
+    assert [x.name for x in info.functionInfos] == ["fib"]
+
+
+def test_function_filter_with_cache():
+    cache = ExtractionCache()
+    src = program_1fn_2 + program_fib
+
+    filtered = LLVMGraphBuilder(cache=cache, function_filter=FunctionFilter(names=["bar"])).string_to_info(src)
+    full = LLVMGraphBuilder(cache=cache).string_to_info(src)
+
+    assert [x.name for x in filtered.functionInfos] == ["bar"]
+    assert [x.name for x in full.functionInfos] == ["bar", "fib"]
+
+    with pytest.raises(ValueError):
+        LLVMGraphBuilder(cache=cache, function_filter=FunctionFilter(predicate=lambda name: True))
+
+
+def test_string_to_function_infos():
+    builder = LLVMGraphBuilder()
+    graphs = []
+    builder.string_to_function_infos(
+        program_1fn_2 + program_fib,
+        lambda function: graphs.append(builder.info_to_representation(function, LLVMProGraMLVisitor)),
+    )
+
+    assert len(graphs) == 2
+    assert all(graph.get_node_list() for graph in graphs)
+
+
+def test_per_call_clang_driver_leaves_builder_driver_unchanged():
+    clang_driver = ClangDriver(ClangDriver.ProgrammingLanguage.C, ClangDriver.OptimizationLevel.O0, [], ["-Wall"])
+    builder = LLVMGraphBuilder(clang_driver)
+    cpp_driver = ClangDriver(ClangDriver.ProgrammingLanguage.CPlusPlus, ClangDriver.OptimizationLevel.O0, [], [])
+
+    info = builder.string_to_info(program_fib, additional_include_dir="/tmp", filename="fib.cc", clang_driver=cpp_driver)
+
+    assert len(info.functionInfos) == 1
+    assert clang_driver.getFileName() == "program.c"
+    assert cpp_driver.getFileName() == "program.cc"
+    assert clang_driver.getIncludeDirs() == [] and cpp_driver.getIncludeDirs() == []
+
+
+def test_string_to_info_from_threads():
+    builder = LLVMGraphBuilder()
+    srcs = [program_1fn_2, program_fib] * 8
+
+    def extract(src):
+        return builder.info_to_representation(builder.string_to_info(src), LLVMProGraMLVisitor).size()
+
+    expected = [extract(src) for src in srcs]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        sizes = list(executor.map(extract, srcs))
+
+    assert sizes == expected
+
+
 # CDFG
 # ############################
 @pytest.fixture
@@ -220,3 +368,20 @@ def test_programl_cfg_edges_reach_all_nodes(llvm_programl_graph):
     explored = explore_cfg_with_dfs(llvm_programl_graph, first_instruction)
 
     assert set(explored) == set(get_all_instructions(llvm_programl_graph))
+
+
+# Supervised extraction
+def test_strings_to_infos_isolates_failing_sources():
+    builder = LLVMGraphBuilder()
+
+    def postprocess(info):
+        return builder.info_to_representation(info, LLVMCDFGVisitor).get_node_str_list()
+
+    results = sorted(builder.strings_to_infos(
+        [program_1fn_2, "foobar", program_fib], workers=2, timeout=60, postprocess=postprocess
+    ))
+
+    assert [index for index, _, _ in results] == [0, 1, 2]
+    assert "ret" in results[0][1] and results[0][2] is None
+    assert results[1][1] is None and results[1][2]
+    assert "call" in results[2][1] and results[2][2] is None
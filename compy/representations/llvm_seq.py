@@ -1,4 +1,8 @@
-from compy.representations.extractors import clang_driver_scoped_options
+import os
+
+from compy.representations.extractors import clang_drivers_for_batch
+from compy.representations.extractors import ExtractorPool
+from compy.representations.extractors import function_filter_cache_kind
 from compy.representations.extractors.extractors import Visitor
 from compy.representations.extractors.extractors import ClangDriver
 from compy.representations.extractors.extractors import LLVMIRExtractor
@@ -70,8 +74,10 @@ class LLVMSeqVisitor(Visitor):
 
 
 class LLVMSeqBuilder(common.RepresentationBuilder):
-    def __init__(self, clang_driver=None):
-        common.RepresentationBuilder.__init__(self)
+    def __init__(self, clang_driver=None, cache=None, function_filter=None, vocabulary=None):
+        """If function_filter is given, e.g. FunctionFilter(names=["foo"]), only the functions it selects are
+        extracted. A filter with a predicate cannot be used with a cache."""
+        common.RepresentationBuilder.__init__(self, vocabulary)
 
         if clang_driver:
             self.__clang_driver = clang_driver
@@ -82,19 +88,70 @@ class LLVMSeqBuilder(common.RepresentationBuilder):
                 [],
                 ["-Wall"],
             )
-        self.__extractor = LLVMIRExtractor(self.__clang_driver)
-
-    def string_to_info(self, src, additional_include_dir=None, filename=None):
-        with clang_driver_scoped_options(self.__clang_driver, additional_include_dir=additional_include_dir, filename=filename):
-            return self.__extractor.SeqFromString(src)
+        self.__extractors = ExtractorPool(LLVMIRExtractor, self.__clang_driver, function_filter)
+        self.__cache = cache
+        self.__kind = function_filter_cache_kind("llvm_seq", function_filter, cache)
+
+    def string_to_info(self, src, additional_include_dir=None, filename=None, clang_driver=None):
+        extractor, driver = self.__extractors.get(clang_driver, additional_include_dir, filename)
+        if self.__cache is None:
+            return extractor.SeqFromString(src)
+        return self.__cache.lookup(self.__kind, driver, src, lambda: extractor.SeqFromString(src))
         
+    def batch_string_to_info(self, srcs, additional_include_dirs=None, filenames=None, clang_drivers=None,
+                             num_workers=0):
+        drivers = clang_drivers_for_batch(self.__clang_driver, len(srcs), additional_include_dirs, filenames, clang_drivers)
+        extractor, _ = self.__extractors.get()
+        return extractor.SeqFromStrings(srcs, num_workers, drivers)
+
+    def file_to_info(self, path, additional_include_dir=None, clang_driver=None):
+        path = os.fspath(path)
+        extractor, driver = self.__extractors.get(clang_driver, additional_include_dir)
+        if self.__cache is None:
+            return extractor.SeqFromFile(path)
+        return self.__cache.lookup_file(self.__kind, driver, path, lambda: extractor.SeqFromFile(path))
+
+    def batch_file_to_info(self, paths, additional_include_dirs=None, clang_drivers=None, num_workers=0):
+        drivers = clang_drivers_for_batch(self.__clang_driver, len(paths), additional_include_dirs, None, clang_drivers)
+        extractor, _ = self.__extractors.get()
+        return extractor.SeqFromFiles([os.fspath(path) for path in paths], num_workers, drivers)
+
+    def string_to_function_infos(self, src, callback, additional_include_dir=None, filename=None, clang_driver=None):
+        """Like string_to_info(), but pass every FunctionInfo to callback as soon as it is extracted, so that only one
+        function is held at a time unless callback keeps it. The cache is not used."""
+        extractor, _ = self.__extractors.get(clang_driver, additional_include_dir, filename)
+        return extractor.SeqFunctionsFromString(src, callback)
+
+    def file_to_function_infos(self, path, callback, additional_include_dir=None, clang_driver=None):
+        """Like string_to_function_infos(), reading the source from path."""
+        extractor, _ = self.__extractors.get(clang_driver, additional_include_dir)
+        return extractor.SeqFunctionsFromFile(os.fspath(path), callback)
+
+    def string_to_infos_at_levels(self, src, levels, additional_include_dir=None, filename=None, clang_driver=None):
+        """Extract infos for several optimization levels, lowering the source to LLVM IR only once.
+
+        Returns one info per level in levels, e.g. [ClangDriver.OptimizationLevel.O0, ClangDriver.OptimizationLevel.O3].
+        The optimization level of the clang driver is not used.
+        """
+        levels = list(levels)
+        kind = self.__kind + "@" + ",".join(str(int(level)) for level in levels)
+        extractor, driver = self.__extractors.get(clang_driver, additional_include_dir, filename)
+        if self.__cache is None:
+            return extractor.SeqFromStringAtLevels(src, levels)
+        return self.__cache.lookup(kind, driver, src, lambda: extractor.SeqFromStringAtLevels(src, levels))
+
+    def file_to_infos_at_levels(self, path, levels, additional_include_dir=None, clang_driver=None):
+        """Like string_to_infos_at_levels(), reading the source from path."""
+        path = os.fspath(path)
+        levels = list(levels)
+        kind = self.__kind + "@" + ",".join(str(int(level)) for level in levels)
+        extractor, driver = self.__extractors.get(clang_driver, additional_include_dir)
+        if self.__cache is None:
+            return extractor.SeqFromFileAtLevels(path, levels)
+        return self.__cache.lookup_file(kind, driver, path, lambda: extractor.SeqFromFileAtLevels(path, levels))
+
     def info_to_representation(self, info, visitor=LLVMSeqVisitor):
         vis = visitor()
         info.accept(vis)
 
-        for token in vis.S:
-            if token not in self._tokens:
-                self._tokens[token] = 1
-            self._tokens[token] += 1
-
-        return common.Sequence(vis.S, self.get_tokens())
+        return common.Sequence(vis.S, self._add_tokens(vis.S))
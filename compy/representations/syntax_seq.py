@@ -1,4 +1,8 @@
-from compy.representations.extractors import clang_driver_scoped_options
+import os
+
+from compy.representations.extractors import clang_drivers_for_batch
+from compy.representations.extractors import ExtractorPool
+from compy.representations.extractors import function_filter_cache_kind
 from compy.representations.extractors.extractors import Visitor
 from compy.representations.extractors.extractors import ClangDriver
 from compy.representations.extractors.extractors import ClangExtractor
@@ -47,8 +51,11 @@ class SyntaxTokenkindVariableVisitor(Visitor):
 
 
 class SyntaxSeqBuilder(common.RepresentationBuilder):
-    def __init__(self, clang_driver=None):
-        common.RepresentationBuilder.__init__(self)
+    def __init__(self, clang_driver=None, cache=None, lex_only=False, function_filter=None, vocabulary=None):
+        """With lex_only, the sources are only lexed instead of parsed, which is much faster but finds the functions
+        and variables to rename syntactically, and does not rename names declared in headers. If function_filter is
+        given, e.g. FunctionFilter(names=["foo"]), only the functions it selects are extracted."""
+        common.RepresentationBuilder.__init__(self, vocabulary)
 
         if clang_driver:
             self.__clang_driver = clang_driver
@@ -59,19 +66,37 @@ class SyntaxSeqBuilder(common.RepresentationBuilder):
                 [],
                 ["-Wall"],
             )
-        self.__extractor = ClangExtractor(self.__clang_driver)
-
-    def string_to_info(self, src, additional_include_dir=None, filename=None):
-        with clang_driver_scoped_options(self.__clang_driver, additional_include_dir=additional_include_dir, filename=filename):
-            return self.__extractor.SeqFromString(src)
+        self.__extractors = ExtractorPool(ClangExtractor, self.__clang_driver, function_filter)
+        self.__cache = cache
+        self.__lex_only = lex_only
+        self.__kind = function_filter_cache_kind("clang_seq-lex" if lex_only else "clang_seq", function_filter, cache)
+
+    def string_to_info(self, src, additional_include_dir=None, filename=None, clang_driver=None):
+        extractor, driver = self.__extractors.get(clang_driver, additional_include_dir, filename)
+        if self.__cache is None:
+            return extractor.SeqFromString(src, self.__lex_only)
+        return self.__cache.lookup(self.__kind, driver, src, lambda: extractor.SeqFromString(src, self.__lex_only))
+
+    def batch_string_to_info(self, srcs, additional_include_dirs=None, filenames=None, clang_drivers=None,
+                             num_workers=0):
+        drivers = clang_drivers_for_batch(self.__clang_driver, len(srcs), additional_include_dirs, filenames, clang_drivers)
+        extractor, _ = self.__extractors.get()
+        return extractor.SeqFromStrings(srcs, num_workers, drivers, self.__lex_only)
+
+    def file_to_info(self, path, additional_include_dir=None, clang_driver=None):
+        path = os.fspath(path)
+        extractor, driver = self.__extractors.get(clang_driver, additional_include_dir)
+        if self.__cache is None:
+            return extractor.SeqFromFile(path, self.__lex_only)
+        return self.__cache.lookup_file(self.__kind, driver, path, lambda: extractor.SeqFromFile(path, self.__lex_only))
+
+    def batch_file_to_info(self, paths, additional_include_dirs=None, clang_drivers=None, num_workers=0):
+        drivers = clang_drivers_for_batch(self.__clang_driver, len(paths), additional_include_dirs, None, clang_drivers)
+        extractor, _ = self.__extractors.get()
+        return extractor.SeqFromFiles([os.fspath(path) for path in paths], num_workers, drivers, self.__lex_only)
 
     def info_to_representation(self, info, visitor=SyntaxTokenkindVariableVisitor):
         vis = visitor()
         info.accept(vis)
 
-        for token in vis.S:
-            if token not in self._tokens:
-                self._tokens[token] = 1
-            self._tokens[token] += 1
-
-        return common.Sequence(vis.S, self.get_tokens())
+        return common.Sequence(vis.S, self._add_tokens(vis.S))
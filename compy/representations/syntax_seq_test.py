@@ -1,5 +1,6 @@
 import os
 
+from compy.representations.extractors.extractors import ClangDriver
 from compy.representations.extractors.extractors import Visitor
 from compy.representations.extractors.extractors import clang
 from compy.representations.syntax_seq import SyntaxSeqBuilder
@@ -64,3 +65,41 @@ def test_all_visitors():
         ast = builder.info_to_representation(info, visitor)
 
         assert ast
+
+
+# Lexer only
+def test_lex_only_gives_same_sequence():
+    for src in [program_1fn_2, program_fib]:
+        info = SyntaxSeqBuilder().string_to_info(src)
+        lexed_info = SyntaxSeqBuilder(lex_only=True).string_to_info(src)
+
+        for visitor in [SyntaxSeqVisitor, SyntaxTokenkindVisitor]:
+            seq = SyntaxSeqBuilder().info_to_representation(info, visitor)
+            lexed_seq = SyntaxSeqBuilder().info_to_representation(lexed_info, visitor)
+
+            assert lexed_seq.S == seq.S
+
+
+def test_lex_only_does_not_read_headers(tmpdir):
+    src = '#include "missing.h"\n' + program_1fn_2
+    path = os.path.join(tmpdir, "program.c")
+    with open(path, "w") as f:
+        f.write(src)
+
+    builder = SyntaxSeqBuilder(lex_only=True)
+    for info in [builder.string_to_info(src), builder.file_to_info(path)]:
+        seq = builder.info_to_representation(info, SyntaxSeqVisitor)
+
+        assert "include" not in seq.S
+        assert "fn_0" in seq.S
+
+
+def test_lex_only_reads_virtual_files(tmpdir):
+    path = os.path.join(tmpdir, "program.c")
+    clang_driver = ClangDriver(ClangDriver.ProgrammingLanguage.C, ClangDriver.OptimizationLevel.O0, [], [])
+    clang_driver.setVirtualFiles({path: program_1fn_2})
+
+    builder = SyntaxSeqBuilder(clang_driver, lex_only=True)
+    seq = builder.info_to_representation(builder.file_to_info(path), SyntaxSeqVisitor)
+
+    assert "fn_0" in seq.S
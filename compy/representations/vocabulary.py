@@ -0,0 +1,184 @@
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+
+class Vocabulary(object):
+    """The token types of representations and their ids, with the number of times each was seen.
+
+    Ids are assigned in the order tokens are first added. A builder adds the tokens of every representation it
+    builds to its vocabulary, and the representations refer to the vocabulary instead of copying it, so that they
+    see the ids of tokens added later as well. Ids never change once assigned.
+
+    A frozen vocabulary does not take new tokens any more. Unknown tokens are then mapped to the id of
+    unknown_token, which freeze() adds if it is not in the vocabulary yet, or are rejected with a KeyError if there is
+    no unknown_token. Freeze a vocabulary, e.g. one that was loaded from disk, to build representations with the
+    same ids in several processes, for training and inference. To build one from sharded extraction, merge the
+    vocabularies of the shards and take by_count(), whose ids do not depend on the order the shards finished in.
+
+    Vocabularies can be used from several threads at once.
+    """
+
+    def __init__(self, tokens=(), unknown_token=None):
+        self.unknown_token = unknown_token
+
+        self.__tokens = []
+        self.__ids = {}
+        self.__counts = []
+        self.__frozen = False
+        self.__lock = threading.Lock()
+
+        tokens = list(tokens)
+        self.add(tokens, [0] * len(tokens))
+
+    @property
+    def tokens(self):
+        """The list of tokens by id. Must not be modified."""
+        return self.__tokens
+
+    @property
+    def ids(self):
+        """The dict from token to id. Must not be modified."""
+        return self.__ids
+
+    @property
+    def frozen(self):
+        return self.__frozen
+
+    @property
+    def unknown_id(self):
+        """The id unknown tokens are mapped to, or None if they are rejected."""
+        if not self.__frozen or self.unknown_token is None:
+            return None
+        return self.__ids[self.unknown_token]
+
+    def add(self, tokens, counts=None):
+        """Count counts[i] occurrences of tokens[i] (one each by default), adding the tokens that are new unless the
+        vocabulary is frozen."""
+        with self.__lock:
+            for i, token in enumerate(tokens):
+                count = 1 if counts is None else counts[i]
+                token_id = self.__ids.get(token)
+                if token_id is None:
+                    token_id = self.__unknown(token)
+                self.__counts[token_id] += count
+
+    def merge(self, other):
+        """Add the tokens of other with their counts, e.g. of a vocabulary built in another process."""
+        tokens, counts = zip(*other.items()) if len(other) else ((), ())
+        self.add(tokens, counts)
+        return self
+
+    def lookup(self, tokens):
+        """Return the ids of tokens as an int32 numpy array."""
+        unknown_id = self.unknown_id
+        if unknown_id is None:
+            return np.fromiter(map(self.__ids.__getitem__, tokens), dtype=np.int32, count=len(tokens))
+        return np.fromiter(map(self.__ids.get, tokens, [unknown_id] * len(tokens)), dtype=np.int32, count=len(tokens))
+
+    def count(self, token):
+        token_id = self.__ids.get(token)
+        return 0 if token_id is None else self.__counts[token_id]
+
+    def items(self):
+        """Return the (token, count) pairs by id."""
+        with self.__lock:
+            return list(zip(self.__tokens, self.__counts))
+
+    def freeze(self):
+        with self.__lock:
+            if self.unknown_token is not None and self.unknown_token not in self.__ids:
+                self.__append(self.unknown_token)
+            self.__frozen = True
+        return self
+
+    def by_count(self, min_count=1):
+        """Return a new vocabulary of the tokens seen at least min_count times, with ids by decreasing count.
+
+        Tokens with the same count are ordered by their string, so the ids only depend on the counts. The unknown
+        token is kept, and the new vocabulary is frozen if this one is.
+        """
+        items = [(token, count) for token, count in self.items() if count >= min_count or token == self.unknown_token]
+        items.sort(key=lambda item: (-item[1], str(item[0])))
+
+        vocabulary = Vocabulary(unknown_token=self.unknown_token)
+        vocabulary.add([token for token, _ in items], [count for _, count in items])
+        if self.__frozen:
+            vocabulary.freeze()
+        return vocabulary
+
+    def save(self, path):
+        """Save the vocabulary as JSON. Tokens must be strings or tuples of strings."""
+        with self.__lock:
+            data = {
+                "tokens": self.__tokens,
+                "counts": self.__counts,
+                "unknown_token": self.unknown_token,
+                "frozen": self.__frozen,
+            }
+            directory = os.path.dirname(os.path.abspath(path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+
+        # JSON turns tuples into lists, which cannot be tokens
+        def token(value):
+            return tuple(token(v) for v in value) if isinstance(value, list) else value
+
+        vocabulary = cls(unknown_token=token(data["unknown_token"]))
+        vocabulary.add([token(t) for t in data["tokens"]], data["counts"])
+        if data["frozen"]:
+            vocabulary.freeze()
+        return vocabulary
+
+    def index(self, token):
+        token_id = self.__ids.get(token)
+        if token_id is None:
+            raise ValueError("%r is not in vocabulary" % (token,))
+        return token_id
+
+    def __len__(self):
+        return len(self.__tokens)
+
+    def __getitem__(self, token_id):
+        return self.__tokens[token_id]
+
+    def __iter__(self):
+        return iter(list(self.__tokens))
+
+    def __contains__(self, token):
+        return token in self.__ids
+
+    def __getstate__(self):
+        with self.__lock:
+            return self.__tokens, self.__counts, self.unknown_token, self.__frozen
+
+    def __setstate__(self, state):
+        tokens, counts, self.unknown_token, self.__frozen = state
+        self.__tokens = list(tokens)
+        self.__ids = {token: i for i, token in enumerate(self.__tokens)}
+        self.__counts = list(counts)
+        self.__lock = threading.Lock()
+
+    def __unknown(self, token):
+        if not self.__frozen:
+            return self.__append(token)
+        if self.unknown_token is None:
+            raise KeyError(token)
+        return self.__ids[self.unknown_token]
+
+    def __append(self, token):
+        token_id = len(self.__tokens)
+        self.__ids[token] = token_id
+        self.__tokens.append(token)
+        self.__counts.append(0)
+        return token_id
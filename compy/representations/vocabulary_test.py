@@ -0,0 +1,68 @@
+import pickle
+
+import pytest
+
+from compy.representations.vocabulary import Vocabulary
+
+
+def test_ids_follow_first_occurrence():
+    vocabulary = Vocabulary()
+    vocabulary.add(["b", "a", "b"])
+    vocabulary.add(["c"], [5])
+
+    assert list(vocabulary) == ["b", "a", "c"]
+    assert vocabulary.lookup(["a", "c", "b"]).tolist() == [1, 2, 0]
+    assert vocabulary.items() == [("b", 2), ("a", 1), ("c", 5)]
+    assert vocabulary.index("c") == 2
+    with pytest.raises(ValueError):
+        vocabulary.index("d")
+
+
+def test_frozen_vocabulary_maps_unknown_tokens():
+    vocabulary = Vocabulary(["a", "b"], unknown_token="<unk>").freeze()
+    vocabulary.add(["a", "z"])
+
+    assert list(vocabulary) == ["a", "b", "<unk>"]
+    assert vocabulary.lookup(["b", "z"]).tolist() == [1, 2]
+    assert vocabulary.count("<unk>") == 1
+
+    strict = Vocabulary(["a"]).freeze()
+    with pytest.raises(KeyError):
+        strict.add(["z"])
+    with pytest.raises(KeyError):
+        strict.lookup(["z"])
+
+
+def test_merged_shards_get_ids_independent_of_order():
+    shard1 = Vocabulary()
+    shard1.add(["a", "b", "b"])
+    shard2 = Vocabulary()
+    shard2.add(["c", "b", "c", "a"])
+
+    merged = Vocabulary().merge(shard1).merge(shard2).by_count()
+    merged_reversed = Vocabulary().merge(shard2).merge(shard1).by_count()
+
+    assert merged.items() == merged_reversed.items() == [("b", 3), ("a", 2), ("c", 2)]
+    assert merged.by_count(min_count=3).items() == [("b", 3)]
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "vocabulary.json")
+    vocabulary = Vocabulary(unknown_token="<unk>")
+    vocabulary.add(["a", ("i32", "add")])
+    vocabulary.freeze().save(path)
+
+    loaded = Vocabulary.load(path)
+    assert loaded.items() == vocabulary.items()
+    assert loaded.frozen
+    assert loaded.lookup([("i32", "add"), "new"]).tolist() == [1, 2]
+
+
+def test_pickle():
+    vocabulary = Vocabulary(["a", "b"])
+
+    unpickled = pickle.loads(pickle.dumps(vocabulary))
+    unpickled.add(["c"])
+
+    assert list(unpickled) == ["a", "b", "c"]
+    assert list(vocabulary) == ["a", "b"]
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from appdirs import user_cache_dir
+
+
+def default_discovery_cache_path():
+    return os.path.join(user_cache_dir(appname="compy-Learn", version="1.0"), "discovery.json")
+
+
+def tool_stamp(path):
+    """Identify the tool at path by its real path, modification time and size, so that entries about it are not used
+    any more once it is replaced, e.g. by a compiler upgrade."""
+    real_path = os.path.realpath(path)
+    stat = os.stat(real_path)
+    return [real_path, stat.st_mtime_ns, stat.st_size]
+
+
+class DiscoveryCache(object):
+    """Results of toolchain discovery, e.g. compiler versions and system include dirs, persisted in a JSON file.
+
+    Other processes reuse the results instead of running the same subprocesses again. Values must be JSON
+    serializable. The file is replaced atomically, so it is never read half-written, but entries that two processes
+    add at the same time can get lost, and are then computed again. If the file cannot be read or written, results are
+    only kept in memory.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_discovery_cache_path()
+
+        self.__entries = None
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def key(kind, key_parts):
+        return kind + ":" + hashlib.sha256(json.dumps(key_parts).encode()).hexdigest()
+
+    def get(self, kind, key_parts, compute):
+        """Return the cached result for key_parts, calling compute() to discover it on a miss."""
+        key = self.key(kind, key_parts)
+
+        with self.__lock:
+            if self.__entries is None:
+                self.__entries = self.__read()
+            if key in self.__entries:
+                return self.__entries[key]
+
+        value = compute()
+
+        with self.__lock:
+            # Merge with the entries other processes added in the meantime.
+            entries = self.__read()
+            entries.update(self.__entries)
+            entries[key] = value
+            self.__entries = entries
+            self.__write()
+        return value
+
+    def clear(self):
+        with self.__lock:
+            self.__entries = {}
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def __read(self):
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def __write(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.__entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+
+_discovery_cache = None
+
+
+def discovery_cache():
+    """The discovery cache of this process, in the default location."""
+    global _discovery_cache
+    if _discovery_cache is None:
+        _discovery_cache = DiscoveryCache()
+    return _discovery_cache
@@ -0,0 +1,56 @@
+import os
+
+from compy.utils.discovery_cache import DiscoveryCache
+from compy.utils.discovery_cache import tool_stamp
+
+
+class CountingDiscovery(object):
+    def __init__(self, result):
+        self.calls = 0
+        self.result = result
+
+    def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+def test_results_are_reused_by_other_processes(tmp_path):
+    path = str(tmp_path / "discovery.json")
+    discover = CountingDiscovery(["/usr/include"])
+
+    assert DiscoveryCache(path).get("includes", ["clang", "-O2"], discover) == ["/usr/include"]
+    # A new cache on the same file, like in another process
+    assert DiscoveryCache(path).get("includes", ["clang", "-O2"], discover) == ["/usr/include"]
+
+    assert discover.calls == 1
+
+
+def test_key_depends_on_kind_and_parts(tmp_path):
+    cache = DiscoveryCache(str(tmp_path / "discovery.json"))
+
+    assert cache.get("a", ["clang"], lambda: 1) == 1
+    assert cache.get("b", ["clang"], lambda: 2) == 2
+    assert cache.get("a", ["clang", "-O2"], lambda: 3) == 3
+    assert cache.get("a", ["clang"], lambda: 4) == 1
+
+
+def test_tool_stamp_changes_with_tool(tmp_path):
+    tool = tmp_path / "clang"
+    tool.write_text("old")
+    os.utime(tool, ns=(0, 0))
+    stamp = tool_stamp(str(tool))
+
+    tool.write_text("newer")
+    assert tool_stamp(str(tool)) != stamp
+
+
+def test_unwritable_cache_keeps_results_in_memory(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    cache = DiscoveryCache(str(blocker / "discovery.json"))
+    discover = CountingDiscovery("17.0.6")
+
+    for _ in range(2):
+        assert cache.get("llvm_version", ["clang"], discover) == "17.0.6"
+
+    assert discover.calls == 1
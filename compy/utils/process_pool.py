@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+
+
+# How often the supervisor wakes up to check timeouts and memory usage, in seconds.
+POLL_INTERVAL = 0.1
+
+
+def _worker_main(fn, conn):
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+
+        index, item = task
+        try:
+            message = (index, fn(item), None)
+        except Exception as e:
+            message = (index, None, "%s: %s" % (type(e).__name__, e))
+
+        try:
+            conn.send(message)
+        except Exception as e:
+            conn.send((index, None, "Cannot send result to supervisor: %s" % e))
+
+
+def _rss_bytes(pid):
+    """Return the resident set size of a process, or None if it cannot be determined."""
+    try:
+        with open("/proc/%d/statm" % pid) as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _Worker(object):
+    def __init__(self, context, fn):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(fn, child_conn), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+        self.index = None
+        self.started_at = None
+
+    def submit(self, index, item):
+        self.index = index
+        self.started_at = time.monotonic()
+        self.conn.send((index, item))
+
+    def is_busy(self):
+        return self.index is not None
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+def supervised_imap(fn, items, workers=None, timeout=None, max_rss=None, retries=1):
+    """Apply fn to every item in supervised worker processes.
+
+    Yields (index, result, error) tuples as soon as items finish, i.e. not necessarily in input order. Exactly one of
+    result and error is set. An item fails if fn raises, if it runs longer than timeout seconds, if the worker grows
+    beyond max_rss bytes or if the worker dies, e.g. because native code called exit(). Workers that are killed or
+    die are replaced. Items that killed their worker are tried again up to retries times before they are skipped,
+    exceptions raised by fn are not retried.
+
+    Workers are forked, so fn can refer to objects that cannot be pickled, like native extractors. Results are sent
+    back to the supervisor and have to be picklable.
+    """
+    context = multiprocessing.get_context("fork")
+    workers = workers or os.cpu_count()
+
+    items = list(items)
+    pending = list(reversed(range(len(items))))
+    attempts = [0] * len(items)
+
+    pool = [_Worker(context, fn) for _ in range(min(workers, len(items)))]
+
+    def fail_and_replace(worker, error):
+        index = worker.index
+        worker.kill()
+        pool[pool.index(worker)] = _Worker(context, fn)
+
+        attempts[index] += 1
+        if attempts[index] <= retries:
+            pending.append(index)
+            return None
+        return index, None, error
+
+    try:
+        while pending or any(worker.is_busy() for worker in pool):
+            # Hand out work to idle workers.
+            for worker in pool:
+                if not worker.is_busy() and pending:
+                    index = pending.pop()
+                    worker.submit(index, items[index])
+
+            busy = [worker for worker in pool if worker.is_busy()]
+            ready = wait([worker.conn for worker in busy] + [worker.process.sentinel for worker in busy],
+                         timeout=POLL_INTERVAL)
+
+            for worker in busy:
+                failed = None
+                if worker.conn in ready:
+                    try:
+                        index, result, error = worker.conn.recv()
+                    except (EOFError, OSError):
+                        worker.process.join()
+                        failed = "Worker died with exit code %s" % worker.process.exitcode
+                    else:
+                        worker.index = None
+                        yield index, result, error
+                        continue
+                elif worker.process.sentinel in ready:
+                    worker.process.join()
+                    failed = "Worker died with exit code %s" % worker.process.exitcode
+                elif timeout is not None and time.monotonic() - worker.started_at > timeout:
+                    failed = "Timeout after %s seconds" % timeout
+                elif max_rss is not None and (_rss_bytes(worker.process.pid) or 0) > max_rss:
+                    failed = "Memory limit of %d bytes exceeded" % max_rss
+
+                if failed:
+                    message = fail_and_replace(worker, failed)
+                    if message:
+                        yield message
+    finally:
+        for worker in pool:
+            worker.stop()
@@ -0,0 +1,82 @@
+import os
+import time
+
+from compy.utils.process_pool import supervised_imap
+
+
+def square_or_fail(x):
+    if x == "exit":
+        os._exit(1)
+    if x == "hang":
+        time.sleep(60)
+    if x == "raise":
+        raise ValueError("bad input")
+    if x == "unpicklable":
+        return lambda: None
+    if x == "allocate":
+        memory = bytearray(512 * 1024 * 1024)
+        time.sleep(60)
+    return x * x
+
+
+def test_results_cover_all_items():
+    results = sorted(supervised_imap(square_or_fail, range(20), workers=4))
+
+    assert results == [(i, i * i, None) for i in range(20)]
+
+
+def test_empty_input():
+    assert list(supervised_imap(square_or_fail, [], workers=4)) == []
+
+
+def test_dead_worker_only_fails_its_item():
+    results = sorted(supervised_imap(square_or_fail, [1, "exit", 3], workers=2))
+
+    assert results[0] == (0, 1, None)
+    assert results[1][0] == 1 and results[1][1] is None
+    assert "exit code 1" in results[1][2]
+    assert results[2] == (2, 9, None)
+
+
+def test_timeout_kills_item():
+    start = time.monotonic()
+    results = sorted(supervised_imap(square_or_fail, [1, "hang", 3], workers=2, timeout=0.5, retries=0))
+
+    assert time.monotonic() - start < 30
+    assert results[1][1] is None and "Timeout" in results[1][2]
+    assert results[2] == (2, 9, None)
+
+
+def test_memory_limit_kills_item():
+    results = sorted(supervised_imap(square_or_fail, ["allocate", 2], workers=2, max_rss=256 * 1024 * 1024,
+                                     retries=0))
+
+    assert results[0][1] is None and "Memory limit" in results[0][2]
+    assert results[1] == (1, 4, None)
+
+
+def test_exceptions_are_reported_and_not_retried():
+    results = list(supervised_imap(square_or_fail, ["raise"], workers=1, retries=3))
+
+    assert results == [(0, None, "ValueError: bad input")]
+
+
+def test_unpicklable_results_are_reported():
+    results = list(supervised_imap(square_or_fail, ["unpicklable"], workers=1))
+
+    assert results[0][1] is None and "Cannot send result" in results[0][2]
+
+
+def test_crashing_items_are_retried():
+    marker = "/tmp/compy_process_pool_test_%d" % os.getpid()
+
+    def crash_once(x):
+        if not os.path.exists(marker):
+            open(marker, "w").close()
+            os._exit(1)
+        return x
+
+    try:
+        assert list(supervised_imap(crash_once, [42], workers=1, retries=1)) == [(0, 42, None)]
+    finally:
+        os.remove(marker)
@@ -11,6 +11,9 @@ from compy.representations.extractors import ClangDriver
 # Load dataset
 dataset = D.OpenCLDevmapDataset()
 
+# Sources are parsed and lowered once, not once per combination
+cache = R.ExtractionCache(R.default_cache_dir())
+
 # Explore combinations
 combinations = [
     # CGO 20: AST+DF, CDFG
@@ -36,7 +39,8 @@ for builder, visitor, model in combinations:
         [(x, ClangDriver.IncludeDirType.User) for x in dataset.additional_include_dirs],
         ["-xcl", "-target", "x86_64-pc-linux-gnu"],
     )
-    data = dataset.preprocess(builder(clang_driver), visitor)
+    data = dataset.preprocess(builder(clang_driver, cache=cache), visitor)
+    print("Extraction cache: %s" % cache.stats())
 
     # Train and test
     kf = StratifiedKFold(n_splits=10, shuffle=True, random_state=204)